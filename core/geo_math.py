@@ -0,0 +1,97 @@
+"""Shared great-circle distance kernels for the team apps.
+
+All distances are haversine distances in kilometres. The array functions
+take latitudes/longitudes in degrees (anything ``numpy.asarray`` accepts)
+and compute every distance in a single vectorized pass, so radius and
+nearest queries over thousands of points do not loop in Python.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance between two points; scalar form of :func:`distances_km`."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2.0) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Broadcasting haversine over radian arrays."""
+    dphi = lat2 - lat1
+    dlam = lon2 - lon1
+    a = np.sin(dphi / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlam / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def distances_km(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """One-to-many: distance from ``(lat, lon)`` to every ``(lats[i], lons[i])``."""
+    lats_r = np.radians(np.asarray(lats, dtype=np.float64))
+    lons_r = np.radians(np.asarray(lons, dtype=np.float64))
+    return _haversine(math.radians(lat), math.radians(lon), lats_r, lons_r)
+
+
+def distance_matrix_km(lats1, lons1, lats2, lons2) -> np.ndarray:
+    """Many-to-many: ``result[i, j]`` is the distance from point ``i`` of set 1 to point ``j`` of set 2."""
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, np.newaxis]
+    lon1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, np.newaxis]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[np.newaxis, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=np.float64))[np.newaxis, :]
+    return _haversine(lat1, lon1, lat2, lon2)
+
+
+def top_k_indices(distances, k: int, max_distance_km: float | None = None) -> np.ndarray:
+    """
+    Indices of the ``k`` smallest distances, nearest first.
+
+    Uses ``argpartition`` so only the selected ``k`` entries are sorted. Entries
+    beyond ``max_distance_km`` (when given) are never returned.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    candidates = np.arange(distances.shape[0])
+    if max_distance_km is not None:
+        candidates = np.flatnonzero(distances <= max_distance_km)
+    if k <= 0 or candidates.size == 0:
+        return np.empty(0, dtype=np.intp)
+    subset = distances[candidates]
+    if k == 1:
+        # argmin keeps the first of equally distant points, like a plain loop would
+        return candidates[[int(np.argmin(subset))]]
+    if k < subset.size:
+        part = np.argpartition(subset, k - 1)[:k]
+        candidates, subset = candidates[part], subset[part]
+    return candidates[np.argsort(subset, kind="stable")]
+
+
+def within_radius_indices(distances, radius_km: float) -> np.ndarray:
+    """Indices of all distances ``<= radius_km``, nearest first."""
+    distances = np.asarray(distances, dtype=np.float64)
+    idx = np.flatnonzero(distances <= radius_km)
+    return idx[np.argsort(distances[idx], kind="stable")]
+
+
+def circle_ring(lat: float, lon: float, radius_km: float, segments: int = 64) -> list:
+    """
+    Closed ring of ``segments`` points at great-circle distance ``radius_km``
+    around ``(lat, lon)``, as GeoJSON ``[lon, lat]`` pairs (first point repeated last).
+    """
+    phi1 = math.radians(lat)
+    lam1 = math.radians(lon)
+    delta = radius_km / EARTH_RADIUS_KM
+    theta = np.linspace(0.0, 2.0 * math.pi, segments, endpoint=False)
+    phi2 = np.arcsin(math.sin(phi1) * math.cos(delta) + math.cos(phi1) * math.sin(delta) * np.cos(theta))
+    lam2 = lam1 + np.arctan2(
+        np.sin(theta) * math.sin(delta) * math.cos(phi1),
+        math.cos(delta) - math.sin(phi1) * np.sin(phi2),
+    )
+    ring = np.column_stack((np.degrees(lam2), np.degrees(phi2))).round(6).tolist()
+    return ring + ring[:1]
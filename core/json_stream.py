@@ -0,0 +1,114 @@
+"""Incremental parsing of large top-level JSON arrays.
+
+``iter_array`` yields the items of a ``[item, item, ...]`` document one at a
+time while reading the file in fixed-size chunks, so memory stays bounded by
+the largest single item rather than the whole file and consumers can start
+writing rows before the file has been read to the end. Each item is decoded
+with the stdlib ``json`` decoder, so values are identical to ``json.load``.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+class _Buffer:
+    """Text window over a file-like object (text or binary, UTF-8)."""
+
+    def __init__(self, fp, chunk_size: int):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = None
+
+    def fill(self, min_chars: int = 1) -> bool:
+        """Append at least ``min_chars`` more characters (fewer at EOF); returns False if none were added."""
+        before = len(self.text)
+        wanted = before + min_chars
+        while not self.eof and len(self.text) < wanted:
+            raw = self.fp.read(max(self.chunk_size, min_chars))
+            if isinstance(raw, bytes):
+                if self._decoder is None:
+                    self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+                self.text += self._decoder.decode(raw, final=not raw)
+            else:
+                self.text += raw
+            self.eof = not raw
+        return len(self.text) > before
+
+    def compact(self) -> None:
+        """Drop consumed text once it outgrows a chunk, keeping memory bounded."""
+        if self.pos > self.chunk_size:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+
+    def skip_whitespace(self) -> str:
+        """Advance past whitespace and return the next character ('' at EOF)."""
+        while True:
+            text, pos = self.text, self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self.fill():
+                return ""
+
+
+def iter_array(fp, chunk_size: int = DEFAULT_CHUNK_SIZE, decoder: json.JSONDecoder | None = None):
+    """
+    Yield the items of the top-level JSON array in ``fp`` one at a time.
+
+    ``fp`` may be opened in text or binary mode (binary is decoded as UTF-8,
+    with or without BOM). Raises ``ValueError`` (``json.JSONDecodeError`` for
+    malformed items) if the document is not a well-formed array.
+    """
+    decoder = decoder or json.JSONDecoder()
+    buf = _Buffer(fp, chunk_size)
+    if buf.skip_whitespace() != "[":
+        raise ValueError("Expected a top-level JSON array")
+    buf.pos += 1
+    if buf.skip_whitespace() == "]":
+        buf.pos += 1
+        _expect_end(buf)
+        return
+    while True:
+        if not buf.skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        # A complete item is always followed by whitespace, ',' or ']'. Anything else (or the end of
+        # the buffer) may mean a number was cut at a chunk boundary ("1.5" of "1.5e3"): read more
+        # and decode again.
+        read = chunk_size
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf.text, buf.pos)
+            except json.JSONDecodeError:
+                if not buf.fill(read):
+                    raise
+                read *= 2
+                continue
+            if (end < len(buf.text) and buf.text[end] in _DELIMITERS) or not buf.fill(read):
+                break
+            read *= 2
+        buf.pos = end
+        buf.compact()
+        yield item
+        separator = buf.skip_whitespace()
+        buf.pos += 1
+        if separator == "]":
+            _expect_end(buf)
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {separator!r}")
+
+
+def _expect_end(buf: _Buffer) -> None:
+    if buf.skip_whitespace():
+        raise ValueError("Extra data after JSON array")
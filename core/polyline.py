@@ -0,0 +1,110 @@
+"""Encoded polylines and line simplification for route geometry.
+
+``encode``/``decode`` implement the encoded polyline algorithm format used by
+Neshan and Google (precision 5 by default). ``simplify`` is Douglas–Peucker
+with a tolerance in metres on a local equirectangular projection, which is
+accurate enough for the city-scale routes served by the team apps.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+# Web Mercator ground resolution at the equator for zoom 0 with 256px tiles (metres per pixel)
+METERS_PER_PIXEL_ZOOM0 = 156543.03392
+
+
+def _encode_value(value: int, out: list) -> None:
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def encode(points, precision: int = 5) -> str:
+    """Encode ``(lat, lng)`` pairs into a polyline string."""
+    factor = 10 ** precision
+    out: list = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_i = int(math.floor(lat * factor + 0.5))
+        lng_i = int(math.floor(lng * factor + 0.5))
+        _encode_value(lat_i - prev_lat, out)
+        _encode_value(lng_i - prev_lng, out)
+        prev_lat, prev_lng = lat_i, lng_i
+    return "".join(out)
+
+
+def decode(encoded: str, precision: int = 5) -> list:
+    """Decode a polyline string into a list of ``(lat, lng)`` tuples; raises ``ValueError`` if truncated."""
+    factor = float(10 ** precision)
+    points = []
+    index, length = 0, len(encoded)
+    lat = lng = 0
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                if index >= length:
+                    raise ValueError("Truncated polyline")
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+def tolerance_for_zoom(zoom: float, lat: float, pixels: float = 1.0) -> float:
+    """Simplification tolerance in metres that stays below ``pixels`` screen pixels at map ``zoom``."""
+    return METERS_PER_PIXEL_ZOOM0 * math.cos(math.radians(lat)) / (2.0 ** zoom) * pixels
+
+
+def simplify(points, tolerance_m: float) -> list:
+    """
+    Douglas–Peucker simplification of ``(lat, lng)`` points.
+
+    Keeps the first and last point and every point farther than ``tolerance_m``
+    metres from the simplified line. Iterative, so long routes do not hit the
+    recursion limit; each split measures its whole span in one numpy pass.
+    """
+    points = [tuple(p) for p in points]
+    n = len(points)
+    if n < 3 or not tolerance_m or tolerance_m <= 0:
+        return points
+    pts = np.asarray(points, dtype=np.float64)
+    cos_lat = math.cos(math.radians(float(pts[:, 0].mean())))
+    xy = np.column_stack((np.radians(pts[:, 1]) * cos_lat, np.radians(pts[:, 0]))) * EARTH_RADIUS_M
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg = xy[end] - xy[start]
+        rel = xy[start + 1:end] - xy[start]
+        seg_len2 = float(seg @ seg)
+        if seg_len2 == 0.0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            t = np.clip(rel @ seg / seg_len2, 0.0, 1.0)
+            off = rel - np.outer(t, seg)
+            dist = np.hypot(off[:, 0], off[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            split = start + 1 + i
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return [points[i] for i in np.flatnonzero(keep)]
@@ -1,6 +1,13 @@
-from django.test import TestCase
+import io
+import json
+
+from django.test import SimpleTestCase, TestCase
 from django.contrib.auth import get_user_model
 
+from core.geo_math import distance_matrix_km, distances_km, haversine_km, top_k_indices
+from core.json_stream import iter_array
+from core.polyline import decode, encode, simplify
+
 User = get_user_model()
 
 class AuthFlowTests(TestCase):
@@ -22,3 +29,37 @@ class AuthFlowTests(TestCase):
         # logout
         res3 = self.client.post("/api/auth/logout/", data="{}", content_type="application/json")
         self.assertEqual(res3.status_code, 200)
+
+
+class GeoMathTests(SimpleTestCase):
+    def test_vectorized_kernels_match_scalar_haversine(self):
+        lats = [35.6997, 35.7448, 32.6546]
+        lons = [51.3380, 51.3753, 51.6680]
+        row = distances_km(35.70, 51.34, lats, lons)
+        for d, lat, lon in zip(row, lats, lons):
+            self.assertAlmostEqual(float(d), haversine_km(35.70, 51.34, lat, lon), places=6)
+        matrix = distance_matrix_km([35.70, 32.65], [51.34, 51.67], lats, lons)
+        self.assertEqual(matrix.shape, (2, 3))
+        self.assertAlmostEqual(float(matrix[0, 1]), float(row[1]), places=6)
+        self.assertEqual(list(top_k_indices(row, 2)), [0, 1])
+        self.assertEqual(list(top_k_indices(row, 5, max_distance_km=10)), [0, 1])
+
+    def test_polyline_round_trip_and_simplify(self):
+        encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+        points = decode(encoded)
+        self.assertEqual(points, [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)])
+        self.assertEqual(encode(points), encoded)
+        line = [(35.70, 51.30), (35.70001, 51.31), (35.70, 51.32), (35.71, 51.33)]
+        self.assertEqual(simplify(line, 5.0), [(35.70, 51.30), (35.70, 51.32), (35.71, 51.33)])
+        self.assertEqual(simplify(line, 0), line)
+
+    def test_iter_array_streams_items_across_chunk_boundaries(self):
+        items = [{"name": "هتل ]," + str(i), "v": i * 1.5e-7, "tags": [i, None, True]} for i in range(50)]
+        document = json.dumps(items, ensure_ascii=False)
+        for chunk_size in (1, 3, 7, 4096):
+            self.assertEqual(list(iter_array(io.BytesIO(document.encode()), chunk_size=chunk_size)), items)
+            self.assertEqual(list(iter_array(io.StringIO(document), chunk_size=chunk_size)), items)
+        self.assertEqual(list(iter_array(io.StringIO(" [ ] "))), [])
+        for bad in ('{"a": 1}', "[1, 2", "[1 2]", "[1] x", "[1.5e]"):
+            with self.assertRaises(ValueError):
+                list(iter_array(io.StringIO(bad), chunk_size=2))
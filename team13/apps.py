@@ -39,5 +39,10 @@ class Team13Config(AppConfig):
     name = 'team13'
 
     def ready(self):
+        from django.db.backends.signals import connection_created
         from django.db.models.signals import post_migrate
+
+        from .fts import register_functions
+
         post_migrate.connect(_ensure_team13_default_admin, sender=self)
+        connection_created.connect(register_functions, dispatch_uid="team13_fts_functions")
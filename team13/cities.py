@@ -0,0 +1,102 @@
+# نرمال‌سازی شهر مکان‌ها به جدول City (team13_cities)
+# نام فارسی/انگلیسی هر شهر پس از یکسان‌سازی search_index.normalize به شناسه‌اش نگاشت می‌شود؛ نام‌های مشترک
+# میان چند شهر (مثلاً در استان‌های مختلف) مبهم‌اند و به هیچ شهری نگاشت نمی‌شوند. نگاشت در هر پردازه کش و پس از
+# TEAM13_CITY_NAMES_MAX_AGE ثانیه دوباره ساخته می‌شود (جدول شهرها فقط با بارگذار مجموعه‌داده تغییر می‌کند).
+# place.city_ref هنگام بارگذاری و تأیید پیشنهادها پر می‌شود تا فیلتر شهر در زمان درخواست روی شناسه باشد، نه
+# جستجوی متنی؛ مکان‌هایی که city_ref ندارند همچنان با جستجوی متنی city پیدا می‌شوند.
+
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Q
+
+from .search_index import normalize
+
+TEAM13_DB = "team13"
+DEFAULT_MAX_AGE_SECONDS = 300
+
+_names = None
+_built_at = 0.0
+_lock = threading.Lock()
+
+
+def build_city_names(using=TEAM13_DB):
+    """نگاشت نام یکسان‌شده → city_id (فقط نام‌های یکتا)."""
+    from .models import City
+
+    owners = {}
+    for city_id, name_fa, name_en in City.objects.using(using).values_list("city_id", "name_fa", "name_en").iterator():
+        for name in {normalize(name_fa), normalize(name_en)}:
+            if name:
+                owners.setdefault(name, set()).add(city_id)
+    return {name: ids.pop() for name, ids in owners.items() if len(ids) == 1}
+
+
+def _max_age_seconds():
+    return getattr(settings, "TEAM13_CITY_NAMES_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+
+
+def _expired(max_age):
+    return _names is None or (max_age and time.monotonic() - _built_at >= max_age)
+
+
+def city_names(using=TEAM13_DB):
+    """نگاشت مشترک پردازه؛ در اولین فراخوانی یا پس از منقضی شدن (max age) ساخته می‌شود."""
+    global _names, _built_at
+    max_age = _max_age_seconds()
+    if not _expired(max_age):
+        return _names
+    with _lock:
+        if _expired(max_age):
+            _names = build_city_names(using=using)
+            _built_at = time.monotonic()
+    return _names
+
+
+def city_id_for_name(name, using=TEAM13_DB):
+    """شناسهٔ شهر با نام name (فارسی یا انگلیسی، با یکسان‌سازی) یا None اگر ناشناخته یا مبهم باشد."""
+    key = normalize(name)
+    if not key:
+        return None
+    return city_names(using=using).get(key)
+
+
+def city_filter_q(name, using=TEAM13_DB):
+    """
+    شرط فیلتر مکان‌ها بر اساس نام شهر: اگر نام به یک City نگاشت شود، روی city_ref (با ایندکس) به‌علاوهٔ
+    جستجوی متنی روی مکان‌هایی که هنوز city_ref ندارند (تا همهٔ مسیرهای نوشتن city_ref را پر کنند)؛
+    وگرنه (نام جزئی یا شهر بیرون از جدول) همان جستجوی متنی قبلی روی city.
+    """
+    city_id = city_id_for_name(name, using=using)
+    if city_id is not None:
+        return Q(city_ref_id=city_id) | Q(city_ref__isnull=True, city__icontains=name)
+    return Q(city__icontains=name)
+
+
+def link_places_to_cities(using=TEAM13_DB):
+    """
+    پر کردن city_ref مکان‌هایی که هنوز شهر نرمال‌شده ندارند، از روی city متنی. خروجی: تعداد مکان‌های پیوندشده.
+    برای هر شهر یک UPDATE (نه یکی به ازای هر مکان).
+    """
+    from .models import Place
+
+    names = build_city_names(using=using)
+    by_city = {}
+    rows = Place.objects.using(using).filter(city_ref__isnull=True).exclude(city="").values_list("place_id", "city")
+    for place_id, city in rows.iterator():
+        city_id = names.get(normalize(city))
+        if city_id is not None:
+            by_city.setdefault(city_id, []).append(place_id)
+    linked = 0
+    for city_id, place_ids in by_city.items():
+        for start in range(0, len(place_ids), 500):
+            linked += Place.objects.using(using).filter(place_id__in=place_ids[start:start + 500]).update(city_ref_id=city_id)
+    return linked
+
+
+def reset_city_names():
+    """دور انداختن نگاشت کش‌شده (مثلاً در تست‌ها)."""
+    global _names
+    with _lock:
+        _names = None
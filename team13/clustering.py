@@ -0,0 +1,300 @@
+# خوشه‌بندی سمت سرور مارکرهای نقشه (مشابه supercluster)
+# مکان‌ها روی صفحهٔ Web Mercator (مختصات نرمال ۰..۱) قرار می‌گیرند و برای هر سطح zoom از بالاترین
+# به پایین‌ترین، خوشه‌های سطح قبل به‌صورت حریصانه (greedy) با شعاع ثابت پیکسلی ادغام می‌شوند.
+# پاسخ یک درخواست bbox+zoom فقط مرکز خوشه‌ها و تعداد اعضای آن‌هاست؛ مکان‌های تکی فقط در zoom بالا.
+# نمایه یک بار در هر پردازه ساخته می‌شود و مکان‌های تازه (پس از تأیید) به‌صورت افزایشی اضافه می‌شوند.
+
+import itertools
+import math
+import threading
+import time
+
+from django.conf import settings
+
+TEAM13_DB = "team13"
+
+MIN_ZOOM = 0
+MAX_ZOOM = 16  # از MAX_ZOOM + 1 به بعد مکان‌ها تکی برگردانده می‌شوند
+RADIUS_PX = 40
+EXTENT_PX = 512
+DEFAULT_MAX_AGE_SECONDS = 300
+
+
+def project(lat, lng):
+    """(lat, lng) به مختصات نرمال Web Mercator (x, y) در بازهٔ ۰..۱."""
+    x = lng / 360.0 + 0.5
+    sin = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi if abs(sin) < 1 else (0.0 if sin > 0 else 1.0)
+    return x, min(max(y, 0.0), 1.0)
+
+
+def unproject(x, y):
+    """معکوس project: (x, y) نرمال به (lat, lng)."""
+    lng = (x - 0.5) * 360.0
+    lat = 360.0 * math.atan(math.exp((180.0 - y * 360.0) * math.pi / 180.0)) / math.pi - 90.0
+    return lat, lng
+
+
+class Cluster:
+    """
+    یک گره در سلسله‌مراتب: مکان تکی (place_id دارد) یا خوشهٔ ساخته‌شده در سطح zoom.
+    گره در همهٔ سطح‌های lowest..zoom حضور دارد؛ در سطح lowest - 1 در parent ادغام شده است.
+    """
+
+    __slots__ = ("id", "x", "y", "count", "zoom", "lowest", "parent", "place_id", "place_type")
+
+    def __init__(self, id, x, y, count, zoom, place_id=None, place_type=""):
+        self.id = id
+        self.x = x
+        self.y = y
+        self.count = count
+        self.zoom = zoom
+        self.lowest = MIN_ZOOM
+        self.parent = None
+        self.place_id = place_id
+        self.place_type = place_type
+
+    @property
+    def is_place(self):
+        return self.place_id is not None
+
+
+class ClusterIndex:
+    """نمایهٔ خوشه‌ها برای همهٔ سطح‌های zoom (MIN_ZOOM .. MAX_ZOOM + 1)."""
+
+    def __init__(self, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, radius_px=RADIUS_PX, extent_px=EXTENT_PX):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius_px = radius_px
+        self.extent_px = extent_px
+        self._ids = itertools.count(1)
+        self._by_place = {}
+        # برای هر سطح: {سلول: {id: Cluster}}
+        self._grids = {z: {} for z in range(min_zoom, max_zoom + 2)}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._by_place)
+
+    def _radius(self, zoom):
+        return self.radius_px / (self.extent_px * 2 ** zoom)
+
+    def _cell(self, zoom, x, y):
+        r = self._radius(zoom)
+        return int(x // r), int(y // r)
+
+    def _insert(self, zoom, node):
+        self._grids[zoom].setdefault(self._cell(zoom, node.x, node.y), {})[node.id] = node
+
+    def _remove(self, zoom, node):
+        cell = self._cell(zoom, node.x, node.y)
+        bucket = self._grids[zoom].get(cell)
+        if bucket is not None:
+            bucket.pop(node.id, None)
+            if not bucket:
+                del self._grids[zoom][cell]
+
+    def _neighbors(self, zoom, x, y):
+        """گره‌های سطح zoom در فاصلهٔ شعاع خوشه‌بندی از (x, y)، نزدیک‌ترین اول."""
+        r = self._radius(zoom)
+        cx, cy = self._cell(zoom, x, y)
+        grid = self._grids[zoom]
+        found = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                for node in (grid.get((gx, gy)) or {}).values():
+                    d2 = (node.x - x) ** 2 + (node.y - y) ** 2
+                    if d2 <= r * r:
+                        found.append((d2, node.id, node))
+        found.sort(key=lambda t: (t[0], t[1]))
+        return [node for _, _, node in found]
+
+    def load(self, points):
+        """ساخت کامل سلسله‌مراتب از (place_id, lat, lng, place_type)ها."""
+        with self._lock:
+            leaf_zoom = self.max_zoom + 1
+            current = []
+            for place_id, lat, lng, place_type in points:
+                x, y = project(float(lat), float(lng))
+                node = Cluster(next(self._ids), x, y, 1, leaf_zoom, str(place_id), place_type or "")
+                self._by_place[node.place_id] = node
+                self._insert(leaf_zoom, node)
+                current.append(node)
+            for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+                current = self._cluster_level(zoom, current)
+
+    def _cluster_level(self, zoom, nodes):
+        """ادغام حریصانهٔ گره‌های سطح zoom + 1 و ثبت نتیجه در سطح zoom."""
+        r2 = self._radius(zoom) ** 2
+        # شبکهٔ موقت سطح بالاتر با اندازهٔ سلول همین سطح برای یافتن همسایه‌ها
+        grid = {}
+        for node in nodes:
+            grid.setdefault(self._cell(zoom, node.x, node.y), []).append(node)
+        merged = set()
+        out = []
+        for node in nodes:
+            if node.id in merged:
+                continue
+            merged.add(node.id)
+            cx, cy = self._cell(zoom, node.x, node.y)
+            members = [node]
+            for gx in (cx - 1, cx, cx + 1):
+                for gy in (cy - 1, cy, cy + 1):
+                    for other in grid.get((gx, gy), ()):
+                        if other.id not in merged and (other.x - node.x) ** 2 + (other.y - node.y) ** 2 <= r2:
+                            merged.add(other.id)
+                            members.append(other)
+            if len(members) == 1:
+                parent = node
+            else:
+                count = sum(m.count for m in members)
+                parent = Cluster(
+                    next(self._ids),
+                    sum(m.x * m.count for m in members) / count,
+                    sum(m.y * m.count for m in members) / count,
+                    count,
+                    zoom,
+                )
+                for m in members:
+                    m.parent = parent
+                    m.lowest = zoom + 1
+            self._insert(zoom, parent)
+            out.append(parent)
+        return out
+
+    def add(self, place_id, latitude, longitude, place_type=""):
+        """
+        افزودن افزایشی یک مکان: از بالاترین سطح به پایین، در اولین خوشهٔ نزدیک ادغام می‌شود و
+        تعداد/مرکز همهٔ اجداد آن خوشه به‌روز می‌شود. ترتیب ادغام با ساخت کامل یکسان نیست ولی
+        در هر سطح مجموع تعداد خوشه‌ها برابر تعداد مکان‌هاست.
+        """
+        key = str(place_id)
+        try:
+            x, y = project(float(latitude), float(longitude))
+        except (TypeError, ValueError):
+            return
+        with self._lock:
+            if key in self._by_place:
+                return
+            leaf = Cluster(next(self._ids), x, y, 1, self.max_zoom + 1, key, place_type or "")
+            self._by_place[key] = leaf
+            self._insert(leaf.zoom, leaf)
+            for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+                near = self._neighbors(zoom, x, y)
+                if not near:
+                    self._insert(zoom, leaf)
+                    continue
+                target = near[0]
+                if target.zoom > zoom:
+                    # target در سطح‌های بالاتر هم تکی است؛ خوشهٔ تازه‌ای از target و leaf در همین سطح ساخته می‌شود
+                    target = self._split_below(target, zoom)
+                leaf.parent = target
+                leaf.lowest = zoom + 1
+                node = target
+                while node is not None:
+                    self._move(node, (node.x * node.count + x) / (node.count + 1), (node.y * node.count + y) / (node.count + 1))
+                    node.count += 1
+                    node = node.parent
+                return
+            leaf.lowest = self.min_zoom
+
+    def _split_below(self, node, zoom):
+        """گره‌ای که تا سطح zoom حضور دارد را از سطح zoom به پایین با یک خوشهٔ جدید جایگزین می‌کند."""
+        cluster = Cluster(next(self._ids), node.x, node.y, node.count, zoom)
+        cluster.parent = node.parent
+        cluster.lowest = node.lowest
+        for z in range(node.lowest, zoom + 1):
+            self._remove(z, node)
+            self._insert(z, cluster)
+        node.parent = cluster
+        node.lowest = zoom + 1
+        return cluster
+
+    def _move(self, node, x, y):
+        levels = range(node.lowest, min(node.zoom, self.max_zoom + 1) + 1)
+        for z in levels:
+            self._remove(z, node)
+        node.x, node.y = x, y
+        for z in levels:
+            self._insert(z, node)
+
+    def clamp_zoom(self, zoom):
+        return max(self.min_zoom, min(int(zoom), self.max_zoom + 1))
+
+    def get_clusters(self, bbox, zoom):
+        """
+        گره‌های سطح zoom داخل bbox = (min_lng, min_lat, max_lng, max_lat).
+        خروجی: لیست Cluster (خوشه یا مکان تکی).
+        """
+        zoom = self.clamp_zoom(zoom)
+        min_lng, min_lat, max_lng, max_lat = bbox
+        if min_lng > max_lng:  # عبور از نصف‌النهار ۱۸۰
+            return self.get_clusters((min_lng, min_lat, 180.0, max_lat), zoom) + self.get_clusters(
+                (-180.0, min_lat, max_lng, max_lat), zoom
+            )
+        min_x, max_y = project(min_lat, min_lng)
+        max_x, min_y = project(max_lat, max_lng)
+        r = self._radius(zoom)
+        cx0, cy0 = int(min_x // r), int(min_y // r)
+        cx1, cy1 = int(max_x // r), int(max_y // r)
+        out = []
+        with self._lock:
+            grid = self._grids[zoom]
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) <= len(grid):
+                cells = (grid.get((gx, gy)) for gx in range(cx0, cx1 + 1) for gy in range(cy0, cy1 + 1))
+            else:
+                cells = (bucket for (gx, gy), bucket in grid.items() if cx0 <= gx <= cx1 and cy0 <= gy <= cy1)
+            for bucket in cells:
+                for node in (bucket or {}).values():
+                    if min_x <= node.x <= max_x and min_y <= node.y <= max_y:
+                        out.append(node)
+        out.sort(key=lambda n: n.id)
+        return out
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _max_age_seconds():
+    return getattr(settings, "TEAM13_CLUSTER_INDEX_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+
+
+def build_cluster_index(using=TEAM13_DB):
+    """ساخت نمایهٔ خوشه‌ها از جدول مکان‌ها با یک کوئری."""
+    from .models import Place
+
+    index = ClusterIndex()
+    rows = Place.objects.using(using).order_by("place_id").values_list("place_id", "latitude", "longitude", "type")
+    index.load(rows.iterator())
+    return index
+
+
+def get_cluster_index(using=TEAM13_DB):
+    """نمایهٔ مشترک پردازه؛ در اولین فراخوانی یا پس از منقضی شدن (max age) ساخته می‌شود."""
+    global _index
+    index = _index
+    max_age = _max_age_seconds()
+    if index is not None and (not max_age or time.monotonic() - index.built_at < max_age):
+        return index
+    with _index_lock:
+        index = _index
+        if index is None or (max_age and time.monotonic() - index.built_at >= max_age):
+            index = build_cluster_index(using=using)
+            _index = index
+    return index
+
+
+def cluster_place(place):
+    """افزودن افزایشی یک مکان تازه به نمایه (اگر نمایه قبلاً ساخته شده باشد)."""
+    index = _index
+    if index is not None:
+        index.add(place.place_id, place.latitude, place.longitude, place.type)
+
+
+def reset_cluster_index():
+    """دور انداختن نمایه تا در فراخوانی بعدی از دیتابیس بازسازی شود."""
+    global _index
+    with _index_lock:
+        _index = None
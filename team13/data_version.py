@@ -0,0 +1,25 @@
+# شمارندهٔ نسخهٔ داده برای کش‌هایی که به محتوای جدول مکان‌ها وابسته‌اند (مثل لایهٔ GeoJSON نقشه)
+# هر تغییری که خروجی نقشه را عوض می‌کند (تأیید مکان، تغییر امتیاز، بارگذاری داده) نسخه را بالا می‌برد؛
+# کش‌ها کلید خود را از نسخه می‌سازند و با تغییر نسخه خودبه‌خود باطل می‌شوند.
+
+from django.db.models import F
+
+from .models import DataVersion
+
+TEAM13_DB = "team13"
+PLACES = "places"
+
+
+def get_data_version(name=PLACES, using=TEAM13_DB):
+    """نسخهٔ فعلی (۰ اگر هنوز هیچ تغییری ثبت نشده باشد)."""
+    version = DataVersion.objects.using(using).filter(name=name).values_list("version", flat=True).first()
+    return version or 0
+
+
+def bump_data_version(name=PLACES, using=TEAM13_DB):
+    """افزایش اتمیک نسخه (در همان تراکنش تغییر داده)."""
+    updated = DataVersion.objects.using(using).filter(name=name).update(version=F("version") + 1)
+    if not updated:
+        _, created = DataVersion.objects.using(using).get_or_create(name=name, defaults={"version": 1})
+        if not created:
+            DataVersion.objects.using(using).filter(name=name).update(version=F("version") + 1)
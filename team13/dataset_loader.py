@@ -0,0 +1,228 @@
+# بارگذار وابستگی‌محور مجموعه‌دادهٔ temp_data_inseart: استان‌ها → شهرها → هتل‌ها
+# هر فایل یک Source است با تابع parse (سطح ماژول، بدون جنگو، خروجی picklable) و تابع write (نوشتن دسته‌ای در team13).
+# فایل‌های کوچک مرجع (استان‌ها، شهرها) هم‌زمان در ProcessPoolExecutor خوانده می‌شوند و جدول‌ها به ترتیب گراف
+# وابستگی (graphlib) نوشته می‌شوند. hotels.json (بزرگ‌ترین فایل) parse ندارد: در همین پردازه با iter_array جریانی
+# و دسته‌به‌دسته در import_hotels نوشته می‌شود تا کل ردیف‌ها در حافظه جمع یا بین پردازه‌ها pickle نشوند.
+# شناسه‌های شهر/استان مرجع پیش از نوشتن با مجموعه‌ای در حافظه سنجیده می‌شوند (نه یک کوئری برای هر ردیف).
+# اجرا: python team13/load_temp_data.py [--workers N] [--dry-run]
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from graphlib import TopologicalSorter
+
+from core.json_stream import iter_array
+
+from .load_temp_data import DEFAULT_BATCH_SIZE, _diff, import_hotels
+
+TEAM13_DB = "team13"
+
+PROVINCE_FIELDS = ("name_fa", "name_en", "latitude", "longitude")
+CITY_FIELDS = ("province_id", "name_fa", "name_en", "latitude", "longitude")
+
+
+class Source:
+    """یک فایل مجموعه‌داده و جایگاهش در گراف وابستگی."""
+
+    __slots__ = ("name", "filename", "parse", "write", "depends_on")
+
+    def __init__(self, name, filename, parse, write, depends_on=()):
+        self.name = name
+        self.filename = filename
+        self.parse = parse  # parse(path) -> (rows, skipped)؛ None برای منبع جریانی
+        self.write = write  # write(rows, ctx) -> stats؛ برای منبع جریانی write(path, ctx)
+        self.depends_on = tuple(depends_on)
+
+
+class LoadContext:
+    """تنظیمات یک اجرا و ردیف‌های خوانده‌شدهٔ منابع قبلی (برای سنجش ارجاع‌ها)."""
+
+    def __init__(self, db=TEAM13_DB, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None):
+        self.db = db
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.progress = progress
+        self.parsed = {}
+
+    def known_ids(self, name, model):
+        """شناسه‌های منبع name که پس از نوشتنش وجود دارند: ردیف‌های خوانده‌شده به‌علاوهٔ ردیف‌های موجود جدول."""
+        ids = set(model.objects.using(self.db).values_list("pk", flat=True))
+        return ids | set(self.parsed.get(name) or ())
+
+
+# ---------- parse (در پردازهٔ کارگر) ----------
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _text(value, max_length):
+    return str(value or "").strip()[:max_length]
+
+
+def _location(item):
+    loc = item.get("location") or {}
+    lat, lng = loc.get("latitude"), loc.get("longitude")
+    return (float(lat) if lat is not None else None, float(lng) if lng is not None else None)
+
+
+def parse_provinces(path):
+    """province.json → ({province_id: (name_fa, name_en, lat, lng)}, skipped)."""
+    rows, skipped = {}, 0
+    with open(path, "rb") as f:
+        for item in iter_array(f):
+            province_id = _int(item.get("province_id")) if isinstance(item, dict) else None
+            if province_id is None or not _text(item.get("name_fa"), 128):
+                skipped += 1
+                continue
+            rows[province_id] = (_text(item["name_fa"], 128), _text(item.get("name_en"), 128), *_location(item))
+    return rows, skipped
+
+
+def parse_cities(path):
+    """cities.json → ({city_id: (province_id, name_fa, name_en, lat, lng)}, skipped)."""
+    rows, skipped = {}, 0
+    with open(path, "rb") as f:
+        for item in iter_array(f):
+            city_id = _int(item.get("city_id")) if isinstance(item, dict) else None
+            if city_id is None or not _text(item.get("name_fa"), 128):
+                skipped += 1
+                continue
+            province = item.get("province")
+            province_id = _int(province.get("province_id") if isinstance(province, dict) else item.get("province_id"))
+            rows[city_id] = (
+                province_id, _text(item["name_fa"], 128), _text(item.get("name_en"), 128), *_location(item),
+            )
+    return rows, skipped
+
+
+# ---------- write (در پردازهٔ اصلی، به ترتیب وابستگی) ----------
+
+
+def upsert_rows(model, fields, rows, ctx):
+    """
+    upsert دسته‌ای {pk: values} روی model: برای هر دسته یک کوئری خواندن و یک bulk_create(update_conflicts)
+    فقط برای ردیف‌های جدید/تغییرکرده. خروجی {"created", "updated", "unchanged"}.
+    """
+    counts = {"created": 0, "updated": 0, "unchanged": 0}
+    pk_name = model._meta.pk.name
+    items = list(rows.items())
+    for start in range(0, len(items), ctx.batch_size):
+        batch = dict(items[start:start + ctx.batch_size])
+        existing = {
+            pk: tuple(values)
+            for pk, *values in model.objects.using(ctx.db).filter(pk__in=list(batch)).values_list("pk", *fields)
+        }
+        changed = _diff(batch, existing, counts)
+        if changed and not ctx.dry_run:
+            model.objects.using(ctx.db).bulk_create(
+                [model(**{pk_name: pk}, **dict(zip(fields, batch[pk]))) for pk in changed],
+                update_conflicts=True, unique_fields=[pk_name], update_fields=list(fields),
+            )
+    return counts
+
+
+def write_provinces(rows, ctx):
+    from .models import Province
+
+    return {"processed": len(rows), "skipped": 0, "provinces": upsert_rows(Province, PROVINCE_FIELDS, rows, ctx)}
+
+
+def write_cities(rows, ctx):
+    from .cities import reset_city_names
+    from .models import City, Province
+
+    provinces = ctx.known_ids("provinces", Province)
+    unlinked = 0
+    resolved = {}
+    for city_id, (province_id, *values) in rows.items():
+        if province_id is not None and province_id not in provinces:
+            unlinked += 1
+            province_id = None
+        resolved[city_id] = (province_id, *values)
+    counts = upsert_rows(City, CITY_FIELDS, resolved, ctx)
+    if not ctx.dry_run:
+        reset_city_names()
+    return {"processed": len(rows), "skipped": 0, "unlinked": unlinked, "cities": counts}
+
+
+def write_hotels(path, ctx):
+    """hotels.json جریانی (iter_array) و دسته‌ای به import_hotels؛ ردیف‌های نامعتبر در آمار skipped شمرده می‌شوند."""
+    from .models import City
+
+    with open(path, "rb") as f:
+        return import_hotels(
+            iter_array(f), db=ctx.db, batch_size=ctx.batch_size, dry_run=ctx.dry_run, progress=ctx.progress,
+            city_ids=ctx.known_ids("cities", City),
+        )
+
+
+SOURCES = (
+    Source("provinces", "province.json", parse_provinces, write_provinces),
+    Source("cities", "cities.json", parse_cities, write_cities, depends_on=("provinces",)),
+    Source("hotels", "hotels.json", None, write_hotels, depends_on=("cities",)),
+)
+
+
+def load_order(sources=SOURCES):
+    """نام منابع به ترتیب وابستگی (ValueError برای وابستگی ناشناخته، graphlib.CycleError برای دور)."""
+    names = {source.name for source in sources}
+    graph = {}
+    for source in sources:
+        missing = set(source.depends_on) - names
+        if missing:
+            raise ValueError(f"{source.name} depends on unknown sources: {', '.join(sorted(missing))}")
+        graph[source.name] = source.depends_on
+    return list(TopologicalSorter(graph).static_order())
+
+
+def load_datasets(data_dir, db=TEAM13_DB, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, workers=None,
+                  progress=None, sources=SOURCES):
+    """
+    خواندن موازی و نوشتن ترتیبی فایل‌های موجود در data_dir. منبعی که فایلش نیست کنار گذاشته می‌شود و
+    وابسته‌هایش فقط با ردیف‌های موجود جدول سنجیده می‌شوند. workers: تعداد پردازه‌های خواندن
+    (None = یکی برای هر فایل parse‌دار، 0 = خواندن در همین پردازه)؛ منبع جریانی همیشه در همین پردازه خوانده
+    و نوشته می‌شود. نوشتن هر منبع parse‌دار در یک تراکنش است؛ منبع جریانی (هتل‌ها) هر دسته را جدا commit می‌کند
+    تا ردیف‌ها از همان ابتدا ثبت شوند و قفل نوشتن SQLite در کل مدت بارگذاری نگه داشته نشود.
+
+    خروجی {source_name: stats + "seconds"} به ترتیب نوشتن، یا None اگر هیچ فایلی نبود.
+    ValueError برای JSON نامعتبر.
+    """
+    from django.db import transaction
+
+    by_name = {source.name: source for source in sources}
+    paths = {
+        name: os.path.join(data_dir, by_name[name].filename)
+        for name in load_order(sources)
+        if os.path.isfile(os.path.join(data_dir, by_name[name].filename))
+    }
+    if not paths:
+        return None
+    ctx = LoadContext(db=db, batch_size=batch_size, dry_run=dry_run, progress=progress)
+    results = {}
+    parsed = [name for name in paths if by_name[name].parse is not None]
+    executor = ProcessPoolExecutor(max_workers=workers or len(parsed)) if workers != 0 and parsed else None
+    try:
+        futures = {name: executor.submit(by_name[name].parse, paths[name]) for name in parsed} if executor else {}
+        for name, path in paths.items():
+            started = time.monotonic()
+            source = by_name[name]
+            if source.parse is None:
+                stats = source.write(path, ctx)
+            else:
+                rows, skipped = futures[name].result() if executor else source.parse(path)
+                ctx.parsed[name] = rows
+                with transaction.atomic(using=db):
+                    stats = source.write(rows, ctx)
+                stats["processed"] += skipped
+                stats["skipped"] += skipped
+            stats["seconds"] = time.monotonic() - started
+            results[name] = stats
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return results
@@ -0,0 +1,273 @@
+# موتور محلی ماتریس فاصله/زمان برای تیم ۱۳ (بدون وابستگی به API نشان)
+# فاصلهٔ خط مستقیم (Haversine) همهٔ جفت‌های مبدأ×مقصد یک‌جا با NumPy محاسبه و با ضریب پیچ‌وخم
+# جاده (circuity) به فاصلهٔ جاده‌ای تبدیل می‌شود؛ زمان از مدل سرعت هر نوع سفر برآورد می‌شود.
+# موتورها: local (فقط برآورد)، neshan (API نشان؛ خانه‌ها برای استفادهٔ بعدی کش می‌شوند) و
+# hybrid (خانه‌های کش‌شدهٔ نشان + برآورد محلی برای بقیه).
+
+import numpy as np
+from django.conf import settings
+
+from core.geo_math import distance_matrix_km
+
+from .neshan.cache import coord_key, get_cache
+
+ENGINE_LOCAL = "local"
+ENGINE_NESHAN = "neshan"
+ENGINE_HYBRID = "hybrid"
+ENGINES = (ENGINE_LOCAL, ENGINE_NESHAN, ENGINE_HYBRID)
+
+SOURCE_NESHAN = "neshan"
+SOURCE_ESTIMATE = "estimate"
+
+# سقف تعداد خانه‌های ماتریس محلی (مبدأ × مقصد)
+DEFAULT_MAX_CELLS = 250000
+# عمر خانه‌های کش‌شدهٔ ماتریس نشان (ثانیه)
+DEFAULT_CELL_TTL_SECONDS = 6 * 60 * 60
+CELL_PRECISION = 4
+# نشان ماتریس پیاده ندارد
+NESHAN_TRAVEL_MODES = ("car", "motorcycle")
+
+
+class SpeedModel:
+    """
+    برآورد فاصلهٔ جاده‌ای و زمان سفر از فاصلهٔ خط مستقیم:
+    road_km = circuity × straight_km و duration = overhead_s + road_km / speed_kmh.
+    """
+
+    __slots__ = ("circuity", "speed_kmh", "overhead_s")
+
+    def __init__(self, circuity, speed_kmh, overhead_s=0.0):
+        self.circuity = float(circuity)
+        self.speed_kmh = float(speed_kmh)
+        self.overhead_s = float(overhead_s)
+
+    def road_km(self, straight_km):
+        return np.asarray(straight_km, dtype=np.float64) * self.circuity
+
+    def duration_s(self, road_km):
+        road_km = np.asarray(road_km, dtype=np.float64)
+        seconds = self.overhead_s + road_km / self.speed_kmh * 3600.0
+        # مبدأ و مقصد یکسان: زمان صفر
+        return np.where(road_km > 0, seconds, 0.0)
+
+    def as_dict(self):
+        return {"circuity": self.circuity, "speed_kmh": self.speed_kmh, "overhead_s": self.overhead_s}
+
+
+# مقادیر پیش‌فرض برای ترافیک شهری؛ با TEAM13_SPEED_MODELS یا calibrate_speed_model قابل تنظیم است
+DEFAULT_SPEED_MODELS = {
+    "car": SpeedModel(circuity=1.35, speed_kmh=24.0, overhead_s=90),
+    "car_no_traffic": SpeedModel(circuity=1.35, speed_kmh=38.0, overhead_s=60),
+    "motorcycle": SpeedModel(circuity=1.25, speed_kmh=30.0, overhead_s=30),
+    "walk": SpeedModel(circuity=1.2, speed_kmh=4.8),
+}
+
+
+def speed_model_for(travel_mode, no_traffic=False):
+    """مدل سرعت یک نوع سفر؛ settings.TEAM13_SPEED_MODELS = {"car": {"speed_kmh": 20}, ...} مقادیر را جایگزین می‌کند."""
+    name = "car_no_traffic" if travel_mode == "car" and no_traffic else travel_mode
+    base = DEFAULT_SPEED_MODELS.get(name, DEFAULT_SPEED_MODELS["car"])
+    override = (getattr(settings, "TEAM13_SPEED_MODELS", None) or {}).get(name)
+    if not override:
+        return base
+    return SpeedModel(**dict(base.as_dict(), **override))
+
+
+def calibrate_speed_model(straight_km, road_km, duration_s):
+    """
+    برازش مدل سرعت از نمونه‌های واقعی (مثلاً خانه‌های ماتریس یا مسیرهای نشان):
+    circuity = میانهٔ road/straight و (overhead، 1/speed) با کمترین مربعات روی duration ~ road_km.
+    """
+    straight = np.asarray(straight_km, dtype=np.float64)
+    road = np.asarray(road_km, dtype=np.float64)
+    duration = np.asarray(duration_s, dtype=np.float64)
+    ok = (straight > 0.05) & (road > 0) & (duration > 0)
+    if ok.sum() < 2:
+        raise ValueError("at least two non-trivial samples are required")
+    straight, road, duration = straight[ok], road[ok], duration[ok]
+    circuity = float(np.median(road / straight))
+    design = np.stack([np.ones_like(road), road], axis=1)
+    (overhead_s, sec_per_km), *_ = np.linalg.lstsq(design, duration, rcond=None)
+    if sec_per_km <= 0:
+        # نمونه‌ها برای شیب کافی نیستند: سرعت میانگین بدون overhead
+        overhead_s, sec_per_km = 0.0, float(duration.sum() / road.sum())
+    return SpeedModel(circuity=max(1.0, circuity), speed_kmh=3600.0 / sec_per_km, overhead_s=max(0.0, overhead_s))
+
+
+def parse_points(value):
+    """
+    نقاط به‌صورت "lat,lng|lat,lng|..." یا لیست (lat, lng)؛ خروجی آرایهٔ n×2.
+    ValueError اگر نقطه‌ای نامعتبر باشد.
+    """
+    if isinstance(value, str):
+        value = [p for p in value.split("|") if p.strip()]
+    points = []
+    for p in value:
+        if isinstance(p, str):
+            p = p.split(",")
+        lat, lng = float(p[0]), float(p[1])
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("point")
+        points.append((lat, lng))
+    if not points:
+        raise ValueError("points")
+    return np.array(points, dtype=np.float64)
+
+
+def max_cells():
+    return getattr(settings, "TEAM13_DISTANCE_MATRIX_MAX_CELLS", DEFAULT_MAX_CELLS)
+
+
+def local_matrix(origins, destinations, travel_mode="car", no_traffic=False):
+    """ماتریس برآوردی (distance_km, duration_s)، هر کدام آرایهٔ len(origins)×len(destinations)."""
+    origins = np.asarray(origins, dtype=np.float64)
+    destinations = np.asarray(destinations, dtype=np.float64)
+    if origins.shape[0] * destinations.shape[0] > max_cells():
+        raise ValueError("matrix too large")
+    model = speed_model_for(travel_mode, no_traffic)
+    straight = distance_matrix_km(origins[:, 0], origins[:, 1], destinations[:, 0], destinations[:, 1])
+    road = model.road_km(straight)
+    return road, model.duration_s(road)
+
+
+def _cell_cache():
+    return get_cache("matrix", default_ttl=DEFAULT_CELL_TTL_SECONDS)
+
+
+def _cell_key(origin, destination, travel_mode, no_traffic):
+    return "|".join([
+        coord_key(origin[0], origin[1], CELL_PRECISION),
+        coord_key(destination[0], destination[1], CELL_PRECISION),
+        travel_mode,
+        "nt" if no_traffic else "t",
+    ])
+
+
+def _neshan_request(origins, destinations, travel_mode, no_traffic):
+    return (
+        [tuple(p) for p in origins], [tuple(p) for p in destinations],
+    ), {"vehicle_type": travel_mode, "no_traffic": no_traffic}
+
+
+def _from_neshan(data, origins, destinations, travel_mode, no_traffic):
+    """ماتریس از پاسخ نشان؛ هر خانهٔ موفق برای موتور hybrid کش می‌شود و بقیه برآورد محلی می‌گیرند."""
+    distance, duration = local_matrix(origins, destinations, travel_mode, no_traffic)
+    shape = distance.shape
+    known = np.zeros(shape, dtype=bool)
+    cells = _cell_cache()
+    for i, row in enumerate((data.get("rows") or [])[:shape[0]]):
+        for j, element in enumerate((row.get("elements") or [])[:shape[1]]):
+            d = (element.get("distance") or {}).get("value")
+            t = (element.get("duration") or {}).get("value")
+            if d is None or t is None:
+                continue
+            distance[i, j], duration[i, j], known[i, j] = d / 1000.0, t, True
+            cells.set(_cell_key(origins[i], destinations[j], travel_mode, no_traffic), (d / 1000.0, t))
+    return distance, duration, known
+
+
+def neshan_matrix(origins, destinations, travel_mode="car", no_traffic=False):
+    """
+    ماتریس از API نشان؛ هر خانهٔ موفق برای موتور hybrid کش می‌شود.
+    خروجی: (distance_km, duration_s, known) که known ماسک خانه‌های پاسخ‌داده‌شده (بقیه برآورد محلی)؛ None در خطا.
+    """
+    from .neshan import fetch_distance_matrix
+
+    if travel_mode not in NESHAN_TRAVEL_MODES:
+        return None
+    args, kwargs = _neshan_request(origins, destinations, travel_mode, no_traffic)
+    data = fetch_distance_matrix(*args, **kwargs)
+    if data is None:
+        return None
+    return _from_neshan(data, origins, destinations, travel_mode, no_traffic)
+
+
+def hybrid_matrix(origins, destinations, travel_mode="car", no_traffic=False):
+    """
+    خانه‌های کش‌شدهٔ نشان به‌علاوهٔ برآورد محلی برای بقیه؛ خروجی مانند neshan_matrix.
+    همهٔ خانه‌ها با یک خواندن دسته‌ای (get_many) از کش خوانده می‌شوند؛ بدون کلید نشان خانهٔ کش‌شده‌ای
+    وجود ندارد و کش اصلاً خوانده نمی‌شود.
+    """
+    from .neshan import is_configured
+
+    distance, duration = local_matrix(origins, destinations, travel_mode, no_traffic)
+    known = np.zeros(distance.shape, dtype=bool)
+    if not is_configured() or travel_mode not in NESHAN_TRAVEL_MODES:
+        return distance, duration, known
+    suffix = f"{travel_mode}|{'nt' if no_traffic else 't'}"
+    origin_keys = [coord_key(p[0], p[1], CELL_PRECISION) for p in origins]
+    destination_keys = [coord_key(p[0], p[1], CELL_PRECISION) for p in destinations]
+    # نقطهٔ تکراری (مثلاً waypoint دوباره) چند خانه با یک کلید دارد
+    cells = {}
+    for i, o in enumerate(origin_keys):
+        for j, d in enumerate(destination_keys):
+            cells.setdefault(f"{o}|{d}|{suffix}", []).append((i, j))
+    for key, (cell_distance, cell_duration) in _cell_cache().get_many(cells).items():
+        for i, j in cells[key]:
+            distance[i, j], duration[i, j], known[i, j] = cell_distance, cell_duration, True
+    return distance, duration, known
+
+
+def compute_matrix(origins, destinations, travel_mode="car", no_traffic=False, engine=ENGINE_HYBRID):
+    """
+    ماتریس با موتور خواسته‌شده. موتور neshan در صورت خطا به hybrid برمی‌گردد.
+    خروجی: (distance_km, duration_s, known, engine_used).
+    """
+    if engine == ENGINE_NESHAN:
+        result = neshan_matrix(origins, destinations, travel_mode, no_traffic)
+        if result is not None:
+            return result + (ENGINE_NESHAN,)
+        engine = ENGINE_HYBRID
+    if engine == ENGINE_HYBRID:
+        return hybrid_matrix(origins, destinations, travel_mode, no_traffic) + (ENGINE_HYBRID,)
+    distance, duration = local_matrix(origins, destinations, travel_mode, no_traffic)
+    return distance, duration, np.zeros(distance.shape, dtype=bool), ENGINE_LOCAL
+
+
+async def acompute_matrix(origins, destinations, travel_mode="car", no_traffic=False, engine=ENGINE_HYBRID):
+    """نسخهٔ async compute_matrix: فقط فراخوانی نشان ناهم‌گام است؛ محاسبه و کش در thread جدا."""
+    from asgiref.sync import sync_to_async
+
+    from .neshan import aio
+
+    if engine == ENGINE_NESHAN:
+        data = None
+        if travel_mode in NESHAN_TRAVEL_MODES:
+            args, kwargs = _neshan_request(origins, destinations, travel_mode, no_traffic)
+            data = await aio.fetch_distance_matrix(*args, **kwargs)
+        if data is not None:
+            result = await sync_to_async(_from_neshan)(data, origins, destinations, travel_mode, no_traffic)
+            return result + (ENGINE_NESHAN,)
+        engine = ENGINE_HYBRID
+    return await sync_to_async(compute_matrix)(origins, destinations, travel_mode, no_traffic, engine)
+
+
+def _element(distance_km, duration_s, source):
+    meters = int(round(distance_km * 1000))
+    seconds = int(round(duration_s))
+    return {
+        "status": "Ok",
+        "distance": {"value": meters, "text": f"{distance_km:.1f} کیلومتر"},
+        "duration": {"value": seconds, "text": f"{max(1, round(seconds / 60)) if seconds else 0} دقیقه"},
+        "source": source,
+    }
+
+
+def matrix_payload(origins, destinations, distance, duration, known, engine):
+    """پاسخ هم‌شکل Distance Matrix نشان (status، rows، origin_addresses، destination_addresses) + engine."""
+    rows = [
+        {
+            "elements": [
+                _element(distance[i, j], duration[i, j], SOURCE_NESHAN if known[i, j] else SOURCE_ESTIMATE)
+                for j in range(len(destinations))
+            ]
+        }
+        for i in range(len(origins))
+    ]
+    return {
+        "status": "Ok",
+        "engine": engine,
+        "rows": rows,
+        "origin_addresses": [f"{lat},{lng}" for lat, lng in origins],
+        "destination_addresses": [f"{lat},{lng}" for lat, lng in destinations],
+    }
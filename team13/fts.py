@@ -0,0 +1,185 @@
+# جدول‌های تمام‌متن SQLite FTS5 برای ترجمه‌های مکان‌ها و رویدادهای تیم ۱۳
+# هر جدول FTS سایهٔ یک جدول ترجمه است (rowid همان id ترجمه) و با triggerهای SQLite هم‌گام می‌ماند، پس
+# bulk_create، بارگذارهای CSV/JSON و حذف آبشاری هم پوشش داده می‌شوند. متن پیش از نمایه با تابع SQL
+# team13_normalize یکسان می‌شود؛ این تابع همان search_index.normalize است (ي/ك عربی، نیم‌فاصله، اعراب، ارقام)
+# که روی هر اتصال SQLite جنگو ثبت می‌شود (apps.ready)، چون unicode61 کلمه را در اعراب می‌شکند و ي/ك را یکی نمی‌کند.
+# پس نوشتن در جدول‌های ترجمه باید از طریق جنگو باشد. tokenizer از نوع unicode61 با نمایهٔ پیشوندی ۲ و ۳ حرفی است.
+# جستجو با MATCH و رتبه‌بندی bm25 انجام می‌شود؛ بازسازی کامل: python manage.py rebuild_team13_fts
+
+from django.db import connections
+
+from .search_index import normalize
+from .translations import LANGS
+
+TEAM13_DB = "team13"
+
+SQL_NORMALIZE = "team13_normalize"
+TOKENIZE = "unicode61 remove_diacritics 2"
+PREFIX = "2 3"
+
+PLACE_FTS = "team13_place_translations_fts"
+EVENT_FTS = "team13_event_translations_fts"
+# وزن ستون‌ها در bm25 (به‌ترتیب ستون‌های نمایه‌شده)
+PLACE_WEIGHTS = (10.0, 2.0)  # name, city
+EVENT_WEIGHTS = (10.0, 1.0)  # title, description
+
+
+def sql_normalize(expr):
+    return f"{SQL_NORMALIZE}({expr})"
+
+
+def register_functions(sender, connection, **kwargs):
+    """گیرندهٔ سیگنال connection_created: ثبت team13_normalize روی اتصال‌های SQLite."""
+    if connection.vendor == "sqlite":
+        connection.connection.create_function(SQL_NORMALIZE, 1, normalize, deterministic=True)
+
+
+def _place_select(alias):
+    return (
+        f"SELECT {alias}.id, {sql_normalize(f'{alias}.name')}, {sql_normalize('p.city')}, {alias}.place_id, {alias}.lang "
+        f"FROM team13_place_translations {alias} JOIN team13_places p ON p.place_id = {alias}.place_id"
+    )
+
+
+def _event_select(alias):
+    return (
+        f"SELECT {alias}.id, {sql_normalize(f'{alias}.title')}, {sql_normalize(f'{alias}.description')}, "
+        f"{alias}.event_id, {alias}.lang FROM team13_event_translations {alias}"
+    )
+
+
+def schema_statements():
+    """دستورهای ساخت جدول‌های FTS5 و triggerهای هم‌گام‌سازی (idempotent)."""
+    place_insert = f"INSERT INTO {PLACE_FTS}(rowid, name, city, place_id, lang)"
+    event_insert = f"INSERT INTO {EVENT_FTS}(rowid, title, description, event_id, lang)"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {PLACE_FTS} USING fts5("
+        f"name, city, place_id UNINDEXED, lang UNINDEXED, tokenize = '{TOKENIZE}', prefix = '{PREFIX}')",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {EVENT_FTS} USING fts5("
+        f"title, description, event_id UNINDEXED, lang UNINDEXED, tokenize = '{TOKENIZE}', prefix = '{PREFIX}')",
+        # ترجمه‌های مکان
+        f"CREATE TRIGGER IF NOT EXISTS {PLACE_FTS}_ai AFTER INSERT ON team13_place_translations BEGIN "
+        f"{place_insert} {_place_select('t')} WHERE t.id = new.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {PLACE_FTS}_ad AFTER DELETE ON team13_place_translations BEGIN "
+        f"DELETE FROM {PLACE_FTS} WHERE rowid = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {PLACE_FTS}_au AFTER UPDATE ON team13_place_translations BEGIN "
+        f"DELETE FROM {PLACE_FTS} WHERE rowid = old.id; {place_insert} {_place_select('t')} WHERE t.id = new.id; END",
+        # تغییر شهر یک مکان در ردیف‌های FTS همهٔ ترجمه‌هایش
+        f"CREATE TRIGGER IF NOT EXISTS {PLACE_FTS}_city AFTER UPDATE OF city ON team13_places BEGIN "
+        f"UPDATE {PLACE_FTS} SET city = {sql_normalize('new.city')} WHERE rowid IN "
+        f"(SELECT id FROM team13_place_translations WHERE place_id = new.place_id); END",
+        # ترجمه‌های رویداد
+        f"CREATE TRIGGER IF NOT EXISTS {EVENT_FTS}_ai AFTER INSERT ON team13_event_translations BEGIN "
+        f"{event_insert} {_event_select('t')} WHERE t.id = new.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {EVENT_FTS}_ad AFTER DELETE ON team13_event_translations BEGIN "
+        f"DELETE FROM {EVENT_FTS} WHERE rowid = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {EVENT_FTS}_au AFTER UPDATE ON team13_event_translations BEGIN "
+        f"DELETE FROM {EVENT_FTS} WHERE rowid = old.id; {event_insert} {_event_select('t')} WHERE t.id = new.id; END",
+    ]
+
+
+def drop_statements():
+    triggers = [f"{PLACE_FTS}_{s}" for s in ("ai", "ad", "au", "city")] + [f"{EVENT_FTS}_{s}" for s in ("ai", "ad", "au")]
+    return [f"DROP TRIGGER IF EXISTS {name}" for name in triggers] + [
+        f"DROP TABLE IF EXISTS {PLACE_FTS}",
+        f"DROP TABLE IF EXISTS {EVENT_FTS}",
+    ]
+
+
+def is_available(using=TEAM13_DB):
+    """FTS5 فقط روی SQLite؛ روی دیتابیس‌های دیگر viewها به جستجوی icontains برمی‌گردند."""
+    return connections[using].vendor == "sqlite"
+
+
+def create_fts(connection):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for sql in schema_statements():
+            cursor.execute(sql)
+
+
+def drop_fts(connection):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for sql in drop_statements():
+            cursor.execute(sql)
+
+
+def rebuild_fts(using=TEAM13_DB):
+    """
+    بازسازی کامل: جدول‌ها و triggerها دوباره ساخته (تا با تغییر قواعد یکسان‌سازی هم‌خوان شوند) و از
+    جدول‌های ترجمه پر می‌شوند. خروجی (تعداد ردیف مکان، تعداد ردیف رویداد).
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return 0, 0
+    drop_fts(connection)
+    create_fts(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {PLACE_FTS}(rowid, name, city, place_id, lang) {_place_select('t')}")
+        cursor.execute(f"INSERT INTO {EVENT_FTS}(rowid, title, description, event_id, lang) {_event_select('t')}")
+        cursor.execute(f"INSERT INTO {PLACE_FTS}({PLACE_FTS}) VALUES ('optimize')")
+        cursor.execute(f"INSERT INTO {EVENT_FTS}({EVENT_FTS}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {PLACE_FTS}")
+        places = cursor.fetchone()[0]
+        cursor.execute(f"SELECT count(*) FROM {EVENT_FTS}")
+        events = cursor.fetchone()[0]
+    return places, events
+
+
+def match_expression(text):
+    """
+    عبارت MATCH از متن کاربر: هر کلمهٔ یکسان‌شده به‌صورت رشتهٔ نقل‌قول‌شده با * (جستجوی پیشوندی)
+    و کلمه‌ها با AND ضمنی؛ متن بدون کلمه → None.
+    """
+    tokens = normalize(text).split()
+    if not tokens:
+        return None
+    return " ".join('"' + token.replace('"', '""') + '"*' for token in tokens)
+
+
+def _ranked_ids(table, id_column, weights, text, limit, using):
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    weight_args = ", ".join(str(w) for w in weights)
+    # bm25 در تابع تجمیعی (GROUP BY) مجاز نیست؛ ردیف‌ها به‌ترتیب امتیاز خوانده و شناسه‌های تکراری (ترجمهٔ
+    # دیگر همان مکان/رویداد، حداکثر یکی برای هر زبان) در پایتون کنار گذاشته می‌شوند
+    sql = (
+        f"SELECT {id_column} FROM {table} WHERE {table} MATCH %s "
+        f"ORDER BY bm25({table}, {weight_args}) LIMIT %s"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [expression, -1 if limit is None else limit * len(LANGS)])
+        ids = list(dict.fromkeys(row[0] for row in cursor.fetchall()))
+    return ids if limit is None else ids[:limit]
+
+
+def search_place_ids(text, limit=30, using=TEAM13_DB):
+    """شناسهٔ (hex) مکان‌های منطبق با text روی نام و شهر، مرتب بر اساس bm25 (بهترین اول)."""
+    return _ranked_ids(PLACE_FTS, "place_id", PLACE_WEIGHTS, text, limit, using)
+
+
+def search_cities(text, limit=10, using=TEAM13_DB):
+    """
+    لیست (city, lat, lng) شهرهایی که نامشان با text منطبق است؛ نقطهٔ هر شهر شمالی‌ترین مکان آن
+    (ستون‌های بی‌تجمیع SQLite در کنار max() از همان ردیف بیشینه می‌آیند).
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    sql = (
+        "SELECT p.city, max(p.latitude), p.longitude FROM team13_places p "
+        f"WHERE p.place_id IN (SELECT place_id FROM {PLACE_FTS} WHERE {PLACE_FTS} MATCH %s) "
+        "GROUP BY p.city ORDER BY p.city LIMIT %s"
+    )
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, [f"city : ({expression})", limit])
+        return [tuple(row) for row in cursor.fetchall() if row[0] and str(row[0]).strip()]
+
+
+def search_event_ids(text, limit=None, using=TEAM13_DB):
+    """شناسهٔ (hex) رویدادهای منطبق با text روی عنوان و توضیح، مرتب بر اساس bm25 (بهترین اول؛ limit=None بدون سقف)."""
+    return _ranked_ids(EVENT_FTS, "event_id", EVENT_WEIGHTS, text, limit, using)
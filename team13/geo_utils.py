@@ -1,5 +1,13 @@
 # تبدیل مختصات جغرافیایی به آدرس متنی برای ذخیره در دیتابیس
 # در صورت تنظیم NESHAN_API_KEY از سرویس نشان استفاده می‌شود؛ وگرنه فرمت عرض/طول.
+# ثبت پیشنهادها فقط coordinate_address را ذخیره می‌کند و آدرس نشان بعداً در صف team13.geocode_queue پر می‌شود.
+
+import math
+
+
+def coordinate_address(latitude, longitude):
+    """آدرس موقت/جایگزین به فرمت عرض/طول (بدون تماس با نشان)."""
+    return "عرض جغرافیایی: {:.6f}، طول جغرافیایی: {:.6f}".format(float(latitude), float(longitude))
 
 
 def address_from_coords(latitude, longitude):
@@ -19,4 +27,40 @@ def address_from_coords(latitude, longitude):
             return addr.strip()
     except Exception:
         pass
-    return "عرض جغرافیایی: {:.6f}، طول جغرافیایی: {:.6f}".format(lat, lng)
+    return coordinate_address(lat, lng)
+
+
+# طول تقریبی یک درجه عرض جغرافیایی (کیلومتر)
+KM_PER_DEG_LAT = 111.32
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    کادر محیطی (min_lat, max_lat, min_lng, max_lng) دایره‌ای به شعاع radius_km حول نقطه.
+    برای پیش‌فیلتر SQL روی ستون‌های latitude/longitude (ایندکس ترکیبی) قبل از محاسبهٔ دقیق Haversine.
+    """
+    lat = float(latitude)
+    lng = float(longitude)
+    radius_km = max(0.0, float(radius_km))
+    dlat = radius_km / KM_PER_DEG_LAT
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    dlng = min(180.0, radius_km / (KM_PER_DEG_LAT * cos_lat))
+    return (
+        max(-90.0, lat - dlat),
+        min(90.0, lat + dlat),
+        lng - dlng,
+        lng + dlng,
+    )
+
+
+def bounding_box_q(latitude, longitude, radius_km, lat_field="latitude", lng_field="longitude"):
+    """شرط Q برای محدود کردن کوئری به کادر محیطی شعاع radius_km (شامل عبور از نصف‌النهار ۱۸۰)."""
+    from django.db.models import Q
+
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    q = Q(**{f"{lat_field}__gte": min_lat, f"{lat_field}__lte": max_lat})
+    if min_lng < -180.0:
+        return q & (Q(**{f"{lng_field}__gte": min_lng + 360.0}) | Q(**{f"{lng_field}__lte": max_lng}))
+    if max_lng > 180.0:
+        return q & (Q(**{f"{lng_field}__gte": min_lng}) | Q(**{f"{lng_field}__lte": max_lng - 360.0}))
+    return q & Q(**{f"{lng_field}__gte": min_lng, f"{lng_field}__lte": max_lng})
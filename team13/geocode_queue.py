@@ -0,0 +1,242 @@
+# صف پس‌زمینهٔ غنی‌سازی آدرس پیشنهادها با reverse geocode نشان؛ صف همان جدول team13_geocode_jobs است (بدون broker)
+# ثبت پیشنهاد مکان/مسیر فقط آدرس عرض/طول (geo_utils.coordinate_address) را ذخیره و کار صف را در همان تراکنش
+# می‌سازد، پس زمان پاسخ به نشان وابسته نیست. worker (python manage.py process_geocode_queue) کارهای سررسیده را
+# دسته‌ای برمی‌دارد (قفل locked_by/locked_until تا چند worker کار تکراری نکنند)، هر نقطهٔ یکتا (کلید کش reverse)
+# را یک بار و نقطه‌های مختلف را هم‌زمان (TEAM13_GEOCODE_CONCURRENCY رشته) از نشان می‌پرسد — با همان کش و ادغام
+# درخواست‌های neshan.geocoding — آدرس را در ردیف هدف می‌نویسد (فقط اگر هنوز همان آدرس عرض/طول باشد، تا ویرایش
+# هم‌زمان کاربر یا ادمین بازنویسی نشود) و کار را حذف می‌کند. پاسخ خالی یا خطا با backoff نمایی
+# دوباره تلاش و پس از TEAM13_GEOCODE_MAX_ATTEMPTS بار failed می‌شود (آدرس عرض/طول می‌ماند).
+# تأیید پیشنهاد، کار باز آن را به Place ساخته‌شده منتقل می‌کند (retarget).
+
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .data_version import PLACES, bump_data_version
+from .geo_utils import coordinate_address
+from .models import GeocodeJob, Place, PlaceContribution, RouteContribution
+
+TEAM13_DB = "team13"
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 6 * 60 * 60
+# مدت قفل یک دسته؛ دسته‌ای که worker آن از کار افتاده پس از این مدت دوباره برداشته می‌شود
+LEASE_SECONDS = 300
+
+Target = GeocodeJob.TargetType
+Status = GeocodeJob.Status
+
+# مدل و فیلد آدرس هر نوع هدف
+TARGET_FIELDS = {
+    Target.PLACE_CONTRIBUTION: (PlaceContribution, "address"),
+    Target.ROUTE_SOURCE: (RouteContribution, "source_address"),
+    Target.ROUTE_DESTINATION: (RouteContribution, "destination_address"),
+    Target.PLACE: (Place, "address"),
+}
+RETRY_FIELDS = ["status", "attempts", "next_attempt_at", "locked_by", "locked_until", "last_error"]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(*jobs, using=TEAM13_DB):
+    """
+    افزودن کارهای (target_type, target_id, latitude, longitude) با یک کوئری؛ کار موجود برای همان هدف
+    با مختصات تازه از نو شروع می‌شود. در همان تراکنش ثبت هدف فراخوانی شود.
+    """
+    now = timezone.now()
+    GeocodeJob.objects.using(using).bulk_create(
+        [
+            GeocodeJob(target_type=target_type, target_id=target_id, latitude=float(lat), longitude=float(lng),
+                       next_attempt_at=now)
+            for target_type, target_id, lat, lng in jobs
+        ],
+        update_conflicts=True,
+        unique_fields=["target_type", "target_id"],
+        update_fields=["latitude", "longitude", *RETRY_FIELDS],
+    )
+
+
+def retarget(target_type, target_id, new_type, new_id, using=TEAM13_DB):
+    """انتقال کار باز یک هدف (مثلاً پیشنهاد تأییدشده) به هدف جدید (Place ساخته‌شده از آن)."""
+    return GeocodeJob.objects.using(using).filter(target_type=target_type, target_id=target_id).update(
+        target_type=new_type, target_id=new_id
+    )
+
+
+def discard(target_id, *target_types, using=TEAM13_DB):
+    """حذف کارهای یک هدف حذف‌شده (مثلاً پیشنهاد ردشده) تا تماسی با نشان برایش زده نشود."""
+    GeocodeJob.objects.using(using).filter(target_id=target_id, target_type__in=target_types).delete()
+
+
+def _unlocked(now):
+    return Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+
+
+def claim(limit=DEFAULT_BATCH_SIZE, using=TEAM13_DB):
+    """برداشتن حداکثر limit کار سررسیده و قفل‌نشده؛ خروجی (token، لیست کارها)."""
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = list(
+        GeocodeJob.objects.using(using)
+        .filter(_unlocked(now), status=Status.PENDING, next_attempt_at__lte=now)
+        .order_by("next_attempt_at")
+        .values_list("pk", flat=True)[:limit]
+    )
+    if not due:
+        return token, []
+    # شرط قفل دوباره در UPDATE: کاری که worker دیگری در این فاصله برداشته کنار گذاشته می‌شود
+    GeocodeJob.objects.using(using).filter(_unlocked(now), pk__in=due).update(
+        locked_by=token, locked_until=now + timedelta(seconds=LEASE_SECONDS)
+    )
+    return token, list(GeocodeJob.objects.using(using).filter(locked_by=token))
+
+
+def _reverse_address(lat, lng):
+    """آدرس نشان برای نقطه (None اگر پاسخی نبود)؛ در رشتهٔ worker اجرا می‌شود."""
+    from .neshan import reverse_geocode_address
+
+    try:
+        address = reverse_geocode_address(lat, lng)
+        return address.strip() if isinstance(address, str) and address.strip() else None
+    finally:
+        # اتصال‌های دیتابیس این رشته (backend دیتابیسی کش نشان)
+        connections.close_all()
+
+
+def _point_key(lat, lng):
+    from .neshan.geocoding import reverse_cache_key
+
+    return reverse_cache_key(float(lat), float(lng))
+
+
+def _resolve(points, geocode):
+    """{key: (lat, lng)} → {key: (address یا None، خطا)} با حداکثر TEAM13_GEOCODE_CONCURRENCY درخواست هم‌زمان."""
+
+    def run(item):
+        key, (lat, lng) = item
+        try:
+            address = geocode(lat, lng)
+        except Exception as e:
+            return key, (None, f"{type(e).__name__}: {e}"[:500])
+        return key, (address, "" if address else "empty response")
+
+    workers = max(1, min(_setting("TEAM13_GEOCODE_CONCURRENCY", DEFAULT_CONCURRENCY), len(points)))
+    if workers == 1:
+        return dict(map(run, points.items()))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(run, points.items()))
+
+
+def retry_delay(attempts):
+    """تأخیر (ثانیه) پیش از تلاش بعدی پس از attempts تلاش ناموفق: ۶۰، ۱۲۰، ۲۴۰، ... تا سقف ۶ ساعت."""
+    return min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+
+
+def process_batch(limit=DEFAULT_BATCH_SIZE, using=TEAM13_DB, geocode=None):
+    """
+    پردازش یک دسته. geocode(lat, lng) → آدرس یا None (پیش‌فرض reverse geocode نشان؛ اگر کلید نشان تنظیم نشده
+    باشد کاری برداشته نمی‌شود تا تلاش‌ها هدر نرود). خروجی {"claimed", "enriched", "retried", "failed"}.
+    """
+    stats = {"claimed": 0, "enriched": 0, "retried": 0, "failed": 0}
+    if geocode is None:
+        from .neshan import is_configured
+
+        if not is_configured():
+            return stats
+        geocode = _reverse_address
+    token, jobs = claim(limit, using=using)
+    stats["claimed"] = len(jobs)
+    if not jobs:
+        return stats
+
+    points = {}
+    for job in jobs:
+        points.setdefault(_point_key(job.latitude, job.longitude), (job.latitude, job.longitude))
+    results = _resolve(points, geocode)
+
+    now = timezone.now()
+    max_attempts = _setting("TEAM13_GEOCODE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    with transaction.atomic(using=using):
+        # هدف فعلی هر کار دوباره خوانده می‌شود: تأیید پیشنهاد ممکن است در این فاصله کار را به Place منتقل کرده باشد
+        targets = {
+            pk: (target_type, target_id)
+            for pk, target_type, target_id in GeocodeJob.objects.using(using)
+            .filter(locked_by=token).values_list("pk", "target_type", "target_id")
+        }
+        # (نوع هدف، آدرس عرض/طول مورد انتظار، آدرس نشان) → شناسه‌های هدف
+        updates = {}
+        done, retry = [], []
+        for job in jobs:
+            if job.pk not in targets:
+                continue
+            address, error = results[_point_key(job.latitude, job.longitude)]
+            if address:
+                target_type, target_id = targets[job.pk]
+                expected = coordinate_address(job.latitude, job.longitude)
+                updates.setdefault((target_type, expected, address), []).append(target_id)
+                done.append(job.pk)
+                continue
+            job.attempts += 1
+            job.last_error = error
+            job.locked_by = ""
+            job.locked_until = None
+            if job.attempts >= max_attempts:
+                job.status = Status.FAILED
+                stats["failed"] += 1
+            else:
+                job.next_attempt_at = now + timedelta(seconds=retry_delay(job.attempts))
+                stats["retried"] += 1
+            retry.append(job)
+        places = []
+        for (target_type, expected, address), ids in updates.items():
+            model, field = TARGET_FIELDS[target_type]
+            # هدفی که آدرسش در این فاصله ویرایش شده دست نمی‌خورد؛ کارش با بقیه حذف می‌شود
+            pending = model.objects.using(using).filter(pk__in=ids, **{field: expected})
+            if model is Place:
+                ids = list(pending.values_list("pk", flat=True))
+                places.extend(ids)
+                pending = model.objects.using(using).filter(pk__in=ids, **{field: expected})
+            stats["enriched"] += pending.update(**{field: address})
+        GeocodeJob.objects.using(using).filter(pk__in=done).delete()
+        GeocodeJob.objects.using(using).bulk_update(retry, RETRY_FIELDS)
+        if places:
+            bump_data_version(PLACES, using=using)
+            transaction.on_commit(lambda: _reindex_places(places, using), using=using)
+    return stats
+
+
+def _reindex_places(place_ids, using):
+    """به‌روزرسانی آدرس مکان‌های غنی‌شده در نمایهٔ جستجو (search_index آدرس را هم نمایه می‌کند)."""
+    from .search_index import index_place
+
+    for place in Place.objects.using(using).filter(pk__in=place_ids):
+        index_place(place, using=using)
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE, using=TEAM13_DB, geocode=None, max_batches=None):
+    """پردازش دسته‌ها تا وقتی کار سررسیده‌ای نماند (یا max_batches دسته)؛ خروجی جمع آمار دسته‌ها."""
+    totals = {"claimed": 0, "enriched": 0, "retried": 0, "failed": 0}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        stats = process_batch(batch_size, using=using, geocode=geocode)
+        batches += 1
+        for key, value in stats.items():
+            totals[key] += value
+        if not stats["claimed"]:
+            break
+    return totals
+
+
+def queue_stats(using=TEAM13_DB):
+    """تعداد کارهای در انتظار (سررسیده یا نه) و ناموفق."""
+    counts = dict(GeocodeJob.objects.using(using).values("status").annotate(n=Count("pk")).values_list("status", "n"))
+    return {status: counts.get(status, 0) for status in Status.values}
@@ -0,0 +1,122 @@
+# محدودهٔ در دسترس (isochrone) با کش و برآورد محلی برای isochrone_request
+# مرکز به یک خانهٔ شبکه (TEAM13_ISOCHRONE_CELL_PRECISION رقم اعشار) و زمان/مسافت به bucketها گرد می‌شوند و
+# همان مقادیر گردشده به نشان فرستاده می‌شود؛ پس چند درخواست نزدیک به هم یک چندضلعی مشترک را از کش می‌گیرند.
+# کش "isochrone" با TTL (TEAM13_NESHAN_CACHE_TTL["isochrone"]) و سقف جدا (TEAM13_ISOCHRONE_CACHE_MAX_ENTRIES).
+# اگر نشان در دسترس نباشد، محدوده با دایره‌ای به شعاع برآوردشده از مدل سرعت موتور محلی (distance_engine) تقریب زده می‌شود.
+
+import math
+
+from django.conf import settings
+
+from core.geo_math import circle_ring
+
+from .distance_engine import speed_model_for
+from .neshan.cache import get_cache
+
+SOURCE_NESHAN = "neshan"
+SOURCE_ESTIMATE = "estimate"
+
+DEFAULT_CELL_PRECISION = 3  # ≈ ۱۱۰ متر
+DEFAULT_TIME_BUCKET_MINUTES = 5
+DEFAULT_DISTANCE_BUCKET_KM = 0.5
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_MAX_ENTRIES = 500
+# تعداد رأس‌های چندضلعی برآوردی
+ESTIMATE_SEGMENTS = 64
+
+
+def _bucket(value, size):
+    """گرد کردن به نزدیک‌ترین مضرب size (حداقل یک bucket)؛ None بدون تغییر. ValueError برای مقدار نامتناهی یا غیرمثبت."""
+    if value is None:
+        return None
+    if not (math.isfinite(value) and value > 0):
+        raise ValueError(f"isochrone distance/time must be a positive number, got {value!r}")
+    return max(size, round(value / size) * size)
+
+
+def snap_request(lat, lng, distance_km=None, time_minutes=None):
+    """(lat, lng, distance_km, time_minutes) گردشده به خانهٔ شبکه و bucketهای زمان/مسافت."""
+    precision = getattr(settings, "TEAM13_ISOCHRONE_CELL_PRECISION", DEFAULT_CELL_PRECISION)
+    return (
+        round(float(lat), precision),
+        round(float(lng), precision),
+        _bucket(distance_km, getattr(settings, "TEAM13_ISOCHRONE_DISTANCE_BUCKET_KM", DEFAULT_DISTANCE_BUCKET_KM)),
+        _bucket(time_minutes, getattr(settings, "TEAM13_ISOCHRONE_TIME_BUCKET_MINUTES", DEFAULT_TIME_BUCKET_MINUTES)),
+    )
+
+
+def isochrone_cache_key(lat, lng, distance_km, time_minutes, polygon, denoise):
+    return "|".join([
+        f"{lat},{lng}",
+        "" if distance_km is None else f"d{distance_km:g}",
+        "" if time_minutes is None else f"t{time_minutes:g}",
+        "p" if polygon else "l",
+        f"{denoise:g}",
+    ])
+
+
+def isochrone_cache():
+    return get_cache(
+        "isochrone", default_ttl=DEFAULT_TTL_SECONDS,
+        max_entries=getattr(settings, "TEAM13_ISOCHRONE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+    )
+
+
+def reach_radius_km(distance_km=None, time_minutes=None, travel_mode="car"):
+    """
+    شعاع خط مستقیم قابل دسترسی از مدل سرعت: مسافت جاده‌ای / circuity و برای زمان
+    (زمان − overhead) × سرعت / circuity؛ با هر دو محدودیت، کوچک‌تر.
+    """
+    model = speed_model_for(travel_mode)
+    radii = []
+    if distance_km is not None:
+        radii.append(distance_km / model.circuity)
+    if time_minutes is not None:
+        seconds = max(0.0, time_minutes * 60.0 - model.overhead_s)
+        radii.append(seconds / 3600.0 * model.speed_kmh / model.circuity)
+    return min(radii) if radii else 0.0
+
+
+def estimate_isochrone(lat, lng, distance_km=None, time_minutes=None, polygon=False):
+    """GeoJSON FeatureCollection برآوردی (دایرهٔ مقیاس‌شده با مدل سرعت) به شکل پاسخ نشان."""
+    radius_km = reach_radius_km(distance_km, time_minutes)
+    ring = circle_ring(lat, lng, radius_km, ESTIMATE_SEGMENTS)
+    geometry = {"type": "Polygon", "coordinates": [ring]} if polygon else {"type": "LineString", "coordinates": ring}
+    properties = {"radius_km": round(radius_km, 3)}
+    if distance_km is not None:
+        properties["distance"] = distance_km
+    if time_minutes is not None:
+        properties["time"] = time_minutes
+    return {
+        "type": "FeatureCollection",
+        "source": SOURCE_ESTIMATE,
+        "features": [{"type": "Feature", "geometry": geometry, "properties": properties}],
+    }
+
+
+async def aisochrone(lat, lng, distance_km=None, time_minutes=None, polygon=False, denoise=0, fallback=True):
+    """
+    محدودهٔ در دسترس برای مرکز و زمان/مسافت گردشده: از کش، وگرنه از نشان (و ذخیره در کش)، وگرنه
+    با fallback=True برآورد محلی. خروجی FeatureCollection با فیلد source (neshan یا estimate) یا None.
+    """
+    from .neshan import aio
+
+    lat, lng, distance_km, time_minutes = snap_request(lat, lng, distance_km, time_minutes)
+    cache = isochrone_cache()
+    key = isochrone_cache_key(lat, lng, distance_km, time_minutes, polygon, denoise)
+    data = await cache.aget(key)
+    if data is None:
+        try:
+            data = await aio.fetch_isochrone(
+                lat, lng, distance_km=distance_km, time_minutes=time_minutes, polygon=polygon, denoise=denoise,
+            )
+        except Exception:
+            data = None
+        if isinstance(data, dict):
+            data = dict(data, source=SOURCE_NESHAN)
+            await cache.aset(key, data)
+        else:
+            data = None
+    if data is None and fallback:
+        data = estimate_isochrone(lat, lng, distance_km, time_minutes, polygon)
+    return data
@@ -5,12 +5,12 @@ Read data from temp_data_inseart (JSON) at project root and insert into team13 S
 No CSV storage; data is loaded from JSON and saved in the correct format in SQLite.
 
 Run from project root:
-  py -3.11 team13/load_temp_data.py [--clear] [--path path/to/temp_data_inseart]
+  py -3.11 team13/load_temp_data.py [--clear] [--path path/to/temp_data_inseart] [--batch-size 500] [--dry-run] [--workers N]
 """
 
-import json
 import os
 import sys
+import time
 import uuid
 
 if __name__ == "__main__":
@@ -57,6 +57,8 @@ def _clear_team13(db):
             "team13_events",
             "team13_place_translations",
             "team13_places",
+            "team13_cities",
+            "team13_provinces",
         ]:
             try:
                 cursor.execute(f"DELETE FROM {table}")
@@ -65,114 +67,276 @@ def _clear_team13(db):
                     raise
 
 
-def load_from_json(data_dir, db="team13", clear=False):
+# Amenity IDs used in hotels.json -> names stored in team13_place_amenities
+AMENITY_NAMES = {
+    1: "پارکینگ",
+    2: "وای‌فای",
+    3: "استخر",
+    4: "سالن ورزش",
+    5: "رستوران",
+    6: "کافی‌شاپ",
+    7: "اینترنت",
+    8: "تهویه",
+    9: "صبحانه",
+    10: "استقبال ۲۴ ساعته",
+    11: "صبحانه",
+}
+
+DEFAULT_BATCH_SIZE = 500
+IMPORT_TABLES = ("places", "translations", "hotel_details", "amenities")
+PLACE_UPDATE_FIELDS = ("type", "city", "address", "latitude", "longitude", "city_ref_id")
+
+
+def _hotel_row(h):
     """
-    Load hotels.json (and optionally province.json, cities.json) from temp_data_inseart
-    into team13 SQLite in the correct schema (Place, PlaceTranslation, HotelDetails).
+    Normalize one hotels.json entry into the rows it owns, keyed by its deterministic place_id.
+    city_id is the raw dataset city id; it only becomes Place.city_ref once the city is known.
+    Returns None for entries without hotel_id or location.
     """
-    from team13.models import HotelDetails, Place, PlaceTranslation
+    hotel_id = h.get("hotel_id")
+    if hotel_id is None:
+        return None
+    loc = h.get("location") or {}
+    lat = loc.get("latitude")
+    lng = loc.get("longitude")
+    if lat is None or lng is None:
+        return None
+    stars = h.get("stars")
+    if stars is not None:
+        try:
+            stars = int(stars)
+        except (TypeError, ValueError):
+            stars = None
+    try:
+        city_id = int(h["city_id"]) if h.get("city_id") is not None else None
+    except (TypeError, ValueError):
+        city_id = None
+    amenity_ids = h.get("amenities") or []
+    if not isinstance(amenity_ids, list):
+        amenity_ids = []
+    return {
+        # Deterministic UUID so re-run does not duplicate
+        "place_id": uuid.uuid5(NAMESPACE_HOTEL, str(hotel_id)),
+        "place": (
+            "hotel",
+            (h.get("city_name_fa") or h.get("city") or "").strip()[:255],
+            (h.get("address") or "").strip(),
+            float(lat),
+            float(lng),
+        ),
+        "city_id": city_id,
+        "translations": {
+            "fa": (((h.get("name_fa") or "").strip() or "هتل")[:255], (h.get("description_fa") or "").strip()),
+            "en": (((h.get("name_en") or "").strip() or "Hotel")[:255], (h.get("description_en") or "").strip()),
+        },
+        "hotel_details": (stars, (h.get("price_tier") or "").strip()[:64]),
+        "amenities": {(AMENITY_NAMES.get(aid) or f"amenity_{aid}")[:128] for aid in amenity_ids},
+    }
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _diff(incoming, existing, counts):
+    """Keys of incoming whose values are new or differ from existing; updates counts in place."""
+    changed = []
+    for key, values in incoming.items():
+        current = existing.get(key)
+        if current is None:
+            counts["created"] += 1
+            changed.append(key)
+        elif current != values:
+            counts["updated"] += 1
+            changed.append(key)
+        else:
+            counts["unchanged"] += 1
+    return changed
 
-    hotels_path = os.path.join(data_dir, "hotels.json")
-    if not os.path.isfile(hotels_path):
-        print(f"hotels.json not found in {data_dir}")
-        return False
 
-    if clear:
-        print("Clearing existing team13 data...")
-        _clear_team13(db)
-        print("Done clearing.")
+def import_hotels(hotels, db="team13", batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None, city_ids=None):
+    """
+    Idempotent bulk upsert of hotels.json entries (any iterable of dicts) into Place, PlaceTranslation,
+    HotelDetails and PlaceAmenity. Entries are normalized lazily, so a streamed iterable stays streamed.
+    See import_hotel_rows for batching, city linking and the returned stats.
+    """
+    rows = (_hotel_row(h) if isinstance(h, dict) else None for h in hotels)
+    return import_hotel_rows(rows, db=db, batch_size=batch_size, dry_run=dry_run, progress=progress, city_ids=city_ids)
 
-    with open(hotels_path, "r", encoding="utf-8") as f:
-        hotels = json.load(f)
 
-    if not isinstance(hotels, list):
-        print("hotels.json must be a JSON array.")
-        return False
+def import_hotel_rows(rows, db="team13", batch_size=DEFAULT_BATCH_SIZE, dry_run=False, progress=None, city_ids=None):
+    """
+    Idempotent bulk upsert of normalized hotel rows (_hotel_row output; None counts as skipped).
 
-    created = 0
-    for h in hotels:
-        hotel_id = h.get("hotel_id")
-        if hotel_id is None:
-            continue
-        loc = h.get("location") or {}
-        lat = loc.get("latitude")
-        lng = loc.get("longitude")
-        if lat is None or lng is None:
-            continue
-        # Deterministic UUID so re-run does not duplicate
-        place_id = uuid.uuid5(NAMESPACE_HOTEL, str(hotel_id))
-        city = (h.get("city_name_fa") or h.get("city") or "").strip()
-        address = (h.get("address") or "").strip()
-        name_fa = (h.get("name_fa") or "").strip() or "هتل"
-        name_en = (h.get("name_en") or "").strip() or "Hotel"
-        desc_fa = (h.get("description_fa") or "").strip()
-        desc_en = (h.get("description_en") or "").strip()
-        stars = h.get("stars")
-        if stars is not None:
-            try:
-                stars = int(stars)
-            except (TypeError, ValueError):
-                stars = None
-        price_tier = (h.get("price_tier") or "").strip()
-        price_range = price_tier or ""
+    Rows are processed in batches of batch_size. Per batch, existing rows are read with one query
+    per table (filtered by the precomputed uuid5 place ids). Only new or changed rows are written, with
+    bulk_create(update_conflicts=True) inside one transaction per batch. Amenities are only added, never
+    removed. With dry_run=True nothing is written and the returned counts describe the pending diff.
+    progress(processed, stats) is called after every batch.
 
-        place, place_created = Place.objects.using(db).get_or_create(
-            place_id=place_id,
-            defaults={
-                "type": "hotel",
-                "city": city[:255],
-                "address": address,
-                "latitude": float(lat),
-                "longitude": float(lng),
-            },
-        )
-        if place_created:
-            created += 1
-        else:
-            Place.objects.using(db).filter(place_id=place_id).update(
-                city=city[:255], address=address, latitude=float(lat), longitude=float(lng)
-            )
+    Place.city_ref is set from the row's city_id when that city is known: city_ids is the set of known
+    ids (the dataset loader passes the cities it has just written); with None, each batch's ids are
+    looked up in City. Unknown city ids are counted as "unlinked" and leave city_ref empty.
 
-        PlaceTranslation.objects.using(db).update_or_create(
-            place=place,
-            lang="fa",
-            defaults={"name": name_fa[:255], "description": desc_fa},
-        )
-        PlaceTranslation.objects.using(db).update_or_create(
-            place=place,
-            lang="en",
-            defaults={"name": name_en[:255], "description": desc_en},
-        )
-        HotelDetails.objects.using(db).update_or_create(
-            place=place,
-            defaults={"stars": stars, "price_range": price_range[:64]},
-        )
+    Returns {"processed", "skipped", "unlinked", "places" | "translations" | "hotel_details" | "amenities":
+    {"created", "updated", "unchanged"}}.
+    """
+    from django.db import transaction
+
+    from team13.models import City, HotelDetails, Place, PlaceAmenity, PlaceTranslation
+
+    stats = {"processed": 0, "skipped": 0, "unlinked": 0}
+    stats.update({table: {"created": 0, "updated": 0, "unchanged": 0} for table in IMPORT_TABLES})
+    for batch in _batches(rows, batch_size):
+        by_id = {row["place_id"]: row for row in batch if row is not None}
+        stats["processed"] += len(batch)
+        stats["skipped"] += len(batch) - len(by_id)
+        ids = list(by_id)
+
+        known_cities = city_ids
+        wanted = {row["city_id"] for row in by_id.values() if row["city_id"] is not None}
+        if known_cities is None and wanted:
+            known_cities = set(City.objects.using(db).filter(city_id__in=wanted).values_list("city_id", flat=True))
+        places_in = {}
+        for pk, row in by_id.items():
+            city_ref = None
+            if row["city_id"] is not None:
+                if row["city_id"] in known_cities:
+                    city_ref = row["city_id"]
+                else:
+                    stats["unlinked"] += 1
+            places_in[pk] = row["place"] + (city_ref,)
 
-        # Optional: amenities (IDs in JSON; map to names for team13_place_amenities)
-        amenity_names = {
-            1: "پارکینگ",
-            2: "وای‌فای",
-            3: "استخر",
-            4: "سالن ورزش",
-            5: "رستوران",
-            6: "کافی‌شاپ",
-            7: "اینترنت",
-            8: "تهویه",
-            9: "صبحانه",
-            10: "استقبال ۲۴ ساعته",
-            11: "صبحانه",
+        existing_places = {
+            pk: tuple(values)
+            for pk, *values in Place.objects.using(db).filter(place_id__in=ids).values_list("place_id", *PLACE_UPDATE_FIELDS)
         }
-        amenity_ids = h.get("amenities") or []
-        if isinstance(amenity_ids, list):
-            from team13.models import PlaceAmenity
-            for aid in amenity_ids:
-                aname = amenity_names.get(aid) or f"amenity_{aid}"
-                PlaceAmenity.objects.using(db).get_or_create(
-                    place=place,
-                    amenity_name=aname[:128],
+        existing_trans = {
+            (pk, lang): (name, description)
+            for pk, lang, name, description in PlaceTranslation.objects.using(db)
+            .filter(place_id__in=ids).values_list("place_id", "lang", "name", "description")
+        }
+        existing_details = {
+            pk: (stars, price_range)
+            for pk, stars, price_range in HotelDetails.objects.using(db)
+            .filter(place_id__in=ids).values_list("place_id", "stars", "price_range")
+        }
+        existing_amenities = set(
+            PlaceAmenity.objects.using(db).filter(place_id__in=ids).values_list("place_id", "amenity_name")
+        )
+
+        places = _diff(places_in, existing_places, stats["places"])
+        trans = _diff(
+            {(pk, lang): values for pk, row in by_id.items() for lang, values in row["translations"].items()},
+            existing_trans, stats["translations"],
+        )
+        details = _diff({pk: row["hotel_details"] for pk, row in by_id.items()}, existing_details, stats["hotel_details"])
+        amenities = [
+            (pk, name) for pk, row in by_id.items() for name in sorted(row["amenities"])
+            if (pk, name) not in existing_amenities
+        ]
+        stats["amenities"]["created"] += len(amenities)
+        stats["amenities"]["unchanged"] += sum(len(row["amenities"]) for row in by_id.values()) - len(amenities)
+
+        if not dry_run and (places or trans or details or amenities):
+            with transaction.atomic(using=db):
+                Place.objects.using(db).bulk_create(
+                    [Place(place_id=pk, **dict(zip(PLACE_UPDATE_FIELDS, places_in[pk]))) for pk in places],
+                    update_conflicts=True, unique_fields=["place_id"], update_fields=list(PLACE_UPDATE_FIELDS),
+                )
+                PlaceTranslation.objects.using(db).bulk_create(
+                    [
+                        PlaceTranslation(place_id=pk, lang=lang, name=by_id[pk]["translations"][lang][0],
+                                         description=by_id[pk]["translations"][lang][1])
+                        for pk, lang in trans
+                    ],
+                    update_conflicts=True, unique_fields=["place", "lang"], update_fields=["name", "description"],
+                )
+                HotelDetails.objects.using(db).bulk_create(
+                    [
+                        HotelDetails(place_id=pk, stars=by_id[pk]["hotel_details"][0], price_range=by_id[pk]["hotel_details"][1])
+                        for pk in details
+                    ],
+                    update_conflicts=True, unique_fields=["place"], update_fields=["stars", "price_range"],
+                )
+                PlaceAmenity.objects.using(db).bulk_create(
+                    [PlaceAmenity(place_id=pk, amenity_name=name) for pk, name in amenities],
+                    ignore_conflicts=True,
                 )
+        if progress is not None:
+            progress(stats["processed"], stats)
+    return stats
+
+
+def _print_progress(processed, stats):
+    places = stats["places"]
+    print(f"  {processed} hotels: {places['created']} new, {places['updated']} changed, {places['unchanged']} unchanged places")
+
+
+def _print_import_stats(stats, dry_run=False):
+    prefix = "Dry run — would write" if dry_run else "Wrote"
+    print(f"{prefix} (processed {stats['processed']}, skipped {stats['skipped']}):")
+    for table in IMPORT_TABLES:
+        counts = stats[table]
+        print(f"  {table:<14} created {counts['created']:>6}  updated {counts['updated']:>6}  unchanged {counts['unchanged']:>6}")
+    if stats.get("unlinked"):
+        print(f"  {stats['unlinked']} hotels reference unknown cities (city_ref left empty)")
+
+
+def _print_table_stats(table, stats, dry_run=False):
+    counts = stats[table]
+    prefix = "Dry run — would write" if dry_run else "Wrote"
+    print(
+        f"{prefix} {table} (processed {stats['processed']}, skipped {stats['skipped']}): created {counts['created']}, "
+        f"updated {counts['updated']}, unchanged {counts['unchanged']}"
+    )
+    if stats.get("unlinked"):
+        print(f"  {stats['unlinked']} {table} reference unknown parents")
+
+
+JSON_DATASETS = ("province.json", "cities.json", "hotels.json")
 
-    print(f"Loaded {len(hotels)} hotels from {hotels_path} (created {created} new places).")
+
+def load_from_json(data_dir, db="team13", clear=False, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, workers=None):
+    """
+    Load province.json, cities.json and hotels.json from temp_data_inseart into team13 SQLite
+    (Province, City, then Place, PlaceTranslation, HotelDetails, PlaceAmenity) with the dependency-aware
+    loader in team13.dataset_loader: province.json and cities.json are parsed in parallel worker processes,
+    hotels.json is streamed in this process, and tables are written in dependency order. workers=0 parses
+    everything in this process.
+    """
+    if not any(os.path.isfile(os.path.join(data_dir, name)) for name in JSON_DATASETS):
+        print(f"None of {', '.join(JSON_DATASETS)} found in {data_dir}")
+        return False
+
+    if clear and not dry_run:
+        print("Clearing existing team13 data...")
+        _clear_team13(db)
+        print("Done clearing.")
+
+    from team13.dataset_loader import load_datasets
+
+    started = time.monotonic()
+    try:
+        results = load_datasets(
+            data_dir, db=db, batch_size=batch_size, dry_run=dry_run, workers=workers, progress=_print_progress,
+        )
+    except ValueError as e:
+        print(f"Dataset files must be JSON arrays of objects: {e}")
+        return False
+    for name, stats in results.items():
+        if name == "hotels":
+            _print_import_stats(stats, dry_run=dry_run)
+        else:
+            _print_table_stats(name, stats, dry_run=dry_run)
+    print(f"Loaded {', '.join(results)} from {data_dir} in {time.monotonic() - started:.1f}s.")
     return True
 
 
@@ -226,21 +390,37 @@ def load_sirjan_defaults(db="team13"):
     return True
 
 
-def run_load(clear=False, data_dir=None):
+def run_load(clear=False, data_dir=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, workers=None):
     data_dir = data_dir or get_data_dir()
     if not os.path.isdir(data_dir):
         print(f"Data folder not found: {data_dir}")
-        print("Put temp_data_inseart at project root with hotels.json inside.")
+        print("Put temp_data_inseart at project root with province.json, cities.json and hotels.json inside.")
         return False
 
-    # Prefer JSON load from temp_data_inseart (hotels.json)
-    if os.path.isfile(os.path.join(data_dir, "hotels.json")):
-        ok = load_from_json(data_dir, db="team13", clear=clear)
+    # Prefer JSON load from temp_data_inseart (province.json, cities.json, hotels.json)
+    has_json = any(os.path.isfile(os.path.join(data_dir, name)) for name in JSON_DATASETS)
+    if dry_run and not has_json:
+        print("--dry-run is only supported for the JSON datasets.")
+        return False
+    if has_json:
+        ok = load_from_json(data_dir, db="team13", clear=clear, batch_size=batch_size, dry_run=dry_run, workers=workers)
+        if dry_run:
+            return ok
     else:
         ok = _run_load_csv(data_dir, clear=clear)
 
     # Always ensure Sirjan default places (hospitals, clinics, fire stations)
     load_sirjan_defaults(db="team13")
+
+    # Link places that only carry a free-text city (CSV rows, Sirjan defaults) to team13_cities
+    from team13.cities import link_places_to_cities
+    linked = link_places_to_cities(using="team13")
+    if linked:
+        print(f"Linked {linked} places to cities by name.")
+
+    # Invalidate caches keyed on the places data version (e.g. the map GeoJSON layer)
+    from team13.data_version import PLACES, bump_data_version
+    bump_data_version(PLACES, using="team13")
     return ok
 
 
@@ -374,6 +554,9 @@ def _run_load_csv(data_dir, clear=False):
                     },
                 )
                 Comment.objects.using(db).filter(pk=obj.pk).update(created_at=_parse_dt(row["created_at"]))
+        from .ratings import rebuild_ratings
+
+        rebuild_ratings(using=db)
         print(f"Loaded comments from {path}")
 
     # 7) hotel_details
@@ -472,8 +655,14 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Load data from temp_data_inseart (JSON) into team13 SQLite")
     parser.add_argument("--clear", action="store_true", help="Clear existing team13 data before load")
     parser.add_argument("--path", type=str, default=None, help="Path to data folder (default: project root temp_data_inseart)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Hotels per batch/transaction (default: 500)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what the JSON files would create/update; write nothing")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for province/city files (default: one per file; 0 = parse inline)")
     args = parser.parse_args()
-    ok = run_load(clear=args.clear, data_dir=args.path)
+    ok = run_load(
+        clear=args.clear, data_dir=args.path, batch_size=max(1, args.batch_size), dry_run=args.dry_run,
+        workers=None if args.workers is None else max(0, args.workers),
+    )
     if ok:
         print("Data load finished successfully.")
     else:
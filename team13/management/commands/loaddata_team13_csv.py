@@ -1,10 +1,18 @@
 # بارگذاری داده‌های نمونه از temp_data/*.csv به دیتابیس team13 (SQLite)
+# هر فایل در یک تراکنش و با bulk_create (دسته‌های --batch-size ردیفی) نوشته می‌شود؛ کلیدهای خارجی (مکان/رویداد)
+# به‌جای یک get به ازای هر ردیف با مجموعهٔ شناسه‌های موجود در حافظه بررسی می‌شوند. ردیف‌های نامعتبر
+# (ستون ناموجود، مقدار خراب، مکان/رویداد ناموجود) با شمارهٔ خط گزارش و کنار گذاشته می‌شوند.
+# معنای هر جدول مانند قبل است: مکان/رویداد/تصویر/نظر/امکانات فقط در صورت نبودن درج می‌شوند، ترجمه‌ها و
+# جزئیات به‌روزرسانی (upsert) و مسیرها همیشه افزوده می‌شوند؛ created_at نظرات و مسیرها از CSV گرفته می‌شود.
 import csv
 import os
+from datetime import time
 from uuid import UUID
+
 from django.core.management.base import BaseCommand
-from django.db import connections
+from django.db import connections, transaction
 from django.utils.dateparse import parse_datetime
+
 from team13.models import (
     Place,
     PlaceTranslation,
@@ -18,12 +26,221 @@ from team13.models import (
     PlaceAmenity,
     RouteLog,
 )
+from team13.cities import link_places_to_cities
+from team13.data_version import PLACES, bump_data_version
+from team13.ratings import rebuild_ratings
+
+DEFAULT_BATCH_SIZE = 500
+# حداکثر خطاهای چاپ‌شده برای هر فایل (بقیه فقط شمرده می‌شوند)
+MAX_REPORTED_ERRORS = 20
+
+# حالت‌های نوشتن هر جدول
+INSERT = "insert"  # فقط ردیف‌های تازه (مانند get_or_create)
+UPSERT = "upsert"  # درج یا به‌روزرسانی (مانند update_or_create)
+APPEND = "append"  # همیشه ردیف تازه (مانند create)
 
 
 def csv_path(filename):
     return os.path.join(os.path.dirname(__file__), "..", "..", "temp_data", filename)
 
 
+def _int_or_none(value):
+    return int(value) if value else None
+
+
+def _time_or_none(value):
+    if value and ":" in value:
+        h, m = value.strip().split(":")[:2]
+        return time(int(h), int(m))
+    return None
+
+
+def _datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"invalid datetime {value!r}")
+    return parsed
+
+
+class _Context:
+    """شناسه‌های مکان و رویدادهای موجود برای بررسی کلید خارجی بدون کوئری به ازای هر ردیف."""
+
+    def __init__(self, db):
+        self.db = db
+        self.place_ids = set(Place.objects.using(db).values_list("place_id", flat=True))
+        self.event_ids = set(Event.objects.using(db).values_list("event_id", flat=True))
+
+    def place(self, value):
+        place_id = UUID(value)
+        if place_id not in self.place_ids:
+            raise ValueError(f"unknown place {value}")
+        return place_id
+
+    def event(self, value):
+        event_id = UUID(value)
+        if event_id not in self.event_ids:
+            raise ValueError(f"unknown event {value}")
+        return event_id
+
+
+def _place(row, ctx):
+    return Place(
+        place_id=UUID(row["place_id"]), type=row["type"], city=row.get("city", ""), address=row.get("address", ""),
+        latitude=float(row["latitude"]), longitude=float(row["longitude"]),
+    )
+
+
+def _place_translation(row, ctx):
+    return PlaceTranslation(
+        place_id=ctx.place(row["place_id"]), lang=row["lang"], name=row.get("name", ""),
+        description=row.get("description", ""),
+    )
+
+
+def _event(row, ctx):
+    return Event(
+        event_id=UUID(row["event_id"]), start_at=_datetime(row["start_at"]), end_at=_datetime(row["end_at"]),
+        city=row.get("city", ""), address=row.get("address", ""),
+        latitude=float(row["latitude"]), longitude=float(row["longitude"]),
+    )
+
+
+def _event_translation(row, ctx):
+    return EventTranslation(
+        event_id=ctx.event(row["event_id"]), lang=row["lang"], title=row.get("title", ""),
+        description=row.get("description", ""),
+    )
+
+
+def _image(row, ctx):
+    return Image(
+        image_id=UUID(row["image_id"]), target_type=row["target_type"], target_id=UUID(row["target_id"]),
+        image_url=row["image_url"],
+    )
+
+
+def _comment(row, ctx):
+    return Comment(
+        comment_id=UUID(row["comment_id"]), target_type=row["target_type"], target_id=UUID(row["target_id"]),
+        rating=_int_or_none(row.get("rating")),
+    )
+
+
+def _hotel_details(row, ctx):
+    return HotelDetails(
+        place_id=ctx.place(row["place_id"]), stars=_int_or_none(row.get("stars")), price_range=row.get("price_range", ""),
+    )
+
+
+def _restaurant_details(row, ctx):
+    return RestaurantDetails(
+        place_id=ctx.place(row["place_id"]), cuisine=row.get("cuisine", ""), avg_price=_int_or_none(row.get("avg_price")),
+    )
+
+
+def _museum_details(row, ctx):
+    return MuseumDetails(
+        place_id=ctx.place(row["place_id"]), open_at=_time_or_none(row.get("open_at")),
+        close_at=_time_or_none(row.get("close_at")), ticket_price=_int_or_none(row.get("ticket_price")),
+    )
+
+
+def _place_amenity(row, ctx):
+    return PlaceAmenity(place_id=ctx.place(row["place_id"]), amenity_name=row["amenity_name"])
+
+
+def _route_log(row, ctx):
+    return RouteLog(
+        source_place_id=ctx.place(row["source_place_id"]), destination_place_id=ctx.place(row["destination_place_id"]),
+        travel_mode=row["travel_mode"], user_id=UUID(row["user_id"]) if row.get("user_id") else None,
+    )
+
+
+class CsvTable:
+    """
+    یک فایل CSV و شیوهٔ نوشتن آن: build(row, ctx) نمونهٔ مدل را می‌سازد (یا ValueError/KeyError برای ردیف
+    نامعتبر)، mode یکی از INSERT/UPSERT/APPEND و stamp نام فیلد auto_now_add که مقدارش از ستون CSV هم‌نام
+    گرفته می‌شود (bulk_create آن را با زمان فعلی پر می‌کند، پس پس از درج با bulk_update اصلاح می‌شود).
+    """
+
+    def __init__(self, filename, model, build, mode, unique_fields=(), update_fields=(), stamp=None, ids=None):
+        self.filename = filename
+        self.model = model
+        self.build = build
+        self.mode = mode
+        self.unique_fields = list(unique_fields)
+        self.update_fields = list(update_fields)
+        self.stamp = stamp
+        # نام مجموعهٔ شناسه در _Context که ردیف‌های این فایل به آن افزوده می‌شوند (place_ids / event_ids)
+        self.ids = ids
+
+
+TABLES = [
+    CsvTable("places.csv", Place, _place, INSERT, ids="place_ids"),
+    CsvTable("place_translations.csv", PlaceTranslation, _place_translation, UPSERT, ["place", "lang"], ["name", "description"]),
+    CsvTable("events.csv", Event, _event, INSERT, ids="event_ids"),
+    CsvTable("event_translations.csv", EventTranslation, _event_translation, UPSERT, ["event", "lang"], ["title", "description"]),
+    CsvTable("images.csv", Image, _image, INSERT),
+    CsvTable("comments.csv", Comment, _comment, INSERT, stamp="created_at"),
+    CsvTable("hotel_details.csv", HotelDetails, _hotel_details, UPSERT, ["place"], ["stars", "price_range"]),
+    CsvTable("restaurant_details.csv", RestaurantDetails, _restaurant_details, UPSERT, ["place"], ["cuisine", "avg_price"]),
+    CsvTable("museum_details.csv", MuseumDetails, _museum_details, UPSERT, ["place"], ["open_at", "close_at", "ticket_price"]),
+    CsvTable("place_amenities.csv", PlaceAmenity, _place_amenity, INSERT),
+    CsvTable("route_logs.csv", RouteLog, _route_log, APPEND, stamp="created_at"),
+]
+
+
+def _write_batch(table, objs, stamps, db, batch_size):
+    manager = table.model.objects.using(db)
+    if table.mode == UPSERT:
+        manager.bulk_create(
+            objs, batch_size=batch_size, update_conflicts=True,
+            unique_fields=table.unique_fields, update_fields=table.update_fields,
+        )
+    else:
+        manager.bulk_create(objs, batch_size=batch_size, ignore_conflicts=table.mode == INSERT)
+    if table.stamp:
+        for obj, value in zip(objs, stamps):
+            setattr(obj, table.stamp, value)
+        manager.bulk_update(objs, [table.stamp], batch_size=batch_size)
+
+
+def load_csv_table(table, path, ctx, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    بارگذاری یک فایل در یک تراکنش با دسته‌های batch_size ردیفی.
+    خروجی (تعداد ردیف نوشته‌شده، لیست خطاها به‌صورت (شمارهٔ خط، پیام)).
+    """
+    loaded = 0
+    errors = []
+    new_ids = set()
+    id_field = table.model._meta.pk.attname
+    with open(path, "r", encoding="utf-8", newline="") as f, transaction.atomic(using=ctx.db):
+        reader = csv.DictReader(f)
+        objs, stamps = [], []
+        for row in reader:
+            try:
+                obj = table.build(row, ctx)
+                stamp = _datetime(row["created_at"]) if table.stamp else None
+            except (KeyError, TypeError, ValueError) as e:
+                message = f"missing column {e}" if isinstance(e, KeyError) else str(e)
+                errors.append((reader.line_num, message))
+                continue
+            objs.append(obj)
+            stamps.append(stamp)
+            if table.ids:
+                new_ids.add(getattr(obj, id_field))
+            if len(objs) >= batch_size:
+                _write_batch(table, objs, stamps, ctx.db, batch_size)
+                loaded += len(objs)
+                objs, stamps = [], []
+        if objs:
+            _write_batch(table, objs, stamps, ctx.db, batch_size)
+            loaded += len(objs)
+    if table.ids:
+        getattr(ctx, table.ids).update(new_ids)
+    return loaded, errors
+
+
 class Command(BaseCommand):
     help = "Load sample data from team13/temp_data/*.csv into SQLite (team13 DB)."
 
@@ -33,16 +250,28 @@ class Command(BaseCommand):
             action="store_true",
             help="Delete existing team13 data before loading (optional).",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Rows per bulk insert (default: {DEFAULT_BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--path",
+            default=None,
+            help="Folder with the CSV files (default: team13/temp_data).",
+        )
 
     def handle(self, *args, **options):
-        base = csv_path("")
+        base = options.get("path") or csv_path("")
         if not os.path.isdir(base):
             self.stderr.write(f"Folder not found: {base}")
             return
 
+        db = "team13"
         if options.get("clear"):
             self.stdout.write("Clearing existing team13 data...")
-            with connections["team13"].cursor() as cursor:
+            with connections[db].cursor() as cursor:
                 for table in [
                     "team13_route_logs",
                     "team13_place_amenities",
@@ -65,206 +294,29 @@ class Command(BaseCommand):
                             raise
             self.stdout.write("Done clearing.")
 
-        db = "team13"
+        batch_size = max(1, options["batch_size"])
+        ctx = _Context(db)
+        total_errors = 0
+        for table in TABLES:
+            path = os.path.join(base, table.filename)
+            if not os.path.isfile(path):
+                continue
+            loaded, errors = load_csv_table(table, path, ctx, batch_size)
+            total_errors += len(errors)
+            for line, message in errors[:MAX_REPORTED_ERRORS]:
+                self.stderr.write(f"{table.filename}:{line}: {message}")
+            if len(errors) > MAX_REPORTED_ERRORS:
+                self.stderr.write(f"{table.filename}: ... {len(errors) - MAX_REPORTED_ERRORS} more errors")
+            suffix = f" ({len(errors)} rows skipped)" if errors else ""
+            self.stdout.write(f"Loaded {loaded} rows from {path}{suffix}")
+            if table.model is Comment:
+                rebuild_ratings(using=db)
 
-        # 1) places
-        path = csv_path("places.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    Place.objects.using(db).get_or_create(
-                        place_id=UUID(row["place_id"]),
-                        defaults={
-                            "type": row["type"],
-                            "city": row.get("city", ""),
-                            "address": row.get("address", ""),
-                            "latitude": float(row["latitude"]),
-                            "longitude": float(row["longitude"]),
-                        },
-                    )
-            self.stdout.write(f"Loaded places from {path}")
-
-        # 2) place_translations
-        path = csv_path("place_translations.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    place = Place.objects.using(db).get(place_id=UUID(row["place_id"]))
-                    PlaceTranslation.objects.using(db).update_or_create(
-                        place=place,
-                        lang=row["lang"],
-                        defaults={
-                            "name": row.get("name", ""),
-                            "description": row.get("description", ""),
-                        },
-                    )
-            self.stdout.write(f"Loaded place_translations from {path}")
-
-        # 3) events
-        path = csv_path("events.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    Event.objects.using(db).get_or_create(
-                        event_id=UUID(row["event_id"]),
-                        defaults={
-                            "start_at": parse_datetime(row["start_at"]),
-                            "end_at": parse_datetime(row["end_at"]),
-                            "city": row.get("city", ""),
-                            "address": row.get("address", ""),
-                            "latitude": float(row["latitude"]),
-                            "longitude": float(row["longitude"]),
-                        },
-                    )
-            self.stdout.write(f"Loaded events from {path}")
-
-        # 4) event_translations
-        path = csv_path("event_translations.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    event = Event.objects.using(db).get(event_id=UUID(row["event_id"]))
-                    EventTranslation.objects.using(db).update_or_create(
-                        event=event,
-                        lang=row["lang"],
-                        defaults={
-                            "title": row.get("title", ""),
-                            "description": row.get("description", ""),
-                        },
-                    )
-            self.stdout.write(f"Loaded event_translations from {path}")
-
-        # 5) images
-        path = csv_path("images.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    Image.objects.using(db).get_or_create(
-                        image_id=UUID(row["image_id"]),
-                        defaults={
-                            "target_type": row["target_type"],
-                            "target_id": UUID(row["target_id"]),
-                            "image_url": row["image_url"],
-                        },
-                    )
-            self.stdout.write(f"Loaded images from {path}")
-
-        # 6) comments
-        path = csv_path("comments.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    obj, _ = Comment.objects.using(db).get_or_create(
-                        comment_id=UUID(row["comment_id"]),
-                        defaults={
-                            "target_type": row["target_type"],
-                            "target_id": UUID(row["target_id"]),
-                            "rating": int(row["rating"]) if row.get("rating") else None,
-                        },
-                    )
-                    Comment.objects.using(db).filter(pk=obj.pk).update(
-                        created_at=parse_datetime(row["created_at"])
-                    )
-            self.stdout.write(f"Loaded comments from {path}")
-
-        # 7) hotel_details
-        path = csv_path("hotel_details.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    place = Place.objects.using(db).get(place_id=UUID(row["place_id"]))
-                    HotelDetails.objects.using(db).update_or_create(
-                        place=place,
-                        defaults={
-                            "stars": int(row["stars"]) if row.get("stars") else None,
-                            "price_range": row.get("price_range", ""),
-                        },
-                    )
-            self.stdout.write(f"Loaded hotel_details from {path}")
-
-        # 8) restaurant_details
-        path = csv_path("restaurant_details.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    place = Place.objects.using(db).get(place_id=UUID(row["place_id"]))
-                    RestaurantDetails.objects.using(db).update_or_create(
-                        place=place,
-                        defaults={
-                            "cuisine": row.get("cuisine", ""),
-                            "avg_price": int(row["avg_price"]) if row.get("avg_price") else None,
-                        },
-                    )
-            self.stdout.write(f"Loaded restaurant_details from {path}")
-
-        # 9) museum_details
-        path = csv_path("museum_details.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    place = Place.objects.using(db).get(place_id=UUID(row["place_id"]))
-                    from datetime import time
-                    open_at = row.get("open_at")
-                    close_at = row.get("close_at")
-                    if open_at and ":" in open_at:
-                        h, m = open_at.strip().split(":")[:2]
-                        open_at = time(int(h), int(m))
-                    else:
-                        open_at = None
-                    if close_at and ":" in close_at:
-                        h, m = close_at.strip().split(":")[:2]
-                        close_at = time(int(h), int(m))
-                    else:
-                        close_at = None
-                    MuseumDetails.objects.using(db).update_or_create(
-                        place=place,
-                        defaults={
-                            "open_at": open_at,
-                            "close_at": close_at,
-                            "ticket_price": int(row["ticket_price"]) if row.get("ticket_price") else None,
-                        },
-                    )
-            self.stdout.write(f"Loaded museum_details from {path}")
-
-        # 10) place_amenities
-        path = csv_path("place_amenities.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    place = Place.objects.using(db).get(place_id=UUID(row["place_id"]))
-                    PlaceAmenity.objects.using(db).get_or_create(
-                        place=place,
-                        amenity_name=row["amenity_name"],
-                    )
-            self.stdout.write(f"Loaded place_amenities from {path}")
-
-        # 11) route_logs
-        path = csv_path("route_logs.csv")
-        if os.path.isfile(path):
-            with open(path, "r", encoding="utf-8") as f:
-                r = csv.DictReader(f)
-                for row in r:
-                    src = Place.objects.using(db).get(place_id=UUID(row["source_place_id"]))
-                    dst = Place.objects.using(db).get(place_id=UUID(row["destination_place_id"]))
-                    obj = RouteLog.objects.using(db).create(
-                        source_place=src,
-                        destination_place=dst,
-                        travel_mode=row["travel_mode"],
-                        user_id=UUID(row["user_id"]) if row.get("user_id") else None,
-                    )
-                    RouteLog.objects.using(db).filter(pk=obj.pk).update(
-                        created_at=parse_datetime(row["created_at"])
-                    )
-            self.stdout.write(f"Loaded route_logs from {path}")
-
-        self.stdout.write(self.style.SUCCESS("Sample data load finished."))
+        linked = link_places_to_cities(using=db)
+        if linked:
+            self.stdout.write(f"Linked {linked} places to cities by name")
+        bump_data_version(PLACES, using=db)
+        if total_errors:
+            self.stdout.write(self.style.WARNING(f"Sample data load finished with {total_errors} skipped rows."))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sample data load finished."))
@@ -0,0 +1,90 @@
+# آزمون بار مسیریابی در برابر یک نشان کُند: مقایسهٔ viewهای هم‌گام (N worker) با کلاینت async
+# یک سرور جعلی محلی با تأخیر ثابت جای API نشان را می‌گیرد؛ حالت sync هر درخواست را در یکی از
+# --workers رشته (مانند workerهای gunicorn هم‌گام) اجرا می‌کند و حالت async همهٔ درخواست‌ها را هم‌زمان
+# با AsyncNeshanClient در یک حلقهٔ رویداد (مانند یک worker ASGI).
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from team13.neshan import aio, routing
+from team13.neshan.async_client import reset_async_clients
+from team13.neshan.client import NeshanClient, set_client
+
+
+class _SlowNeshanHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = json.dumps({"routes": [{"legs": [{"distance": {"value": 2500}, "duration": {"value": 300}}]}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def _origin(i):
+    return 51.33, 35.70 + (i % 1000) * 0.0001
+
+
+class Command(BaseCommand):
+    help = "Compare sync (thread-per-request) and async Neshan routing throughput against a slow local fake upstream."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Number of route requests (default: 200).")
+        parser.add_argument("--delay", type=float, default=0.5, help="Upstream latency in seconds (default: 0.5).")
+        parser.add_argument("--workers", type=int, default=8, help="Sync workers/threads (default: 8).")
+
+    def handle(self, *args, **options):
+        count, workers = options["requests"], options["workers"]
+        server = _Server(("127.0.0.1", 0), _SlowNeshanHandler)
+        server.delay = options["delay"]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            with override_settings(NESHAN_API_BASE=base_url, NESHAN_API_KEY_SERVICE="load-test"):
+                previous = set_client(NeshanClient(pool_maxsize=workers))
+                reset_async_clients()
+                try:
+                    sync_elapsed, sync_ok = self._run_sync(count, workers)
+                    async_elapsed, async_ok = asyncio.run(self._run_async(count))
+                finally:
+                    set_client(previous).close()
+                    reset_async_clients()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.stdout.write(f"{count} requests, upstream delay {options['delay']:.2f}s")
+        for label, elapsed, ok in ((f"sync ({workers} workers)", sync_elapsed, sync_ok), ("async", async_elapsed, async_ok)):
+            self.stdout.write(f"  {label:<20} {elapsed:7.2f}s  {count / elapsed:8.1f} req/s  ok={ok}")
+        self.stdout.write(self.style.SUCCESS(f"Speed-up: {sync_elapsed / async_elapsed:.1f}x"))
+
+    def _run_sync(self, count, workers):
+        def one(i):
+            return routing.fetch_route_eta(*_origin(i), 51.40, 35.75)[0] is not None
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            ok = sum(pool.map(one, range(count)))
+        return time.monotonic() - started, ok
+
+    async def _run_async(self, count):
+        started = time.monotonic()
+        results = await asyncio.gather(*[aio.fetch_route_eta(*_origin(i), 51.40, 35.75) for i in range(count)])
+        return time.monotonic() - started, sum(r[0] is not None for r in results)
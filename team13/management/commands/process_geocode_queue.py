@@ -0,0 +1,40 @@
+# worker صف غنی‌سازی آدرس (team13.geocode_queue): آدرس عرض/طول پیشنهادها را با آدرس نشان جایگزین می‌کند
+# پیش‌فرض: اجرای دائمی و بررسی صف هر --interval ثانیه؛ --once فقط کارهای سررسیدهٔ فعلی را پردازش و خارج می‌شود.
+import time
+
+from django.core.management.base import BaseCommand
+
+from team13.geocode_queue import DEFAULT_BATCH_SIZE, drain, queue_stats
+from team13.neshan import is_configured
+
+
+class Command(BaseCommand):
+    help = "Enrich contribution addresses from the team13 geocode queue with Neshan reverse geocoding."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="team13", help="Database alias (default: team13).")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Jobs claimed per batch (default: 50).")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls when the queue is empty (default: 5).")
+        parser.add_argument("--once", action="store_true", help="Process the jobs that are due now, then exit.")
+
+    def handle(self, *args, **options):
+        db = options["database"]
+        batch_size = max(1, options["batch_size"])
+        if not is_configured():
+            self.stderr.write("NESHAN_API_KEY is not configured; queued contributions keep their coordinate addresses.")
+            if options["once"]:
+                return
+        try:
+            while True:
+                stats = drain(batch_size=batch_size, using=db)
+                if stats["claimed"]:
+                    self.stdout.write(
+                        f"Geocode queue: {stats['enriched']} enriched, {stats['retried']} retried, {stats['failed']} failed"
+                    )
+                if options["once"]:
+                    break
+                time.sleep(max(0.1, options["interval"]))
+        except KeyboardInterrupt:
+            pass
+        counts = queue_stats(using=db)
+        self.stdout.write(self.style.SUCCESS(f"Geocode queue: {counts['pending']} pending, {counts['failed']} failed."))
@@ -0,0 +1,15 @@
+# بازسازی جدول‌های تمام‌متن FTS5 ترجمه‌های مکان و رویداد (و triggerهای هم‌گام‌سازی آن‌ها)
+from django.core.management.base import BaseCommand
+
+from team13.fts import rebuild_fts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite FTS5 full-text tables of team13 place and event translations."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="team13", help="Database alias (default: team13).")
+
+    def handle(self, *args, **options):
+        places, events = rebuild_fts(using=options["database"])
+        self.stdout.write(self.style.SUCCESS(f"Full-text index rebuilt: {places} place translations, {events} event translations."))
@@ -0,0 +1,15 @@
+# بازسازی خلاصهٔ امتیاز مکان‌ها و رویدادها (rating_count / rating_sum / avg_rating) از جدول نظرات
+from django.core.management.base import BaseCommand
+
+from team13.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized rating aggregates of team13 places and events from approved comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="team13", help="Database alias (default: team13).")
+
+    def handle(self, *args, **options):
+        places, events = rebuild_ratings(using=options["database"])
+        self.stdout.write(self.style.SUCCESS(f"Rating aggregates rebuilt: {places} places, {events} events."))
@@ -0,0 +1,168 @@
+# لایهٔ GeoJSON مکان‌ها برای نقشه (نسخه‌دار و کش‌شده)
+# FeatureCollection همهٔ مکان‌های تأییدشده یک بار برای هر نسخهٔ داده (team13.data_version) ساخته
+# و فشرده (gzip) در کش Django نگه داشته می‌شود. ETag از نسخه و پارامترهای درخواست ساخته می‌شود تا
+# مرورگر با If-None-Match فقط 304 بگیرد. برش با bbox و کم‌تراکم‌سازی بر اساس zoom روی نسخهٔ
+# درون‌پردازه‌ای ویژگی‌ها انجام می‌شود.
+
+import gzip
+import hashlib
+import json
+import math
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .data_version import PLACES
+from .translations import translation_pair
+
+TEAM13_DB = "team13"
+
+# از این zoom به بعد همهٔ مکان‌های داخل bbox برگردانده می‌شوند
+FULL_DETAIL_ZOOM = 14
+# در zoomهای پایین‌تر، در هر سلول (تقریباً ۳۲ پیکسل) فقط پرامتیازترین مکان می‌ماند
+CELLS_PER_TILE = 8
+MAX_ZOOM = 22
+DEFAULT_CACHE_TIMEOUT = 60 * 60
+
+
+class MapLayer:
+    """ویژگی‌های GeoJSON یک نسخه از داده به‌همراه آرایهٔ مختصات برای برش سریع."""
+
+    def __init__(self, version, features):
+        self.version = version
+        self.features = features  # مرتب بر اساس امتیاز (نزولی)، مانند place_list
+        coords = [f["geometry"]["coordinates"] for f in features]
+        self.lngs = np.array([c[0] for c in coords], dtype=np.float64)
+        self.lats = np.array([c[1] for c in coords], dtype=np.float64)
+
+    def select(self, bbox=None, zoom=None):
+        """اندیس ویژگی‌های داخل bbox (min_lng, min_lat, max_lng, max_lat) پس از کم‌تراکم‌سازی zoom."""
+        idx = np.arange(len(self.features))
+        if bbox is not None:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            in_lat = (self.lats >= min_lat) & (self.lats <= max_lat)
+            if min_lng <= max_lng:
+                in_lng = (self.lngs >= min_lng) & (self.lngs <= max_lng)
+            else:  # bbox از نصف‌النهار ۱۸۰ عبور می‌کند
+                in_lng = (self.lngs >= min_lng) | (self.lngs <= max_lng)
+            idx = np.flatnonzero(in_lat & in_lng)
+        if zoom is not None and zoom < FULL_DETAIL_ZOOM and idx.size:
+            cell_deg = 360.0 / (2 ** zoom * CELLS_PER_TILE)
+            rows = np.floor(self.lats[idx] / cell_deg).astype(np.int64)
+            cols = np.floor(self.lngs[idx] / cell_deg).astype(np.int64)
+            # اولین (پرامتیازترین) مکان هر سلول
+            _, first = np.unique(np.stack([rows, cols], axis=1), axis=0, return_index=True)
+            idx = idx[np.sort(first)]
+        return idx
+
+
+def _feature(place):
+    trans_fa, trans_en = translation_pair(place)
+    return {
+        "type": "Feature",
+        "id": str(place.place_id),
+        "geometry": {"type": "Point", "coordinates": [place.longitude, place.latitude]},
+        "properties": {
+            "place_id": str(place.place_id),
+            "type": place.type,
+            "type_display": place.get_type_display(),
+            "city": place.city,
+            "address": place.address,
+            "name_fa": trans_fa.name if trans_fa else "",
+            "name_en": trans_en.name if trans_en else "",
+            "rating": round(place.avg_rating, 1) if place.rating_count else None,
+        },
+    }
+
+
+def build_map_layer(version, using=TEAM13_DB):
+    """ساخت ویژگی‌های همهٔ مکان‌ها با دو کوئری (مکان‌ها + ترجمه‌ها)."""
+    from .models import Place
+
+    qs = (
+        Place.objects.using(using)
+        .only("place_id", "type", "city", "address", "latitude", "longitude", "avg_rating", "rating_count")
+        .prefetch_related("translations")
+        .order_by("-avg_rating")
+    )
+    return MapLayer(version, [_feature(p) for p in qs])
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_map_layer(version, using=TEAM13_DB):
+    """لایهٔ درون‌پردازه‌ای برای نسخهٔ داده شده؛ با تغییر نسخه دوباره ساخته می‌شود."""
+    global _layer
+    layer = _layer
+    if layer is not None and layer.version == version:
+        return layer
+    with _layer_lock:
+        if _layer is None or _layer.version != version:
+            _layer = build_map_layer(version, using=using)
+        return _layer
+
+
+def reset_map_layer():
+    """دور انداختن لایهٔ درون‌پردازه‌ای (مثلاً در تست‌ها)."""
+    global _layer
+    with _layer_lock:
+        _layer = None
+
+
+def parse_bbox(value):
+    """bbox به‌صورت "min_lng,min_lat,max_lng,max_lat" (ترتیب GeoJSON)؛ None اگر ارسال نشده. ValueError اگر نامعتبر."""
+    if not value:
+        return None
+    parts = [float(x) for x in value.split(",")]
+    if len(parts) != 4 or not all(math.isfinite(x) for x in parts):
+        raise ValueError("bbox")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+        raise ValueError("bbox")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def parse_zoom(value):
+    """سطح zoom (۰ تا ۲۲)؛ None اگر ارسال نشده. ValueError اگر نامعتبر."""
+    if value in (None, ""):
+        return None
+    zoom = int(value)
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError("zoom")
+    return zoom
+
+
+def layer_etag(version, bbox=None, zoom=None):
+    """ETag وابسته به نسخهٔ داده و پارامترهای برش."""
+    key = f"{PLACES}:{version}:{bbox}:{zoom}"
+    return '"%s"' % hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def _cache_timeout():
+    return getattr(settings, "TEAM13_MAP_LAYER_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT)
+
+
+def geojson_payload(version, bbox=None, zoom=None, using=TEAM13_DB):
+    """
+    بدنهٔ gzip‌شدهٔ FeatureCollection برای نسخه و برش داده شده.
+    از کش Django خوانده می‌شود؛ در صورت نبودن ساخته و ذخیره می‌شود.
+    """
+    cache_key = "team13:map_layer:" + layer_etag(version, bbox, zoom).strip('"')
+    body = cache.get(cache_key)
+    if body is not None:
+        return body
+    layer = get_map_layer(version, using=using)
+    if bbox is None and zoom is None:
+        features = layer.features
+    else:
+        features = [layer.features[i] for i in layer.select(bbox, zoom)]
+    collection = {"type": "FeatureCollection", "version": version, "features": features}
+    raw = json.dumps(collection, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    body = gzip.compress(raw, compresslevel=6, mtime=0)
+    cache.set(cache_key, body, _cache_timeout())
+    return body
+
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-17 18:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team13', '0007_comment_is_approved_image_is_approved'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['latitude', 'longitude'], name='team13_events_lat_lng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='place',
+            index=models.Index(fields=['latitude', 'longitude'], name='team13_places_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.27 on 2026-10-17 19:00
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    """پر کردن خلاصهٔ امتیاز مکان‌ها و رویدادهای موجود از نظرات تأییدشده."""
+    db = schema_editor.connection.alias
+    Comment = apps.get_model("team13", "Comment")
+    targets = {"place": (apps.get_model("team13", "Place"), "place_id"), "event": (apps.get_model("team13", "Event"), "event_id")}
+    rows = (
+        Comment.objects.using(db)
+        .filter(is_approved=True, rating__isnull=False)
+        .values("target_type", "target_id")
+        .annotate(n=Count("rating"), total=Sum("rating"), avg=Avg("rating"))
+    )
+    for row in rows.iterator():
+        model, pk_field = targets.get(row["target_type"], (None, None))
+        if model is None:
+            continue
+        model.objects.using(db).filter(**{pk_field: row["target_id"]}).update(
+            rating_count=row["n"], rating_sum=row["total"], avg_rating=float(row["avg"])
+        )
+
+
+def noop(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team13', '0008_place_event_lat_lng_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='avg_rating',
+            field=models.FloatField(db_index=True, default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='avg_rating',
+            field=models.FloatField(db_index=True, default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['target_type', 'target_id'], name='team13_comments_target_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-17 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team13', '0010_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NeshanCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('namespace', models.CharField(db_index=True, max_length=64)),
+                ('value', models.JSONField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('last_access', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'team13_neshan_cache',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# جدول‌های FTS5 و triggerهای هم‌گام‌سازی برای ترجمه‌های مکان و رویداد (فقط روی SQLite)
+
+from django.db import migrations
+
+
+def create_fts(apps, schema_editor):
+    from team13.fts import rebuild_fts
+
+    rebuild_fts(using=schema_editor.connection.alias)
+
+
+def drop_fts(apps, schema_editor):
+    from team13.fts import drop_fts
+
+    drop_fts(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team13', '0011_neshan_cache'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
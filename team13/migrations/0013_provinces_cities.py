@@ -0,0 +1,54 @@
+# Generated by Django 4.2.27 on 2026-10-17 19:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def recreate_fts_triggers(apps, schema_editor):
+    # افزودن ستون، جدول team13_places را در SQLite بازسازی می‌کند و trigger شهر FTS با جدول قدیمی حذف می‌شود
+    from team13.fts import create_fts
+
+    create_fts(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team13', '0012_translation_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Province',
+            fields=[
+                ('province_id', models.PositiveIntegerField(db_column='province_id', primary_key=True, serialize=False)),
+                ('name_fa', models.CharField(max_length=128)),
+                ('name_en', models.CharField(blank=True, max_length=128)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'team13_provinces',
+            },
+        ),
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('city_id', models.PositiveIntegerField(db_column='city_id', primary_key=True, serialize=False)),
+                ('name_fa', models.CharField(db_index=True, max_length=128)),
+                ('name_en', models.CharField(blank=True, max_length=128)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('province', models.ForeignKey(blank=True, db_column='province_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cities', to='team13.province')),
+            ],
+            options={
+                'db_table': 'team13_cities',
+            },
+        ),
+        migrations.AddField(
+            model_name='place',
+            name='city_ref',
+            field=models.ForeignKey(blank=True, db_column='city_id', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='places', to='team13.city'),
+        ),
+        migrations.RunPython(recreate_fts_triggers, migrations.RunPython.noop),
+    ]
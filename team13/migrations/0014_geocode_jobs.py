@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-17 19:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team13', '0013_provinces_cities'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('place_contribution', 'پیشنهاد مکان'), ('route_source', 'مبدأ پیشنهاد مسیر'), ('route_destination', 'مقصد پیشنهاد مسیر'), ('place', 'مکان')], max_length=32)),
+                ('target_id', models.UUIDField()),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('status', models.CharField(choices=[('pending', 'در انتظار'), ('failed', 'ناموفق')], default='pending', max_length=16)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=32)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'team13_geocode_jobs',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='team13_geocode_jobs_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='geocodejob',
+            constraint=models.UniqueConstraint(fields=('target_type', 'target_id'), name='team13_geocode_jobs_target_uniq'),
+        ),
+    ]
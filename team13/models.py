@@ -4,12 +4,50 @@
 import uuid
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 # برای سازگاری با SQLite پیش‌فرض، از دو فیلد عرض/طول استفاده شده است.
 # در صورت استفاده از PostgreSQL/PostGIS می‌توان از PointField استفاده کرد.
 
 
+class Province(models.Model):
+    """استان؛ شناسه همان province_id مجموعه‌دادهٔ province.json است."""
+
+    province_id = models.PositiveIntegerField(primary_key=True, db_column="province_id")
+    name_fa = models.CharField(max_length=128)
+    name_en = models.CharField(max_length=128, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        app_label = "team13"
+        db_table = "team13_provinces"
+
+    def __str__(self):
+        return self.name_fa
+
+
+class City(models.Model):
+    """شهر؛ شناسه همان city_id مجموعه‌دادهٔ cities.json و hotels.json است."""
+
+    city_id = models.PositiveIntegerField(primary_key=True, db_column="city_id")
+    province = models.ForeignKey(
+        Province, on_delete=models.SET_NULL, null=True, blank=True, related_name="cities", db_column="province_id"
+    )
+    name_fa = models.CharField(max_length=128, db_index=True)
+    name_en = models.CharField(max_length=128, blank=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        app_label = "team13"
+        db_table = "team13_cities"
+
+    def __str__(self):
+        return self.name_fa
+
+
 class Place(models.Model):
     """مکان (POI): رستوران، بیمارستان، موزه، هتل، تفریحی."""
 
@@ -28,13 +66,25 @@ class Place(models.Model):
     )
     type = models.CharField(max_length=32, choices=PlaceType.choices)
     city = models.CharField(max_length=255, blank=True)
+    # شهر نرمال‌شده (team13.cities)؛ city متنی برای نمایش و مکان‌های بدون شهر شناخته‌شده می‌ماند
+    city_ref = models.ForeignKey(
+        City, on_delete=models.SET_NULL, null=True, blank=True, related_name="places", db_column="city_id"
+    )
     address = models.TextField(blank=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # خلاصهٔ امتیازها (فقط نظرات تأییدشده با rating) — توسط team13.ratings به‌روز می‌شود
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0.0, db_index=True, editable=False)
 
     class Meta:
         app_label = "team13"
         db_table = "team13_places"
+        indexes = [
+            # پیش‌فیلتر کادر محیطی (bounding box) در جستجوهای شعاعی
+            models.Index(fields=["latitude", "longitude"], name="team13_places_lat_lng_idx"),
+        ]
 
     def __str__(self):
         return f"{self.get_type_display()} — {self.city or 'بدون شهر'}"
@@ -71,10 +121,17 @@ class Event(models.Model):
     address = models.TextField(blank=True)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    # خلاصهٔ امتیازها — مانند Place
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.FloatField(default=0.0, db_index=True, editable=False)
 
     class Meta:
         app_label = "team13"
         db_table = "team13_events"
+        indexes = [
+            models.Index(fields=["latitude", "longitude"], name="team13_events_lat_lng_idx"),
+        ]
 
     def __str__(self):
         return f"Event {self.event_id} — {self.city or 'بدون شهر'}"
@@ -145,6 +202,9 @@ class Comment(models.Model):
     class Meta:
         app_label = "team13"
         db_table = "team13_comments"
+        indexes = [
+            models.Index(fields=["target_type", "target_id"], name="team13_comments_target_idx"),
+        ]
 
     def __str__(self):
         return f"{self.target_type}:{self.target_id} — {self.rating}"
@@ -325,3 +385,75 @@ class TeamAdmin(models.Model):
 
     def __str__(self):
         return str(self.user_id)
+
+
+class DataVersion(models.Model):
+    """شمارندهٔ نسخهٔ داده (مثلاً لایهٔ نقشهٔ مکان‌ها)؛ با هر تغییر محتوای نمایشی یک واحد افزایش می‌یابد."""
+
+    name = models.CharField(max_length=64, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = "team13"
+        db_table = "team13_data_versions"
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class NeshanCacheEntry(models.Model):
+    """پاسخ کش‌شدهٔ API نشان (backend دیتابیسی team13.neshan.cache)."""
+
+    key = models.CharField(max_length=255, primary_key=True)
+    namespace = models.CharField(max_length=64, db_index=True)
+    value = models.JSONField()
+    expires_at = models.DateTimeField(db_index=True)
+    last_access = models.DateTimeField(db_index=True)
+
+    class Meta:
+        app_label = "team13"
+        db_table = "team13_neshan_cache"
+
+    def __str__(self):
+        return self.key
+
+
+class GeocodeJob(models.Model):
+    """کار صف غنی‌سازی آدرس: یک فیلد آدرس که باید از مختصات با reverse geocode نشان پر شود (team13.geocode_queue)."""
+
+    class TargetType(models.TextChoices):
+        PLACE_CONTRIBUTION = "place_contribution", "پیشنهاد مکان"
+        ROUTE_SOURCE = "route_source", "مبدأ پیشنهاد مسیر"
+        ROUTE_DESTINATION = "route_destination", "مقصد پیشنهاد مسیر"
+        PLACE = "place", "مکان"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "در انتظار"
+        FAILED = "failed", "ناموفق"
+
+    target_type = models.CharField(max_length=32, choices=TargetType.choices)
+    target_id = models.UUIDField()
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # برداشت کار توسط یک worker تا locked_until (کاری که worker آن از کار افتاده دوباره برداشته می‌شود)
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "team13"
+        db_table = "team13_geocode_jobs"
+        constraints = [
+            models.UniqueConstraint(fields=["target_type", "target_id"], name="team13_geocode_jobs_target_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="team13_geocode_jobs_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type}:{self.target_id} ({self.status})"
@@ -2,15 +2,23 @@
 
 from django.db import transaction
 
-from .models import Image, Place, PlaceContribution, PlaceTranslation, RouteContribution, RouteLog
+from .cities import city_id_for_name
+from .clustering import cluster_place
+from .data_version import PLACES, bump_data_version
+from .geocode_queue import retarget
+from .models import GeocodeJob, Image, Place, PlaceContribution, PlaceTranslation, RouteContribution, RouteLog
+from .search_index import index_place as index_search_place
+from .spatial_index import index_place
 
 TEAM13_DB = "team13"
 
 
-def _address_from_contribution_coords(contribution):
-    """آدرس نهایی مکان بر اساس طول و عرض پیشنهاد (برای ذخیره در Place پس از تأیید)."""
-    from .geo_utils import address_from_coords
-    return address_from_coords(contribution.latitude, contribution.longitude)
+def _index_new_places(*places):
+    """افزودن مکان‌های تازه به نمایهٔ مکانی، نمایهٔ خوشه‌های نقشه و نمایهٔ جستجو (پس از commit)."""
+    for place in places:
+        index_place(place)
+        cluster_place(place)
+        index_search_place(place)
 
 
 def approve_route_contribution(route_contribution_id):
@@ -54,7 +62,13 @@ def approve_route_contribution(route_contribution_id):
             destination_place=dest_place,
             travel_mode=rc.travel_mode,
         )
+        # آدرس‌هایی که هنوز در صف غنی‌سازی‌اند روی مکان‌های تازه نوشته شوند
+        Target = GeocodeJob.TargetType
+        retarget(Target.ROUTE_SOURCE, rc.contribution_id, Target.PLACE, source_place.place_id)
+        retarget(Target.ROUTE_DESTINATION, rc.contribution_id, Target.PLACE, dest_place.place_id)
         rc.delete()
+        bump_data_version(PLACES, using=TEAM13_DB)
+        transaction.on_commit(lambda: _index_new_places(source_place, dest_place), using=TEAM13_DB)
     return route_log
 
 
@@ -64,7 +78,9 @@ def approve_contribution(contribution_id):
     به‌صورت رسمی ذخیره می‌کند تا در لیست مکان‌ها و نقشه برای همه نمایش داده شود.
     - ایجاد رکورد Place و PlaceTranslation در همان دیتابیس
     - انتقال تصاویر پیشنهاد به Image با target_type=place و is_approved=True
+    - آدرس همان آدرس پیشنهاد است؛ اگر هنوز در صف غنی‌سازی (geocode_queue) باشد، کار به مکان جدید منتقل می‌شود
     - حذف پیشنهاد (PlaceContribution)
+    - افزودن مکان به نمایهٔ مکانی و نمایهٔ خوشه‌ها (پس از commit) و افزایش نسخهٔ دادهٔ نقشه
 
     Args:
         contribution_id: UUID (یا str) شناسه PlaceContribution.
@@ -76,12 +92,12 @@ def approve_contribution(contribution_id):
         PlaceContribution.DoesNotExist: اگر پیشنهاد یافت نشود.
     """
     contribution = PlaceContribution.objects.using(TEAM13_DB).get(contribution_id=contribution_id)
-    address = _address_from_contribution_coords(contribution) or contribution.address or ""
     with transaction.atomic(using=TEAM13_DB):
         place = Place.objects.using(TEAM13_DB).create(
             type=contribution.type,
             city=contribution.city or "",
-            address=address,
+            city_ref_id=city_id_for_name(contribution.city or ""),
+            address=contribution.address or "",
             latitude=contribution.latitude,
             longitude=contribution.longitude,
         )
@@ -106,5 +122,11 @@ def approve_contribution(contribution_id):
             target_id=place.place_id,
             is_approved=True,
         )
+        retarget(
+            GeocodeJob.TargetType.PLACE_CONTRIBUTION, contribution.contribution_id,
+            GeocodeJob.TargetType.PLACE, place.place_id,
+        )
         contribution.delete()
+        bump_data_version(PLACES, using=TEAM13_DB)
+        transaction.on_commit(lambda: _index_new_places(place), using=TEAM13_DB)
     return place
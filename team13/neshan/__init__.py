@@ -1,6 +1,9 @@
 # ماژول اتصال به APIهای نشان (neshan.ir / platform.neshan.org)
 # کلید و endpointها را در config تنظیم کنید؛ سپس از توابع این پکیج در views و geo_utils استفاده می‌شود.
 
+from .cache import cache_stats
+from .async_client import AsyncNeshanClient, get_async_client
+from .client import NeshanClient, get_client, set_client
 from .config import get_api_key, is_configured
 from .routing import fetch_route_eta, fetch_route_eta_no_traffic, fetch_route_eta_pedestrian
 from .geocoding import geocode, reverse_geocode, reverse_geocode_address
@@ -11,6 +14,12 @@ from .isochrone import fetch_isochrone
 from .map_matching import fetch_map_matching
 
 __all__ = [
+    "cache_stats",
+    "AsyncNeshanClient",
+    "get_async_client",
+    "NeshanClient",
+    "get_client",
+    "set_client",
     "get_api_key",
     "is_configured",
     "fetch_route_eta",
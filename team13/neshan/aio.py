@@ -0,0 +1,100 @@
+# نسخهٔ async توابع پکیج نشان برای viewهای async
+# هر تابع همان درخواست نسخهٔ هم‌گام (NeshanCall ساخته‌شده در همان ماژول) را با کلاینت ناهم‌گام
+# (async_client) اجرا می‌کند؛ ورودی و خروجی دقیقاً مانند تابع هم‌نام در routing، tsp، ... است.
+
+from . import distance_matrix, geocoding, isochrone, map_matching, routing, search, tsp
+from .config import is_configured
+
+
+async def _arun(call, failure=None):
+    return await call.arun() if call is not None else failure
+
+
+async def fetch_route_eta(lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=routing.VEHICLE_CAR,
+                          waypoints=None, avoid_traffic_zone=False, avoid_odd_even_zone=False, alternative=False,
+                          bearing=None):
+    """async routing.fetch_route_eta؛ خروجی (distance_km, duration_seconds, route_geometry)."""
+    return await _arun(routing.route_eta_call(
+        lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=vehicle_type, waypoints=waypoints,
+        avoid_traffic_zone=avoid_traffic_zone, avoid_odd_even_zone=avoid_odd_even_zone,
+        alternative=alternative, bearing=bearing,
+    ), routing.NO_ROUTE)
+
+
+async def fetch_route_eta_no_traffic(lng_origin, lat_origin, lng_dest, lat_dest, waypoints=None,
+                                     avoid_traffic_zone=False, avoid_odd_even_zone=False, alternative=False,
+                                     bearing=None):
+    """async routing.fetch_route_eta_no_traffic."""
+    return await _arun(routing.route_eta_no_traffic_call(
+        lng_origin, lat_origin, lng_dest, lat_dest, waypoints=waypoints,
+        avoid_traffic_zone=avoid_traffic_zone, avoid_odd_even_zone=avoid_odd_even_zone,
+        alternative=alternative, bearing=bearing,
+    ), routing.NO_ROUTE)
+
+
+async def fetch_route_eta_pedestrian(lng_origin, lat_origin, lng_dest, lat_dest, waypoints=None, alternative=False,
+                                     bearing=None):
+    """async routing.fetch_route_eta_pedestrian."""
+    return await _arun(routing.route_eta_pedestrian_call(
+        lng_origin, lat_origin, lng_dest, lat_dest, waypoints=waypoints, alternative=alternative, bearing=bearing,
+    ), routing.NO_ROUTE)
+
+
+async def fetch_tsp(waypoints, round_trip=True, source_is_any_point=True, last_is_any_point=True):
+    """async tsp.fetch_tsp."""
+    return await _arun(tsp.tsp_call(
+        waypoints, round_trip=round_trip, source_is_any_point=source_is_any_point, last_is_any_point=last_is_any_point,
+    ))
+
+
+async def fetch_distance_matrix(origins, destinations, vehicle_type=distance_matrix.TYPE_CAR, no_traffic=False):
+    """async distance_matrix.fetch_distance_matrix."""
+    return await _arun(distance_matrix.distance_matrix_call(
+        origins, destinations, vehicle_type=vehicle_type, no_traffic=no_traffic,
+    ))
+
+
+async def fetch_isochrone(lat, lng, distance_km=None, time_minutes=None, polygon=False, denoise=0):
+    """async isochrone.fetch_isochrone."""
+    return await _arun(isochrone.isochrone_call(
+        lat, lng, distance_km=distance_km, time_minutes=time_minutes, polygon=polygon, denoise=denoise,
+    ))
+
+
+async def fetch_map_matching(path):
+    """async map_matching.fetch_map_matching."""
+    return await _arun(map_matching.map_matching_call(path))
+
+
+async def geocode(address, province=None, city=None, location=None, extent=None, plus=False):
+    """async geocoding.geocode."""
+    return await _arun(geocoding.geocode_call(
+        address, province=province, city=city, location=location, extent=extent, plus=plus,
+    ))
+
+
+async def reverse_geocode(lat, lng):
+    """async geocoding.reverse_geocode با همان کش (بدون ادغام درخواست‌های هم‌زمان)."""
+    if not is_configured():
+        return None
+    try:
+        lat_f = float(lat)
+        lng_f = float(lng)
+    except (TypeError, ValueError):
+        return None
+    cache = geocoding.reverse_cache()
+    key = geocoding.reverse_cache_key(lat_f, lng_f)
+    data = await cache.aget(key)
+    if data is None:
+        data = await geocoding.reverse_geocode_call(lat_f, lng_f).arun()
+        await cache.aset(key, data)
+    return data
+
+
+async def search_response(query, lat=None, lng=None, limit=30):
+    """async search.search_response؛ خروجی { count, items }."""
+    query = search.search_query(query, lat=lat, lng=lng, limit=limit)
+    if query is None:
+        return {"count": 0, "items": []}
+    term, lat_f, lng_f, limit = query
+    return search.shape_search_response(await _arun(search.search_call(term, lat_f, lng_f)), limit)
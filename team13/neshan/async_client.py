@@ -0,0 +1,174 @@
+# کلاینت ناهم‌گام (httpx.AsyncClient) برای APIهای نشان — نسخهٔ async کلاینت client.py
+# viewهای async تیم ۱۳ در انتظار پاسخ نشان worker یا thread را اشغال نمی‌کنند. timeout هر endpoint،
+# تلاش مجدد برای 429/5xx و خطای اتصال، و circuit breaker (مشترک با کلاینت هم‌گام) مانند client.py است.
+# اتصال‌های httpx به حلقهٔ رویدادی که در آن ساخته شده‌اند وابسته‌اند؛ برای همین برای هر حلقه یک کلاینت
+# نگه داشته می‌شود (زیر ASGI یک حلقه و یک استخر اتصال در هر پردازه). زیر WSGI، async_to_sync برای هر درخواست
+# حلقهٔ تازه‌ای می‌سازد؛ آنجا view داخل client_scope اجرا می‌شود تا کلاینت همان درخواست در پایانش بسته شود.
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import weakref
+
+from django.conf import settings
+
+from .client import CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT, DEFAULT_TIMEOUTS, RETRY_STATUSES, get_client
+from .config import get_api_base, get_api_key
+
+logger = logging.getLogger(__name__)
+
+# سقف انتظار برای Retry-After (ثانیه)
+MAX_RETRY_AFTER_SECONDS = 5
+
+
+class AsyncNeshanClient:
+    """
+    کلاینت نشان روی یک httpx.AsyncClient. request مانند NeshanClient.request در خطای شبکه یا باز بودن
+    مدار None برمی‌گرداند و در غیر این صورت httpx.Response (با status_code، text و json()).
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeouts=None, retries=2, backoff_factor=0.3,
+                 max_connections=100, breaker=None, transport=None):
+        import httpx
+
+        self._base_url = base_url
+        self._api_key = api_key
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._breaker = breaker
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 4 or 1),
+            transport=transport,
+        )
+
+    @property
+    def breaker(self):
+        # بدون breaker اختصاصی، وضعیت مدار با کلاینت هم‌گام مشترک است
+        return self._breaker or get_client().breaker
+
+    @property
+    def base_url(self):
+        return (self._base_url or get_api_base()).rstrip("/")
+
+    def timeout_for(self, endpoint):
+        import httpx
+
+        return httpx.Timeout(self.timeouts.get(endpoint, DEFAULT_READ_TIMEOUT), connect=CONNECT_TIMEOUT)
+
+    def _backoff(self, attempt, resp=None):
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(int(retry_after), MAX_RETRY_AFTER_SECONDS)
+        return self.backoff_factor * (2 ** attempt) if attempt else 0
+
+    async def _wait(self, seconds):
+        try:
+            await asyncio.sleep(seconds)
+        except BaseException:
+            self.breaker.record_failure()
+            raise
+
+    async def request(self, method, path, endpoint, params=None, json=None, headers=None, api_key=None):
+        """ارسال درخواست به base_url + path با تلاش مجدد؛ endpoint برای timeout و لاگ است."""
+        import httpx
+
+        if not self.breaker.allow():
+            logger.debug("Neshan %s skipped: circuit open", endpoint)
+            return None
+        all_headers = {"Api-Key": api_key or self._api_key or get_api_key()}
+        if headers:
+            all_headers.update(headers)
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                resp = await self.http.request(
+                    method, url, params=params, json=json, headers=all_headers, timeout=self.timeout_for(endpoint),
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if last:
+                    logger.debug("Neshan %s request failed: %s", endpoint, e)
+                    self.breaker.record_failure()
+                    return None
+                await self._wait(self._backoff(attempt + 1))
+                continue
+            except httpx.HTTPError as e:
+                # پاسخ دیر رسیده یا قطع‌شده تکرار نمی‌شود (مانند read=0 در کلاینت هم‌گام)
+                logger.debug("Neshan %s request failed: %s", endpoint, e)
+                self.breaker.record_failure()
+                return None
+            except BaseException:
+                # لغو (CancelledError) یا خطای دیگر: نتیجه ثبت می‌شود تا درخواست آزمایشی half-open رها نماند
+                self.breaker.record_failure()
+                raise
+            if resp.status_code in RETRY_STATUSES and not last:
+                await self._wait(self._backoff(attempt + 1, resp))
+                continue
+            break
+        if resp.status_code in RETRY_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return resp
+
+    async def get(self, path, endpoint, **kwargs):
+        return await self.request("GET", path, endpoint, **kwargs)
+
+    async def post(self, path, endpoint, **kwargs):
+        return await self.request("POST", path, endpoint, **kwargs)
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+# کلاینت client_scope جاری (اولویت بر کلاینت حلقه)
+_scoped_client = contextvars.ContextVar("team13_neshan_async_client", default=None)
+
+
+def _build_default_client():
+    return AsyncNeshanClient(
+        timeouts=getattr(settings, "TEAM13_NESHAN_TIMEOUTS", None),
+        retries=getattr(settings, "TEAM13_NESHAN_RETRIES", 2),
+        max_connections=getattr(settings, "TEAM13_NESHAN_ASYNC_MAX_CONNECTIONS", 100),
+    )
+
+
+def get_async_client():
+    """کلاینت ناهم‌گام حلقهٔ رویداد جاری (باید داخل یک coroutine فراخوانی شود)."""
+    client = _scoped_client.get()
+    if client is not None:
+        return client
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(loop)
+            if client is None:
+                client = _clients[loop] = _build_default_client()
+    return client
+
+
+@contextlib.asynccontextmanager
+async def client_scope():
+    """
+    کلاینت اختصاصی برای یک واحد کار کوتاه‌عمر (مثلاً یک درخواست WSGI)؛ get_async_client داخل بلوک همین
+    کلاینت را برمی‌گرداند و اتصال‌هایش در پایان بسته می‌شوند. circuit breaker همچنان مشترک است.
+    """
+    client = _build_default_client()
+    token = _scoped_client.set(client)
+    try:
+        yield client
+    finally:
+        _scoped_client.reset(token)
+        await client.aclose()
+
+
+def reset_async_clients():
+    """فراموش کردن کلاینت‌های ساخته‌شده؛ درخواست بعدی کلاینت تازه‌ای با تنظیمات فعلی می‌سازد."""
+    with _clients_lock:
+        _clients.clear()
@@ -0,0 +1,373 @@
+# کش پاسخ‌های API نشان با TTL، حذف LRU و ادغام درخواست‌های هم‌زمان (single-flight)
+# هر نوع پاسخ (مثلاً reverse geocode) یک namespace جدا دارد. backend قابل انتخاب است:
+#   memory — درون‌پردازه‌ای (پیش‌فرض)، django — کش Django (settings.CACHES)، db — جدول team13_neshan_cache.
+# تنظیمات: TEAM13_NESHAN_CACHE_BACKEND، TEAM13_NESHAN_CACHE_MAX_ENTRIES و برای هر namespace
+# TEAM13_NESHAN_CACHE_TTL = {"reverse": ثانیه، ...}.
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TEAM13_DB = "team13"
+DEFAULT_BACKEND = "memory"
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# منتظر ماندن درخواست‌های هم‌زمان برای نتیجهٔ درخواست اول (ثانیه)
+SINGLE_FLIGHT_WAIT_SECONDS = 15
+
+_MISSING = object()
+
+
+def coord_key(lat, lng, precision=4):
+    """کلید کش برای یک نقطه با گرد کردن به precision رقم اعشار (۴ رقم ≈ ۱۱ متر)."""
+    return f"{float(lat):.{precision}f},{float(lng):.{precision}f}"
+
+
+class MemoryBackend:
+    """کش درون‌پردازه‌ای: OrderedDict با انقضای TTL و حذف قدیمی‌ترین استفاده (LRU)."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        """{key: value} برای کلیدهای موجود و منقضی‌نشده (یک بار گرفتن قفل)."""
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                item = self._data.get(key)
+                if item is None:
+                    continue
+                if item[0] <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = item[1]
+        return found
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCacheBackend:
+    """کش Django (مشترک بین پردازه‌ها اگر CACHES روی Redis/Memcached تنظیم شده باشد)؛ TTL و حذف با خود کش."""
+
+    def __init__(self, alias="default", prefix="team13:neshan:"):
+        self.alias = alias
+        self.prefix = prefix
+
+    @property
+    def _cache(self):
+        from django.core.cache import caches
+
+        return caches[self.alias]
+
+    def get(self, key):
+        return self._cache.get(self.prefix + key, _MISSING)
+
+    def get_many(self, keys):
+        values = self._cache.get_many([self.prefix + key for key in keys])
+        return {key[len(self.prefix):]: value for key, value in values.items()}
+
+    def set(self, key, value, ttl):
+        self._cache.set(self.prefix + key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(self.prefix + key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class DatabaseBackend:
+    """
+    جدول team13_neshan_cache در دیتابیس SQLite تیم ۱۳ (ماندگار پس از راه‌اندازی مجدد).
+    زمان آخرین استفاده حداکثر هر TOUCH_INTERVAL به‌روز می‌شود؛ پاک‌سازی منقضی‌ها و حذف LRU
+    هر PRUNE_EVERY نوشتن یک بار انجام می‌شود.
+    """
+
+    TOUCH_INTERVAL = timedelta(minutes=1)
+    PRUNE_EVERY = 100
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, using=TEAM13_DB):
+        self.max_entries = max_entries
+        self.using = using
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def _manager(self):
+        from team13.models import NeshanCacheEntry
+
+        return NeshanCacheEntry.objects.using(self.using)
+
+    def get(self, key):
+        from django.utils import timezone
+
+        now = timezone.now()
+        entry = self._manager.filter(key=key).only("value", "expires_at", "last_access").first()
+        if entry is None:
+            return _MISSING
+        if entry.expires_at <= now:
+            self._manager.filter(key=key).delete()
+            return _MISSING
+        if now - entry.last_access >= self.TOUCH_INTERVAL:
+            self._manager.filter(key=key).update(last_access=now)
+        return entry.value
+
+    def get_many(self, keys, chunk_size=500):
+        """یک کوئری برای هر chunk_size کلید؛ زمان استفادهٔ ردیف‌های کهنه با یک UPDATE به‌روز می‌شود."""
+        from django.utils import timezone
+
+        now = timezone.now()
+        keys = list(keys)
+        found, stale = {}, []
+        for start in range(0, len(keys), chunk_size):
+            rows = self._manager.filter(key__in=keys[start:start + chunk_size], expires_at__gt=now)
+            for key, value, last_access in rows.values_list("key", "value", "last_access"):
+                found[key] = value
+                if now - last_access >= self.TOUCH_INTERVAL:
+                    stale.append(key)
+        for start in range(0, len(stale), chunk_size):
+            self._manager.filter(key__in=stale[start:start + chunk_size]).update(last_access=now)
+        return found
+
+    def set(self, key, value, ttl):
+        from django.utils import timezone
+
+        now = timezone.now()
+        self._manager.update_or_create(
+            key=key,
+            defaults={
+                "namespace": key.split(":", 1)[0],
+                "value": value,
+                "expires_at": now + timedelta(seconds=ttl),
+                "last_access": now,
+            },
+        )
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """حذف ردیف‌های منقضی و سپس قدیمی‌ترین‌ها تا سقف max_entries."""
+        from django.utils import timezone
+
+        self._manager.filter(expires_at__lte=timezone.now()).delete()
+        excess = self._manager.count() - self.max_entries
+        if excess > 0:
+            stale = list(self._manager.order_by("last_access").values_list("key", flat=True)[:excess])
+            self._manager.filter(key__in=stale).delete()
+
+    def delete(self, key):
+        self._manager.filter(key=key).delete()
+
+    def clear(self):
+        self._manager.all().delete()
+
+
+class _Flight:
+    __slots__ = ("event", "value")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+
+
+class ResponseCache:
+    """
+    کش یک namespace: get_or_fetch(key, fetch) نتیجه را از backend می‌خواند یا با fetch می‌سازد.
+    درخواست‌های هم‌زمان برای یک کلید منتظر همان یک فراخوانی fetch می‌مانند.
+    نتیجهٔ None (خطا/بی‌پاسخ) کش نمی‌شود تا خطای گذرا ماندگار نشود.
+    """
+
+    def __init__(self, namespace, backend, ttl=DEFAULT_TTL_SECONDS):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _backend_get(self, full_key):
+        try:
+            return self.backend.get(full_key)
+        except Exception as e:
+            logger.warning("Neshan cache %s read failed: %s", self.namespace, e)
+            self._count("errors")
+            return _MISSING
+
+    def _backend_set(self, full_key, value, ttl):
+        try:
+            self.backend.set(full_key, value, ttl)
+        except Exception as e:
+            logger.warning("Neshan cache %s write failed: %s", self.namespace, e)
+            self._count("errors")
+
+    def get_or_fetch(self, key, fetch, ttl=None):
+        """ttl (ثانیه) در صورت ارسال جایگزین TTL پیش‌فرض namespace برای همین مقدار می‌شود."""
+        full_key = f"{self.namespace}:{key}"
+        value = self._backend_get(full_key)
+        if value is not _MISSING:
+            self._count("hits")
+            return value
+        with self._lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            if flight.event.wait(SINGLE_FLIGHT_WAIT_SECONDS):
+                return flight.value
+            return fetch()
+        try:
+            value = fetch()
+            if value is not None:
+                self._backend_set(full_key, value, self.ttl if ttl is None else ttl)
+            flight.value = value
+            return value
+        finally:
+            with self._lock:
+                self._flights.pop(full_key, None)
+            flight.event.set()
+
+    def get(self, key):
+        """مقدار کش‌شده بدون fetch؛ None اگر نباشد (در آمار hit/miss شمرده می‌شود)."""
+        value = self._backend_get(f"{self.namespace}:{key}")
+        self._count("misses" if value is _MISSING else "hits")
+        return None if value is _MISSING else value
+
+    def get_many(self, keys):
+        """{key: value} برای کلیدهای کش‌شده با یک خواندن دسته‌ای از backend (در آمار hit/miss شمرده می‌شوند)."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        prefix = f"{self.namespace}:"
+        try:
+            values = self.backend.get_many([prefix + key for key in keys])
+        except Exception as e:
+            logger.warning("Neshan cache %s read failed: %s", self.namespace, e)
+            self._count("errors")
+            values = {}
+        found = {key[len(prefix):]: value for key, value in values.items()}
+        with self._lock:
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(keys) - len(found)
+        return found
+
+    def set(self, key, value, ttl=None):
+        if value is not None:
+            self._backend_set(f"{self.namespace}:{key}", value, self.ttl if ttl is None else ttl)
+
+    async def aget(self, key):
+        """get برای کد async؛ backendهای غیر حافظه (دیتابیس/کش Django) در thread جدا خوانده می‌شوند."""
+        if isinstance(self.backend, MemoryBackend):
+            return self.get(key)
+        from asgiref.sync import sync_to_async
+
+        return await sync_to_async(self.get)(key)
+
+    async def aset(self, key, value, ttl=None):
+        if isinstance(self.backend, MemoryBackend):
+            return self.set(key, value, ttl)
+        from asgiref.sync import sync_to_async
+
+        return await sync_to_async(self.set)(key, value, ttl)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["backend"] = type(self.backend).__name__
+        stats["ttl"] = self.ttl
+        return stats
+
+    def clear(self):
+        self.backend.clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _make_backend(max_entries=None):
+    name = getattr(settings, "TEAM13_NESHAN_CACHE_BACKEND", DEFAULT_BACKEND)
+    if max_entries is None:
+        max_entries = getattr(settings, "TEAM13_NESHAN_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+    if name == "django":
+        return DjangoCacheBackend()
+    if name == "db":
+        return DatabaseBackend(max_entries=max_entries)
+    return MemoryBackend(max_entries=max_entries)
+
+
+def get_cache(namespace, default_ttl=DEFAULT_TTL_SECONDS, max_entries=None):
+    """
+    کش namespace داده شده (یک نمونه در هر پردازه) با backend و TTL از تنظیمات.
+    max_entries سقف جداگانهٔ این namespace است (برای پاسخ‌های حجیم)؛ پیش‌فرض TEAM13_NESHAN_CACHE_MAX_ENTRIES.
+    """
+    cache = _caches.get(namespace)
+    if cache is not None:
+        return cache
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            ttl = (getattr(settings, "TEAM13_NESHAN_CACHE_TTL", None) or {}).get(namespace, default_ttl)
+            cache = _caches[namespace] = ResponseCache(namespace, _make_backend(max_entries), ttl=ttl)
+    return cache
+
+
+def cache_stats():
+    """شمارنده‌های hit/miss همهٔ namespaceهای ساخته‌شده در این پردازه."""
+    return {namespace: cache.stats() for namespace, cache in sorted(_caches.items())}
+
+
+def reset_caches():
+    """دور انداختن همهٔ کش‌های درون‌پردازه‌ای و شمارنده‌ها (مثلاً پس از تغییر تنظیمات یا در تست‌ها)."""
+    with _caches_lock:
+        for cache in _caches.values():
+            if isinstance(cache.backend, MemoryBackend):
+                cache.backend.clear()
+        _caches.clear()
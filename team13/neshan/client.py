@@ -0,0 +1,254 @@
+# کلاینت HTTP مشترک برای همهٔ APIهای نشان
+# یک requests.Session با HTTPAdapter (استخر اتصال، keep-alive) برای همهٔ ماژول‌های این پکیج؛
+# timeout جدا برای هر endpoint، تلاش مجدد با backoff برای 429/5xx و یک circuit breaker که پس از
+# چند خطای پیاپی برای مدتی درخواست‌ها را بدون تماس با نشان رد می‌کند.
+# با set_client می‌توان کلاینت دیگری (مثلاً با base_url یک سرور جعلی محلی) جایگزین کرد.
+# هر ماژول درخواست خود را به شکل NeshanCall می‌سازد تا همان درخواست با این کلاینت (run) یا کلاینت
+# ناهم‌گام async_client (arun) اجرا شود.
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .config import get_api_base, get_api_key
+
+logger = logging.getLogger(__name__)
+
+# timeout خواندن (ثانیه) برای هر endpoint؛ با TEAM13_NESHAN_TIMEOUTS قابل تغییر است
+DEFAULT_TIMEOUTS = {
+    "direction": 15,
+    "distance_matrix": 20,
+    "tsp": 15,
+    "isochrone": 20,
+    "map_matching": 30,
+    "reverse": 10,
+    "geocode": 10,
+    "search": 10,
+}
+DEFAULT_READ_TIMEOUT = 15
+CONNECT_TIMEOUT = 3.05
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitBreaker:
+    """
+    پس از failure_threshold خطای پیاپی «باز» می‌شود و تا reset_timeout ثانیه درخواستی عبور نمی‌کند؛
+    سپس یک درخواست آزمایشی (half-open) اجازه دارد و موفقیت آن مدار را می‌بندد. اگر درخواست آزمایشی نتیجه‌ای
+    ثبت نکند (مثلاً لغو شود)، پس از reset_timeout ثانیه درخواست آزمایشی دیگری اجازه می‌گیرد.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                now = time.monotonic()
+                if now - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self.probe_started_at = now
+                return True
+            if self.state == self.HALF_OPEN:
+                # فقط یک درخواست آزمایشی در حال اجرا؛ آزمایشی که در reset_timeout نتیجه نداد رها شده است
+                now = time.monotonic()
+                if now - self.probe_started_at < self.reset_timeout:
+                    return False
+                self.probe_started_at = now
+                return True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class NeshanClient:
+    """
+    کلاینت نشان روی یک Session مشترک. request در صورت خطای شبکه یا باز بودن مدار None برمی‌گرداند
+    (مانند رفتار قبلی ماژول‌ها که در خطا None می‌دادند)؛ در غیر این صورت خود Response.
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeouts=None, retries=2, backoff_factor=0.3,
+                 pool_maxsize=20, breaker=None, session=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self._base_url = base_url
+        self._api_key = api_key
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.breaker = breaker or CircuitBreaker()
+        self.session = session or requests.Session()
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,  # درخواست‌هایی که پاسخشان دیر رسیده تکرار نمی‌شوند
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def base_url(self):
+        return (self._base_url or get_api_base()).rstrip("/")
+
+    def timeout_for(self, endpoint):
+        return (CONNECT_TIMEOUT, self.timeouts.get(endpoint, DEFAULT_READ_TIMEOUT))
+
+    def request(self, method, path, endpoint, params=None, json=None, headers=None, api_key=None):
+        """ارسال درخواست به base_url + path؛ endpoint فقط برای timeout و لاگ است."""
+        import requests
+
+        if not self.breaker.allow():
+            logger.debug("Neshan %s skipped: circuit open", endpoint)
+            return None
+        all_headers = {"Api-Key": api_key or self._api_key or get_api_key()}
+        if headers:
+            all_headers.update(headers)
+        try:
+            resp = self.session.request(
+                method, f"{self.base_url}{path}", params=params, json=json,
+                headers=all_headers, timeout=self.timeout_for(endpoint),
+            )
+        except requests.RequestException as e:
+            logger.debug("Neshan %s request failed: %s", endpoint, e)
+            self.breaker.record_failure()
+            return None
+        if resp.status_code in RETRY_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return resp
+
+    def get(self, path, endpoint, **kwargs):
+        return self.request("GET", path, endpoint, **kwargs)
+
+    def post(self, path, endpoint, **kwargs):
+        return self.request("POST", path, endpoint, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class NeshanCall:
+    """
+    یک درخواست آمادهٔ نشان به‌همراه تابع تفسیر پاسخ. parse(resp) خروجی نهایی را می‌سازد؛ در خطای شبکه،
+    باز بودن مدار یا استثنا در parse مقدار failure برگردانده می‌شود (همان رفتار قبلی توابع این پکیج).
+    """
+
+    __slots__ = ("method", "path", "endpoint", "parse", "params", "json", "headers", "api_key", "failure")
+
+    def __init__(self, method, path, endpoint, parse, params=None, json=None, headers=None, api_key=None,
+                 failure=None):
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint
+        self.parse = parse
+        self.params = params
+        self.json = json
+        self.headers = headers
+        self.api_key = api_key
+        self.failure = failure
+
+    def _kwargs(self):
+        return {"params": self.params, "json": self.json, "headers": self.headers, "api_key": self.api_key}
+
+    def finish(self, resp):
+        if resp is None:
+            return self.failure
+        try:
+            return self.parse(resp)
+        except Exception as e:
+            logger.debug("Neshan %s failed: %s", self.endpoint, e)
+            return self.failure
+
+    def run(self, client=None):
+        """اجرا با کلاینت هم‌گام مشترک."""
+        try:
+            resp = (client or get_client()).request(self.method, self.path, self.endpoint, **self._kwargs())
+        except Exception as e:
+            logger.debug("Neshan %s failed: %s", self.endpoint, e)
+            return self.failure
+        return self.finish(resp)
+
+    async def arun(self, client=None):
+        """اجرا با کلاینت ناهم‌گام حلقهٔ رویداد جاری (team13.neshan.async_client)."""
+        from .async_client import get_async_client
+
+        try:
+            resp = await (client or get_async_client()).request(
+                self.method, self.path, self.endpoint, **self._kwargs()
+            )
+        except Exception as e:
+            logger.debug("Neshan %s failed: %s", self.endpoint, e)
+            return self.failure
+        return self.finish(resp)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _build_default_client():
+    return NeshanClient(
+        timeouts=getattr(settings, "TEAM13_NESHAN_TIMEOUTS", None),
+        retries=getattr(settings, "TEAM13_NESHAN_RETRIES", 2),
+        breaker=CircuitBreaker(
+            failure_threshold=getattr(settings, "TEAM13_NESHAN_BREAKER_THRESHOLD", 5),
+            reset_timeout=getattr(settings, "TEAM13_NESHAN_BREAKER_RESET_SECONDS", 30.0),
+        ),
+    )
+
+
+def get_client():
+    """کلاینت مشترک پردازه (در اولین استفاده ساخته می‌شود)."""
+    global _client
+    client = _client
+    if client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_default_client()
+            client = _client
+    return client
+
+
+def set_client(client):
+    """جایگزینی کلاینت مشترک (مثلاً با کلاینتی به سمت سرور جعلی)؛ کلاینت قبلی برگردانده می‌شود."""
+    global _client
+    with _client_lock:
+        previous, _client = _client, client
+    return previous
+
+
+def reset_client():
+    """بستن کلاینت فعلی؛ فراخوانی بعدی get_client کلاینت تازه‌ای با تنظیمات فعلی می‌سازد."""
+    previous = set_client(None)
+    if previous is not None:
+        previous.close()
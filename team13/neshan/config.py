@@ -20,6 +20,11 @@ def get_api_key():
     return _get_setting("NESHAN_API_KEY_SERVICE", "NESHAN_API_KEY_SERVICE") or _get_setting("NESHAN_API_KEY", "NESHAN_API_KEY") or os.environ.get("API_KEY", "").strip()
 
 
+def get_api_base():
+    """آدرس پایهٔ API نشان؛ با NESHAN_API_BASE در settings/env می‌توان آن را (مثلاً به سرور جعلی محلی) تغییر داد."""
+    return _get_setting("NESHAN_API_BASE", "NESHAN_API_BASE", NESHAN_API_BASE)
+
+
 def get_web_key():
     """کلید وب نشان برای استفاده در فرانت (نقشه، در صورت نیاز)."""
     return _get_setting("NESHAN_API_KEY_WEB", "NESHAN_API_KEY_WEB")
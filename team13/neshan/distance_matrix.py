@@ -4,10 +4,10 @@
 # بدون ترافیک: GET https://api.neshan.org/v1/distance-matrix/no-traffic
 
 import logging
+from .client import NeshanCall
 from .config import (
     get_api_key,
     is_configured,
-    NESHAN_API_BASE,
     NESHAN_DISTANCE_MATRIX_PATH,
     NESHAN_DISTANCE_MATRIX_NO_TRAFFIC_PATH,
 )
@@ -36,6 +36,36 @@ def _points_to_string(points):
     return "|".join(parts) if parts else ""
 
 
+def _parse_distance_matrix(resp):
+    if resp.status_code != 200:
+        logger.debug("Neshan distance-matrix HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    data = resp.json()
+    if data.get("status") != "Ok":
+        return None
+    return data
+
+
+def distance_matrix_call(origins, destinations, vehicle_type=TYPE_CAR, no_traffic=False):
+    """درخواست ماتریس فاصله (NeshanCall)؛ None اگر نشان تنظیم نشده یا نقاط خالی باشند."""
+    if not is_configured():
+        return None
+    api_key = get_api_key()
+    if vehicle_type not in (TYPE_CAR, TYPE_MOTORCYCLE):
+        vehicle_type = TYPE_CAR
+    origins_str = _points_to_string(origins) if not isinstance(origins, str) else origins
+    destinations_str = _points_to_string(destinations) if not isinstance(destinations, str) else destinations
+    if not origins_str or not destinations_str:
+        return None
+    path = NESHAN_DISTANCE_MATRIX_NO_TRAFFIC_PATH if no_traffic else NESHAN_DISTANCE_MATRIX_PATH
+    params = {
+        "type": vehicle_type,
+        "origins": origins_str,
+        "destinations": destinations_str,
+    }
+    return NeshanCall("GET", path, "distance_matrix", _parse_distance_matrix, params=params, api_key=api_key)
+
+
 def fetch_distance_matrix(origins, destinations, vehicle_type=TYPE_CAR, no_traffic=False):
     """
     ماتریس فاصله و زمان بین نقاط مبدأ و مقصد.
@@ -46,33 +76,5 @@ def fetch_distance_matrix(origins, destinations, vehicle_type=TYPE_CAR, no_traff
     خروجی: پاسخ کامل API شامل status، rows، origin_addresses، destination_addresses؛ در صورت خطا None.
     rows[i].elements[j] = فاصله/زمان از origin i به destination j.
     """
-    if not is_configured():
-        return None
-    api_key = get_api_key()
-    if vehicle_type not in (TYPE_CAR, TYPE_MOTORCYCLE):
-        vehicle_type = TYPE_CAR
-    origins_str = _points_to_string(origins) if not isinstance(origins, str) else origins
-    destinations_str = _points_to_string(destinations) if not isinstance(destinations, str) else destinations
-    if not origins_str or not destinations_str:
-        return None
-    try:
-        import requests
-        path = NESHAN_DISTANCE_MATRIX_NO_TRAFFIC_PATH if no_traffic else NESHAN_DISTANCE_MATRIX_PATH
-        url = f"{NESHAN_API_BASE.rstrip('/')}{path}"
-        params = {
-            "type": vehicle_type,
-            "origins": origins_str,
-            "destinations": destinations_str,
-        }
-        headers = {"Api-Key": api_key}
-        resp = requests.get(url, params=params, headers=headers, timeout=20)
-        if resp.status_code != 200:
-            logger.debug("Neshan distance-matrix HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        data = resp.json()
-        if data.get("status") != "Ok":
-            return None
-        return data
-    except Exception as e:
-        logger.debug("Neshan distance-matrix failed: %s", e)
-        return None
+    call = distance_matrix_call(origins, destinations, vehicle_type=vehicle_type, no_traffic=no_traffic)
+    return call.run() if call is not None else None
@@ -6,8 +6,11 @@ import json
 import logging
 from urllib.parse import quote
 
+from django.conf import settings
+
+from .cache import coord_key, get_cache
+from .client import NeshanCall
 from .config import (
-    NESHAN_API_BASE,
     NESHAN_GEOCODING_PATH,
     NESHAN_GEOCODING_PLUS_PATH,
     NESHAN_REVERSE_PATH,
@@ -17,6 +20,10 @@ from .config import (
 
 logger = logging.getLogger(__name__)
 
+# ۴ رقم اعشار ≈ ۱۱ متر؛ آدرس خیابان در این فاصله تغییر نمی‌کند
+REVERSE_CACHE_PRECISION = 4
+REVERSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
 
 def reverse_geocode(lat, lng):
     """
@@ -24,6 +31,8 @@ def reverse_geocode(lat, lng):
     خروجی: دیکشنری کامل پاسخ شامل status، formatted_address، route_name، route_type،
     neighbourhood، city، state، place، municipality_zone، in_traffic_zone، in_odd_even_zone،
     village، county، district؛ در صورت خطا None.
+    نتیجه برای نقاطی که پس از گرد کردن (TEAM13_REVERSE_GEOCODE_PRECISION رقم اعشار) یکی می‌شوند
+    از کش خوانده می‌شود؛ درخواست‌های هم‌زمان برای یک نقطه فقط یک فراخوانی به نشان می‌زنند.
     """
     if not is_configured():
         return None
@@ -32,25 +41,39 @@ def reverse_geocode(lat, lng):
         lng_f = float(lng)
     except (TypeError, ValueError):
         return None
-    api_key = get_api_key()
-    try:
-        import requests
-        url = f"{NESHAN_API_BASE.rstrip('/')}{NESHAN_REVERSE_PATH}"
-        params = {"lat": lat_f, "lng": lng_f}
-        headers = {"Api-Key": api_key}
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            logger.debug("Neshan reverse HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        data = resp.json()
-        if not isinstance(data, dict):
-            return None
-        if data.get("status") != "OK":
-            return None
-        return data
-    except Exception as e:
-        logger.debug("Neshan reverse failed: %s", e)
+    return reverse_cache().get_or_fetch(reverse_cache_key(lat_f, lng_f), lambda: _fetch_reverse_geocode(lat_f, lng_f))
+
+
+def _parse_reverse(resp):
+    if resp.status_code != 200:
+        logger.debug("Neshan reverse HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    data = resp.json()
+    if not isinstance(data, dict):
         return None
+    if data.get("status") != "OK":
+        return None
+    return data
+
+
+def reverse_geocode_call(lat_f, lng_f):
+    """درخواست v5/reverse (NeshanCall)."""
+    params = {"lat": lat_f, "lng": lng_f}
+    return NeshanCall("GET", NESHAN_REVERSE_PATH, "reverse", _parse_reverse, params=params, api_key=get_api_key())
+
+
+def reverse_cache_key(lat_f, lng_f):
+    precision = getattr(settings, "TEAM13_REVERSE_GEOCODE_PRECISION", REVERSE_CACHE_PRECISION)
+    return coord_key(lat_f, lng_f, precision)
+
+
+def reverse_cache():
+    return get_cache("reverse", default_ttl=REVERSE_CACHE_TTL_SECONDS)
+
+
+def _fetch_reverse_geocode(lat_f, lng_f):
+    """فراخوانی مستقیم v5/reverse (بدون کش)."""
+    return reverse_geocode_call(lat_f, lng_f).run()
 
 
 def reverse_geocode_address(lat, lng):
@@ -63,6 +86,16 @@ def reverse_geocode_address(lat, lng):
     return data.get("formatted_address") or None
 
 
+def _parse_geocode(resp):
+    if resp.status_code != 200:
+        logger.debug("Neshan geocode HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    data = resp.json()
+    if not isinstance(data, dict):
+        return None
+    return data
+
+
 def geocode(
     address,
     province=None,
@@ -88,6 +121,12 @@ def geocode(
         دیکشنری با کلید items (لیست حداکثر ۵ نتیجه؛ هر آیتم: location, province, city, neighbourhood, unMatchedTerm)
         یا None در صورت خطا.
     """
+    call = geocode_call(address, province=province, city=city, location=location, extent=extent, plus=plus)
+    return call.run() if call is not None else None
+
+
+def geocode_call(address, province=None, city=None, location=None, extent=None, plus=False):
+    """درخواست Geocoding (NeshanCall)؛ None اگر نشان تنظیم نشده یا آدرس خالی باشد."""
     if not is_configured():
         return None
     address = (address or "").strip()
@@ -118,21 +157,8 @@ def geocode(
             except (TypeError, ValueError, AttributeError):
                 pass
     path = NESHAN_GEOCODING_PLUS_PATH if plus else NESHAN_GEOCODING_PATH
-    base = NESHAN_API_BASE.rstrip("/")
     json_str = json.dumps(payload, ensure_ascii=False)
-    url = f"{base}{path}?json={quote(json_str)}"
-    api_key = get_api_key()
-    try:
-        import requests
-        headers = {"Api-Key": api_key, "Content-Type": "application/json"}
-        resp = requests.get(url, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            logger.debug("Neshan geocode HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        data = resp.json()
-        if not isinstance(data, dict):
-            return None
-        return data
-    except Exception as e:
-        logger.debug("Neshan geocode failed: %s", e)
-        return None
+    return NeshanCall(
+        "GET", f"{path}?json={quote(json_str)}", "geocode", _parse_geocode,
+        headers={"Content-Type": "application/json"}, api_key=get_api_key(),
+    )
@@ -3,21 +3,21 @@
 # Endpoint: GET https://api.neshan.org/v1/isochrone
 
 import logging
-from .config import get_api_key, is_configured, NESHAN_API_BASE, NESHAN_ISOCHRONE_PATH
+from .client import NeshanCall
+from .config import get_api_key, is_configured, NESHAN_ISOCHRONE_PATH
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_isochrone(lat, lng, distance_km=None, time_minutes=None, polygon=False, denoise=0):
-    """
-    محدوده‌ای که از نقطه مرکز در زمان یا مسافت معین قابل دسترسی است.
-    lat, lng: مختصات مرکز.
-    distance_km: حداکثر مسافت قابل دسترسی (کیلومتر) — حداقل یکی از distance_km یا time_minutes اجباری است.
-    time_minutes: حداکثر زمان قابل دسترسی (دقیقه).
-    polygon: True = خروجی Polygon، False = LineString (پیش‌فرض).
-    denoise: 0 تا 1؛ هرچه به 1 نزدیک‌تر، پولیگان ساده‌تر (پیش‌فرض 0).
-    خروجی: GeoJSON FeatureCollection یا None در صورت خطا.
-    """
+def _parse_isochrone(resp):
+    if resp.status_code != 200:
+        logger.debug("Neshan isochrone HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    return resp.json()
+
+
+def isochrone_call(lat, lng, distance_km=None, time_minutes=None, polygon=False, denoise=0):
+    """درخواست محدودهٔ در دسترس (NeshanCall)؛ None اگر نشان تنظیم نشده یا ورودی نامعتبر باشد."""
     if not is_configured():
         return None
     if distance_km is None and time_minutes is None:
@@ -48,15 +48,18 @@ def fetch_isochrone(lat, lng, distance_km=None, time_minutes=None, polygon=False
     params["polygon"] = "true" if polygon else "false"
     if denoise is not None and 0 <= denoise <= 1:
         params["denoise"] = denoise
-    try:
-        import requests
-        url = f"{NESHAN_API_BASE.rstrip('/')}{NESHAN_ISOCHRONE_PATH}"
-        headers = {"Api-Key": api_key}
-        resp = requests.get(url, params=params, headers=headers, timeout=20)
-        if resp.status_code != 200:
-            logger.debug("Neshan isochrone HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        return resp.json()
-    except Exception as e:
-        logger.debug("Neshan isochrone failed: %s", e)
-        return None
+    return NeshanCall("GET", NESHAN_ISOCHRONE_PATH, "isochrone", _parse_isochrone, params=params, api_key=api_key)
+
+
+def fetch_isochrone(lat, lng, distance_km=None, time_minutes=None, polygon=False, denoise=0):
+    """
+    محدوده‌ای که از نقطه مرکز در زمان یا مسافت معین قابل دسترسی است.
+    lat, lng: مختصات مرکز.
+    distance_km: حداکثر مسافت قابل دسترسی (کیلومتر) — حداقل یکی از distance_km یا time_minutes اجباری است.
+    time_minutes: حداکثر زمان قابل دسترسی (دقیقه).
+    polygon: True = خروجی Polygon، False = LineString (پیش‌فرض).
+    denoise: 0 تا 1؛ هرچه به 1 نزدیک‌تر، پولیگان ساده‌تر (پیش‌فرض 0).
+    خروجی: GeoJSON FeatureCollection یا None در صورت خطا.
+    """
+    call = isochrone_call(lat, lng, distance_km=distance_km, time_minutes=time_minutes, polygon=polygon, denoise=denoise)
+    return call.run() if call is not None else None
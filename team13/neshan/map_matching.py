@@ -4,18 +4,24 @@
 # Body: JSON { "path": "lat1,lng1|lat2,lng2|..." } — حداقل ۲، حداکثر ۱۰۰۰ نقطه.
 
 import logging
-from .config import get_api_key, is_configured, NESHAN_API_BASE, NESHAN_MAP_MATCHING_PATH
+from .client import NeshanCall
+from .config import get_api_key, is_configured, NESHAN_MAP_MATCHING_PATH
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_map_matching(path):
-    """
-    نگاشت مجموعه نقاط به محتمل‌ترین مسیر روی نقشه.
-    path: رشتهٔ lat,lng|lat,lng|... یا لیست نقاط ([lat,lng], ...) یا شیء با .lat/.lng.
-    خروجی: { "snappedPoints": [...], "geometry": "encoded_polyline" } یا None.
-    snappedPoint: { "location": [lat, lng], "originalIndex": int }.
-    """
+def _parse_map_matching(resp):
+    if resp.status_code == 404:
+        logger.debug("Neshan map-matching 404: no route found for path")
+        return None
+    if resp.status_code != 200:
+        logger.debug("Neshan map-matching HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    return resp.json()
+
+
+def map_matching_call(path):
+    """درخواست نگاشت نقطه بر نقشه (NeshanCall)؛ None اگر نشان تنظیم نشده یا کمتر از ۲ نقطه باشد."""
     if not is_configured():
         return None
     if not path:
@@ -42,19 +48,16 @@ def fetch_map_matching(path):
         logger.debug("Neshan map-matching: more than 1000 points, truncating")
         path_str = "|".join(parts[:1000])
     api_key = get_api_key()
-    try:
-        import requests
-        url = f"{NESHAN_API_BASE.rstrip('/')}{NESHAN_MAP_MATCHING_PATH}"
-        headers = {"Api-Key": api_key, "Content-Type": "application/json"}
-        payload = {"path": path_str}
-        resp = requests.post(url, json=payload, headers=headers, timeout=30)
-        if resp.status_code == 404:
-            logger.debug("Neshan map-matching 404: no route found for path")
-            return None
-        if resp.status_code != 200:
-            logger.debug("Neshan map-matching HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        return resp.json()
-    except Exception as e:
-        logger.debug("Neshan map-matching failed: %s", e)
-        return None
+    payload = {"path": path_str}
+    return NeshanCall("POST", NESHAN_MAP_MATCHING_PATH, "map_matching", _parse_map_matching, json=payload, api_key=api_key)
+
+
+def fetch_map_matching(path):
+    """
+    نگاشت مجموعه نقاط به محتمل‌ترین مسیر روی نقشه.
+    path: رشتهٔ lat,lng|lat,lng|... یا لیست نقاط ([lat,lng], ...) یا شیء با .lat/.lng.
+    خروجی: { "snappedPoints": [...], "geometry": "encoded_polyline" } یا None.
+    snappedPoint: { "location": [lat, lng], "originalIndex": int }.
+    """
+    call = map_matching_call(path)
+    return call.run() if call is not None else None
@@ -4,10 +4,10 @@
 # عابر پیاده: https://platform.neshan.org/docs/api/routing-category/routing_pedestrian/
 
 import logging
+from .client import NeshanCall
 from .config import (
     get_api_key,
     is_configured,
-    NESHAN_API_BASE,
     NESHAN_DIRECTION_PATH,
     NESHAN_DIRECTION_NO_TRAFFIC_PATH,
 )
@@ -19,37 +19,37 @@ VEHICLE_CAR = "car"
 VEHICLE_MOTORCYCLE = "motorcycle"
 VEHICLE_PEDESTRIAN = "pedestrian"
 
+# خروجی در صورت خطا یا نبود مسیر
+NO_ROUTE = (None, None, None)
 
-def _request_direction(url_path, params, api_key, timeout=15):
-    """درخواست GET به یک endpoint مسیریابی نشان؛ خروجی (distance_km, duration_seconds, route_geometry)."""
-    try:
-        import requests
-        url = f"{NESHAN_API_BASE.rstrip('/')}{url_path}"
-        headers = {"Api-Key": api_key}
-        resp = requests.get(url, params=params, headers=headers, timeout=timeout)
-        if resp.status_code != 200:
-            logger.debug("Neshan direction HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None, None, None
-        data = resp.json()
-        routes = data.get("routes") or []
-        if not routes:
-            return None, None, None
-        first = routes[0]
-        legs = first.get("legs") or []
-        distance_m = None
-        duration_s = None
-        for leg in legs:
-            d = (leg.get("distance") or {}).get("value")
-            t = (leg.get("duration") or {}).get("value")
-            if d is not None:
-                distance_m = (distance_m or 0) + d
-            if t is not None:
-                duration_s = (duration_s or 0) + t
-        dist_km = (distance_m / 1000.0) if distance_m is not None else None
-        return dist_km, duration_s, first
-    except Exception as e:
-        logger.debug("Neshan direction failed: %s", e)
-        return None, None, None
+
+def _parse_direction(resp):
+    """تفسیر پاسخ مسیریابی نشان؛ خروجی (distance_km, duration_seconds, route_geometry)."""
+    if resp.status_code != 200:
+        logger.debug("Neshan direction HTTP %s: %s", resp.status_code, resp.text[:200])
+        return NO_ROUTE
+    data = resp.json()
+    routes = data.get("routes") or []
+    if not routes:
+        return NO_ROUTE
+    first = routes[0]
+    legs = first.get("legs") or []
+    distance_m = None
+    duration_s = None
+    for leg in legs:
+        d = (leg.get("distance") or {}).get("value")
+        t = (leg.get("duration") or {}).get("value")
+        if d is not None:
+            distance_m = (distance_m or 0) + d
+        if t is not None:
+            duration_s = (duration_s or 0) + t
+    dist_km = (distance_m / 1000.0) if distance_m is not None else None
+    return dist_km, duration_s, first
+
+
+def _direction_call(url_path, params, api_key):
+    """درخواست GET به یک endpoint مسیریابی نشان."""
+    return NeshanCall("GET", url_path, "direction", _parse_direction, params=params, api_key=api_key, failure=NO_ROUTE)
 
 
 def _build_direction_params(lat_origin, lng_origin, lat_dest, lng_dest, vehicle_type,
@@ -84,14 +84,11 @@ def _build_direction_params(lat_origin, lng_origin, lat_dest, lng_dest, vehicle_
     return params
 
 
-def fetch_route_eta(lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=VEHICLE_CAR,
-                    waypoints=None, avoid_traffic_zone=False, avoid_odd_even_zone=False, alternative=False, bearing=None):
-    """
-    فاصله (کیلومتر)، زمان (ثانیه) و geometry مسیر از سرویس مسیریابی با ترافیک نشان.
-    خروجی: (distance_km, duration_seconds, route_geometry). نوع وسیله: car | motorcycle.
-    """
+def route_eta_call(lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=VEHICLE_CAR,
+                   waypoints=None, avoid_traffic_zone=False, avoid_odd_even_zone=False, alternative=False, bearing=None):
+    """درخواست مسیریابی با ترافیک (NeshanCall)؛ None اگر نشان تنظیم نشده باشد."""
     if not is_configured():
-        return None, None, None
+        return None
     api_key = get_api_key()
     if vehicle_type not in (VEHICLE_CAR, VEHICLE_MOTORCYCLE):
         vehicle_type = VEHICLE_CAR
@@ -100,7 +97,53 @@ def fetch_route_eta(lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=VEH
         waypoints=waypoints, avoid_traffic_zone=avoid_traffic_zone,
         avoid_odd_even_zone=avoid_odd_even_zone, alternative=alternative, bearing=bearing,
     )
-    return _request_direction(NESHAN_DIRECTION_PATH, params, api_key)
+    return _direction_call(NESHAN_DIRECTION_PATH, params, api_key)
+
+
+def route_eta_no_traffic_call(lng_origin, lat_origin, lng_dest, lat_dest,
+                              waypoints=None, avoid_traffic_zone=False, avoid_odd_even_zone=False,
+                              alternative=False, bearing=None):
+    """درخواست مسیریابی بدون ترافیک (NeshanCall)؛ None اگر نشان تنظیم نشده باشد."""
+    if not is_configured():
+        return None
+    api_key = get_api_key()
+    params = _build_direction_params(
+        lat_origin, lng_origin, lat_dest, lng_dest, VEHICLE_CAR,
+        waypoints=waypoints, avoid_traffic_zone=avoid_traffic_zone,
+        avoid_odd_even_zone=avoid_odd_even_zone, alternative=alternative, bearing=bearing,
+    )
+    return _direction_call(NESHAN_DIRECTION_NO_TRAFFIC_PATH, params, api_key)
+
+
+def route_eta_pedestrian_call(lng_origin, lat_origin, lng_dest, lat_dest,
+                              waypoints=None, alternative=False, bearing=None):
+    """درخواست مسیریابی عابر پیاده (NeshanCall)؛ None اگر نشان تنظیم نشده باشد."""
+    if not is_configured():
+        return None
+    api_key = get_api_key()
+    params = _build_direction_params(
+        lat_origin, lng_origin, lat_dest, lng_dest, VEHICLE_PEDESTRIAN,
+        waypoints=waypoints, avoid_traffic_zone=False, avoid_odd_even_zone=False,
+        alternative=alternative, bearing=bearing,
+    )
+    return _direction_call(NESHAN_DIRECTION_PATH, params, api_key)
+
+
+def _run(call):
+    return call.run() if call is not None else NO_ROUTE
+
+
+def fetch_route_eta(lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=VEHICLE_CAR,
+                    waypoints=None, avoid_traffic_zone=False, avoid_odd_even_zone=False, alternative=False, bearing=None):
+    """
+    فاصله (کیلومتر)، زمان (ثانیه) و geometry مسیر از سرویس مسیریابی با ترافیک نشان.
+    خروجی: (distance_km, duration_seconds, route_geometry). نوع وسیله: car | motorcycle.
+    """
+    return _run(route_eta_call(
+        lng_origin, lat_origin, lng_dest, lat_dest, vehicle_type=vehicle_type, waypoints=waypoints,
+        avoid_traffic_zone=avoid_traffic_zone, avoid_odd_even_zone=avoid_odd_even_zone,
+        alternative=alternative, bearing=bearing,
+    ))
 
 
 def fetch_route_eta_no_traffic(lng_origin, lat_origin, lng_dest, lat_dest,
@@ -112,15 +155,11 @@ def fetch_route_eta_no_traffic(lng_origin, lat_origin, lng_dest, lat_dest,
     Endpoint: GET https://api.neshan.org/v4/direction/no-traffic
     خروجی: (distance_km, duration_seconds, route_geometry).
     """
-    if not is_configured():
-        return None, None, None
-    api_key = get_api_key()
-    params = _build_direction_params(
-        lat_origin, lng_origin, lat_dest, lng_dest, VEHICLE_CAR,
-        waypoints=waypoints, avoid_traffic_zone=avoid_traffic_zone,
-        avoid_odd_even_zone=avoid_odd_even_zone, alternative=alternative, bearing=bearing,
-    )
-    return _request_direction(NESHAN_DIRECTION_NO_TRAFFIC_PATH, params, api_key)
+    return _run(route_eta_no_traffic_call(
+        lng_origin, lat_origin, lng_dest, lat_dest, waypoints=waypoints,
+        avoid_traffic_zone=avoid_traffic_zone, avoid_odd_even_zone=avoid_odd_even_zone,
+        alternative=alternative, bearing=bearing,
+    ))
 
 
 def fetch_route_eta_pedestrian(lng_origin, lat_origin, lng_dest, lat_dest,
@@ -132,12 +171,6 @@ def fetch_route_eta_pedestrian(lng_origin, lat_origin, lng_dest, lat_dest,
     پارامترها: type=pedestrian، origin، destination؛ اختیاری: waypoints، alternative، bearing.
     خروجی: (distance_km, duration_seconds, route_geometry).
     """
-    if not is_configured():
-        return None, None, None
-    api_key = get_api_key()
-    params = _build_direction_params(
-        lat_origin, lng_origin, lat_dest, lng_dest, VEHICLE_PEDESTRIAN,
-        waypoints=waypoints, avoid_traffic_zone=False, avoid_odd_even_zone=False,
-        alternative=alternative, bearing=bearing,
-    )
-    return _request_direction(NESHAN_DIRECTION_PATH, params, api_key)
+    return _run(route_eta_pedestrian_call(
+        lng_origin, lat_origin, lng_dest, lat_dest, waypoints=waypoints, alternative=alternative, bearing=bearing,
+    ))
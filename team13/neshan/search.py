@@ -4,7 +4,8 @@
 # پارامترهای اجباری: term، lat، lng. حداکثر ۳۰ نتیجه در هر درخواست.
 
 import logging
-from .config import get_api_key, is_configured, NESHAN_API_BASE, NESHAN_SEARCH_PATH
+from .client import NeshanCall
+from .config import get_api_key, is_configured, NESHAN_SEARCH_PATH
 
 logger = logging.getLogger(__name__)
 
@@ -13,24 +14,39 @@ DEFAULT_LAT = 35.6892
 DEFAULT_LNG = 51.3890
 
 
-def _search_raw(term, lat_f, lng_f):
-    """یک درخواست GET به API جستجو؛ خروجی خام { count, items } یا در خطا None. API حداکثر ۳۰ نتیجه برمی‌گرداند."""
+def _parse_search(resp):
+    if resp.status_code != 200:
+        logger.debug("Neshan search HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    return resp.json()
+
+
+def search_call(term, lat_f, lng_f):
+    """یک درخواست GET به API جستجو (NeshanCall)؛ خروجی خام { count, items } یا در خطا None. API حداکثر ۳۰ نتیجه برمی‌گرداند."""
     if not is_configured():
         return None
-    api_key = get_api_key()
-    try:
-        import requests
-        url = f"{NESHAN_API_BASE.rstrip('/')}{NESHAN_SEARCH_PATH}"
-        params = {"term": term, "lat": lat_f, "lng": lng_f}
-        headers = {"Api-Key": api_key}
-        resp = requests.get(url, params=params, headers=headers, timeout=10)
-        if resp.status_code != 200:
-            logger.debug("Neshan search HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        return resp.json()
-    except Exception as e:
-        logger.debug("Neshan search failed: %s", e)
+    params = {"term": term, "lat": lat_f, "lng": lng_f}
+    return NeshanCall("GET", NESHAN_SEARCH_PATH, "search", _parse_search, params=params, api_key=get_api_key())
+
+
+def _search_raw(term, lat_f, lng_f):
+    call = search_call(term, lat_f, lng_f)
+    return call.run() if call is not None else None
+
+
+def search_query(query, lat=None, lng=None, limit=30):
+    """نرمال‌سازی ورودی جستجو؛ خروجی (term, lat_f, lng_f, limit) یا None برای عبارت خالی."""
+    term = (query or "").strip()
+    if not term:
         return None
+    lat_val = lat if lat is not None else DEFAULT_LAT
+    lng_val = lng if lng is not None else DEFAULT_LNG
+    try:
+        lat_f = float(lat_val)
+        lng_f = float(lng_val)
+    except (TypeError, ValueError):
+        lat_f, lng_f = DEFAULT_LAT, DEFAULT_LNG
+    return term, lat_f, lng_f, min(30, max(1, int(limit)))
 
 
 def search_autocomplete(query, lat=None, lng=None, limit=10):
@@ -50,18 +66,15 @@ def search_response(query, lat=None, lng=None, limit=30):
     جستجوی مکان‌مبنا با یک درخواست؛ خروجی مطابق مستندات: { count, items }.
     items هر کدام: title, address, neighbourhood, region, type, category, location: { x: lng, y: lat }, lat, lng.
     """
-    term = (query or "").strip()
-    if not term:
+    query = search_query(query, lat=lat, lng=lng, limit=limit)
+    if query is None:
         return {"count": 0, "items": []}
-    lat_val = lat if lat is not None else DEFAULT_LAT
-    lng_val = lng if lng is not None else DEFAULT_LNG
-    try:
-        lat_f = float(lat_val)
-        lng_f = float(lng_val)
-    except (TypeError, ValueError):
-        lat_f, lng_f = DEFAULT_LAT, DEFAULT_LNG
-    limit = min(30, max(1, int(limit)))
-    data = _search_raw(term, lat_f, lng_f)
+    term, lat_f, lng_f, limit = query
+    return shape_search_response(_search_raw(term, lat_f, lng_f), limit)
+
+
+def shape_search_response(data, limit):
+    """تبدیل پاسخ خام API جستجو به { count, items } با حداکثر limit آیتم."""
     if not data:
         return {"count": 0, "items": []}
     count = int(data.get("count", 0))
@@ -3,20 +3,21 @@
 # Endpoint: GET https://api.neshan.org/v3/trip
 
 import logging
-from .config import get_api_key, is_configured, NESHAN_API_BASE, NESHAN_TSP_PATH
+from .client import NeshanCall
+from .config import get_api_key, is_configured, NESHAN_TSP_PATH
 
 logger = logging.getLogger(__name__)
 
 
-def fetch_tsp(waypoints, round_trip=True, source_is_any_point=True, last_is_any_point=True):
-    """
-    ترتیب بهینهٔ بازدید از نقاط (TSP).
-    waypoints: لیست نقاط، هر نقطه (lat, lng) یا شیء با .lat/.lng یا رشتهٔ "lat,lng|lat,lng".
-    round_trip: بازگشت به نقطهٔ شروع (پیش‌فرض True).
-    source_is_any_point: انتخاب بهینهٔ مبدأ از بین نقاط (پیش‌فرض True).
-    last_is_any_point: انتخاب بهینهٔ مقصد از بین نقاط (پیش‌فرض True).
-    خروجی: لیست نقاط به ترتیب بهینه، هر عنصر {"name", "location": [lng, lat], "index"}؛ در صورت خطا None.
-    """
+def _parse_tsp(resp):
+    if resp.status_code != 200:
+        logger.debug("Neshan TSP HTTP %s: %s", resp.status_code, resp.text[:200])
+        return None
+    return resp.json().get("points")
+
+
+def tsp_call(waypoints, round_trip=True, source_is_any_point=True, last_is_any_point=True):
+    """درخواست TSP (NeshanCall)؛ None اگر نشان تنظیم نشده یا کمتر از دو نقطه باشد."""
     if not is_configured():
         return None
     api_key = get_api_key()
@@ -43,23 +44,26 @@ def fetch_tsp(waypoints, round_trip=True, source_is_any_point=True, last_is_any_
         if len(parts) < 2:
             return None
         waypoints_str = "|".join(parts)
-    try:
-        import requests
-        url = f"{NESHAN_API_BASE.rstrip('/')}{NESHAN_TSP_PATH}"
-        params = {"waypoints": waypoints_str}
-        if round_trip is not None:
-            params["roundTrip"] = "true" if round_trip else "false"
-        if source_is_any_point is not None:
-            params["sourceIsAnyPoint"] = "true" if source_is_any_point else "false"
-        if last_is_any_point is not None:
-            params["lastIsAnyPoint"] = "true" if last_is_any_point else "false"
-        headers = {"Api-Key": api_key}
-        resp = requests.get(url, params=params, headers=headers, timeout=15)
-        if resp.status_code != 200:
-            logger.debug("Neshan TSP HTTP %s: %s", resp.status_code, resp.text[:200])
-            return None
-        data = resp.json()
-        return data.get("points")
-    except Exception as e:
-        logger.debug("Neshan TSP failed: %s", e)
-        return None
+    params = {"waypoints": waypoints_str}
+    if round_trip is not None:
+        params["roundTrip"] = "true" if round_trip else "false"
+    if source_is_any_point is not None:
+        params["sourceIsAnyPoint"] = "true" if source_is_any_point else "false"
+    if last_is_any_point is not None:
+        params["lastIsAnyPoint"] = "true" if last_is_any_point else "false"
+    return NeshanCall("GET", NESHAN_TSP_PATH, "tsp", _parse_tsp, params=params, api_key=api_key)
+
+
+def fetch_tsp(waypoints, round_trip=True, source_is_any_point=True, last_is_any_point=True):
+    """
+    ترتیب بهینهٔ بازدید از نقاط (TSP).
+    waypoints: لیست نقاط، هر نقطه (lat, lng) یا شیء با .lat/.lng یا رشتهٔ "lat,lng|lat,lng".
+    round_trip: بازگشت به نقطهٔ شروع (پیش‌فرض True).
+    source_is_any_point: انتخاب بهینهٔ مبدأ از بین نقاط (پیش‌فرض True).
+    last_is_any_point: انتخاب بهینهٔ مقصد از بین نقاط (پیش‌فرض True).
+    خروجی: لیست نقاط به ترتیب بهینه، هر عنصر {"name", "location": [lng, lat], "index"}؛ در صورت خطا None.
+    """
+    call = tsp_call(
+        waypoints, round_trip=round_trip, source_is_any_point=source_is_any_point, last_is_any_point=last_is_any_point,
+    )
+    return call.run() if call is not None else None
@@ -0,0 +1,101 @@
+# خلاصهٔ امتیازها (rating aggregates) برای مکان‌ها و رویدادهای تیم ۱۳
+# به‌جای محاسبهٔ AVG روی جدول نظرات در هر درخواست، تعداد/مجموع/میانگین امتیاز روی خود
+# Place و Event نگه داشته می‌شود. فقط نظرات تأییدشده‌ای که rating دارند شمرده می‌شوند.
+# به‌روزرسانی با عبارت F در خود دیتابیس انجام می‌شود تا ثبت هم‌زمان امتیازها گم نشود.
+
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast
+
+from .data_version import PLACES, bump_data_version
+from .models import Comment, Event, Place
+
+TEAM13_DB = "team13"
+BATCH_SIZE = 500
+
+
+def _target_model(target_type):
+    if target_type == Comment.TargetType.PLACE:
+        return Place, "place_id"
+    if target_type == Comment.TargetType.EVENT:
+        return Event, "event_id"
+    return None, None
+
+
+def apply_rating(target_type, target_id, rating, delta=1, using=TEAM13_DB):
+    """
+    افزودن (delta=1) یا کم کردن (delta=-1) یک امتیاز از خلاصهٔ هدف.
+    میانگین در همان UPDATE از مقادیر جدید count/sum محاسبه می‌شود.
+    """
+    model, pk_field = _target_model(target_type)
+    if model is None or rating is None:
+        return 0
+    new_count = F("rating_count") + delta
+    new_sum = F("rating_sum") + delta * int(rating)
+    qs = model.objects.using(using).filter(**{pk_field: target_id})
+    if delta < 0:
+        qs = qs.filter(rating_count__gte=-delta)
+    updated = qs.update(
+        rating_count=new_count,
+        rating_sum=new_sum,
+        avg_rating=Case(
+            When(rating_count__lte=-delta, then=Value(0.0)),
+            default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+            output_field=FloatField(),
+        ),
+    )
+    if updated and model is Place:
+        # امتیاز مکان در لایهٔ نقشه نمایش داده می‌شود
+        bump_data_version(PLACES, using=using)
+    return updated
+
+
+def counts_toward_rating(comment):
+    """آیا این نظر در میانگین امتیاز شمرده می‌شود (تأییدشده و دارای rating)."""
+    return bool(comment.is_approved) and comment.rating is not None
+
+
+def record_comment(comment, using=TEAM13_DB):
+    """پس از ثبت یا تأیید یک نظر فراخوانی می‌شود."""
+    if counts_toward_rating(comment):
+        apply_rating(comment.target_type, comment.target_id, comment.rating, 1, using=using)
+
+
+def forget_comment(comment, using=TEAM13_DB):
+    """پیش از حذف (یا لغو تأیید) یک نظر فراخوانی می‌شود."""
+    if counts_toward_rating(comment):
+        apply_rating(comment.target_type, comment.target_id, comment.rating, -1, using=using)
+
+
+def rebuild_ratings(using=TEAM13_DB):
+    """
+    بازسازی کامل خلاصه‌ها از جدول نظرات (برای مهاجرت، بارگذاری داده یا اصلاح ناهمخوانی).
+    خروجی: (تعداد مکان‌های دارای امتیاز، تعداد رویدادهای دارای امتیاز).
+    """
+    rows = (
+        Comment.objects.using(using)
+        .filter(is_approved=True, rating__isnull=False)
+        .values("target_type", "target_id")
+        .annotate(n=Count("rating"), total=Sum("rating"), avg=Avg("rating"))
+    )
+    by_type = {Comment.TargetType.PLACE: {}, Comment.TargetType.EVENT: {}}
+    for row in rows:
+        if row["target_type"] in by_type:
+            by_type[row["target_type"]][row["target_id"]] = row
+
+    result = []
+    for target_type, stats in by_type.items():
+        model, pk_field = _target_model(target_type)
+        manager = model.objects.using(using)
+        manager.filter(rating_count__gt=0).update(rating_count=0, rating_sum=0, avg_rating=0.0)
+        ids = list(stats)
+        for start in range(0, len(ids), BATCH_SIZE):
+            objs = list(manager.filter(**{f"{pk_field}__in": ids[start:start + BATCH_SIZE]}).only(pk_field))
+            for obj in objs:
+                row = stats[getattr(obj, pk_field)]
+                obj.rating_count = row["n"]
+                obj.rating_sum = row["total"]
+                obj.avg_rating = float(row["avg"])
+            manager.bulk_update(objs, ["rating_count", "rating_sum", "avg_rating"])
+        result.append(len(ids))
+    bump_data_version(PLACES, using=using)
+    return tuple(result)
@@ -0,0 +1,136 @@
+# کلید، TTL و شکل ذخیره‌شدهٔ کش نتیجهٔ مسیریابی نشان (کش "route"؛ استفاده در routing_engine.CachedRouteProvider)
+# کلید: مبدأ و مقصد گردشده، نوع سفر، نوع وسیله، گزینه‌های اجتناب/بدون ترافیک/مسیر جایگزین و bearing.
+# TTL وابسته به نوع مسیر است: مسیر خودرو با ترافیک زود کهنه می‌شود، مسیر پیاده و بدون ترافیک دیر.
+# فقط بخش‌های لازم پاسخ (فاصله، زمان، polyline و خلاصهٔ stepها) ذخیره می‌شود. پاسخ به کلاینت با
+# shape_geometry ساخته می‌شود: فقط overview_polyline (در صورت درخواست ساده‌شده) و stepها فقط با steps=1.
+
+from django.conf import settings
+
+from core.polyline import decode, encode, simplify, tolerance_for_zoom
+
+from .neshan.cache import coord_key
+
+ROUTE_CACHE_PRECISION = 4
+# TTL (ثانیه) برای هر نوع مسیر؛ با TEAM13_ROUTE_CACHE_TTL قابل تغییر است
+DEFAULT_ROUTE_TTL_SECONDS = {
+    "traffic": 5 * 60,
+    "no_traffic": 24 * 60 * 60,
+    "pedestrian": 7 * 24 * 60 * 60,
+}
+NESHAN_TRAVEL_MODES = ("car", "motorcycle", "walk")
+STEP_FIELDS = ("name", "instruction", "polyline")
+
+
+def route_kind(travel_mode, no_traffic=False):
+    """نوع مسیر برای انتخاب endpoint و TTL: traffic، no_traffic یا pedestrian."""
+    if travel_mode == "walk":
+        return "pedestrian"
+    if travel_mode == "car" and no_traffic:
+        return "no_traffic"
+    return "traffic"
+
+
+def route_ttl(kind):
+    ttls = dict(DEFAULT_ROUTE_TTL_SECONDS, **(getattr(settings, "TEAM13_ROUTE_CACHE_TTL", None) or {}))
+    return ttls[kind]
+
+
+def _vehicle_type(travel_mode, route_options):
+    if travel_mode == "walk":
+        return "pedestrian"
+    return route_options.get("vehicle_type") or ("motorcycle" if travel_mode == "motorcycle" else "car")
+
+
+def route_cache_key(lat_src, lng_src, lat_dest, lng_dest, travel_mode, **route_options):
+    """کلید کش: مختصات گردشده به‌همراه همهٔ گزینه‌هایی که مسیر برگشتی را تغییر می‌دهند."""
+    precision = getattr(settings, "TEAM13_ROUTE_CACHE_PRECISION", ROUTE_CACHE_PRECISION)
+    flags = "".join(
+        "1" if route_options.get(name) else "0"
+        for name in ("avoid_traffic_zone", "avoid_odd_even_zone", "no_traffic", "alternative")
+    )
+    bearing = route_options.get("bearing")
+    return "|".join([
+        coord_key(lat_src, lng_src, precision),
+        coord_key(lat_dest, lng_dest, precision),
+        travel_mode,
+        _vehicle_type(travel_mode, route_options),
+        flags,
+        "" if bearing is None else str(int(bearing)),
+    ])
+
+
+def compact_geometry(route):
+    """
+    نسخهٔ فشردهٔ routes[0] نشان: overview_polyline و برای هر leg فاصله/زمان و stepها
+    (فقط name، instruction، polyline و مقدار فاصله/زمان). decodeRouteGeometry در فرانت با همین کار می‌کند.
+    """
+    if not isinstance(route, dict):
+        return None
+    out = {}
+    overview = route.get("overview_polyline")
+    if isinstance(overview, dict) and overview.get("points"):
+        out["overview_polyline"] = {"points": overview["points"]}
+    elif isinstance(overview, str) and overview:
+        out["overview_polyline"] = {"points": overview}
+    legs = []
+    for leg in route.get("legs") or []:
+        steps = []
+        for step in leg.get("steps") or []:
+            item = {k: step[k] for k in STEP_FIELDS if step.get(k)}
+            for k in ("distance", "duration"):
+                value = (step.get(k) or {}).get("value")
+                if value is not None:
+                    item[k] = {"value": value}
+            steps.append(item)
+        compact_leg = {"steps": steps}
+        for k in ("distance", "duration"):
+            value = (leg.get(k) or {}).get("value")
+            if value is not None:
+                compact_leg[k] = {"value": value}
+        legs.append(compact_leg)
+    if legs:
+        out["legs"] = legs
+    return out or None
+
+
+# بیشترین/کمترین zoom نقشه که برای تعیین تلورانس ساده‌سازی پذیرفته می‌شود
+MIN_ZOOM, MAX_ZOOM = 0, 22
+
+
+def route_points(geometry):
+    """نقاط (lat, lng) مسیر از overview_polyline یا در نبود آن از polyline پشت‌سرهم stepها."""
+    overview = (geometry.get("overview_polyline") or {}).get("points")
+    if overview:
+        return decode(overview)
+    points = []
+    for leg in geometry.get("legs") or []:
+        for step in leg.get("steps") or []:
+            if step.get("polyline"):
+                step_points = decode(step["polyline"])
+                # نقطهٔ پایان هر step همان شروع step بعدی است
+                points.extend(step_points[1:] if points and step_points and step_points[0] == points[-1] else step_points)
+    return points
+
+
+def shape_geometry(geometry, steps=False, tolerance_m=None, zoom=None):
+    """
+    route_geometry پاسخ از geometry کش‌شده: {"overview_polyline": {"points": ...}} و با steps=True
+    legs و stepها. tolerance_m (متر) یا zoom نقشه (تلورانس حدود یک پیکسل) overview را با Douglas–Peucker
+    ساده می‌کند؛ بدون آن‌ها polyline اصلی بدون decode برمی‌گردد.
+    """
+    if not geometry:
+        return None
+    overview = (geometry.get("overview_polyline") or {}).get("points")
+    if overview is None or tolerance_m or zoom is not None:
+        try:
+            points = route_points(geometry)
+        except ValueError:
+            points = []
+        if points and zoom is not None and not tolerance_m:
+            tolerance_m = tolerance_for_zoom(min(MAX_ZOOM, max(MIN_ZOOM, zoom)), points[0][0])
+        if points:
+            overview = encode(simplify(points, tolerance_m) if tolerance_m else points)
+    out = {"overview_polyline": {"points": overview}} if overview else {}
+    if steps and geometry.get("legs"):
+        out["legs"] = geometry["legs"]
+    return out or None
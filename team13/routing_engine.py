@@ -0,0 +1,307 @@
+# موتور مسیریابی تیم ۱۳: انتخاب provider، زنجیرهٔ جایگزین، زمان‌سنجی و شکل یکسان نتیجه
+# providerها به ترتیب TEAM13_ROUTING_PROVIDERS امتحان می‌شوند و اولین نتیجه برمی‌گردد:
+#   neshan / neshan_no_traffic / neshan_pedestrian — API مسیریابی نشان (هر کدام برای یک نوع مسیر)، پشت کش route_cache
+#   haversine — برآورد محلی از فاصلهٔ خط مستقیم و سرعت تقریبی هر نوع سفر؛ همیشه جواب می‌دهد و همیشه در زنجیره است.
+# هر provider نسخهٔ هم‌گام (route) و async (aroute) دارد؛ view هم‌گام و async و batch از یک مسیر کد می‌گذرند.
+
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from core.geo_math import haversine_km
+
+from .neshan.cache import get_cache
+from .route_cache import NESHAN_TRAVEL_MODES, compact_geometry, route_cache_key, route_kind, route_ttl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDERS = ("neshan", "neshan_no_traffic", "neshan_pedestrian", "haversine")
+# سرعت تقریبی (کیلومتر بر دقیقه) برای برآورد haversine؛ با TEAM13_ROUTE_FALLBACK_SPEEDS قابل تغییر است
+DEFAULT_FALLBACK_SPEEDS_KM_PER_MIN = {"car": 0.5, "motorcycle": 0.5, "walk": 0.08}
+DEFAULT_FALLBACK_SPEED_KM_PER_MIN = 0.4
+# حداکثر درخواست هم‌زمان به نشان در RoutingEngine.aroute_many (TEAM13_ROUTE_BATCH_CONCURRENCY)
+DEFAULT_BATCH_CONCURRENCY = 8
+
+
+class RouteQuery:
+    """یک درخواست مسیر: مبدأ، مقصد، نوع سفر و گزینه‌های API مسیریابی نشان (vehicle_type، no_traffic، ...)."""
+
+    __slots__ = ("lat_src", "lng_src", "lat_dest", "lng_dest", "travel_mode", "options")
+
+    def __init__(self, lat_src, lng_src, lat_dest, lng_dest, travel_mode="car", **options):
+        self.lat_src = lat_src
+        self.lng_src = lng_src
+        self.lat_dest = lat_dest
+        self.lng_dest = lng_dest
+        self.travel_mode = travel_mode
+        self.options = options
+
+    @property
+    def kind(self):
+        return route_kind(self.travel_mode, self.options.get("no_traffic", False))
+
+    def cache_key(self):
+        return route_cache_key(self.lat_src, self.lng_src, self.lat_dest, self.lng_dest, self.travel_mode, **self.options)
+
+
+class RouteResult:
+    """نتیجهٔ مسیر: فاصله (کیلومتر)، زمان (ثانیه)، geometry فشرده (یا None) و نام provider پاسخ‌دهنده."""
+
+    __slots__ = ("distance_km", "duration_s", "geometry", "source")
+
+    def __init__(self, distance_km, duration_s, geometry=None, source=None):
+        self.distance_km = distance_km
+        self.duration_s = duration_s
+        self.geometry = geometry
+        self.source = source
+
+    @property
+    def eta_minutes(self):
+        return max(1, round(self.duration_s / 60.0))
+
+
+class RouteProvider:
+    """
+    پایهٔ providerها. route(query) و aroute(query, gate) خروجی dict با distance_km، duration_s و geometry
+    یا None (پشتیبانی نشده/خطا) دارند. gate (asyncio.Semaphore) تعداد فراخوانی هم‌زمان شبکه را محدود می‌کند.
+    """
+
+    name = None
+
+    def supports(self, query):
+        return True
+
+    def route(self, query):
+        raise NotImplementedError
+
+    async def aroute(self, query, gate=None):
+        return self.route(query)
+
+
+class NeshanRouteProvider(RouteProvider):
+    """API مسیریابی نشان برای یک نوع مسیر (traffic، no_traffic یا pedestrian)."""
+
+    FUNCTIONS = {
+        "traffic": "fetch_route_eta",
+        "no_traffic": "fetch_route_eta_no_traffic",
+        "pedestrian": "fetch_route_eta_pedestrian",
+    }
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+
+    def supports(self, query):
+        return query.travel_mode in NESHAN_TRAVEL_MODES and query.kind == self.kind
+
+    def _request(self, query):
+        options = query.options
+        kwargs = {"alternative": options.get("alternative", False), "bearing": options.get("bearing")}
+        if self.kind != "pedestrian":
+            kwargs["avoid_traffic_zone"] = options.get("avoid_traffic_zone", False)
+            kwargs["avoid_odd_even_zone"] = options.get("avoid_odd_even_zone", False)
+        if self.kind == "traffic":
+            kwargs["vehicle_type"] = options.get("vehicle_type") or (
+                "motorcycle" if query.travel_mode == "motorcycle" else "car"
+            )
+        args = (query.lng_src, query.lat_src, query.lng_dest, query.lat_dest)
+        return self.FUNCTIONS[self.kind], args, kwargs
+
+    @staticmethod
+    def _value(dist_km, dur_sec, route):
+        if dist_km is None or dur_sec is None:
+            return None
+        return {"distance_km": dist_km, "duration_s": dur_sec, "geometry": compact_geometry(route)}
+
+    def route(self, query):
+        from . import neshan
+
+        name, args, kwargs = self._request(query)
+        return self._value(*getattr(neshan, name)(*args, **kwargs))
+
+    async def aroute(self, query, gate=None):
+        from .neshan import aio
+
+        name, args, kwargs = self._request(query)
+        async with gate or contextlib.nullcontext():
+            return self._value(*await getattr(aio, name)(*args, **kwargs))
+
+
+class CachedRouteProvider(RouteProvider):
+    """
+    provider دیگری را پشت کش "route" قرار می‌دهد: کلید route_cache_key و TTL وابسته به نوع مسیر.
+    hit کش منتظر gate نمی‌ماند؛ نتیجهٔ None کش نمی‌شود.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+
+    def supports(self, query):
+        return self.inner.supports(query)
+
+    def route(self, query):
+        return get_cache("route").get_or_fetch(
+            query.cache_key(), lambda: self.inner.route(query), ttl=route_ttl(query.kind),
+        )
+
+    async def aroute(self, query, gate=None):
+        cache = get_cache("route")
+        key = query.cache_key()
+        value = await cache.aget(key)
+        if value is None:
+            value = await self.inner.aroute(query, gate)
+            await cache.aset(key, value, ttl=route_ttl(query.kind))
+        return value
+
+
+class HaversineRouteProvider(RouteProvider):
+    """برآورد محلی: فاصلهٔ خط مستقیم و سرعت تقریبی هر نوع سفر (TEAM13_ROUTE_FALLBACK_SPEEDS، کیلومتر بر دقیقه)."""
+
+    name = "haversine"
+
+    def speed_km_per_min(self, travel_mode):
+        speeds = dict(
+            DEFAULT_FALLBACK_SPEEDS_KM_PER_MIN, **(getattr(settings, "TEAM13_ROUTE_FALLBACK_SPEEDS", None) or {})
+        )
+        return speeds.get(travel_mode, DEFAULT_FALLBACK_SPEED_KM_PER_MIN)
+
+    def route(self, query):
+        dist_km = haversine_km(query.lat_src, query.lng_src, query.lat_dest, query.lng_dest)
+        return {
+            "distance_km": dist_km,
+            "duration_s": dist_km / self.speed_km_per_min(query.travel_mode) * 60.0,
+            "geometry": None,
+        }
+
+
+PROVIDERS = {
+    "neshan": lambda: CachedRouteProvider(NeshanRouteProvider("neshan", "traffic")),
+    "neshan_no_traffic": lambda: CachedRouteProvider(NeshanRouteProvider("neshan_no_traffic", "no_traffic")),
+    "neshan_pedestrian": lambda: CachedRouteProvider(NeshanRouteProvider("neshan_pedestrian", "pedestrian")),
+    "haversine": HaversineRouteProvider,
+}
+
+
+class RoutingEngine:
+    """
+    زنجیرهٔ providerها: route(query) / aroute(query) اولین نتیجهٔ provider پشتیبان را برمی‌گرداند
+    (استثنای provider مانند None به provider بعدی می‌رود). زمان هر فراخوانی در stats() جمع می‌شود.
+    """
+
+    def __init__(self, providers):
+        self.providers = list(providers)
+        self._stats = {p.name: {"calls": 0, "results": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0} for p in self.providers}
+        self._lock = threading.Lock()
+
+    def providers_for(self, query):
+        return [p for p in self.providers if p.supports(query)]
+
+    def _record(self, name, started, value=None, error=False):
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats["results"] += value is not None
+            stats["errors"] += error
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def route(self, query):
+        """RouteResult یا None اگر هیچ provider پاسخی نداشت."""
+        for provider in self.providers_for(query):
+            started = time.perf_counter()
+            try:
+                value = provider.route(query)
+            except Exception as e:
+                logger.warning("Routing provider %s failed: %s", provider.name, e)
+                self._record(provider.name, started, error=True)
+                continue
+            self._record(provider.name, started, value)
+            if value is not None:
+                return RouteResult(value["distance_km"], value["duration_s"], value["geometry"], provider.name)
+        return None
+
+    async def aroute(self, query, gate=None):
+        """نسخهٔ async route؛ gate (اختیاری) فراخوانی‌های شبکه را محدود می‌کند."""
+        for provider in self.providers_for(query):
+            started = time.perf_counter()
+            try:
+                value = await provider.aroute(query, gate)
+            except Exception as e:
+                logger.warning("Routing provider %s failed: %s", provider.name, e)
+                self._record(provider.name, started, error=True)
+                continue
+            self._record(provider.name, started, value)
+            if value is not None:
+                return RouteResult(value["distance_km"], value["duration_s"], value["geometry"], provider.name)
+        return None
+
+    async def aroute_many(self, queries, concurrency=None):
+        """
+        چند مسیر با هم، هم‌ترتیب با queries. درخواست‌های هم‌کلید یک بار حساب می‌شوند، hitهای کش فوراً
+        برمی‌گردند و باقی هم‌زمان با حداکثر concurrency فراخوانی باز (TEAM13_ROUTE_BATCH_CONCURRENCY).
+        """
+        if concurrency is None:
+            concurrency = getattr(settings, "TEAM13_ROUTE_BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY)
+        gate = asyncio.Semaphore(max(1, int(concurrency)))
+        unique = {}
+        keys = []
+        for query in queries:
+            key = query.cache_key()
+            unique.setdefault(key, query)
+            keys.append(key)
+        results = await asyncio.gather(*[self.aroute(query, gate) for query in unique.values()])
+        by_key = dict(zip(unique, results))
+        return [by_key[key] for key in keys]
+
+    def stats(self):
+        """شمارنده‌ها و زمان هر provider (میانگین و بیشینه بر حسب میلی‌ثانیه)."""
+        with self._lock:
+            out = {}
+            for name, stats in self._stats.items():
+                stats = dict(stats)
+                stats["avg_ms"] = round(stats["total_ms"] / stats["calls"], 2) if stats["calls"] else None
+                stats["total_ms"] = round(stats["total_ms"], 2)
+                stats["max_ms"] = round(stats["max_ms"], 2)
+                out[name] = stats
+        return out
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def build_routing_engine(names=None):
+    """
+    موتور با providerهای names (پیش‌فرض TEAM13_ROUTING_PROVIDERS)؛ نام ناشناخته ValueError می‌دهد.
+    haversine اگر در فهرست نباشد به انتهای زنجیره اضافه می‌شود تا هر درخواست نتیجه‌ای داشته باشد.
+    """
+    names = list(names or getattr(settings, "TEAM13_ROUTING_PROVIDERS", None) or DEFAULT_PROVIDERS)
+    unknown = [name for name in names if name not in PROVIDERS]
+    if unknown:
+        raise ValueError(f"Unknown routing providers: {', '.join(unknown)}")
+    if "haversine" not in names:
+        names.append("haversine")
+    return RoutingEngine(PROVIDERS[name]() for name in names)
+
+
+def get_routing_engine():
+    """موتور مسیریابی مشترک پردازه."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = build_routing_engine()
+    return _engine
+
+
+def reset_routing_engine():
+    """دور انداختن موتور (مثلاً پس از تغییر TEAM13_ROUTING_PROVIDERS یا در تست‌ها)."""
+    global _engine
+    with _engine_lock:
+        _engine = None
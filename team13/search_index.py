@@ -0,0 +1,366 @@
+# نمایهٔ جستجوی درون‌پردازه‌ای (Search Index) برای تکمیل خودکار search_places
+# نام فارسی/انگلیسی، شهر و نشانی هر مکان پس از یکسان‌سازی فارسی (ي/ك عربی، نیم‌فاصله، اعراب، ارقام)
+# در یک نمایهٔ معکوس نگه داشته می‌شود: سه‌حرفی‌ها (trigram) برای جستجوی زیررشته‌ای و توکن‌ها برای جستجوی پیشوندی.
+# محبوبیت (تعداد مسیرهای ثبت‌شده و میانگین امتیاز) هنگام ساخت با دو کوئری تجمیعی پیش‌محاسبه می‌شود تا
+# هر ضربهٔ کلید بدون join و distinct روی کل جدول پاسخ بگیرد. مانند نمایهٔ مکانی، پس از تأیید پیشنهادها
+# به‌صورت افزایشی به‌روز و پس از TEAM13_SEARCH_INDEX_MAX_AGE ثانیه از دیتابیس بازسازی می‌شود.
+
+import bisect
+import heapq
+import re
+import threading
+import time
+
+from django.conf import settings
+
+TEAM13_DB = "team13"
+
+DEFAULT_MAX_AGE_SECONDS = 300
+DEFAULT_CITY_LIMIT = 10
+
+# حروف عربی و گونه‌های هم‌ارز → حرف فارسی؛ ارقام فارسی/عربی → لاتین
+CHAR_FOLDS = (
+    ("ي", "ی"), ("ى", "ی"), ("ئ", "ی"), ("ك", "ک"), ("ة", "ه"), ("ۀ", "ه"),
+    ("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"), ("ؤ", "و"),
+    *((chr(0x06F0 + d), str(d)) for d in range(10)),
+    *((chr(0x0660 + d), str(d)) for d in range(10)),
+)
+# نویسه‌های حذف‌شونده: اعراب (فتحه، کسره، تشدید، ...)، الف مقصوره کوچک، کشیده (ـ)، نیم‌فاصله و
+# اتصال‌دهنده (تا «کتاب‌خانه» و «کتابخانه» یکسان شوند) و نویسه‌های کنترلی جهت‌نما
+IGNORED_CHARS = (
+    "".join(chr(c) for c in range(0x064B, 0x0660)) + "\u0670\u0640\u200c\u200d\u200e\u200f"
+    + "".join(chr(c) for c in range(0x202A, 0x202F))
+)
+_CHAR_MAP = str.maketrans({**dict(CHAR_FOLDS), **{c: None for c in IGNORED_CHARS}})
+_SEPARATOR_RE = re.compile(r"[\W_]+", re.UNICODE)
+
+# رتبهٔ انطباق: کمتر بهتر
+MATCH_NAME_PREFIX = 0
+MATCH_NAME = 1
+MATCH_OTHER = 2
+
+
+def normalize(text):
+    """
+    یکسان‌سازی متن برای جستجو: حروف عربی به فارسی، حذف اعراب و کشیده، حذف نیم‌فاصله،
+    ارقام فارسی/عربی به لاتین، حروف کوچک و فاصله‌گذاری یکنواخت (نشانه‌گذاری → فاصله).
+    """
+    if not text:
+        return ""
+    text = str(text).translate(_CHAR_MAP).casefold()
+    return " ".join(_SEPARATOR_RE.sub(" ", text).split())
+
+
+def trigrams(text):
+    """مجموعهٔ سه‌حرفی‌های متن یکسان‌شده (متن کوتاه‌تر از ۳ حرف مجموعهٔ تهی دارد)."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchDoc:
+    """یک مکان در نمایهٔ جستجو: فیلدهای خروجی به‌همراه متن یکسان‌شده و محبوبیت."""
+
+    __slots__ = (
+        "place_id", "title", "address", "city", "latitude", "longitude",
+        "names", "fields", "tokens", "route_count", "avg_rating", "_name_text", "_text",
+    )
+
+    def __init__(self, place_id, title, address, city, latitude, longitude, names, fields, route_count=0, avg_rating=0.0):
+        self.place_id = place_id
+        self.title = title
+        self.address = address
+        self.city = city
+        self.latitude = latitude
+        self.longitude = longitude
+        self.names = names
+        self.fields = fields
+        self.tokens = {token for field in fields for token in field.split()}
+        # فیلدها با \n به هم چسبانده می‌شوند تا هر بررسی انطباق یک جستجوی زیررشته‌ای باشد (و از مرز فیلدها نگذرد)
+        self._name_text = "\n" + "\n".join(names)
+        self._text = "\n".join(fields)
+        self.route_count = route_count
+        self.avg_rating = avg_rating
+
+    def match_rank(self, query, query_tokens):
+        """رتبهٔ انطباق query با این مکان یا None: پیشوند نام، درون نام، یا فقط شهر/نشانی."""
+        if query in self._name_text:
+            return MATCH_NAME_PREFIX if "\n" + query in self._name_text else MATCH_NAME
+        if query in self._text:
+            return MATCH_OTHER
+        # چند کلمه به هر ترتیب: هر کلمه پیشوند یکی از توکن‌ها
+        if len(query_tokens) > 1 and all(any(t.startswith(q) for t in self.tokens) for q in query_tokens):
+            name_tokens = {t for name in self.names for t in name.split()}
+            if all(any(t.startswith(q) for t in name_tokens) for q in query_tokens):
+                return MATCH_NAME
+            return MATCH_OTHER
+        return None
+
+    def sort_key(self, rank):
+        return (rank, -self.route_count, -self.avg_rating, self.title)
+
+
+class _CityEntry:
+    __slots__ = ("title", "place_ids", "latitude", "longitude", "anchor_id")
+
+    def __init__(self, title):
+        self.title = title
+        self.place_ids = set()
+        self.latitude = self.longitude = self.anchor_id = None
+
+
+class PlaceSearchIndex:
+    """
+    نمایهٔ معکوس روی متن یکسان‌شدهٔ مکان‌ها.
+    - search: شهرهای منطبق (با نقطهٔ نمایندهٔ هر شهر) و مکان‌های منطبق مرتب بر اساس
+      رتبهٔ انطباق، تعداد مسیر و میانگین امتیاز.
+    """
+
+    def __init__(self):
+        self._docs = {}
+        self._trigrams = {}
+        self._tokens = {}
+        self._sorted_tokens = None
+        self._cities = {}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, doc):
+        """افزودن یا جایگزینی یک مکان در نمایه."""
+        with self._lock:
+            self.discard(doc.place_id)
+            self._docs[doc.place_id] = doc
+            for gram in {g for field in doc.fields for g in trigrams(field)}:
+                self._trigrams.setdefault(gram, set()).add(doc.place_id)
+            for token in doc.tokens:
+                postings = self._tokens.get(token)
+                if postings is None:
+                    postings = self._tokens[token] = set()
+                    self._sorted_tokens = None
+                postings.add(doc.place_id)
+            if doc.city:
+                key = normalize(doc.city)
+                if key:
+                    entry = self._cities.get(key)
+                    if entry is None:
+                        entry = self._cities[key] = _CityEntry(doc.city)
+                    entry.place_ids.add(doc.place_id)
+                    # نقطهٔ نمایندهٔ شهر: شمالی‌ترین مکان آن (مانند پیاده‌سازی پیشین)
+                    if doc.latitude is not None and (entry.latitude is None or doc.latitude > entry.latitude):
+                        entry.latitude, entry.longitude, entry.anchor_id = doc.latitude, doc.longitude, doc.place_id
+
+    def discard(self, place_id):
+        """حذف یک مکان از نمایه (در صورت وجود)."""
+        with self._lock:
+            doc = self._docs.pop(place_id, None)
+            if doc is None:
+                return None
+            for gram in {g for field in doc.fields for g in trigrams(field)}:
+                postings = self._trigrams.get(gram)
+                if postings is not None:
+                    postings.discard(place_id)
+                    if not postings:
+                        del self._trigrams[gram]
+            for token in doc.tokens:
+                postings = self._tokens.get(token)
+                if postings is not None:
+                    postings.discard(place_id)
+                    if not postings:
+                        del self._tokens[token]
+                        self._sorted_tokens = None
+            key = normalize(doc.city) if doc.city else ""
+            entry = self._cities.get(key)
+            if entry is not None:
+                entry.place_ids.discard(place_id)
+                if not entry.place_ids:
+                    del self._cities[key]
+                elif entry.anchor_id == place_id:
+                    anchor = max((self._docs[pid] for pid in entry.place_ids), key=lambda d: d.latitude or float("-inf"))
+                    entry.latitude, entry.longitude, entry.anchor_id = anchor.latitude, anchor.longitude, anchor.place_id
+            return doc
+
+    def record_route(self, *place_ids):
+        """افزایش شمارندهٔ مسیر مکان‌ها پس از ثبت یک RouteLog."""
+        with self._lock:
+            for place_id in place_ids:
+                doc = self._docs.get(str(place_id))
+                if doc is not None:
+                    doc.route_count += 1
+
+    def _prefix_postings(self, prefix):
+        """اجتماع مکان‌های همهٔ توکن‌هایی که با prefix شروع می‌شوند (جستجوی دودویی روی توکن‌های مرتب)."""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._tokens)
+        tokens = self._sorted_tokens
+        out = set()
+        i = bisect.bisect_left(tokens, prefix)
+        while i < len(tokens) and tokens[i].startswith(prefix):
+            out |= self._tokens[tokens[i]]
+            i += 1
+        return out
+
+    def _candidates(self, query, query_tokens):
+        """شناسهٔ مکان‌هایی که ممکن است منطبق باشند (بررسی نهایی با match_rank)."""
+        if len(query) >= 3:
+            postings = sorted((self._trigrams.get(g, set()) for g in trigrams(query)), key=len)
+            found = set(postings[0]).intersection(*postings[1:]) if postings else set()
+        else:
+            found = self._prefix_postings(query)
+        if len(query_tokens) > 1:
+            per_token = sorted((self._prefix_postings(q) for q in query_tokens), key=len)
+            found |= per_token[0].intersection(*per_token[1:])
+        return found
+
+    def search(self, query, limit=30, city_limit=DEFAULT_CITY_LIMIT):
+        """
+        (cities, places) برای متن query:
+        cities لیست (title, lat, lng) شهرهایی که نامشان شامل query است،
+        places لیست SearchDoc مکان‌های منطبق (حداکثر limit).
+        """
+        query = normalize(query)
+        if not query:
+            return [], []
+        query_tokens = query.split()
+        with self._lock:
+            cities = [
+                (entry.title, entry.latitude, entry.longitude)
+                for key, entry in sorted(self._cities.items())
+                if query in key and entry.latitude is not None
+            ][:city_limit]
+            ranked = []
+            for place_id in self._candidates(query, query_tokens):
+                doc = self._docs[place_id]
+                rank = doc.match_rank(query, query_tokens)
+                if rank is not None:
+                    ranked.append((doc.sort_key(rank), doc))
+        return cities, [doc for _, doc in heapq.nsmallest(limit, ranked, key=lambda row: row[0])]
+
+
+def make_doc(place_id, place_type, type_label, city, address, latitude, longitude, names, route_count=0, avg_rating=0.0):
+    """
+    ساخت SearchDoc از فیلدهای یک مکان؛ names لیست (lang, name) ترجمه‌هاست.
+    عنوان: نام فارسی، وگرنه انگلیسی، وگرنه شهر، وگرنه برچسب نوع (مانند پاسخ پیشین search_places).
+    """
+    by_lang = {}
+    for lang, name in names:
+        if name and lang not in by_lang:
+            by_lang[lang] = name
+    title = (by_lang.get("fa") or by_lang.get("en") or city or "").strip() or str(type_label or place_type or "")
+    normalized_names = [n for n in (normalize(name) for _, name in names if name) if n]
+    fields = [n for n in [*normalized_names, normalize(city), normalize(address)] if n]
+    return SearchDoc(
+        place_id=str(place_id),
+        title=title,
+        address=(address or city or "").strip() or title,
+        city=city or "",
+        latitude=latitude,
+        longitude=longitude,
+        names=normalized_names,
+        fields=fields,
+        route_count=route_count,
+        avg_rating=float(avg_rating or 0.0),
+    )
+
+
+def _type_labels():
+    from .models import Place
+
+    return dict(Place._meta.get_field("type").choices)
+
+
+def _route_counts(using, place_ids=None):
+    """تعداد RouteLogهای هر مکان (مبدأ + مقصد) با دو کوئری تجمیعی."""
+    from django.db.models import Count
+
+    from .models import RouteLog
+
+    counts = {}
+    for field in ("source_place", "destination_place"):
+        qs = RouteLog.objects.using(using)
+        if place_ids is not None:
+            qs = qs.filter(**{f"{field}__in": place_ids})
+        for place_id, count in qs.values_list(field).annotate(c=Count("pk")).values_list(field, "c"):
+            counts[str(place_id)] = counts.get(str(place_id), 0) + count
+    return counts
+
+
+def build_search_index(using=TEAM13_DB):
+    """ساخت نمایه با سه کوئری: مکان‌ها، ترجمه‌ها و شمارش تجمیعی مسیرها."""
+    from .models import Place, PlaceTranslation
+
+    names = {}
+    for place_id, lang, name in PlaceTranslation.objects.using(using).values_list("place_id", "lang", "name").iterator():
+        names.setdefault(str(place_id), []).append((lang, name))
+    counts = _route_counts(using)
+    labels = _type_labels()
+    index = PlaceSearchIndex()
+    rows = Place.objects.using(using).values_list(
+        "place_id", "type", "city", "address", "latitude", "longitude", "avg_rating",
+    )
+    for place_id, place_type, city, address, lat, lng, avg_rating in rows.iterator():
+        key = str(place_id)
+        index.add(make_doc(
+            key, place_type, labels.get(place_type), city, address, lat, lng,
+            names.get(key, []), counts.get(key, 0), avg_rating,
+        ))
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _max_age_seconds():
+    return getattr(settings, "TEAM13_SEARCH_INDEX_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+
+
+def get_search_index(using=TEAM13_DB):
+    """نمایهٔ مشترک پردازه؛ در اولین فراخوانی یا پس از منقضی شدن (max age) ساخته می‌شود."""
+    global _index
+    index = _index
+    max_age = _max_age_seconds()
+    if index is not None and (not max_age or time.monotonic() - index.built_at < max_age):
+        return index
+    with _index_lock:
+        index = _index
+        if index is None or (max_age and time.monotonic() - index.built_at >= max_age):
+            index = build_search_index(using=using)
+            _index = index
+    return index
+
+
+def index_place(place, using=TEAM13_DB):
+    """افزودن افزایشی یک مکان (با ترجمه‌ها و شمار مسیرهایش) به نمایه، اگر نمایه قبلاً ساخته شده باشد."""
+    index = _index
+    if index is None:
+        return
+    from .models import PlaceTranslation
+
+    key = str(place.place_id)
+    names = list(PlaceTranslation.objects.using(using).filter(place_id=place.place_id).values_list("lang", "name"))
+    index.add(make_doc(
+        key, place.type, _type_labels().get(place.type), place.city, place.address,
+        place.latitude, place.longitude, names, _route_counts(using, [place.place_id]).get(key, 0), place.avg_rating,
+    ))
+
+
+def unindex_place(place_id):
+    """حذف یک مکان از نمایه (اگر نمایه قبلاً ساخته شده باشد)."""
+    index = _index
+    if index is not None:
+        index.discard(str(place_id))
+
+
+def record_route(source_place_id, destination_place_id):
+    """به‌روزرسانی محبوبیت مبدأ و مقصد پس از ثبت یک مسیر (اگر نمایه قبلاً ساخته شده باشد)."""
+    index = _index
+    if index is not None:
+        index.record_route(source_place_id, destination_place_id)
+
+
+def reset_search_index():
+    """دور انداختن نمایه تا در فراخوانی بعدی از دیتابیس بازسازی شود (مثلاً پس از بارگذاری داده)."""
+    global _index
+    with _index_lock:
+        _index = None
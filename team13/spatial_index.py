@@ -0,0 +1,221 @@
+# نمایهٔ مکانی درون‌پردازه‌ای (Spatial Index) برای مکان‌های تیم ۱۳
+# مکان‌ها در سلول‌های یک شبکهٔ ثابت عرض/طول (grid bucket) نگه داشته می‌شوند تا جستجوی
+# نزدیک‌ترین مکان و جستجوی شعاعی فقط روی چند سلول اطراف نقطه انجام شود، نه روی کل جدول.
+# نمایه یک بار در هر پردازه ساخته می‌شود و پس از تأیید پیشنهاد مکان به‌صورت افزایشی به‌روز می‌شود.
+
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from core.geo_math import distances_km
+
+from .geo_utils import KM_PER_DEG_LAT, bounding_box
+
+TEAM13_DB = "team13"
+
+# اندازهٔ هر سلول شبکه بر حسب درجه (حدود ۱۱ کیلومتر در عرض جغرافیایی)
+CELL_SIZE_DEG = 0.1
+# پس از این مدت (ثانیه) نمایه از دیتابیس بازسازی می‌شود تا تغییرات پردازه‌های دیگر هم دیده شود
+DEFAULT_MAX_AGE_SECONDS = 300
+
+
+class IndexedPlace:
+    """یک مکان در نمایه: فقط فیلدهای لازم برای جستجوی مکانی."""
+
+    __slots__ = ("place_id", "latitude", "longitude", "type")
+
+    def __init__(self, place_id, latitude, longitude, type):
+        self.place_id = place_id
+        self.latitude = latitude
+        self.longitude = longitude
+        self.type = type
+
+
+class PlaceSpatialIndex:
+    """
+    نمایهٔ شبکه‌ای (grid bucket) روی عرض/طول مکان‌ها.
+    - within_radius: همهٔ مکان‌ها در شعاع معین، مرتب بر اساس فاصله.
+    - nearest: k مکان نزدیک (اختیاری با حداکثر شعاع).
+    خروجی هر دو: لیست (distance_km, IndexedPlace).
+    """
+
+    def __init__(self, cell_size_deg=CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self._cells = {}
+        self._by_id = {}
+        self._lock = threading.RLock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def _cell_of(self, lat, lng):
+        return (int(math.floor(lat / self.cell_size_deg)), int(math.floor(lng / self.cell_size_deg)))
+
+    def add(self, place_id, latitude, longitude, place_type=""):
+        """افزودن یا جابه‌جایی یک مکان در نمایه."""
+        try:
+            lat = float(latitude)
+            lng = float(longitude)
+        except (TypeError, ValueError):
+            return
+        key = str(place_id)
+        with self._lock:
+            self.discard(key)
+            item = IndexedPlace(key, lat, lng, place_type or "")
+            self._by_id[key] = item
+            self._cells.setdefault(self._cell_of(lat, lng), []).append(item)
+
+    def discard(self, place_id):
+        """حذف یک مکان از نمایه (در صورت وجود)."""
+        key = str(place_id)
+        with self._lock:
+            item = self._by_id.pop(key, None)
+            if item is None:
+                return
+            cell = self._cell_of(item.latitude, item.longitude)
+            bucket = self._cells.get(cell) or []
+            bucket[:] = [p for p in bucket if p.place_id != key]
+            if not bucket:
+                self._cells.pop(cell, None)
+
+    def _cell_range(self, lat, lng, radius_km):
+        """محدودهٔ سلول‌هایی که کادر محیطی شعاع radius_km را می‌پوشانند."""
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        row_min, col_min = self._cell_of(min_lat, min_lng)
+        row_max, col_max = self._cell_of(max_lat, max_lng)
+        return row_min, row_max, col_min, col_max
+
+    def _candidates(self, row_min, row_max, col_min, col_max):
+        cells = self._cells
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                bucket = cells.get((row, col))
+                if bucket:
+                    yield from bucket
+
+    def within_radius(self, lat, lng, radius_km, types=None):
+        """همهٔ مکان‌ها در شعاع radius_km از (lat, lng)؛ types (اختیاری) نوع‌های مجاز."""
+        if radius_km is None or radius_km < 0:
+            return []
+        type_set = set(types) if types else None
+        with self._lock:
+            items = [
+                item for item in self._candidates(*self._cell_range(lat, lng, radius_km))
+                if type_set is None or item.type in type_set
+            ]
+        out = [(float(d), item) for d, item in zip(self._distances(lat, lng, items), items) if d <= radius_km]
+        out.sort(key=lambda x: x[0])
+        return out
+
+    @staticmethod
+    def _distances(lat, lng, items):
+        if not items:
+            return []
+        return distances_km(lat, lng, [i.latitude for i in items], [i.longitude for i in items])
+
+    def nearest(self, lat, lng, k=1, radius_km=None, types=None):
+        """
+        k مکان نزدیک به (lat, lng). حلقه‌های سلول به‌ترتیب از مرکز گسترش می‌یابند و جستجو وقتی
+        متوقف می‌شود که فاصلهٔ حلقهٔ بعدی از k-امین نتیجه بیشتر باشد.
+        """
+        if k <= 0 or not self._by_id:
+            return []
+        type_set = set(types) if types else None
+        center_row, center_col = self._cell_of(lat, lng)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        # کوتاه‌ترین فاصلهٔ ممکن تا سلول‌های حلقهٔ r (کیلومتر) — کران پایین محافظه‌کارانه
+        ring_step_km = self.cell_size_deg * KM_PER_DEG_LAT * min(1.0, cos_lat)
+        with self._lock:
+            if not self._cells:
+                return []
+            rows = [cell[0] for cell in self._cells]
+            cols = [cell[1] for cell in self._cells]
+            # دورترین حلقه‌ای که هنوز سلول پُری در آن وجود دارد
+            max_ring = max(
+                abs(center_row - min(rows)), abs(max(rows) - center_row),
+                abs(center_col - min(cols)), abs(max(cols) - center_col),
+            )
+            if radius_km is not None:
+                max_ring = min(max_ring, int(math.ceil(radius_km / ring_step_km)) + 1)
+            heap = []  # max-heap با علامت منفی: (-distance, place_id, item)
+            for ring in range(0, max_ring + 1):
+                ring_items = []
+                for row in range(center_row - ring, center_row + ring + 1):
+                    for col in range(center_col - ring, center_col + ring + 1):
+                        if ring and abs(row - center_row) != ring and abs(col - center_col) != ring:
+                            continue
+                        for item in self._cells.get((row, col)) or ():
+                            if type_set is None or item.type in type_set:
+                                ring_items.append(item)
+                for d, item in zip(self._distances(lat, lng, ring_items), ring_items):
+                    d = float(d)
+                    if radius_km is not None and d > radius_km:
+                        continue
+                    entry = (-d, item.place_id, item)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, entry)
+                # سلول‌های حلقه‌های بعدی دست‌کم ring سلول کامل از نقطه فاصله دارند
+                if len(heap) >= k and ring * ring_step_km >= -heap[0][0]:
+                    break
+        return sorted(((-neg_d, item) for neg_d, _, item in heap), key=lambda x: x[0])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _max_age_seconds():
+    return getattr(settings, "TEAM13_SPATIAL_INDEX_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+
+
+def build_place_index(using=TEAM13_DB):
+    """ساخت نمایه از جدول مکان‌ها با یک کوئری (فقط ستون‌های لازم)."""
+    from .models import Place
+
+    index = PlaceSpatialIndex()
+    rows = Place.objects.using(using).values_list("place_id", "latitude", "longitude", "type")
+    for place_id, lat, lng, place_type in rows.iterator():
+        index.add(place_id, lat, lng, place_type)
+    return index
+
+
+def get_place_index(using=TEAM13_DB):
+    """نمایهٔ مشترک پردازه؛ در اولین فراخوانی یا پس از منقضی شدن (max age) ساخته می‌شود."""
+    global _index
+    index = _index
+    max_age = _max_age_seconds()
+    if index is not None and (not max_age or time.monotonic() - index.built_at < max_age):
+        return index
+    with _index_lock:
+        index = _index
+        if index is None or (max_age and time.monotonic() - index.built_at >= max_age):
+            index = build_place_index(using=using)
+            _index = index
+    return index
+
+
+def index_place(place):
+    """افزودن افزایشی یک مکان تازه به نمایه (اگر نمایه قبلاً ساخته شده باشد)."""
+    index = _index
+    if index is not None:
+        index.add(place.place_id, place.latitude, place.longitude, place.type)
+
+
+def unindex_place(place_id):
+    """حذف یک مکان از نمایه (اگر نمایه قبلاً ساخته شده باشد)."""
+    index = _index
+    if index is not None:
+        index.discard(place_id)
+
+
+def reset_place_index():
+    """دور انداختن نمایه تا در فراخوانی بعدی از دیتابیس بازسازی شود (مثلاً پس از بارگذاری داده)."""
+    global _index
+    with _index_lock:
+        _index = None
@@ -110,8 +110,20 @@ const api = {
     if (options.avoid_traffic_zone) params.avoid_traffic_zone = '1';
     if (options.avoid_odd_even_zone) params.avoid_odd_even_zone = '1';
     if (options.alternative) params.alternative = '1';
+    if (options.steps) params.steps = '1';
+    if (options.zoom != null) params.zoom = String(options.zoom);
+    if (options.simplify != null) params.simplify = String(options.simplify);
     return fetchData('routes/', params);
   },
+  /**
+   * چند مسیر در یک درخواست؛ هر آیتم همان پارامترهای routes/ (source_place_id/destination_place_id یا
+   * source_lat/source_lng/dest_lat/dest_lng، travel_mode، no_traffic، ...).
+   * @returns {Promise<{ count: number, results: Array<{ index: number, status: 'ok'|'error' }> }>}
+   */
+  routesBatch: (routes) => {
+    if (!Array.isArray(routes) || routes.length === 0) return Promise.reject(new Error('routes باید آرایه‌ای غیرخالی باشد'));
+    return postJson('routes/batch/', { routes: routes });
+  },
   emergency: (lat, lon, limit = 50, radiusKm = 10) => {
     const params = { lat: String(lat), lon: String(lon), limit: String(limit), radius_km: String(radiusKm) };
     return fetchData('emergency/', params);
@@ -128,6 +140,8 @@ const api = {
     if (options.round_trip !== undefined) params.round_trip = options.round_trip ? '1' : '0';
     if (options.source_is_any_point !== undefined) params.source_is_any_point = options.source_is_any_point ? '1' : '0';
     if (options.last_is_any_point !== undefined) params.last_is_any_point = options.last_is_any_point ? '1' : '0';
+    if (options.engine) params.engine = options.engine;
+    if (options.type) params.type = options.type;
     return fetchData('tsp/', params);
   },
   distanceMatrix: (origins, destinations, options = {}) => {
@@ -142,8 +156,9 @@ const api = {
     const d = toStr(destinations);
     if (!o || !d) return Promise.reject(new Error('origins و destinations الزامی هستند (آرایه یا رشتهٔ lat,lng|...)'));
     const params = { origins: o, destinations: d };
-    if (options.type === 'motorcycle') params.type = 'motorcycle';
+    if (options.type === 'motorcycle' || options.type === 'walk') params.type = options.type;
     if (options.no_traffic) params.no_traffic = '1';
+    if (options.engine) params.engine = options.engine;
     return fetchData('distance-matrix/', params);
   },
   isochrone: (lat, lng, options = {}) => {
@@ -202,15 +217,26 @@ const api = {
   },
 };
 
+/**
+ * Convert a GeoJSON place feature (map/places.geojson) to the place shape used by places/?format=json.
+ * @param {object} feature
+ * @returns {object}
+ */
+function placeFromFeature(feature) {
+  const coords = (feature.geometry && feature.geometry.coordinates) || [];
+  return Object.assign({}, feature.properties, { longitude: coords[0], latitude: coords[1] });
+}
+
 /**
  * Load places and events from backend for map and sidebar.
+ * Places come from the cached GeoJSON layer (ETag; the browser revalidates and usually gets 304).
  * GET requests; no CSRF required.
  * @returns {Promise<{ places: Array, events: Array }>}
  */
 async function loadMapData() {
   const baseUrl = window.location.origin + (API_BASE || '/team13');
   const [placesRes, eventsRes] = await Promise.all([
-    fetch(`${baseUrl}/places/?format=json`, { method: 'GET', headers: { Accept: 'application/json' }, credentials: 'same-origin' }),
+    fetch(`${baseUrl}/map/places.geojson`, { method: 'GET', headers: { Accept: 'application/geo+json' }, credentials: 'same-origin' }),
     fetch(`${baseUrl}/events/?format=json`, { method: 'GET', headers: { Accept: 'application/json' }, credentials: 'same-origin' }),
   ]);
   if (!placesRes.ok) throw new Error('Places fetch failed: ' + placesRes.status);
@@ -218,7 +244,7 @@ async function loadMapData() {
   const placesData = await placesRes.json();
   const eventsData = await eventsRes.json();
   return {
-    places: placesData.places || [],
+    places: (placesData.features || []).map(placeFromFeature),
     events: eventsData.events || [],
   };
 }
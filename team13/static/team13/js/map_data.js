@@ -560,6 +560,7 @@
     });
     if (options && options.no_traffic && travelMode === 'car') params.set('no_traffic', '1');
     if (options && options.bearing != null && options.bearing >= 0 && options.bearing <= 360) params.set('bearing', String(options.bearing));
+    if (options && options.zoom != null) params.set('zoom', String(options.zoom));
     var url = base + '/routes/?' + params.toString();
 
     return fetch(url, { method: 'GET', headers: { Accept: 'application/json' }, credentials: 'same-origin' })
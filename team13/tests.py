@@ -1,6 +1,1208 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import numpy as np
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from team13.load_temp_data import import_hotels
+from team13.models import (
+    City, Comment, Event, EventTranslation, GeocodeJob, HotelDetails, Place, PlaceAmenity, PlaceContribution,
+    PlaceTranslation, Province, RouteContribution, RouteLog,
+)
+from team13 import distance_engine, fts, geocode_queue, isochrones, routing_engine, tsp_solver, views
+from team13.cities import city_id_for_name, city_names, link_places_to_cities, reset_city_names
+from team13.dataset_loader import load_datasets
+from team13.geo_utils import coordinate_address
+from team13.clustering import ClusterIndex, reset_cluster_index
+from team13.map_layer import reset_map_layer
+from team13.neshan import cache as neshan_cache
+from team13.neshan import aio, async_client
+from team13.neshan import client as neshan_client
+from team13.neshan import geocoding, routing
+from team13.ratings import forget_comment, rebuild_ratings, record_comment
+from team13.search_index import PlaceSearchIndex, make_doc, normalize, reset_search_index
+from team13.translations import place_names
+from team13.spatial_index import PlaceSpatialIndex, reset_place_index
+
 
 class TeamPingTests(TestCase):
     def test_ping_requires_auth(self):
         res = self.client.get("/team13/ping/")
         self.assertEqual(res.status_code, 401)
+
+
+class PlaceSpatialIndexTests(TestCase):
+    def test_nearest_and_radius_queries(self):
+        index = PlaceSpatialIndex()
+        index.add("azadi", 35.6997, 51.3380, "entertainment")
+        index.add("milad", 35.7448, 51.3753, "entertainment")
+        index.add("isfahan", 32.6546, 51.6680, "hospital")
+
+        nearest = index.nearest(35.70, 51.34, k=2)
+        self.assertEqual([item.place_id for _, item in nearest], ["azadi", "milad"])
+        self.assertEqual(index.nearest(35.70, 51.34, k=1, types=["hospital"])[0][1].place_id, "isfahan")
+        self.assertEqual(index.nearest(35.70, 51.34, k=1, radius_km=0.05), [])
+
+        within = index.within_radius(35.70, 51.34, 10)
+        self.assertEqual([item.place_id for _, item in within], ["azadi", "milad"])
+        index.discard("azadi")
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.nearest(35.70, 51.34)[0][1].place_id, "milad")
+
+
+class NearbyPlaceViewTests(TestCase):
+    databases = {"default", "team13"}
+
+    @classmethod
+    def setUpTestData(cls):
+        hospital = Place.objects.create(type=Place.PlaceType.HOSPITAL, city="تهران", latitude=35.7000, longitude=51.3400)
+        PlaceTranslation.objects.create(place=hospital, lang="fa", name="بیمارستان آزمایشی")
+        Place.objects.create(type=Place.PlaceType.HOTEL, city="تهران", latitude=35.7003, longitude=51.3402)
+        Place.objects.create(type=Place.PlaceType.CLINIC, city="اصفهان", latitude=32.6546, longitude=51.6680)
+
+    def setUp(self):
+        reset_place_index()
+        self.addCleanup(reset_place_index)
+
+    def test_nearest_place_within_radius(self):
+        res = self.client.get("/team13/nearest-place/", {"lat": 35.7, "lng": 51.34, "radius_km": 0.05})
+        self.assertEqual(res.status_code, 200)
+        place = res.json()["place"]
+        self.assertEqual(place["name_fa"], "بیمارستان آزمایشی")
+        self.assertEqual(place["distance_km"], 0.0)
+
+    def test_emergency_nearby_filters_type_and_radius(self):
+        res = self.client.get("/team13/emergency/", {"lat": 35.7, "lng": 51.34, "radius_km": 10, "format": "json"})
+        self.assertEqual(res.status_code, 200)
+        places = res.json()["emergency_places"]
+        self.assertEqual(len(places), 1)
+        self.assertEqual(places[0]["type"], Place.PlaceType.HOSPITAL)
+
+    def test_place_list_radius_filter_uses_distance_not_rating_rank(self):
+        for i in range(60):
+            far = Place.objects.create(type=Place.PlaceType.HOTEL, city="مشهد", latitude=36.3 + i * 0.001, longitude=59.6)
+            Comment.objects.create(target_type=Comment.TargetType.PLACE, target_id=far.place_id, rating=5)
+        res = self.client.get("/team13/places/", {"lat": 35.7, "lng": 51.34, "max_distance": 1, "format": "json"})
+        self.assertEqual(res.status_code, 200)
+        places = res.json()["places"]
+        self.assertEqual(len(places), 2)
+        self.assertTrue(all(p["distance_km"] <= 1 for p in places))
+
+    def test_place_and_event_radius_filters_agree_at_the_boundary(self):
+        # ≈ ۱٫۰۰۳۴ کیلومتر از مرکز؛ هر دو فهرست فاصله را به دو رقم اعشار گرد می‌کنند
+        Place.objects.create(type=Place.PlaceType.MUSEUM, city="تهران", latitude=35.706, longitude=51.4083)
+        Event.objects.create(
+            start_at="2026-03-01T10:00:00Z", end_at="2026-03-01T12:00:00Z", city="تهران", latitude=35.706, longitude=51.4083,
+        )
+        params = {"lat": 35.7, "lng": 51.4, "max_distance": 1, "format": "json"}
+        self.assertEqual(len(self.client.get("/team13/places/", params).json()["places"]), 1)
+        self.assertEqual(len(self.client.get("/team13/events/", params).json()["events"]), 1)
+
+
+class RatingAggregateTests(TestCase):
+    databases = {"default", "team13"}
+
+    def _comment(self, place, rating, approved=True):
+        comment = Comment.objects.create(
+            target_type=Comment.TargetType.PLACE, target_id=place.place_id, rating=rating, is_approved=approved
+        )
+        record_comment(comment)
+        return comment
+
+    def test_incremental_updates_match_rebuild(self):
+        place = Place.objects.create(type=Place.PlaceType.HOTEL, city="تهران", latitude=35.7, longitude=51.34)
+        self._comment(place, 5)
+        low = self._comment(place, 2)
+        self._comment(place, 1, approved=False)
+        place.refresh_from_db()
+        self.assertEqual((place.rating_count, place.rating_sum, place.avg_rating), (2, 7, 3.5))
+
+        forget_comment(low)
+        low.delete()
+        place.refresh_from_db()
+        self.assertEqual((place.rating_count, place.avg_rating), (1, 5.0))
+
+        Place.objects.filter(pk=place.pk).update(rating_count=9, rating_sum=9, avg_rating=1.0)
+        self.assertEqual(rebuild_ratings(), (1, 0))
+        place.refresh_from_db()
+        self.assertEqual((place.rating_count, place.rating_sum, place.avg_rating), (1, 5, 5.0))
+
+    def test_place_list_orders_and_filters_by_stored_rating(self):
+        good = Place.objects.create(type=Place.PlaceType.HOTEL, city="شیراز", latitude=29.6, longitude=52.5)
+        poor = Place.objects.create(type=Place.PlaceType.HOTEL, city="شیراز", latitude=29.61, longitude=52.5)
+        self._comment(good, 5)
+        self._comment(poor, 2)
+        res = self.client.get("/team13/places/", {"city": "شیراز", "format": "json"})
+        self.assertEqual([p["place_id"] for p in res.json()["places"]], [str(good.place_id), str(poor.place_id)])
+        self.assertEqual(res.json()["places"][0]["rating"], 5.0)
+        res = self.client.get("/team13/places/", {"city": "شیراز", "min_rating": 4, "format": "json"})
+        self.assertEqual([p["place_id"] for p in res.json()["places"]], [str(good.place_id)])
+
+
+class SearchIndexTests(TestCase):
+    databases = {"default", "team13"}
+
+    def setUp(self):
+        reset_search_index()
+        self.addCleanup(reset_search_index)
+
+    def test_normalize_persian_variants(self):
+        self.assertEqual(normalize("كتابخانه ملي"), normalize("کتابخانه ملی"))
+        self.assertEqual(normalize("کتاب\u200cخانه"), "کتابخانه")
+        self.assertEqual(normalize("مَدرِسه"), "مدرسه")
+        self.assertEqual(normalize("خیابان ۱۲ Azadi"), "خیابان 12 azadi")
+
+    def test_index_matches_substring_prefix_and_word_order(self):
+        index = PlaceSearchIndex()
+        index.add(make_doc("a", "museum", "", "تهران", "خیابان ولیعصر", 35.7, 51.4, [("fa", "موزه ملي ايران"), ("en", "National Museum")], 3))
+        index.add(make_doc("b", "museum", "", "تهران", "", 35.8, 51.4, [("fa", "موزه هنرهای معاصر")], 9))
+        index.add(make_doc("c", "hotel", "", "شیراز", "", 29.6, 52.5, [("fa", "هتل ملی")], 1))
+
+        cities, places = index.search("تهر")
+        self.assertEqual(cities, [("تهران", 35.8, 51.4)])
+        self.assertEqual([d.place_id for d in places], ["b", "a"])
+        self.assertEqual([d.place_id for d in index.search("موزه")[1]], ["b", "a"])
+        self.assertEqual([d.place_id for d in index.search("ملی")[1]], ["a", "c"])
+        self.assertEqual([d.place_id for d in index.search("museum nat")[1]], ["a"])
+        self.assertEqual([d.place_id for d in index.search("ولی")[1]], ["a"])
+        index.discard("b")
+        self.assertEqual(index.search("تهران")[0], [("تهران", 35.7, 51.4)])
+
+    def test_search_places_view_uses_index_and_popularity(self):
+        quiet = Place.objects.create(type=Place.PlaceType.HOTEL, city="مشهد", latitude=36.30, longitude=59.60)
+        PlaceTranslation.objects.create(place=quiet, lang="fa", name="هتل پارس")
+        busy = Place.objects.create(type=Place.PlaceType.HOTEL, city="مشهد", latitude=36.31, longitude=59.61)
+        PlaceTranslation.objects.create(place=busy, lang="fa", name="هتل پارسيان")
+        RouteLog.objects.create(source_place=busy, destination_place=quiet, travel_mode="car")
+        RouteLog.objects.create(source_place=busy, destination_place=busy, travel_mode="car")
+
+        res = self.client.get("/team13/search-places/", {"q": "هتل پارس"})
+        self.assertEqual(res.status_code, 200)
+        items = res.json()["items"]
+        self.assertEqual([i["title"] for i in items], ["هتل پارسيان", "هتل پارس"])
+        self.assertEqual(items[0]["city"], "مشهد")
+
+        res = self.client.get("/team13/search-places/", {"q": "مشهد", "limit": 1})
+        items = res.json()["items"]
+        self.assertEqual(items[0], {"item_type": "city", "title": "مشهد", "address": "شهر مشهد", "lat": 36.31, "lng": 59.61})
+        self.assertEqual(len(items), 2)
+
+
+class FullTextSearchTests(TestCase):
+    databases = {"default", "team13"}
+
+    def _event(self, title, description=""):
+        event = Event.objects.create(
+            start_at="2026-03-01T10:00:00Z", end_at="2026-03-01T12:00:00Z", city="تهران", latitude=35.7, longitude=51.4,
+        )
+        EventTranslation.objects.create(event=event, lang="fa", title=title, description=description)
+        return event
+
+    def test_triggers_keep_place_index_in_sync(self):
+        place = Place.objects.create(type=Place.PlaceType.MUSEUM, city="تهران", latitude=35.7, longitude=51.4)
+        trans = PlaceTranslation.objects.create(place=place, lang="fa", name="كتاب‌خانه ملي")
+        self.assertEqual(fts.search_place_ids("کتابخانه ملی"), [place.place_id.hex])
+        self.assertEqual(fts.search_place_ids("کتاب"), [place.place_id.hex])
+
+        trans.name = "موزه ملی"
+        trans.save()
+        self.assertEqual(fts.search_place_ids("کتابخانه"), [])
+        self.assertEqual(fts.search_cities("تهر"), [("تهران", 35.7, 51.4)])
+
+        Place.objects.filter(pk=place.pk).update(city="شیراز")
+        self.assertEqual(fts.search_cities("تهران"), [])
+        self.assertEqual(fts.search_place_ids("شیراز"), [place.place_id.hex])
+        trans.delete()
+        self.assertEqual(fts.search_place_ids("موزه"), [])
+
+    def test_event_list_ranks_match_results(self):
+        weak = self._event("نمایشگاه کتاب", "جشنواره موسیقی در حاشیه")
+        strong = self._event("جشنواره موسیقی فجر")
+        self._event("نمایشگاه نقاشی")
+        res = self.client.get("/team13/events/", {"q": "جشنواره موسيقي", "format": "json"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([e["event_id"] for e in res.json()["events"]], [str(strong.event_id), str(weak.event_id)])
+
+    def test_event_list_search_is_bounded(self):
+        self._event("جشنواره موسیقی فجر")
+        with mock.patch.object(fts, "search_event_ids", wraps=fts.search_event_ids) as search:
+            self.client.get("/team13/events/", {"q": "جشنواره", "format": "json"})
+            self.client.get("/team13/events/", {"q": "جشنواره", "lat": "35.7", "lng": "51.4", "max_distance": "5", "format": "json"})
+        self.assertEqual(
+            [c.kwargs["limit"] for c in search.call_args_list], [views.EVENT_LIST_LIMIT, views.EVENT_SEARCH_FILTERED_LIMIT]
+        )
+
+    @override_settings(TEAM13_SEARCH_BACKEND="fts")
+    def test_search_places_fts_backend_and_rebuild_command(self):
+        place = Place.objects.create(type=Place.PlaceType.HOTEL, city="مشهد", latitude=36.3, longitude=59.6)
+        PlaceTranslation.objects.create(place=place, lang="fa", name="هتل پارس")
+        call_command("rebuild_team13_fts", stdout=io.StringIO())
+        res = self.client.get("/team13/search-places/", {"q": "مشه"})
+        items = res.json()["items"]
+        self.assertEqual([i["item_type"] for i in items], ["city", "place"])
+        self.assertEqual(items[1]["title"], "هتل پارس")
+
+
+class HotelImportTests(TestCase):
+    databases = {"default", "team13"}
+
+    HOTELS = [
+        {"hotel_id": 1, "name_fa": "هتل نائین", "name_en": "Na'in Inn", "stars": 3, "city_name_fa": "نائین",
+         "location": {"latitude": 32.86, "longitude": 53.08}, "amenities": [1, 3], "price_tier": "high"},
+        {"hotel_id": 2, "name_fa": "هتل پارس", "location": {"latitude": 36.3, "longitude": 59.6}, "amenities": [2]},
+        {"hotel_id": 3, "name_fa": "بدون مختصات"},
+    ]
+
+    def test_dry_run_then_idempotent_upsert(self):
+        stats = import_hotels(self.HOTELS, dry_run=True)
+        self.assertEqual((stats["processed"], stats["skipped"]), (3, 1))
+        self.assertEqual(stats["places"]["created"], 2)
+        self.assertEqual(stats["translations"]["created"], 4)
+        self.assertFalse(Place.objects.exists())
+
+        import_hotels(self.HOTELS, batch_size=1)
+        self.assertEqual(Place.objects.count(), 2)
+        self.assertEqual(HotelDetails.objects.get(place__city="نائین").stars, 3)
+        self.assertEqual(PlaceAmenity.objects.count(), 3)
+        self.assertEqual(PlaceTranslation.objects.get(lang="en", place__city="").name, "Hotel")
+
+        changed = [dict(self.HOTELS[0], name_fa="هتل جهانگردی نائین"), self.HOTELS[1]]
+        with self.assertNumQueries(4, using="team13"):
+            stats = import_hotels(self.HOTELS[1:2])
+        self.assertEqual(stats["places"], {"created": 0, "updated": 0, "unchanged": 1})
+        stats = import_hotels(changed)
+        self.assertEqual(stats["translations"], {"created": 0, "updated": 1, "unchanged": 3})
+        self.assertEqual(stats["places"]["unchanged"], 2)
+        self.assertTrue(PlaceTranslation.objects.filter(name="هتل جهانگردی نائین").exists())
+        self.assertEqual(PlaceTranslation.objects.count(), 4)
+
+
+class DatasetLoaderTests(TestCase):
+    databases = {"default", "team13"}
+
+    FILES = {
+        "province.json": [
+            {"province_id": 28, "name_fa": "مرکزی", "name_en": "Markazi", "location": {"latitude": 34.6, "longitude": 49.7}},
+        ],
+        "cities.json": [
+            {"city_id": 1, "name_fa": "اراک", "name_en": "Arak", "province": {"province_id": 28}},
+            {"city_id": 2, "name_fa": "کاشان", "name_en": "Kashan", "province": {"province_id": 99}},
+            {"city_id": 3, "name_fa": "", "name_en": "Nameless"},
+        ],
+        "hotels.json": [
+            {"hotel_id": 1, "name_fa": "هتل اراک", "city_id": 1, "city_name_fa": "اراک",
+             "location": {"latitude": 34.09, "longitude": 49.69}},
+            {"hotel_id": 2, "name_fa": "هتل دور", "city_id": 500, "city_name_fa": "ناشناخته",
+             "location": {"latitude": 30.0, "longitude": 50.0}},
+            "not-a-hotel",
+        ],
+    }
+
+    def setUp(self):
+        reset_city_names()
+        self.addCleanup(reset_city_names)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        for name, items in self.FILES.items():
+            with open(os.path.join(self.folder, name), "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False)
+
+    def test_loads_in_dependency_order_and_links_hotels_to_cities(self):
+        results = load_datasets(self.folder, workers=0)
+        self.assertEqual(list(results), ["provinces", "cities", "hotels"])
+        self.assertEqual(results["cities"]["skipped"], 1)
+        self.assertEqual(results["cities"]["unlinked"], 1)
+        self.assertEqual(results["hotels"]["unlinked"], 1)
+        self.assertEqual((results["hotels"]["processed"], results["hotels"]["skipped"]), (3, 1))
+        self.assertEqual(City.objects.get(pk=1).province, Province.objects.get(pk=28))
+        self.assertIsNone(City.objects.get(pk=2).province_id)
+        self.assertEqual(Place.objects.get(city="اراک").city_ref_id, 1)
+        self.assertIsNone(Place.objects.get(city="ناشناخته").city_ref_id)
+
+        # دوباره، این بار با خواندن در پردازه‌های جدا: همه‌چیز بدون تغییر
+        results = load_datasets(self.folder, workers=2)
+        self.assertEqual(results["cities"]["cities"], {"created": 0, "updated": 0, "unchanged": 2})
+        self.assertEqual(results["hotels"]["places"]["unchanged"], 2)
+        self.assertEqual(results["hotels"]["skipped"], 1)
+
+    def test_hotel_batches_are_not_wrapped_in_one_transaction(self):
+        from django.db import connections
+
+        from team13 import dataset_loader
+
+        depths = []
+
+        def record(*args, **kwargs):
+            depths.append(len(connections["team13"].savepoint_ids))
+            return import_hotels(*args, **kwargs)
+
+        baseline = len(connections["team13"].savepoint_ids)
+        with mock.patch.object(dataset_loader, "import_hotels", side_effect=record):
+            load_datasets(self.folder, workers=0)
+        self.assertEqual(depths, [baseline])
+
+    def test_city_filter_uses_normalized_city(self):
+        load_datasets(self.folder, workers=0)
+        other = Place.objects.create(type=Place.PlaceType.MUSEUM, city="Arak", latitude=34.1, longitude=49.7)
+        self.assertEqual(link_places_to_cities(), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.city_ref_id, 1)
+        self.assertEqual(city_id_for_name(" arak "), 1)
+
+        res = self.client.get("/team13/places/", {"city": "اراک", "format": "json"})
+        self.assertEqual(len(res.json()["places"]), 2)
+        # مکانی که city_ref آن هنوز پر نشده با نام متنی پیدا می‌شود
+        Place.objects.create(type=Place.PlaceType.MUSEUM, city="اراک", latitude=34.1, longitude=49.7)
+        res = self.client.get("/team13/places/", {"city": "اراک", "format": "json"})
+        self.assertEqual(len(res.json()["places"]), 3)
+        res = self.client.get("/team13/places/", {"city_id": 1, "format": "json"})
+        self.assertEqual(len(res.json()["places"]), 2)
+        res = self.client.get("/team13/places/", {"city": "ناشن", "format": "json"})
+        self.assertEqual([p["city"] for p in res.json()["places"]], ["ناشناخته"])
+
+
+class GeocodeQueueTests(TestCase):
+    databases = {"default", "team13"}
+
+    def _fake_geocoder(self):
+        calls = []
+
+        def geocode(lat, lng):
+            calls.append((lat, lng))
+            return f"خیابان {lat:.2f}"
+
+        return geocode, calls
+
+    def test_submit_does_not_call_geocoder_and_worker_enriches(self):
+        request = RequestFactory().post("/team13/route-contribution/", {
+            "source_latitude": 35.7, "source_longitude": 51.4,
+            "destination_latitude": 35.8, "destination_longitude": 51.5,
+        })
+        request.user = mock.Mock(is_authenticated=True, id=None)
+        with mock.patch("team13.neshan.geocoding.reverse_geocode_address", side_effect=AssertionError):
+            res = views.submit_route_contribution(request)
+        self.assertEqual(res.status_code, 200)
+        rc = RouteContribution.objects.get()
+        self.assertIn("35.700000", rc.source_address)
+        self.assertEqual(GeocodeJob.objects.count(), 2)
+        # آدرس مقصد پیش از اجرای worker ویرایش شده و نباید بازنویسی شود
+        RouteContribution.objects.update(destination_address="میدان آزادی")
+
+        geocode, calls = self._fake_geocoder()
+        stats = geocode_queue.drain(geocode=geocode)
+        self.assertEqual((stats["claimed"], stats["enriched"]), (2, 1))
+        self.assertEqual(len(calls), 2)
+        rc.refresh_from_db()
+        self.assertEqual((rc.source_address, rc.destination_address), ("خیابان 35.70", "میدان آزادی"))
+        self.assertFalse(GeocodeJob.objects.exists())
+
+    def test_retries_with_backoff_and_follows_approved_place(self):
+        from team13.moderation import approve_contribution
+
+        contribution = PlaceContribution.objects.create(
+            name_fa="کافه", type=Place.PlaceType.FOOD, address=coordinate_address(29.6, 52.5), latitude=29.6, longitude=52.5,
+        )
+        geocode_queue.enqueue((GeocodeJob.TargetType.PLACE_CONTRIBUTION, contribution.pk, 29.6, 52.5))
+        stats = geocode_queue.process_batch(geocode=lambda lat, lng: None)
+        self.assertEqual(stats["retried"], 1)
+        job = GeocodeJob.objects.get()
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertEqual(geocode_queue.process_batch(geocode=lambda lat, lng: "x")["claimed"], 0)
+
+        place = approve_contribution(contribution.pk)
+        self.assertEqual(place.address, coordinate_address(29.6, 52.5))
+        job.refresh_from_db()
+        self.assertEqual((job.target_type, job.target_id), (GeocodeJob.TargetType.PLACE, place.place_id))
+
+        GeocodeJob.objects.update(next_attempt_at=timezone.now())
+        geocode, _ = self._fake_geocoder()
+        with mock.patch("team13.search_index.index_place") as reindex, self.captureOnCommitCallbacks(using="team13", execute=True):
+            self.assertEqual(geocode_queue.process_batch(geocode=geocode)["enriched"], 1)
+        place.refresh_from_db()
+        self.assertEqual(place.address, "خیابان 29.60")
+        self.assertEqual(reindex.call_args.args[0].address, "خیابان 29.60")
+
+        with override_settings(TEAM13_GEOCODE_MAX_ATTEMPTS=1):
+            geocode_queue.enqueue((GeocodeJob.TargetType.PLACE, place.place_id, 29.6, 52.5))
+            self.assertEqual(geocode_queue.process_batch(geocode=mock.Mock(side_effect=OSError("down")))["failed"], 1)
+        job = GeocodeJob.objects.get()
+        self.assertEqual(job.status, GeocodeJob.Status.FAILED)
+        self.assertIn("OSError", job.last_error)
+
+
+class CsvLoaderTests(TestCase):
+    databases = {"default", "team13"}
+
+    FILES = {
+        "places.csv": (
+            "place_id,type,city,address,latitude,longitude\n"
+            "a0000000-0000-0000-0000-000000000001,museum,تهران,,35.7,51.4\n"
+            "a0000000-0000-0000-0000-000000000002,hotel,تهران,,35.71,51.41\n"
+            "not-a-uuid,hotel,تهران,,35.7,51.4\n"
+        ),
+        "place_translations.csv": (
+            "place_id,lang,name,description\n"
+            "a0000000-0000-0000-0000-000000000001,fa,موزه ملی,\n"
+            "a0000000-0000-0000-0000-000000000009,fa,ناموجود,\n"
+        ),
+        "route_logs.csv": (
+            "source_place_id,destination_place_id,travel_mode,user_id,created_at\n"
+            "a0000000-0000-0000-0000-000000000001,a0000000-0000-0000-0000-000000000002,car,,2025-02-01T12:00:00Z\n"
+        ),
+    }
+
+    def test_loads_in_batches_and_reports_bad_rows(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name, content in self.FILES.items():
+                with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+                    f.write(content)
+            out, err = io.StringIO(), io.StringIO()
+            call_command("loaddata_team13_csv", path=folder, batch_size=1, stdout=out, stderr=err)
+            call_command("loaddata_team13_csv", path=folder, stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertIn("places.csv:4:", err.getvalue())
+        self.assertIn("place_translations.csv:3: unknown place", err.getvalue())
+        self.assertEqual(Place.objects.count(), 2)
+        self.assertEqual(PlaceTranslation.objects.get().name, "موزه ملی")
+        logs = list(RouteLog.objects.all())
+        self.assertEqual(len(logs), 2)
+        self.assertEqual(logs[0].created_at.year, 2025)
+
+
+class TranslationQueryCountTests(TestCase):
+    databases = {"default", "team13"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.places = []
+        for i in range(5):
+            place = Place.objects.create(type=Place.PlaceType.MUSEUM, city="یزد", latitude=31.9 + i * 0.01, longitude=54.36)
+            PlaceTranslation.objects.create(place=place, lang="fa", name=f"موزه {i}")
+            PlaceTranslation.objects.create(place=place, lang="en", name=f"Museum {i}")
+            cls.places.append(place)
+        for i in range(5):
+            event = Event.objects.create(
+                city="یزد", latitude=31.9, longitude=54.36,
+                start_at="2026-01-01T10:00:00Z", end_at="2026-01-01T12:00:00Z",
+            )
+            EventTranslation.objects.create(event=event, lang="fa", title=f"رویداد {i}")
+
+    def test_place_list_query_count_does_not_grow_with_rows(self):
+        # places + translations prefetch (+ is_team13_admin روی کاربر ناشناس کوئری ندارد)؛ نگاشت نام شهرها از پیش ساخته
+        reset_city_names()
+        self.addCleanup(reset_city_names)
+        city_names()
+        with self.assertNumQueries(2, using="team13"):
+            res = self.client.get("/team13/places/", {"city": "یزد", "format": "json"})
+        names = {p["name_en"] for p in res.json()["places"]}
+        self.assertEqual(names, {f"Museum {i}" for i in range(5)})
+
+    def test_event_list_query_count_does_not_grow_with_rows(self):
+        with self.assertNumQueries(2, using="team13"):
+            res = self.client.get("/team13/events/", {"city": "یزد", "format": "json"})
+        self.assertEqual(len(res.json()["events"]), 5)
+        self.assertTrue(all(e["title_fa"] for e in res.json()["events"]))
+
+    def test_place_names_single_query_prefers_fa(self):
+        ids = [p.place_id for p in self.places]
+        with self.assertNumQueries(1, using="team13"):
+            names = place_names(ids)
+        self.assertEqual(names[ids[0]], "موزه 0")
+
+
+class MapLayerViewTests(TestCase):
+    databases = {"default", "team13"}
+    url = "/team13/map/places.geojson"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tehran = Place.objects.create(type=Place.PlaceType.HOTEL, city="تهران", latitude=35.70, longitude=51.34)
+        PlaceTranslation.objects.create(place=cls.tehran, lang="fa", name="هتل تهران")
+        cls.tehran_near = Place.objects.create(type=Place.PlaceType.FOOD, city="تهران", latitude=35.701, longitude=51.341)
+        cls.tabriz = Place.objects.create(type=Place.PlaceType.HOTEL, city="تبریز", latitude=38.08, longitude=46.29)
+
+    def setUp(self):
+        cache.clear()
+        reset_map_layer()
+        self.addCleanup(reset_map_layer)
+
+    def _features(self, res):
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        return json.loads(gzip.decompress(res.content))["features"]
+
+    def test_gzip_collection_with_etag_and_304(self):
+        res = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(res.status_code, 200)
+        features = self._features(res)
+        self.assertEqual(len(features), 3)
+        tehran = next(f for f in features if f["id"] == str(self.tehran.place_id))
+        self.assertEqual(tehran["geometry"]["coordinates"], [51.34, 35.70])
+        self.assertEqual(tehran["properties"]["name_fa"], "هتل تهران")
+
+        etag = res["ETag"]
+        with self.assertNumQueries(1, using="team13"):  # فقط خواندن نسخهٔ داده
+            res = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res["ETag"], etag)
+
+        plain = self.client.get(self.url)
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertNotEqual(plain["ETag"], etag)
+        self.assertEqual(len(json.loads(plain.content)["features"]), 3)
+
+    def test_rating_change_invalidates_etag(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")["ETag"]
+        record_comment(Comment.objects.create(target_type=Comment.TargetType.PLACE, target_id=self.tabriz.place_id, rating=4))
+        res = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        features = self._features(res)
+        self.assertEqual(features[0]["id"], str(self.tabriz.place_id))
+        self.assertEqual(features[0]["properties"]["rating"], 4.0)
+
+    def test_bbox_and_zoom_clipping(self):
+        res = self.client.get(self.url, {"bbox": "51,35,52,36"}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual({f["properties"]["city"] for f in self._features(res)}, {"تهران"})
+        self.assertEqual(len(self._features(res)), 2)
+        res = self.client.get(self.url, {"bbox": "51,35,52,36", "zoom": 5}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(len(self._features(res)), 1)
+        res = self.client.get(self.url, {"bbox": "51,35,52,36", "zoom": 16}, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(len(self._features(res)), 2)
+        self.assertEqual(self.client.get(self.url, {"bbox": "1,2,3"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"zoom": 40}).status_code, 400)
+
+
+class ClusterIndexTests(TestCase):
+    WORLD = (-180, -85, 180, 85)
+
+    def _index(self):
+        index = ClusterIndex()
+        index.load([
+            ("azadi", 35.6997, 51.3380, "entertainment"),
+            ("milad", 35.7448, 51.3753, "entertainment"),
+            ("tabriz", 38.0800, 46.2900, "hotel"),
+        ])
+        return index
+
+    def test_low_zoom_clusters_and_high_zoom_places(self):
+        index = self._index()
+        low = index.get_clusters(self.WORLD, 5)
+        self.assertEqual(sorted(n.count for n in low), [1, 2])
+        tehran = next(n for n in low if n.count == 2)
+        self.assertFalse(tehran.is_place)
+        self.assertGreater(tehran.zoom + 1, 5)
+        high = index.get_clusters(self.WORLD, 18)
+        self.assertEqual(sorted(n.place_id for n in high), ["azadi", "milad", "tabriz"])
+        self.assertEqual([n.place_id for n in index.get_clusters((46, 37, 47, 39), 18)], ["tabriz"])
+
+    def test_incremental_add_keeps_counts_at_every_zoom(self):
+        index = self._index()
+        index.add("tajrish", 35.8040, 51.4330, "entertainment")
+        index.add("tabriz", 38.0800, 46.2900, "hotel")  # تکراری نادیده گرفته می‌شود
+        for zoom in range(0, 18):
+            self.assertEqual(sum(n.count for n in index.get_clusters(self.WORLD, zoom)), 4, zoom)
+        self.assertEqual(max(n.count for n in index.get_clusters(self.WORLD, 5)), 3)
+
+
+class MapClusterViewTests(TestCase):
+    databases = {"default", "team13"}
+
+    @classmethod
+    def setUpTestData(cls):
+        place = Place.objects.create(type=Place.PlaceType.HOTEL, city="تهران", latitude=35.70, longitude=51.34)
+        PlaceTranslation.objects.create(place=place, lang="fa", name="هتل آزمایشی")
+        Place.objects.create(type=Place.PlaceType.HOTEL, city="تهران", latitude=35.705, longitude=51.345)
+
+    def setUp(self):
+        reset_cluster_index()
+        self.addCleanup(reset_cluster_index)
+
+    def test_cluster_then_places(self):
+        res = self.client.get("/team13/map/clusters/", {"bbox": "44,25,63,40", "zoom": 6})
+        self.assertEqual(res.status_code, 200)
+        [feature] = res.json()["features"]
+        self.assertTrue(feature["properties"]["cluster"])
+        self.assertEqual(feature["properties"]["point_count"], 2)
+
+        res = self.client.get("/team13/map/clusters/", {"bbox": "51,35,52,36", "zoom": 17})
+        props = [f["properties"] for f in res.json()["features"]]
+        self.assertEqual(len(props), 2)
+        self.assertIn("هتل آزمایشی", {p["name"] for p in props})
+        self.assertEqual(self.client.get("/team13/map/clusters/", {"zoom": 3}).status_code, 400)
+
+
+class NeshanResponseCacheTests(TestCase):
+    databases = {"default", "team13"}
+
+    def setUp(self):
+        neshan_cache.reset_caches()
+        self.addCleanup(neshan_cache.reset_caches)
+
+    def test_memory_backend_ttl_and_lru(self):
+        backend = neshan_cache.MemoryBackend(max_entries=2)
+        backend.set("a", 1, 60)
+        backend.set("b", 2, 60)
+        backend.get("a")
+        backend.set("c", 3, 60)  # b کم‌استفاده‌ترین است
+        self.assertIs(backend.get("b"), neshan_cache._MISSING)
+        self.assertEqual(backend.get("a"), 1)
+        backend.set("d", 4, 0)
+        self.assertIs(backend.get("d"), neshan_cache._MISSING)
+
+    def test_database_backend_roundtrip(self):
+        cache = neshan_cache.ResponseCache("reverse", neshan_cache.DatabaseBackend(max_entries=1), ttl=60)
+        self.assertEqual(cache.get_or_fetch("35.7,51.3", lambda: {"formatted_address": "تهران"}), {"formatted_address": "تهران"})
+        self.assertEqual(cache.get_or_fetch("35.7,51.3", lambda: self.fail("should be cached")), {"formatted_address": "تهران"})
+        cache.backend.set("reverse:other", {"x": 1}, 60)
+        cache.backend.prune()
+        self.assertIs(cache.backend.get("reverse:35.7,51.3"), neshan_cache._MISSING)
+
+    def test_get_many_reads_backend_in_one_query(self):
+        cache = neshan_cache.ResponseCache("matrix", neshan_cache.DatabaseBackend(), ttl=60)
+        cache.set("a", [1, 2])
+        cache.set("b", [3, 4])
+        cache.set("old", [5, 6], ttl=0)
+        with self.assertNumQueries(1, using="team13"):
+            self.assertEqual(cache.get_many(["a", "b", "old", "missing"]), {"a": [1, 2], "b": [3, 4]})
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (2, 2))
+        self.assertEqual(
+            neshan_cache.ResponseCache("matrix", neshan_cache.MemoryBackend(), ttl=60).get_many(["a"]), {}
+        )
+
+    def test_single_flight_shares_one_upstream_call(self):
+        cache = neshan_cache.ResponseCache("reverse", neshan_cache.MemoryBackend(), ttl=60)
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {"status": "OK"}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("k", fetch))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"status": "OK"}] * 5)
+        stats = cache.stats()
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 4))
+
+    @override_settings(NESHAN_API_KEY_SERVICE="test-key", TEAM13_REVERSE_GEOCODE_PRECISION=3)
+    def test_reverse_geocode_rounds_coordinates_and_skips_failures(self):
+        with mock.patch.object(geocoding, "_fetch_reverse_geocode", return_value={"formatted_address": "میدان آزادی"}) as fetch:
+            self.assertEqual(geocoding.reverse_geocode_address(35.69971, 51.33801), "میدان آزادی")
+            self.assertEqual(geocoding.reverse_geocode_address(35.69989, 51.33819), "میدان آزادی")
+        self.assertEqual(fetch.call_count, 1)
+        with mock.patch.object(geocoding, "_fetch_reverse_geocode", return_value=None) as fetch:
+            geocoding.reverse_geocode(29.6, 52.5)
+            geocoding.reverse_geocode(29.6, 52.5)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(neshan_cache.cache_stats()["reverse"]["hits"], 1)
+
+
+class RouteCacheTests(TestCase):
+    ROUTE = {
+        "overview_polyline": {"points": "abc"},
+        "legs": [{"summary": "x", "distance": {"value": 2500, "text": "۲.۵ کیلومتر"}, "duration": {"value": 300},
+                  "steps": [{"name": "آزادی", "instruction": "مستقیم", "polyline": "ab", "bearing_after": 90}]}],
+    }
+
+    def setUp(self):
+        neshan_cache.reset_caches()
+        self.addCleanup(neshan_cache.reset_caches)
+
+    def test_repeated_route_served_from_cache(self):
+        from team13.views import _compute_route_result_from_coords
+
+        with mock.patch("team13.neshan.fetch_route_eta", return_value=(2.5, 300, self.ROUTE)) as fetch:
+            first = _compute_route_result_from_coords(35.70001, 51.33, "a", 35.75, 51.40, "b", "car", geometry={"steps": True})
+            second = _compute_route_result_from_coords(35.70002, 51.33, "a", 35.75, 51.40, "b", "car", geometry={"steps": True})
+            _compute_route_result_from_coords(35.70001, 51.33, "a", 35.75, 51.40, "b", "car", avoid_traffic_zone=True)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual((first["distance_km"], first["eta_minutes"], first["eta_source"]), (2.5, 5, "neshan"))
+        self.assertEqual(second["route_geometry"], first["route_geometry"])
+        self.assertEqual(first["route_geometry"]["legs"][0]["steps"], [
+            {"name": "آزادی", "instruction": "مستقیم", "polyline": "ab"},
+        ])
+
+    @override_settings(TEAM13_ROUTE_CACHE_TTL={"traffic": 0})
+    def test_ttl_depends_on_route_kind_and_failures_fall_back(self):
+        from team13.views import _compute_route_result_from_coords
+
+        with mock.patch("team13.neshan.fetch_route_eta", return_value=(2.5, 300, self.ROUTE)) as car, \
+                mock.patch("team13.neshan.fetch_route_eta_pedestrian", return_value=(2.0, 1500, self.ROUTE)) as walk:
+            for _ in range(2):
+                _compute_route_result_from_coords(35.70, 51.33, "a", 35.75, 51.40, "b", "car")
+                _compute_route_result_from_coords(35.70, 51.33, "a", 35.75, 51.40, "b", "walk")
+        self.assertEqual((car.call_count, walk.call_count), (2, 1))
+        with mock.patch("team13.neshan.fetch_route_eta", return_value=(None, None, None)):
+            result = _compute_route_result_from_coords(35.0, 51.0, "a", 35.1, 51.1, "b", "motorcycle")
+        self.assertEqual(result["eta_source"], "haversine")
+        self.assertNotIn("route_geometry", result)
+
+
+class RouteGeometryTests(TestCase):
+    def test_steps_on_request_and_zoom_simplification(self):
+        from core.polyline import decode, encode
+        from team13.route_cache import compact_geometry, shape_geometry
+
+        points = [(35.70 + i * 1e-4, 51.33 + (i % 2) * 1e-6) for i in range(2000)]
+        steps = [
+            {"name": f"خیابان {i}", "instruction": "در خیابان ادامه دهید", "polyline": encode(points[i * 20:(i + 1) * 20 + 1]),
+             "distance": {"value": 220}, "duration": {"value": 30}}
+            for i in range(100)
+        ]
+        geometry = compact_geometry({"overview_polyline": {"points": encode(points)}, "legs": [{"steps": steps}]})
+        full = shape_geometry(geometry, steps=True)
+        compact = shape_geometry(geometry, zoom=12)
+        self.assertEqual(len(full["legs"][0]["steps"]), 100)
+        self.assertNotIn("legs", compact)
+        self.assertEqual(decode(compact["overview_polyline"]["points"]), decode(encode([points[0], points[-1]])))
+        self.assertGreater(len(json.dumps(full)), 10 * len(json.dumps(compact)))
+        # بدون overview، مسیر از polyline پشت‌سرهم stepها ساخته می‌شود
+        no_overview = shape_geometry({"legs": geometry["legs"]})
+        self.assertEqual(len(decode(no_overview["overview_polyline"]["points"])), 2000)
+
+
+class RoutingEngineTests(TestCase):
+    def setUp(self):
+        neshan_cache.reset_caches()
+        self.addCleanup(neshan_cache.reset_caches)
+
+    def test_chain_falls_back_and_records_timings(self):
+        engine = routing_engine.build_routing_engine(["neshan", "neshan_pedestrian"])
+        self.assertEqual([p.name for p in engine.providers], ["neshan", "neshan_pedestrian", "haversine"])
+        query = routing_engine.RouteQuery(35.70, 51.33, 35.75, 51.40, "car")
+        self.assertEqual([p.name for p in engine.providers_for(query)], ["neshan", "haversine"])
+        with mock.patch("team13.neshan.fetch_route_eta", side_effect=RuntimeError("boom")):
+            route = engine.route(query)
+        self.assertEqual(route.source, "haversine")
+        self.assertIsNone(route.geometry)
+        with mock.patch("team13.neshan.aio.fetch_route_eta", new=mock.AsyncMock(return_value=(2.5, 300, None))):
+            route = asyncio.run(engine.aroute(query))
+        self.assertEqual((route.source, route.distance_km, route.eta_minutes), ("neshan", 2.5, 5))
+        stats = engine.stats()
+        self.assertEqual((stats["neshan"]["calls"], stats["neshan"]["errors"], stats["neshan"]["results"]), (2, 1, 1))
+        self.assertEqual(stats["neshan_pedestrian"]["calls"], 0)
+        with self.assertRaises(ValueError):
+            routing_engine.build_routing_engine(["osrm"])
+
+    @override_settings(TEAM13_ROUTE_FALLBACK_SPEEDS={"walk": 0.1})
+    def test_fallback_speeds_are_configurable(self):
+        engine = routing_engine.build_routing_engine(["haversine"])
+        route = engine.route(routing_engine.RouteQuery(35.70, 51.33, 35.70, 51.34, "walk"))
+        self.assertAlmostEqual(route.duration_s, route.distance_km / 0.1 * 60)
+        self.assertEqual(route.eta_minutes, 9)
+
+
+class DistanceEngineTests(TestCase):
+    def setUp(self):
+        neshan_cache.reset_caches()
+        self.addCleanup(neshan_cache.reset_caches)
+
+    def test_local_matrix_and_calibration(self):
+        points = distance_engine.parse_points("35.70,51.33|35.75,51.40|32.65,51.67")
+        distance, duration = distance_engine.local_matrix(points, points, "car")
+        self.assertEqual(distance.shape, (3, 3))
+        self.assertEqual(list(distance.diagonal()), [0, 0, 0])
+        self.assertAlmostEqual(distance[0, 2], distance[2, 0])
+        self.assertGreater(duration[0, 1], 0)
+
+        straight = np.array([1.0, 2.0, 5.0, 10.0])
+        model = distance_engine.calibrate_speed_model(straight, straight * 1.4, 60 + straight * 1.4 / 30 * 3600)
+        self.assertAlmostEqual(model.circuity, 1.4)
+        self.assertAlmostEqual(model.speed_kmh, 30.0)
+        self.assertAlmostEqual(model.overhead_s, 60.0)
+
+    @override_settings(NESHAN_API_KEY_SERVICE="test-key")
+    def test_hybrid_fills_every_cell_of_repeated_points(self):
+        origins = [(35.7, 51.4), (35.7, 51.4)]
+        destinations = [(35.8, 51.5)]
+        distance_engine._cell_cache().set(distance_engine._cell_key(origins[0], destinations[0], "car", False), (12.0, 900))
+        distance, duration, known = distance_engine.hybrid_matrix(origins, destinations)
+        self.assertEqual(known.tolist(), [[True], [True]])
+        self.assertEqual(distance.tolist(), [[12.0], [12.0]])
+        self.assertEqual(duration.tolist(), [[900], [900]])
+
+    def test_view_falls_back_and_reuses_neshan_cells(self):
+        params = {"origins": "35.70,51.33|35.75,51.40", "destinations": "35.80,51.45"}
+        res = self.client.get("/team13/distance-matrix/", params)
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        self.assertEqual(data["engine"], "hybrid")
+        self.assertEqual([row["elements"][0]["source"] for row in data["rows"]], ["estimate", "estimate"])
+        # بدون کلید نشان کش خانه‌ها اصلاً خوانده نمی‌شود
+        self.assertNotIn("matrix", neshan_cache.cache_stats())
+
+        neshan_rows = {"status": "Ok", "rows": [
+            {"elements": [{"status": "Ok", "distance": {"value": 12000}, "duration": {"value": 900}}]},
+            {"elements": [{"status": "Failed"}]},
+        ]}
+        with mock.patch("team13.neshan.aio.fetch_distance_matrix", return_value=neshan_rows):
+            data = self.client.get("/team13/distance-matrix/", dict(params, engine="neshan")).json()
+        self.assertEqual(data["engine"], "neshan")
+        self.assertEqual(data["rows"][0]["elements"][0]["distance"]["value"], 12000)
+        self.assertEqual(data["rows"][1]["elements"][0]["source"], "estimate")
+
+        with override_settings(NESHAN_API_KEY_SERVICE="test-key"):
+            data = self.client.get("/team13/distance-matrix/", dict(params, engine="hybrid")).json()
+        stats = neshan_cache.cache_stats()["matrix"]
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(data["rows"][0]["elements"][0]["duration"]["value"], 900)
+        self.assertEqual(data["rows"][0]["elements"][0]["source"], "neshan")
+        self.assertEqual(self.client.get("/team13/distance-matrix/", {"origins": "x", "destinations": "1,2"}).status_code, 400)
+
+
+class IsochroneTests(TestCase):
+    FEATURES = {"type": "FeatureCollection", "features": [{"type": "Feature", "geometry": None, "properties": {}}]}
+
+    def setUp(self):
+        neshan_cache.reset_caches()
+        self.addCleanup(neshan_cache.reset_caches)
+
+    def test_nearby_requests_share_cached_polygon(self):
+        fetch = mock.AsyncMock(return_value=self.FEATURES)
+        with mock.patch("team13.neshan.aio.fetch_isochrone", new=fetch):
+            first = self.client.get("/team13/isochrone/", {"lat": "35.70001", "lng": "51.33002", "time": "14"})
+            second = self.client.get("/team13/isochrone/", {"location": "35.70004,51.33004", "time": "15"})
+        self.assertEqual(fetch.await_count, 1)
+        self.assertEqual(fetch.await_args.args, (35.7, 51.33))
+        self.assertEqual(fetch.await_args.kwargs["time_minutes"], 15)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(first.json()["source"], "neshan")
+
+    def test_rejects_non_finite_and_non_positive_ranges(self):
+        for params in ({"time": "nan"}, {"time": "inf"}, {"distance": "-1"}, {"time": "0"}, {"lat": "nan", "time": "5"}):
+            res = self.client.get("/team13/isochrone/", {"location": "35.7,51.4", **params})
+            self.assertEqual(res.status_code, 400, params)
+        with self.assertRaises(ValueError):
+            isochrones.snap_request(35.7, 51.4, time_minutes=float("nan"))
+
+    def test_local_estimate_when_neshan_unavailable(self):
+        from core.geo_math import haversine_km
+
+        with mock.patch("team13.neshan.aio.fetch_isochrone", new=mock.AsyncMock(return_value=None)):
+            res = self.client.get("/team13/isochrone/", {"lat": "35.70", "lng": "51.33", "time": "15", "polygon": "1"})
+            strict = self.client.get("/team13/isochrone/", {"lat": "35.70", "lng": "51.33", "time": "15", "fallback": "0"})
+        data = res.json()
+        self.assertEqual((res.status_code, data["source"]), (200, "estimate"))
+        feature = data["features"][0]
+        self.assertEqual(feature["properties"]["radius_km"], 4.0)  # (۹۰۰ − ۹۰) ثانیه با ۲۴ کیلومتر بر ساعت / ۱٫۳۵
+        ring = feature["geometry"]["coordinates"][0]
+        self.assertEqual(ring[0], ring[-1])
+        self.assertAlmostEqual(haversine_km(35.70, 51.33, ring[10][1], ring[10][0]), 4.0, places=2)
+        self.assertEqual(strict.status_code, 502)
+
+
+async def _fake_map_matching(path):
+    """نگاشت جعلی: هر نقطه روی خودش و geometry همان رد."""
+    from core.polyline import encode
+
+    return {
+        "snappedPoints": [{"location": [lat, lng], "originalIndex": i} for i, (lat, lng) in enumerate(path)],
+        "geometry": encode(path),
+    }
+
+
+@override_settings(TEAM13_MAP_MATCHING_WINDOW=500, TEAM13_MAP_MATCHING_OVERLAP=50)
+class TraceMatchingTests(TestCase):
+    TRACE = [(35.70 + i * 1e-4, 51.30 + (i % 7) * 1e-4) for i in range(2300)]
+
+    def path(self):
+        return "|".join(f"{lat:.5f},{lng:.5f}" for lat, lng in self.TRACE)
+
+    def test_long_trace_is_split_and_stitched(self):
+        from core.polyline import decode
+        from team13 import trace_matching
+
+        plan = trace_matching.plan_windows(len(self.TRACE))
+        self.assertEqual(len(plan), 5)
+        self.assertTrue(all(end - start <= 500 for start, end, _, _ in plan))
+        fetch = mock.AsyncMock(side_effect=_fake_map_matching)
+        with mock.patch("team13.neshan.aio.fetch_map_matching", new=fetch):
+            res = self.client.post("/team13/map-matching/", json.dumps({"path": self.path()}), content_type="application/json")
+        self.assertEqual(fetch.await_count, 5)
+        data = res.json()
+        self.assertEqual([p["originalIndex"] for p in data["snappedPoints"]], list(range(2300)))
+        self.assertEqual(decode(data["geometry"]), [(round(lat, 5), round(lng, 5)) for lat, lng in self.TRACE])
+        self.assertEqual((data["windows"], data["failed_windows"]), (5, []))
+
+    def test_ndjson_stream_reports_failed_windows(self):
+        from django.test import AsyncClient
+
+        async def flaky(path):
+            return None if path[0] == (round(self.TRACE[450][0], 5), round(self.TRACE[450][1], 5)) else await _fake_map_matching(path)
+
+        async def stream():
+            res = await AsyncClient().get("/team13/map-matching/", {"path": self.path(), "stream": "1"})
+            return res, b"".join([chunk async for chunk in res.streaming_content])
+
+        with mock.patch("team13.neshan.aio.fetch_map_matching", new=mock.AsyncMock(side_effect=flaky)):
+            res, body = asyncio.run(stream())
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([line["type"] for line in lines], ["window"] * 5 + ["summary"])
+        self.assertEqual(lines[1]["error"], "no_match")
+        self.assertEqual(lines[-1], {"type": "summary", "points": 2300, "windows": 5, "failed_windows": [1]})
+        self.assertEqual(lines[2]["range"], [925, 1375])
+
+    def test_ndjson_is_buffered_under_wsgi(self):
+        with mock.patch("team13.neshan.aio.fetch_map_matching", new=mock.AsyncMock(side_effect=_fake_map_matching)):
+            res = self.client.get("/team13/map-matching/", {"path": self.path(), "stream": "1"})
+        self.assertFalse(res.streaming)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in res.content.decode().splitlines()]
+        self.assertEqual(lines[-1], {"type": "summary", "points": 2300, "windows": 5, "failed_windows": []})
+
+
+class TspSolverTests(TestCase):
+    def test_solver_respects_fixed_endpoints(self):
+        rng = np.random.default_rng(7)
+        points = np.c_[rng.uniform(35.6, 35.8, 60), rng.uniform(51.2, 51.5, 60)]
+        _, duration = distance_engine.local_matrix(points, points, "car")
+        started = time.monotonic()
+        order = tsp_solver.solve(duration, round_trip=False, source_is_any_point=False, last_is_any_point=False)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(sorted(order), list(range(60)))
+        self.assertEqual((order[0], order[-1]), (0, 59))
+        nearest_only = tsp_solver._nearest_neighbour(duration.tolist(), 0)
+        self.assertLessEqual(tsp_solver.tour_cost(duration, tsp_solver.solve(duration)), tsp_solver.tour_cost(duration, nearest_only))
+
+    def test_view_uses_local_optimizer_without_neshan(self):
+        res = self.client.get("/team13/tsp/", {"waypoints": "35.70,51.30|35.80,51.40|35.71,51.31|35.79,51.39", "round_trip": "0", "source_is_any_point": "0"})
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        self.assertEqual(data["engine"], "hybrid")
+        self.assertEqual([p["index"] for p in data["points"]], [0, 2, 3, 1])
+        self.assertEqual(data["points"][0]["location"], [51.30, 35.70])
+
+
+class FakeNeshanHandler(BaseHTTPRequestHandler):
+    """سرور جعلی نشان: مسیر /v4/direction پاسخ مسیر می‌دهد؛ پاسخ‌های از پیش صف‌شده (status) اول مصرف می‌شوند.
+    server.delay (ثانیه) یک نشان کُند را شبیه‌سازی می‌کند؛ server.peak بیشترین تعداد درخواست هم‌زمان است."""
+
+    protocol_version = "HTTP/1.1"
+    counter_lock = threading.Lock()
+
+    def _in_flight(self, step):
+        server = self.server
+        with self.counter_lock:
+            server.in_flight = getattr(server, "in_flight", 0) + step
+            server.peak = max(getattr(server, "peak", 0), server.in_flight)
+
+    def do_GET(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        server.paths.append(self.path)
+        status = server.statuses.pop(0) if server.statuses else 200
+        self._in_flight(1)
+        try:
+            time.sleep(getattr(server, "delay", 0))
+        finally:
+            self._in_flight(-1)
+        body = json.dumps({"routes": [{"legs": [{"distance": {"value": 2500}, "duration": {"value": 300}}]}]}).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # کلاینت درخواست را لغو کرده است
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(NESHAN_API_KEY_SERVICE="test-key")
+class NeshanClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeNeshanHandler)
+        self.server.connections, self.server.paths, self.server.statuses = set(), [], []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = neshan_client.NeshanClient(
+            base_url=f"http://127.0.0.1:{self.server.server_port}", backoff_factor=0,
+            breaker=neshan_client.CircuitBreaker(failure_threshold=2, reset_timeout=60),
+        )
+        previous = neshan_client.set_client(self.client)
+        self.addCleanup(neshan_client.set_client, previous)
+        self.addCleanup(self.client.close)
+
+    def test_requests_reuse_one_connection(self):
+        for _ in range(3):
+            dist_km, duration_s, _ = routing.fetch_route_eta(51.33, 35.70, 51.40, 35.75)
+            self.assertEqual((dist_km, duration_s), (2.5, 300))
+        self.assertEqual(len(self.server.paths), 3)
+        self.assertEqual(len(self.server.connections), 1)
+
+    def test_retries_5xx_then_opens_circuit(self):
+        self.server.statuses = [503, 200]
+        self.assertEqual(routing.fetch_route_eta(51.33, 35.70, 51.40, 35.75)[0], 2.5)
+        self.assertEqual(len(self.server.paths), 2)
+
+        self.server.statuses = [500] * 6
+        for _ in range(2):
+            self.assertEqual(routing.fetch_route_eta(51.33, 35.70, 51.40, 35.75), (None, None, None))
+        self.assertEqual(self.client.breaker.state, neshan_client.CircuitBreaker.OPEN)
+        calls = len(self.server.paths)
+        self.assertEqual(routing.fetch_route_eta(51.33, 35.70, 51.40, 35.75), (None, None, None))
+        self.assertEqual(len(self.server.paths), calls)  # مدار باز: بدون تماس با سرور
+
+
+class CircuitBreakerTests(TestCase):
+    def test_abandoned_probe_is_replaced_after_reset_timeout(self):
+        breaker = neshan_client.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        with mock.patch("team13.neshan.client.time.monotonic", return_value=100.0):
+            breaker.record_failure()
+        with mock.patch("team13.neshan.client.time.monotonic", return_value=131.0):
+            self.assertTrue(breaker.allow())  # درخواست آزمایشی که هرگز نتیجه ثبت نمی‌کند
+            self.assertFalse(breaker.allow())
+        with mock.patch("team13.neshan.client.time.monotonic", return_value=162.0):
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, neshan_client.CircuitBreaker.CLOSED)
+
+
+def start_fake_neshan(test, delay=0):
+    """سرور جعلی نشان با تأخیر delay برای کلاینت هم‌گام و async (NESHAN_API_BASE)؛ پاک‌سازی با addCleanup."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeNeshanHandler)
+    server.connections, server.paths, server.statuses, server.delay = set(), [], [], delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    test.addCleanup(server.server_close)
+    test.addCleanup(server.shutdown)
+    settings_override = override_settings(
+        NESHAN_API_KEY_SERVICE="test-key", NESHAN_API_BASE=f"http://127.0.0.1:{server.server_port}",
+    )
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    previous = neshan_client.set_client(neshan_client.NeshanClient(backoff_factor=0))
+    test.addCleanup(neshan_client.set_client, previous)
+    async_client.reset_async_clients()
+    test.addCleanup(async_client.reset_async_clients)
+    neshan_cache.reset_caches()
+    test.addCleanup(neshan_cache.reset_caches)
+    return server
+
+
+class AsyncNeshanClientTests(TestCase):
+    def setUp(self):
+        self.server = start_fake_neshan(self, delay=0.3)
+
+    def test_concurrent_requests_wait_for_upstream_together(self):
+        async def fetch_all():
+            return await asyncio.gather(*[
+                aio.fetch_route_eta(51.33, 35.70 + i * 0.01, 51.40, 35.75) for i in range(10)
+            ])
+
+        started = time.monotonic()
+        results = asyncio.run(fetch_all())
+        # ده درخواست هم‌زمان حدود یک تأخیر طول می‌کشند، نه ده برابر آن
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual([r[:2] for r in results], [(2.5, 300)] * 10)
+        self.assertEqual(len(self.server.paths), 10)
+
+    def test_cancelled_probe_releases_half_open_breaker(self):
+        breaker = neshan_client.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        async def cancel_probe():
+            client = async_client.AsyncNeshanClient(breaker=breaker)
+            try:
+                task = asyncio.ensure_future(client.get("/v4/direction", "direction"))
+                await asyncio.sleep(0.1)
+                self.assertEqual(breaker.state, neshan_client.CircuitBreaker.HALF_OPEN)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            finally:
+                await client.aclose()
+
+        asyncio.run(cancel_probe())
+        self.assertEqual(breaker.state, neshan_client.CircuitBreaker.OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_async_route_view(self):
+        self.server.delay = 0
+        res = self.client.get("/team13/routes/", {
+            "format": "json", "source_lat": "35.70", "source_lng": "51.33", "dest_lat": "35.75", "dest_lng": "51.40",
+        })
+        self.assertEqual(res.status_code, 200)
+        data = res.json()
+        self.assertEqual((data["distance_km"], data["eta_minutes"], data["eta_source"]), (2.5, 5, "neshan"))
+        self.assertEqual(len(self.server.paths), 1)
+
+
+class WsgiAsyncClientTests(TestCase):
+    def setUp(self):
+        self.server = start_fake_neshan(self)
+
+    def test_wsgi_request_closes_its_async_client(self):
+        built = []
+        build = async_client._build_default_client
+
+        def record():
+            built.append(build())
+            return built[-1]
+
+        params = {"format": "json", "source_lat": "35.70", "source_lng": "51.33", "dest_lat": "35.75", "dest_lng": "51.40"}
+        with mock.patch.object(async_client, "_build_default_client", record):
+            for _ in range(2):
+                self.assertEqual(self.client.get("/team13/routes/", params).json()["eta_source"], "neshan")
+        self.assertEqual(len(built), 2)
+        self.assertTrue(all(client.http.is_closed for client in built))
+        self.assertEqual(len(async_client._clients), 0)
+
+
+class RouteBatchTests(TestCase):
+    databases = {"default", "team13"}
+
+    def setUp(self):
+        self.server = start_fake_neshan(self, delay=0.3)
+
+    def post(self, routes):
+        return self.client.post("/team13/routes/batch/", json.dumps({"routes": routes}), content_type="application/json")
+
+    def test_batch_dedupes_and_runs_concurrently(self):
+        pairs = [
+            {"source_lat": 35.70 + i * 0.01, "source_lng": 51.33, "dest_lat": 35.75, "dest_lng": 51.40} for i in range(4)
+        ]
+        routes = pairs + [dict(pairs[0]), {"source_lat": "x"}, {"source_place_id": "missing", "destination_place_id": "x"}]
+        res = self.post(routes)
+        self.assertGreater(self.server.peak, 1)  # مسیرهای یکتا هم‌زمان از نشان پرسیده شدند
+        self.assertEqual(res.status_code, 200)
+        results = res.json()["results"]
+        self.assertEqual([r["index"] for r in results], list(range(7)))
+        self.assertEqual([r["status"] for r in results], ["ok"] * 5 + ["error"] * 2)
+        self.assertEqual({r["eta_source"] for r in results[:5]}, {"neshan"})
+        self.assertEqual(len(self.server.paths), 4)
+
+        res = self.post(pairs + [dict(pairs[1], travel_mode="transit")])
+        self.assertEqual([r["eta_source"] for r in res.json()["results"]], ["neshan"] * 4 + ["haversine"])
+        self.assertEqual(len(self.server.paths), 4)  # همه از کش
+
+    def test_rejects_bad_body(self):
+        self.assertEqual(self.client.get("/team13/routes/batch/").status_code, 405)
+        self.assertEqual(self.post([]).status_code, 400)
+        with override_settings(TEAM13_ROUTE_BATCH_MAX_ITEMS=2):
+            self.assertEqual(self.post([{}] * 3).status_code, 400)
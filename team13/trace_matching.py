@@ -0,0 +1,164 @@
+# نگاشت ردهای طولانی GPS بر نقشه (map matching) با پنجره‌های هم‌پوشان
+# API نشان حداکثر ۱۰۰۰ نقطه در هر درخواست می‌پذیرد؛ رد به پنجره‌های TEAM13_MAP_MATCHING_WINDOW نقطه‌ای با
+# TEAM13_MAP_MATCHING_OVERLAP نقطهٔ مشترک تقسیم و پنجره‌ها هم‌زمان (حداکثر TEAM13_MAP_MATCHING_CONCURRENCY)
+# نگاشت می‌شوند. هر پنجره مالک بازهٔ وسط خود است (مرز در میانهٔ هم‌پوشانی)؛ نقاط نگاشت‌شده و geometry هر
+# پنجره به همان بازه بریده و به‌ترتیب به هم چسبانده می‌شوند. amatch_trace نتیجهٔ پنجره‌ها را به‌ترتیب و به محض
+# آماده شدن برمی‌گرداند تا view بتواند آن‌ها را به صورت NDJSON جریان دهد.
+
+import asyncio
+
+import numpy as np
+from django.conf import settings
+
+from core.polyline import decode, encode
+
+# سقف نقاط هر درخواست API نشان
+UPSTREAM_MAX_POINTS = 1000
+DEFAULT_WINDOW_POINTS = 500
+DEFAULT_OVERLAP_POINTS = 50
+DEFAULT_CONCURRENCY = 4
+# سقف طول رد ورودی (TEAM13_MAP_MATCHING_MAX_POINTS)
+DEFAULT_MAX_POINTS = 50000
+
+
+def max_points():
+    return getattr(settings, "TEAM13_MAP_MATCHING_MAX_POINTS", DEFAULT_MAX_POINTS)
+
+
+def parse_trace(value):
+    """رد به‌صورت "lat,lng|lat,lng|..." یا لیست [lat, lng] / {lat, lng}؛ خروجی لیست (lat, lng). ValueError اگر نقطه‌ای نامعتبر باشد."""
+    if isinstance(value, str):
+        value = [p for p in value.split("|") if p.strip()]
+    points = []
+    for p in value:
+        if isinstance(p, str):
+            p = p.split(",")
+        elif isinstance(p, dict):
+            p = (p.get("lat", p.get("latitude")), p.get("lng", p.get("longitude")))
+        lat, lng = float(p[0]), float(p[1])
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("point")
+        points.append((lat, lng))
+    return points
+
+
+def plan_windows(count, window=None, overlap=None):
+    """
+    پنجره‌های (start, end, own_start, own_end) روی count نقطه: [start, end) به نشان فرستاده می‌شود و
+    [own_start, own_end) سهم این پنجره در نتیجهٔ نهایی است (بازه‌های own بدون هم‌پوشانی کل رد را می‌پوشانند).
+    """
+    window = min(UPSTREAM_MAX_POINTS, window or getattr(settings, "TEAM13_MAP_MATCHING_WINDOW", DEFAULT_WINDOW_POINTS))
+    overlap = overlap if overlap is not None else getattr(settings, "TEAM13_MAP_MATCHING_OVERLAP", DEFAULT_OVERLAP_POINTS)
+    overlap = max(0, min(overlap, window // 2))
+    step = window - overlap
+    spans = [(0, min(window, count))]
+    while spans[-1][1] < count:
+        start = spans[-1][0] + step
+        spans.append((start, min(start + window, count)))
+    plan = []
+    for k, (start, end) in enumerate(spans):
+        own_start = 0 if k == 0 else start + overlap // 2
+        own_end = count if k == len(spans) - 1 else spans[k + 1][0] + overlap // 2
+        plan.append((start, end, own_start, own_end))
+    return plan
+
+
+def _location(point):
+    loc = point.get("location")
+    if isinstance(loc, dict):
+        return float(loc.get("lat", loc.get("latitude"))), float(loc.get("lng", loc.get("longitude")))
+    return float(loc[0]), float(loc[1])
+
+
+def _nearest_vertex(vertices, point):
+    diff = vertices - np.asarray(point, dtype=np.float64)
+    return int(np.argmin((diff * diff).sum(axis=1)))
+
+
+def stitch_window(index, span, data):
+    """
+    نتیجهٔ یک پنجره بریده به بازهٔ own آن: snappedPoints با originalIndex سراسری و geometry (polyline)
+    از نزدیک‌ترین رأس به اولین نقطهٔ own تا نزدیک‌ترین رأس به اولین نقطهٔ own پنجرهٔ بعد.
+    """
+    start, end, own_start, own_end = span
+    result = {"type": "window", "index": index, "range": [own_start, own_end]}
+    if not isinstance(data, dict) or not data.get("snappedPoints"):
+        result["error"] = "no_match"
+        return result
+    snapped = []
+    boundary = None
+    for point in data["snappedPoints"]:
+        try:
+            original = start + int(point["originalIndex"])
+            location = _location(point)
+        except (KeyError, TypeError, ValueError):
+            continue
+        if own_start <= original < own_end:
+            snapped.append({"location": list(location), "originalIndex": original})
+        elif original >= own_end and (boundary is None or original < boundary[0]):
+            boundary = (original, location)
+    snapped.sort(key=lambda p: p["originalIndex"])
+    result["snappedPoints"] = snapped
+    geometry = data.get("geometry")
+    if geometry and snapped:
+        try:
+            vertices = decode(geometry)
+        except ValueError:
+            vertices = []
+        if vertices:
+            array = np.asarray(vertices, dtype=np.float64)
+            first = _nearest_vertex(array, snapped[0]["location"]) if own_start > 0 else 0
+            last = _nearest_vertex(array, boundary[1]) if boundary is not None else len(vertices) - 1
+            result["geometry"] = encode(vertices[first:max(first, last) + 1])
+    return result
+
+
+async def amatch_trace(points, window=None, overlap=None, concurrency=None):
+    """
+    async generator: نتیجهٔ stitch_window هر پنجره به‌ترتیب؛ پنجره‌های بعدی در همین حین هم‌زمان نگاشت می‌شوند.
+    """
+    from .neshan import aio
+
+    plan = plan_windows(len(points), window, overlap)
+    if concurrency is None:
+        concurrency = getattr(settings, "TEAM13_MAP_MATCHING_CONCURRENCY", DEFAULT_CONCURRENCY)
+    gate = asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def match(index, span):
+        async with gate:
+            try:
+                data = await aio.fetch_map_matching(points[span[0]:span[1]])
+            except Exception:
+                data = None
+        return stitch_window(index, span, data)
+
+    tasks = [asyncio.ensure_future(match(index, span)) for index, span in enumerate(plan)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def amatch_trace_combined(points, window=None, overlap=None, concurrency=None):
+    """
+    کل رد در یک پاسخ (سازگار با پاسخ نشان): { snappedPoints, geometry, windows, failed_windows }؛
+    None اگر هیچ پنجره‌ای نگاشت نشد.
+    """
+    snapped = []
+    vertices = []
+    windows = 0
+    failed = []
+    async for part in amatch_trace(points, window, overlap, concurrency):
+        windows += 1
+        if "error" in part:
+            failed.append(part["index"])
+            continue
+        snapped.extend(part["snappedPoints"])
+        if part.get("geometry"):
+            chunk = decode(part["geometry"])
+            vertices.extend(chunk[1:] if vertices and chunk and chunk[0] == vertices[-1] else chunk)
+    if len(failed) == windows:
+        return None
+    return {"snappedPoints": snapped, "geometry": encode(vertices), "windows": windows, "failed_windows": failed}
@@ -0,0 +1,52 @@
+# انتخاب ترجمهٔ فارسی/انگلیسی مکان‌ها و رویدادها بدون کوئری اضافه به ازای هر ردیف
+# همهٔ ویوها کوئری‌ست را با prefetch_related("translations") می‌سازند؛ توابع این ماژول فقط از
+# همان کش prefetch می‌خوانند (نه translations.filter(...) که کش را دور می‌زند و برای هر ردیف
+# یک کوئری جدا می‌زند). برای وقتی که فقط شناسه‌ها در دست است، place_names یک کوئری واحد می‌زند.
+
+from .models import PlaceTranslation
+
+TEAM13_DB = "team13"
+LANGS = ("fa", "en")
+
+
+def translation_for(obj, lang):
+    """ترجمهٔ زبان lang از ترجمه‌های prefetch‌شدهٔ یک Place یا Event (یا None)."""
+    for trans in obj.translations.all():
+        if trans.lang == lang:
+            return trans
+    return None
+
+
+def translation_pair(obj):
+    """ترجمه‌های (fa, en) یک Place یا Event از کش prefetch؛ ترجمهٔ ناموجود None است."""
+    trans_fa = trans_en = None
+    for trans in obj.translations.all():
+        if trans.lang == "fa" and trans_fa is None:
+            trans_fa = trans
+        elif trans.lang == "en" and trans_en is None:
+            trans_en = trans
+    return trans_fa, trans_en
+
+
+def place_names(place_ids, using=TEAM13_DB, prefer=LANGS):
+    """
+    نام نمایشی چند مکان با یک کوئری: {place_id: name}.
+    اولویت زبان‌ها به ترتیب prefer است؛ مکان بدون ترجمه در خروجی نیست.
+    """
+    place_ids = list(place_ids)
+    if not place_ids:
+        return {}
+    rank = {lang: i for i, lang in enumerate(prefer)}
+    best = {}
+    rows = (
+        PlaceTranslation.objects.using(using)
+        .filter(place_id__in=place_ids, lang__in=list(prefer))
+        .values_list("place_id", "lang", "name")
+    )
+    for place_id, lang, name in rows:
+        if not name:
+            continue
+        current = best.get(place_id)
+        if current is None or rank[lang] < current[0]:
+            best[place_id] = (rank[lang], name)
+    return {place_id: name for place_id, (_, name) in best.items()}
@@ -0,0 +1,124 @@
+# بهینه‌ساز محلی ترتیب بازدید (TSP) برای تیم ۱۳ — جایگزین درون‌پردازه‌ای /v3/trip نشان
+# ساخت اولیه با نزدیک‌ترین همسایه و سپس بهبود با 2-opt و Or-opt تا رسیدن به بهینهٔ محلی یا پایان
+# بودجهٔ زمانی. ماتریس هزینه (معمولاً زمان سفر از team13.distance_engine) می‌تواند نامتقارن باشد؛
+# هزینهٔ معکوس کردن یک بازه با جمع‌های پیشوندی رفت و برگشت در O(1) محاسبه می‌شود.
+# مسیر باز (round_trip=False) با یک گره مجازی به دور بسته تبدیل می‌شود که مبدأ/مقصد ثابت را تضمین می‌کند.
+
+import time
+
+from django.conf import settings
+
+DEFAULT_TIME_BUDGET_SECONDS = 0.5
+# بیشترین طول بازهٔ جابه‌جاشده در Or-opt
+OR_OPT_MAX_SEGMENT = 3
+
+
+def _prefix_costs(cost, tour):
+    """F[k] جمع هزینهٔ یال‌های tour[0..k] در جهت رفت و B[k] همان یال‌ها در جهت برگشت."""
+    forward, backward = [0.0], [0.0]
+    for a, b in zip(tour, tour[1:]):
+        forward.append(forward[-1] + cost[a][b])
+        backward.append(backward[-1] + cost[b][a])
+    return forward, backward
+
+
+def _nearest_neighbour(cost, start):
+    n = len(cost)
+    tour, seen = [start], {start}
+    while len(tour) < n:
+        row = cost[tour[-1]]
+        nxt = min((j for j in range(n) if j not in seen), key=row.__getitem__)
+        tour.append(nxt)
+        seen.add(nxt)
+    return tour
+
+
+def _two_opt_pass(cost, tour):
+    """اولین حرکت 2-opt بهبوددهنده (معکوس کردن tour[i..j])؛ True اگر حرکتی انجام شد."""
+    m = len(tour)
+    forward, backward = _prefix_costs(cost, tour)
+    for i in range(1, m - 1):
+        a, first = tour[i - 1], tour[i]
+        cost_a = cost[a]
+        for j in range(i + 1, m):
+            last, b = tour[j], tour[(j + 1) % m]
+            delta = (
+                cost_a[last] + cost[first][b] - cost_a[first] - cost[last][b]
+                + (backward[j] - backward[i]) - (forward[j] - forward[i])
+            )
+            if delta < -1e-9:
+                tour[i:j + 1] = tour[i:j + 1][::-1]
+                return True
+    return False
+
+
+def _or_opt_pass(cost, tour):
+    """اولین جابه‌جایی بهبوددهندهٔ بازه‌ای ۱ تا ۳ گرهی (مستقیم یا معکوس)؛ True اگر حرکتی انجام شد."""
+    m = len(tour)
+    forward, backward = _prefix_costs(cost, tour)
+    for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+        for i in range(1, m - length + 1):
+            j = i + length - 1
+            prev, nxt = tour[i - 1], tour[(j + 1) % m]
+            first, last = tour[i], tour[j]
+            removed = cost[prev][first] + cost[last][nxt] - cost[prev][nxt]
+            reverse_internal = (backward[j] - backward[i]) - (forward[j] - forward[i])
+            for p in range(m):
+                if i - 1 <= p <= j:
+                    continue
+                u, v = tour[p], tour[(p + 1) % m]
+                base = -cost[u][v] - removed
+                if base + cost[u][first] + cost[last][v] < -1e-9:
+                    segment = tour[i:j + 1]
+                elif base + cost[u][last] + cost[first][v] + reverse_internal < -1e-9:
+                    segment = tour[i:j + 1][::-1]
+                else:
+                    continue
+                rest = tour[:i] + tour[j + 1:]
+                at = rest.index(u) + 1
+                tour[:] = rest[:at] + segment + rest[at:]
+                return True
+    return False
+
+
+def tour_cost(cost, order, round_trip=True):
+    total = sum(cost[a][b] for a, b in zip(order, order[1:]))
+    if round_trip and len(order) > 1:
+        total += cost[order[-1]][order[0]]
+    return total
+
+
+def solve(cost, round_trip=True, source_is_any_point=True, last_is_any_point=True, time_budget=None):
+    """
+    ترتیب بازدید با کمترین هزینه (تقریبی) برای ماتریس n×n؛ خروجی لیست اندیس‌ها.
+    مانند /v3/trip نشان: اگر source_is_any_point نباشد نقطهٔ اول مبدأ است و اگر last_is_any_point نباشد
+    (و مسیر رفت‌وبرگشتی نباشد) نقطهٔ آخر مقصد است.
+    """
+    cost = [list(map(float, row)) for row in cost]
+    n = len(cost)
+    if n <= 2:
+        return list(range(n))
+    if time_budget is None:
+        time_budget = getattr(settings, "TEAM13_TSP_TIME_BUDGET", DEFAULT_TIME_BUDGET_SECONDS)
+    deadline = time.monotonic() + time_budget
+
+    fixed_start = 0 if not source_is_any_point else None
+    fixed_end = n - 1 if not last_is_any_point and not round_trip else None
+    if round_trip:
+        start = 0
+    else:
+        # گره مجازی n: از آن فقط به مبدأ ثابت و به آن فقط از مقصد ثابت می‌توان رفت
+        big = (max(max(row) for row in cost) + 1.0) * n
+        for i, row in enumerate(cost):
+            row.append(0.0 if fixed_end in (None, i) else big)
+        cost.append([0.0 if fixed_start in (None, j) else big for j in range(n)] + [0.0])
+        start = n
+
+    tour = _nearest_neighbour(cost, start)
+    while time.monotonic() < deadline:
+        if not (_two_opt_pass(cost, tour) or _or_opt_pass(cost, tour)):
+            break
+
+    at = tour.index(start)
+    tour = tour[at:] + tour[:at]
+    return tour if round_trip else tour[1:]
@@ -11,11 +11,14 @@ urlpatterns = [
     path("places/<uuid:place_id>/rate/", views.place_rate, name="place_rate"),
     path("places/<uuid:place_id>/add-image/", views.place_add_image, name="place_add_image"),
     path("places/<uuid:place_id>/add-comment/", views.place_add_comment, name="place_add_comment"),
+    path("map/places.geojson", views.map_places_geojson, name="map_places_geojson"),
+    path("map/clusters/", views.map_clusters, name="map_clusters"),
     path("nearest-place/", views.nearest_place, name="nearest_place"),
     path("events/", views.event_list, name="event_list"),
     path("events/<uuid:event_id>/", views.event_detail, name="event_detail"),
     path("events/<uuid:event_id>/rate/", views.event_rate, name="event_rate"),
     path("routes/", views.route_request, name="routes"),
+    path("routes/batch/", views.route_batch_request, name="routes_batch"),
     path("tsp/", views.tsp_request, name="tsp"),
     path("distance-matrix/", views.distance_matrix_request, name="distance_matrix"),
     path("isochrone/", views.isochrone_request, name="isochrone"),
@@ -38,5 +41,6 @@ urlpatterns = [
     path("admin/reject-comment/<uuid:comment_id>/", views.team13_admin_reject_comment, name="team13_admin_reject_comment"),
     path("admin/approve-image/<uuid:image_id>/", views.team13_admin_approve_image, name="team13_admin_approve_image"),
     path("admin/reject-image/<uuid:image_id>/", views.team13_admin_reject_image, name="team13_admin_reject_image"),
+    path("admin/neshan-cache-stats/", views.team13_admin_neshan_cache_stats, name="team13_admin_neshan_cache_stats"),
     path("admin/add-admin/", views.team13_admin_add_admin, name="team13_admin_add_admin"),
 ]
\ No newline at end of file
@@ -1,20 +1,26 @@
 # مطابق فاز ۳، ۵، ۷ — سرویس امکانات و حمل‌ونقل (گروه Axiom)
 import base64
+import gzip
+import json
 import math
 import re
 import uuid
 from pathlib import Path
 
 from django.conf import settings
-from django.http import JsonResponse, FileResponse, Http404, HttpResponseForbidden
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseNotAllowed, HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django.utils.http import url_has_allowed_host_and_scheme
 from urllib.parse import quote
-from django.db.models import Avg, Count, F, Q, Subquery, OuterRef
-from django.db.models.functions import Coalesce
+from django.db import transaction
+from django.db.models import Q
 from django.views.decorators.http import require_GET, require_POST
 from core.auth import api_login_required
+from core.geo_math import distances_km
 
 from .models import (
     Place,
@@ -27,7 +33,19 @@ from .models import (
     Image,
     PlaceContribution,
     TeamAdmin,
+    GeocodeJob,
 )
+from . import fts, geocode_queue, map_layer, trace_matching
+from .cities import city_filter_q
+from .clustering import get_cluster_index, unproject
+from .data_version import PLACES, get_data_version
+from .geo_utils import coordinate_address
+from .ratings import forget_comment, record_comment
+from .isochrones import aisochrone
+from .route_cache import shape_geometry
+from .routing_engine import RouteQuery, get_routing_engine
+from .search_index import get_search_index, make_doc, record_route
+from .translations import place_names, translation_for, translation_pair
 
 # پوشهٔ قدیمی برای تصاویر (فقط برای سرو فایل‌های قبلی؛ همهٔ آپلودهای جدید در images_user ذخیره می‌شوند)
 CONTRIBUTION_UPLOAD_DIR = Path(__file__).resolve().parent / "contribution_uploads"
@@ -65,15 +83,39 @@ def _login_required_team13(view_func):
     return _wrapped
 
 
-def _distance_km(lat1, lon1, lat2, lon2):
-    """فاصله تقریبی به کیلومتر (Haversine)."""
-    R = 6371
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlam = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+def _async_require_http_methods(methods):
+    """معادل require_http_methods برای viewهای async (دکوراتورهای Django 4.2 view async را نمی‌پذیرند)."""
+    from functools import wraps
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def _wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            return await view_func(request, *args, **kwargs)
+        return _wrapped
+    return decorator
+
+
+_async_require_GET = _async_require_http_methods(["GET"])
+
+
+def _neshan_client_scope(view_func):
+    """
+    زیر WSGI (از جمله runserver و کلاینت تست) async_to_sync هر درخواست را در حلقهٔ تازه‌ای اجرا می‌کند، پس
+    کلاینت ناهم‌گام نشان برای همان درخواست ساخته و در پایانش بسته می‌شود؛ زیر ASGI کلاینت مشترک حلقه استفاده می‌شود.
+    """
+    from functools import wraps
+
+    from .neshan.async_client import client_scope
+
+    @wraps(view_func)
+    async def _wrapped(request, *args, **kwargs):
+        if isinstance(request, ASGIRequest):
+            return await view_func(request, *args, **kwargs)
+        async with client_scope():
+            return await view_func(request, *args, **kwargs)
+    return _wrapped
 
 
 @api_login_required
@@ -142,34 +184,30 @@ def place_list(request):
     لیست مکان‌ها از دیتابیس SQLite تیم ۱۳.
     فقط مکان‌های تأییدشده (جدول Place) برگردانده می‌شوند؛ پیشنهادهای در انتظار (PlaceContribution)
     تا پس از تأیید ادمین در این API و نقشه نمایش داده نمی‌شوند.
-    فیلتر: نوع/شهر/قیمت؛ فاصله Haversine در صورت ارسال lat/lng.
+    فیلتر: نوع/شهر (city= نام یا city_id= شناسهٔ team13_cities)/قیمت؛ فاصله Haversine در صورت ارسال lat/lng.
     """
-    # Subquery: average rating (stars) per place from Comment
-    rating_subq = (
-        Comment.objects.using(TEAM13_DB)
-        .filter(
-            target_type=Comment.TargetType.PLACE,
-            target_id=OuterRef("place_id"),
-        )
-        .values("target_id")
-        .annotate(avg_rating=Avg("rating"))
-        .values("avg_rating")
-    )
+    # مرتب‌سازی بر اساس میانگین امتیاز ذخیره‌شده روی خود مکان (team13.ratings)
     qs = (
         Place.objects.using(TEAM13_DB)
         .all()
         .select_related("hotel_details", "restaurant_details")
         .prefetch_related("translations")
-        .annotate(avg_stars=Coalesce(Subquery(rating_subq), 0.0))
-        .order_by("-avg_stars")
+        .order_by("-avg_rating")
     )
     # Category (Type): type or category GET param
     place_type = request.GET.get("type") or request.GET.get("category")
     if place_type and place_type in dict(Place.PlaceType.choices):
         qs = qs.filter(type=place_type)
+    # شهر: نام شناخته‌شده به شناسه تبدیل و روی city_ref فیلتر می‌شود (team13.cities)؛ city_id مستقیم هم پذیرفته می‌شود
     city = request.GET.get("city")
     if city:
-        qs = qs.filter(city__icontains=city)
+        qs = qs.filter(city_filter_q(city))
+    city_id = request.GET.get("city_id")
+    if city_id:
+        try:
+            qs = qs.filter(city_ref_id=int(city_id))
+        except (TypeError, ValueError):
+            city_id = None
     # Pricing filter
     price_level = request.GET.get("price_level")
     qs = _apply_price_level_filter(qs, price_level)
@@ -179,39 +217,45 @@ def place_list(request):
         try:
             r = float(min_rating)
             if 1 <= r <= 5:
-                qs = qs.filter(avg_stars__gte=r)
+                qs = qs.filter(avg_rating__gte=r)
         except (TypeError, ValueError):
             pass
-    # برای نقشه (format=json بدون فیلتر) همهٔ مکان‌ها برگردانده می‌شوند؛ برای صفحهٔ لیست حداکثر ۱۰ (یا ۵۰ با فاصله).
+    # برای نقشه (format=json بدون فیلتر) همهٔ مکان‌ها برگردانده می‌شوند؛ برای صفحهٔ لیست حداکثر ۱۰.
     max_distance = request.GET.get("max_distance")
     try:
         max_dist_km = float(max_distance) if max_distance else None
     except (TypeError, ValueError):
         max_dist_km = None
-    want_all_for_map = _wants_json(request) and not place_type and not city and not price_level and not min_rating
-    if want_all_for_map:
+    user_lat, user_lng = _parse_lat_lng(request)
+    radius_filter = max_dist_km is not None and user_lat is not None and user_lng is not None
+    want_all_for_map = (
+        _wants_json(request) and not place_type and not city and not city_id and not price_level and not min_rating
+    )
+    if radius_filter:
+        # فیلتر شعاعی در SQL: فقط مکان‌های داخل کادر محیطی (ایندکس latitude/longitude) خوانده می‌شوند؛
+        # بررسی دقیق Haversine فقط روی همین نامزدها انجام می‌شود، به ترتیب امتیاز.
+        from .geo_utils import bounding_box_q
+
+        candidates = list(
+            qs.filter(bounding_box_q(user_lat, user_lng, max_dist_km)).values_list("place_id", "latitude", "longitude")
+        )
+        cand_dist = distances_km(user_lat, user_lng, [c[1] for c in candidates], [c[2] for c in candidates])
+        ids_in_radius = [c[0] for c, d in zip(candidates, cand_dist) if round(float(d), 2) <= max_dist_km]
+        ids_in_radius = ids_in_radius[:2000] if want_all_for_map else ids_in_radius[:10]
+        by_id = {p.place_id: p for p in qs.filter(place_id__in=ids_in_radius)}
+        places_qs = [by_id[pid] for pid in ids_in_radius if pid in by_id]
+    elif want_all_for_map:
         places_qs = list(qs[:2000])
-    elif max_dist_km is not None:
-        places_qs = list(qs[:50])
     else:
         places_qs = list(qs[:10])
-    place_ids = [p.place_id for p in places_qs]
-    rating_rows = (
-        Comment.objects.using(TEAM13_DB)
-        .filter(
-            target_type=Comment.TargetType.PLACE,
-            target_id__in=place_ids,
-        )
-        .values("target_id")
-        .annotate(avg_rating=Avg("rating"))
-    )
-    rating_by_place = {str(r["target_id"]): round(float(r["avg_rating"]), 1) for r in rating_rows}
 
-    user_lat, user_lng = _parse_lat_lng(request)
+    dist_by_place = {}
+    if user_lat is not None and user_lng is not None and places_qs:
+        dists = distances_km(user_lat, user_lng, [p.latitude for p in places_qs], [p.longitude for p in places_qs])
+        dist_by_place = {p.place_id: round(float(d), 2) for p, d in zip(places_qs, dists)}
     places = []
     for p in places_qs:
-        trans_fa = p.translations.filter(lang="fa").first()
-        trans_en = p.translations.filter(lang="en").first()
+        trans_fa, trans_en = translation_pair(p)
         item = {
             "place_id": str(p.place_id),
             "type": p.type,
@@ -222,18 +266,12 @@ def place_list(request):
             "longitude": p.longitude,
             "name_fa": trans_fa.name if trans_fa else "",
             "name_en": trans_en.name if trans_en else "",
-            "rating": rating_by_place.get(str(p.place_id)),
+            "rating": round(p.avg_rating, 1) if p.rating_count else None,
         }
-        if user_lat is not None and user_lng is not None:
-            item["distance_km"] = round(_distance_km(user_lat, user_lng, p.latitude, p.longitude), 2)
+        if p.place_id in dist_by_place:
+            item["distance_km"] = dist_by_place[p.place_id]
         places.append(item)
 
-    # Distance filter (when lat/lng present): keep only places within max_distance_km
-    if max_dist_km is not None and user_lat is not None and user_lng is not None:
-        places = [item for item in places if item.get("distance_km") is not None and item["distance_km"] <= max_dist_km]
-    if not want_all_for_map:
-        places = places[:10]
-
     if _wants_json(request):
         return JsonResponse({"places": places})
 
@@ -257,9 +295,8 @@ def place_detail(request, place_id):
         Place.objects.using(TEAM13_DB).select_related("hotel_details", "restaurant_details", "museum_details").prefetch_related("translations", "amenities"),
         place_id=place_id,
     )
-    trans_fa = place.translations.filter(lang="fa").first()
-    trans_en = place.translations.filter(lang="en").first()
-    amenities = list(place.amenities.values_list("amenity_name", flat=True))
+    trans_fa, trans_en = translation_pair(place)
+    amenities = [a.amenity_name for a in place.amenities.all()]
     comments = list(
         Comment.objects.using(TEAM13_DB).filter(
             target_type=Comment.TargetType.PLACE, target_id=place.place_id, is_approved=True
@@ -306,10 +343,9 @@ def place_detail(request, place_id):
         detail["museum"] = None
 
     if _wants_json(request):
-        # میانگین امتیاز فقط از کامنت‌هایی که rating دارند
-        ratings_only = [c.rating for c in detail["comments"] if getattr(c, "rating", None) is not None]
-        rating_count = len(ratings_only)
-        average_rating = round(sum(ratings_only) / rating_count, 1) if rating_count else None
+        # میانگین امتیاز از خلاصهٔ ذخیره‌شده (همهٔ نظرات تأییدشده‌ای که rating دارند)
+        rating_count = place.rating_count
+        average_rating = round(place.avg_rating, 1) if rating_count else None
         # خروجی API بدون آبجکت Django
         api = {
             "place_id": detail["place_id"],
@@ -339,6 +375,81 @@ def place_detail(request, place_id):
     return render(request, f"{TEAM_NAME}/place_detail.html", {"place": place, "detail": detail})
 
 
+@require_GET
+def map_places_geojson(request):
+    """
+    لایهٔ GeoJSON همهٔ مکان‌های تأییدشده برای نقشه (FeatureCollection فشرده و کش‌شده).
+    پارامترهای اختیاری: bbox=min_lng,min_lat,max_lng,max_lat و zoom (۰–۲۲) برای برش و کم‌تراکم‌سازی.
+    ETag به نسخهٔ داده وابسته است؛ با If-None-Match برابر، پاسخ 304 بدون بدنه برگردانده می‌شود.
+    """
+    try:
+        bbox = map_layer.parse_bbox(request.GET.get("bbox"))
+        zoom = map_layer.parse_zoom(request.GET.get("zoom"))
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "bbox (min_lng,min_lat,max_lng,max_lat) یا zoom (۰ تا ۲۲) نامعتبر است."}, status=400)
+    version = get_data_version(PLACES, using=TEAM13_DB)
+    etag = map_layer.layer_etag(version, bbox, zoom)
+    accepts_gzip = "gzip" in (request.META.get("HTTP_ACCEPT_ENCODING") or "")
+    if not accepts_gzip:
+        etag = etag[:-1] + '-identity"'
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH") or ""
+    if etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        response = HttpResponseNotModified()
+    else:
+        body = map_layer.geojson_payload(version, bbox, zoom, using=TEAM13_DB)
+        if accepts_gzip:
+            response = HttpResponse(body, content_type="application/geo+json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(gzip.decompress(body), content_type="application/geo+json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+@require_GET
+def map_clusters(request):
+    """
+    خوشه‌های مارکر نقشه برای یک bbox و zoom (GeoJSON FeatureCollection).
+    پارامترها: bbox=min_lng,min_lat,max_lng,max_lat و zoom (الزامی).
+    خوشه‌ها: properties.cluster=true، point_count و expansion_zoom (zoomی که خوشه در آن باز می‌شود)؛
+    در zoom بالا مکان‌های تکی با place_id، type و name برگردانده می‌شوند.
+    """
+    try:
+        bbox = map_layer.parse_bbox(request.GET.get("bbox"))
+        zoom = map_layer.parse_zoom(request.GET.get("zoom"))
+    except (TypeError, ValueError):
+        bbox = zoom = None
+    if bbox is None or zoom is None:
+        return JsonResponse({"error": "bbox (min_lng,min_lat,max_lng,max_lat) و zoom (۰ تا ۲۲) الزامی است."}, status=400)
+    nodes = get_cluster_index(TEAM13_DB).get_clusters(bbox, zoom)
+    names = place_names([uuid.UUID(n.place_id) for n in nodes if n.is_place], using=TEAM13_DB)
+    features = []
+    for node in nodes:
+        lat, lng = unproject(node.x, node.y)
+        if node.is_place:
+            properties = {
+                "cluster": False,
+                "place_id": node.place_id,
+                "type": node.place_type,
+                "name": names.get(uuid.UUID(node.place_id)) or "",
+            }
+        else:
+            properties = {
+                "cluster": True,
+                "cluster_id": node.id,
+                "point_count": node.count,
+                "expansion_zoom": node.zoom + 1,
+            }
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(lng, 6), round(lat, 6)]},
+            "properties": properties,
+        })
+    return JsonResponse({"type": "FeatureCollection", "zoom": zoom, "features": features})
+
+
 @require_GET
 def nearest_place(request):
     """
@@ -354,18 +465,16 @@ def nearest_place(request):
             radius_km = 0.05
     except (TypeError, ValueError):
         radius_km = 0.05
-    places = list(Place.objects.using(TEAM13_DB).all())
-    best = None
-    best_d = float("inf")
-    for p in places:
-        d = _distance_km(lat, lng, p.latitude, p.longitude)
-        if d <= radius_km and d < best_d:
-            best_d = d
-            best = p
+    from .spatial_index import get_place_index
+
+    hits = get_place_index(TEAM13_DB).nearest(lat, lng, k=1, radius_km=radius_km)
+    if not hits:
+        return JsonResponse({"place": None})
+    best_d, hit = hits[0]
+    best = Place.objects.using(TEAM13_DB).prefetch_related("translations").filter(place_id=hit.place_id).first()
     if best is None:
         return JsonResponse({"place": None})
-    trans_fa = best.translations.filter(lang="fa").first()
-    trans_en = best.translations.filter(lang="en").first()
+    trans_fa, trans_en = translation_pair(best)
     payload = {
         "place_id": str(best.place_id),
         "name_fa": trans_fa.name if trans_fa else "",
@@ -387,12 +496,14 @@ def place_rate(request, place_id):
     try:
         rating = int(request.POST.get("rating", 0))
         if 1 <= rating <= 5:
-            Comment.objects.using(TEAM13_DB).create(
-                target_type=Comment.TargetType.PLACE,
-                target_id=place.place_id,
-                rating=rating,
-                is_approved=True,
-            )
+            with transaction.atomic(using=TEAM13_DB):
+                comment = Comment.objects.using(TEAM13_DB).create(
+                    target_type=Comment.TargetType.PLACE,
+                    target_id=place.place_id,
+                    rating=rating,
+                    is_approved=True,
+                )
+                record_comment(comment, using=TEAM13_DB)
     except (ValueError, TypeError):
         pass
     return redirect("team13:place_detail", place_id=place.place_id)
@@ -455,13 +566,15 @@ def place_add_comment(request, place_id):
         return JsonResponse({"error": "متن نظر یا امتیاز الزامی است."}, status=400)
     # نظر متنی فقط پس از تأیید ادمین نمایش داده می‌شود؛ امتیاز تنها فوراً نمایش داده می‌شود
     comment_approved = not (body or "").strip()
-    Comment.objects.using(TEAM13_DB).create(
-        target_type=Comment.TargetType.PLACE,
-        target_id=place.place_id,
-        rating=rating,
-        body=body or "",
-        is_approved=comment_approved,
-    )
+    with transaction.atomic(using=TEAM13_DB):
+        comment = Comment.objects.using(TEAM13_DB).create(
+            target_type=Comment.TargetType.PLACE,
+            target_id=place.place_id,
+            rating=rating,
+            body=body or "",
+            is_approved=comment_approved,
+        )
+        record_comment(comment, using=TEAM13_DB)
     if _wants_json(request):
         if comment_approved:
             return JsonResponse({"ok": True, "message": "امتیاز با موفقیت ثبت شد."})
@@ -536,9 +649,8 @@ def submit_contribution(request):
     ثبت پیشنهاد مکان: name_fa, name_en (اختیاری), type، latitude, longitude (الزامی از نقشه).
     آدرس از کاربر دریافت نمی‌شود؛ همیشه از طول و عرض جغرافیایی به‌صورت خودکار ثابت می‌شود.
     تصویر: multipart (image) یا base64 (image_base64) — اختیاری.
+    آدرس ابتدا به فرمت عرض/طول ذخیره و در صف team13.geocode_queue با آدرس نشان جایگزین می‌شود.
     """
-    from .geo_utils import address_from_coords
-
     name_fa = (request.POST.get("name_fa") or "").strip()
     if not name_fa:
         return JsonResponse({"error": "نام مکان (name_fa) الزامی است."}, status=400)
@@ -556,18 +668,19 @@ def submit_contribution(request):
             "error": "موقعیت مکانی (طول و عرض جغرافیایی) الزامی است. لطفاً روی نقشه کلیک کنید و روی دکمهٔ سبز «ادامه» بزنید."
         }, status=400)
     city = (request.POST.get("city") or "").strip()
-    address = address_from_coords(lat, lng)
-
-    contribution = PlaceContribution.objects.using(TEAM13_DB).create(
-        name_fa=name_fa,
-        name_en=name_en or name_fa,
-        type=place_type,
-        address=address,
-        latitude=lat,
-        longitude=lng,
-        city=city,
-        submitted_by_id=getattr(request.user, "id", None),
-    )
+
+    with transaction.atomic(using=TEAM13_DB):
+        contribution = PlaceContribution.objects.using(TEAM13_DB).create(
+            name_fa=name_fa,
+            name_en=name_en or name_fa,
+            type=place_type,
+            address=coordinate_address(lat, lng),
+            latitude=lat,
+            longitude=lng,
+            city=city,
+            submitted_by_id=getattr(request.user, "id", None),
+        )
+        geocode_queue.enqueue((GeocodeJob.TargetType.PLACE_CONTRIBUTION, contribution.contribution_id, lat, lng))
     image_url = None
     # 1) فایل آپلود شده (multipart) — هر فرمت؛ بهینه و ذخیره فقط در images_user
     if request.FILES and request.FILES.get("image"):
@@ -619,11 +732,9 @@ def submit_contribution(request):
 def submit_route_contribution(request):
     """
     ثبت پیشنهاد مسیر: source_latitude, source_longitude, destination_latitude, destination_longitude, travel_mode.
-    آدرس مبدأ و مقصد از روی مختصات (reverse geocode یا فرمت عرض/طول) ثابت و در دیتابیس ذخیره می‌شود.
+    آدرس مبدأ و مقصد ابتدا به فرمت عرض/طول ذخیره و در صف team13.geocode_queue با آدرس نشان جایگزین می‌شود.
     پس از تأیید ادمین، دو مکان و یک RouteLog ساخته می‌شود.
     """
-    from .geo_utils import address_from_coords
-
     try:
         src_lat = float(request.POST.get("source_latitude", 0))
         src_lng = float(request.POST.get("source_longitude", 0))
@@ -634,24 +745,27 @@ def submit_route_contribution(request):
     travel_mode = (request.POST.get("travel_mode") or "car").strip().lower()
     if travel_mode not in dict(RouteContribution.TravelMode.choices):
         travel_mode = RouteContribution.TravelMode.CAR
-    source_address = address_from_coords(src_lat, src_lng)
-    destination_address = address_from_coords(dst_lat, dst_lng)
     user_id = getattr(request.user, "id", None)
     if user_id is not None:
         try:
             user_id = uuid.UUID(str(user_id)) if user_id else None
         except (TypeError, ValueError):
             user_id = None
-    rc = RouteContribution.objects.using("team13").create(
-        source_address=source_address,
-        source_latitude=src_lat,
-        source_longitude=src_lng,
-        destination_address=destination_address,
-        destination_latitude=dst_lat,
-        destination_longitude=dst_lng,
-        travel_mode=travel_mode,
-        user_id=user_id,
-    )
+    with transaction.atomic(using=TEAM13_DB):
+        rc = RouteContribution.objects.using(TEAM13_DB).create(
+            source_address=coordinate_address(src_lat, src_lng),
+            source_latitude=src_lat,
+            source_longitude=src_lng,
+            destination_address=coordinate_address(dst_lat, dst_lng),
+            destination_latitude=dst_lat,
+            destination_longitude=dst_lng,
+            travel_mode=travel_mode,
+            user_id=user_id,
+        )
+        geocode_queue.enqueue(
+            (GeocodeJob.TargetType.ROUTE_SOURCE, rc.contribution_id, src_lat, src_lng),
+            (GeocodeJob.TargetType.ROUTE_DESTINATION, rc.contribution_id, dst_lat, dst_lng),
+        )
     return JsonResponse({
         "ok": True,
         "contribution_id": str(rc.contribution_id),
@@ -728,32 +842,25 @@ def team13_admin_dashboard(request):
             target_type=Comment.TargetType.PLACE, is_approved=False
         ).order_by("-created_at")
     )
-    place_ids_comments = list({c.target_id for c in pending_comments_list_raw})
-    places_for_comments = {
-        str(p.place_id): (p.translations.filter(lang="fa").first() or p.translations.filter(lang="en").first())
-        for p in Place.objects.using("team13").filter(place_id__in=place_ids_comments).prefetch_related("translations")
-    }
-    pending_comments_list = []
-    for c in pending_comments_list_raw:
-        trans = places_for_comments.get(str(c.target_id))
-        place_name = trans.name if trans else str(c.target_id)
-        pending_comments_list.append({"comment": c, "place_name": place_name})
-
     pending_images_list_raw = list(
         Image.objects.using("team13").filter(
             target_type=Image.TargetType.PLACE, is_approved=False
         ).order_by("-created_at")
     )
-    place_ids_images = list({img.target_id for img in pending_images_list_raw})
-    places_for_images = {
-        str(p.place_id): (p.translations.filter(lang="fa").first() or p.translations.filter(lang="en").first())
-        for p in Place.objects.using("team13").filter(place_id__in=place_ids_images).prefetch_related("translations")
-    }
-    pending_images_list = []
-    for img in pending_images_list_raw:
-        trans = places_for_images.get(str(img.target_id))
-        place_name = trans.name if trans else str(img.target_id)
-        pending_images_list.append({"image": img, "place_name": place_name})
+    # نام مکان‌های نظرات و تصاویر در انتظار با یک کوئری
+    names = place_names(
+        {c.target_id for c in pending_comments_list_raw} | {img.target_id for img in pending_images_list_raw},
+        using="team13",
+    )
+    pending_comments_list = [
+        {"comment": c, "place_name": names.get(c.target_id) or str(c.target_id)}
+        for c in pending_comments_list_raw
+    ]
+
+    pending_images_list = [
+        {"image": img, "place_name": names.get(img.target_id) or str(img.target_id)}
+        for img in pending_images_list_raw
+    ]
 
     return render(request, f"{TEAM_NAME}/admin_dashboard.html", {
         "pending_requests": pending_requests,
@@ -793,6 +900,7 @@ def team13_admin_reject(request, contribution_id):
             target_type=Image.TargetType.PENDING_PLACE,
             target_id=contribution.contribution_id,
         ).delete()
+        geocode_queue.discard(contribution.contribution_id, GeocodeJob.TargetType.PLACE_CONTRIBUTION)
         contribution.delete()
     return redirect("team13:team13_admin_panel")
 
@@ -821,6 +929,9 @@ def team13_admin_reject_route(request, contribution_id):
         return HttpResponseForbidden("Forbidden")
     rc = RouteContribution.objects.using("team13").filter(contribution_id=contribution_id).first()
     if rc:
+        geocode_queue.discard(
+            rc.contribution_id, GeocodeJob.TargetType.ROUTE_SOURCE, GeocodeJob.TargetType.ROUTE_DESTINATION
+        )
         rc.delete()
     return redirect("team13:team13_admin_panel")
 
@@ -832,7 +943,12 @@ def team13_admin_approve_comment(request, comment_id):
         return HttpResponseForbidden("Authentication required")
     if not is_team13_admin(request.user):
         return HttpResponseForbidden("Forbidden")
-    Comment.objects.using("team13").filter(comment_id=comment_id).update(is_approved=True)
+    with transaction.atomic(using="team13"):
+        comment = Comment.objects.using("team13").select_for_update().filter(comment_id=comment_id, is_approved=False).first()
+        if comment:
+            Comment.objects.using("team13").filter(pk=comment.pk).update(is_approved=True)
+            comment.is_approved = True
+            record_comment(comment, using="team13")
     return redirect("team13:team13_admin_panel")
 
 
@@ -843,10 +959,25 @@ def team13_admin_reject_comment(request, comment_id):
         return HttpResponseForbidden("Authentication required")
     if not is_team13_admin(request.user):
         return HttpResponseForbidden("Forbidden")
-    Comment.objects.using("team13").filter(comment_id=comment_id).delete()
+    with transaction.atomic(using="team13"):
+        comment = Comment.objects.using("team13").select_for_update().filter(comment_id=comment_id).first()
+        if comment:
+            forget_comment(comment, using="team13")
+            comment.delete(using="team13")
     return redirect("team13:team13_admin_panel")
 
 
+@require_GET
+def team13_admin_neshan_cache_stats(request):
+    """شمارنده‌های hit/miss کش پاسخ‌های نشان و زمان providerهای مسیریابی در این پردازه (فقط ادمین)."""
+    if not getattr(request.user, "is_authenticated", False):
+        return HttpResponseForbidden("Authentication required")
+    if not is_team13_admin(request.user):
+        return HttpResponseForbidden("Forbidden")
+    from .neshan import cache_stats
+    return JsonResponse({"caches": cache_stats(), "routing": get_routing_engine().stats()})
+
+
 @require_POST
 def team13_admin_approve_image(request, image_id):
     """تأیید یک تصویر — پس از تأیید برای همه نمایش داده می‌شود."""
@@ -894,18 +1025,50 @@ def team13_admin_add_admin(request):
 # رویدادها
 # -----------------------------------------------------------------------------
 
+EVENT_LIST_LIMIT = 100
+# سقف نامزدهای FTS وقتی فیلتر شهر/شعاع پس از جستجو بخشی از نتایج را کنار می‌گذارد
+EVENT_SEARCH_FILTERED_LIMIT = 500
+
+
 @require_GET
 def event_list(request):
-    """لیست رویدادها از دیتابیس team13. فیلتر شهر با GET city=. خروجی: JSON (API) یا صفحه HTML."""
+    """
+    لیست رویدادها از دیتابیس team13. فیلتر شهر با GET city=؛ فیلتر شعاعی با lat، lng و max_distance (کیلومتر).
+    جستجوی متنی با q= روی عنوان و توضیح (FTS5 با MATCH؛ نتایج به‌ترتیب رتبهٔ bm25؛ فقط بهترین
+    EVENT_LIST_LIMIT نتیجه، یا EVENT_SEARCH_FILTERED_LIMIT نامزد وقتی فیلتر شهر/شعاع هم هست).
+    خروجی: JSON (API) یا صفحه HTML.
+    """
     qs = Event.objects.using(TEAM13_DB).all().prefetch_related("translations").order_by("-start_at")
     city = (request.GET.get("city") or "").strip()
     if city:
         qs = qs.filter(city__icontains=city)
-    qs = qs[:100]
+    q = (request.GET.get("q") or "").strip()
+    user_lat, user_lng = _parse_lat_lng(request)
+    try:
+        max_dist_km = float(request.GET.get("max_distance")) if request.GET.get("max_distance") else None
+    except (TypeError, ValueError):
+        max_dist_km = None
+    radius_filter = max_dist_km is not None and user_lat is not None and user_lng is not None
+    rank = None
+    if q and fts.is_available(TEAM13_DB):
+        limit = EVENT_SEARCH_FILTERED_LIMIT if city or radius_filter else EVENT_LIST_LIMIT
+        ranked_ids = fts.search_event_ids(q, limit=limit, using=TEAM13_DB)
+        rank = {event_id: i for i, event_id in enumerate(ranked_ids)}
+        qs = qs.filter(event_id__in=ranked_ids)
+    elif q:
+        qs = qs.filter(translations__title__icontains=q).distinct()
+    if radius_filter:
+        from .geo_utils import bounding_box_q
+
+        candidates = list(qs.filter(bounding_box_q(user_lat, user_lng, max_dist_km)))
+        cand_dist = distances_km(user_lat, user_lng, [e.latitude for e in candidates], [e.longitude for e in candidates])
+        qs = [e for e, d in zip(candidates, cand_dist) if round(float(d), 2) <= max_dist_km]
+    if rank is not None:
+        qs = sorted(qs, key=lambda e: rank.get(e.event_id.hex, len(rank)))
+    qs = qs[:EVENT_LIST_LIMIT]
     events = []
     for e in qs:
-        trans_fa = e.translations.filter(lang="fa").first()
-        trans_en = e.translations.filter(lang="en").first()
+        trans_fa, trans_en = translation_pair(e)
         events.append({
             "event_id": str(e.event_id),
             "city": e.city,
@@ -947,8 +1110,7 @@ def event_detail(request, event_id):
         Event.objects.using(TEAM13_DB).prefetch_related("translations"),
         event_id=event_id,
     )
-    trans_fa = event.translations.filter(lang="fa").first()
-    trans_en = event.translations.filter(lang="en").first()
+    trans_fa, trans_en = translation_pair(event)
     comments = list(
         Comment.objects.using(TEAM13_DB).filter(target_type=Comment.TargetType.EVENT, target_id=event.event_id)
         .order_by("-created_at")[:50]
@@ -993,11 +1155,13 @@ def event_rate(request, event_id):
     try:
         rating = int(request.POST.get("rating", 0))
         if 1 <= rating <= 5:
-            Comment.objects.using(TEAM13_DB).create(
-                target_type=Comment.TargetType.EVENT,
-                target_id=event.event_id,
-                rating=rating,
-            )
+            with transaction.atomic(using=TEAM13_DB):
+                comment = Comment.objects.using(TEAM13_DB).create(
+                    target_type=Comment.TargetType.EVENT,
+                    target_id=event.event_id,
+                    rating=rating,
+                )
+                record_comment(comment, using=TEAM13_DB)
     except (ValueError, TypeError):
         pass
     return redirect("team13:event_detail", event_id=event.event_id)
@@ -1007,159 +1171,68 @@ def event_rate(request, event_id):
 # مسیریابی و امکانات روی مسیر (در صورت تنظیم نشان از API نشان؛ وگرنه Haversine)
 # -----------------------------------------------------------------------------
 
-def _compute_route_result(source, dest, travel_mode, request, **route_options):
-    """محاسبه فاصله و ETA؛ برای خودرو/موتور در صورت وجود کلید نشان از API نشان استفاده می‌شود.
-    route_options: vehicle_type, avoid_traffic_zone, avoid_odd_even_zone, alternative (برای fetch_route_eta).
+def _geometry_params(params):
     """
-    dist_km = _distance_km(source.latitude, source.longitude, dest.latitude, dest.longitude)
-    eta_minutes = None
-    eta_source = "haversine"
-
-    route_geometry = None
-    if travel_mode in ("car", "motorcycle"):
-        try:
-            no_traffic = route_options.get("no_traffic", False)
-            bearing = route_options.get("bearing")
-            if travel_mode == "car" and no_traffic:
-                from .neshan import fetch_route_eta_no_traffic
-                dist_neshan, dur_sec, route_geometry = fetch_route_eta_no_traffic(
-                    source.longitude, source.latitude, dest.longitude, dest.latitude,
-                    avoid_traffic_zone=route_options.get("avoid_traffic_zone", False),
-                    avoid_odd_even_zone=route_options.get("avoid_odd_even_zone", False),
-                    alternative=route_options.get("alternative", False),
-                    bearing=bearing,
-                )
-                eta_source = "neshan_no_traffic"
-            else:
-                from .neshan import fetch_route_eta
-                vehicle_type = route_options.get("vehicle_type") or ("motorcycle" if travel_mode == "motorcycle" else "car")
-                dist_neshan, dur_sec, route_geometry = fetch_route_eta(
-                    source.longitude, source.latitude,
-                    dest.longitude, dest.latitude,
-                    vehicle_type=vehicle_type,
-                    avoid_traffic_zone=route_options.get("avoid_traffic_zone", False),
-                    avoid_odd_even_zone=route_options.get("avoid_odd_even_zone", False),
-                    alternative=route_options.get("alternative", False),
-                    bearing=bearing,
-                )
-                eta_source = "neshan"
-            if dist_neshan is not None and dur_sec is not None:
-                dist_km = dist_neshan
-                eta_minutes = max(1, round(dur_sec / 60.0))
-            else:
-                eta_minutes = max(1, round(dist_km / 0.5))
-        except Exception:
-            eta_minutes = max(1, round(dist_km / 0.5))
-    elif travel_mode == "walk":
+    شکل route_geometry پاسخ از پارامترهای GET یا یک آیتم JSON: steps (1/true = legs و stepها)،
+    simplify (تلورانس ساده‌سازی به متر) یا zoom (زوم نقشهٔ کلاینت؛ تلورانس حدود یک پیکسل).
+    """
+    options = {"steps": str(params.get("steps") or "").lower() in ("1", "true", "yes")}
+    for name, key in (("simplify", "tolerance_m"), ("zoom", "zoom")):
         try:
-            from .neshan import fetch_route_eta_pedestrian
-            bearing = route_options.get("bearing")
-            dist_neshan, dur_sec, route_geometry = fetch_route_eta_pedestrian(
-                source.longitude, source.latitude, dest.longitude, dest.latitude,
-                alternative=route_options.get("alternative", False),
-                bearing=bearing,
-            )
-            if dist_neshan is not None and dur_sec is not None:
-                dist_km = dist_neshan
-                eta_minutes = max(1, round(dur_sec / 60.0))
-                eta_source = "neshan_pedestrian"
-            else:
-                eta_minutes = max(1, round(dist_km / 0.08))
-        except Exception:
-            eta_minutes = max(1, round(dist_km / 0.08))
-    else:
-        eta_minutes = max(1, round(dist_km / 0.4))
+            value = float(params.get(name, ""))
+        except (TypeError, ValueError):
+            continue
+        if value >= 0 and value == value:
+            options[key] = value
+    return options
+
 
-    trans_src = source.translations.filter(lang="fa").first()
-    trans_dst = dest.translations.filter(lang="fa").first()
+def _route_fields(route, travel_mode, geometry=None):
+    """فیلدهای مشترک پاسخ مسیریابی از RouteResult موتور مسیریابی؛ geometry خروجی _geometry_params."""
     result = {
+        "travel_mode": travel_mode,
+        "distance_km": round(route.distance_km, 2),
+        "eta_minutes": route.eta_minutes,
+        "eta_source": route.source,
+    }
+    route_geometry = shape_geometry(route.geometry, **(geometry or {}))
+    if route_geometry is not None:
+        result["route_geometry"] = route_geometry
+    return result
+
+
+def _route_result_for_places(source, dest, travel_mode, route, geometry=None):
+    """پاسخ مسیریابی بین دو مکان (translations و amenities باید prefetch شده باشند)."""
+    trans_src = translation_for(source, "fa")
+    trans_dst = translation_for(dest, "fa")
+    return {
         "source_place_id": str(source.place_id),
         "destination_place_id": str(dest.place_id),
         "source_name": trans_src.name if trans_src else str(source.place_id),
         "destination_name": trans_dst.name if trans_dst else str(dest.place_id),
-        "travel_mode": travel_mode,
-        "distance_km": round(dist_km, 2),
-        "eta_minutes": eta_minutes,
-        "eta_source": eta_source,
-        "source_amenities": list(source.amenities.values_list("amenity_name", flat=True)),
-        "destination_amenities": list(dest.amenities.values_list("amenity_name", flat=True)),
+        **_route_fields(route, travel_mode, geometry),
+        "source_amenities": [a.amenity_name for a in source.amenities.all()],
+        "destination_amenities": [a.amenity_name for a in dest.amenities.all()],
         "source_lat": source.latitude,
         "source_lng": source.longitude,
         "dest_lat": dest.latitude,
         "dest_lng": dest.longitude,
     }
-    if route_geometry is not None:
-        result["route_geometry"] = route_geometry
-    return result
 
 
-def _compute_route_result_from_coords(lat_src, lng_src, name_src, lat_dest, lng_dest, name_dest, travel_mode, **route_options):
-    """محاسبه فاصله و ETA از روی مختصات؛ برای خودرو/موتور در صورت وجود نشان از API نشان."""
-    dist_km = _distance_km(lat_src, lng_src, lat_dest, lng_dest)
-    eta_minutes = None
-    eta_source = "haversine"
+def _compute_route_result_from_coords(lat_src, lng_src, name_src, lat_dest, lng_dest, name_dest, travel_mode,
+                                      geometry=None, **route_options):
+    """محاسبهٔ هم‌گام فاصله و ETA از روی مختصات با موتور مسیریابی (نشان با کش، وگرنه Haversine)."""
+    route = get_routing_engine().route(RouteQuery(lat_src, lng_src, lat_dest, lng_dest, travel_mode, **route_options))
+    return _route_result_for_coords(lat_src, lng_src, name_src, lat_dest, lng_dest, name_dest, travel_mode, route, geometry)
 
-    route_geometry = None
-    if travel_mode in ("car", "motorcycle"):
-        try:
-            no_traffic = route_options.get("no_traffic", False)
-            bearing = route_options.get("bearing")
-            if travel_mode == "car" and no_traffic:
-                from .neshan import fetch_route_eta_no_traffic
-                dist_neshan, dur_sec, route_geometry = fetch_route_eta_no_traffic(
-                    lng_src, lat_src, lng_dest, lat_dest,
-                    avoid_traffic_zone=route_options.get("avoid_traffic_zone", False),
-                    avoid_odd_even_zone=route_options.get("avoid_odd_even_zone", False),
-                    alternative=route_options.get("alternative", False),
-                    bearing=bearing,
-                )
-                eta_source = "neshan_no_traffic"
-            else:
-                from .neshan import fetch_route_eta
-                vehicle_type = route_options.get("vehicle_type") or ("motorcycle" if travel_mode == "motorcycle" else "car")
-                dist_neshan, dur_sec, route_geometry = fetch_route_eta(
-                    lng_src, lat_src, lng_dest, lat_dest,
-                    vehicle_type=vehicle_type,
-                    avoid_traffic_zone=route_options.get("avoid_traffic_zone", False),
-                    avoid_odd_even_zone=route_options.get("avoid_odd_even_zone", False),
-                    alternative=route_options.get("alternative", False),
-                    bearing=bearing,
-                )
-                eta_source = "neshan"
-            if dist_neshan is not None and dur_sec is not None:
-                dist_km = dist_neshan
-                eta_minutes = max(1, round(dur_sec / 60.0))
-            else:
-                eta_minutes = max(1, round(dist_km / 0.5))
-        except Exception:
-            eta_minutes = max(1, round(dist_km / 0.5))
-    elif travel_mode == "walk":
-        try:
-            from .neshan import fetch_route_eta_pedestrian
-            bearing = route_options.get("bearing")
-            dist_neshan, dur_sec, route_geometry = fetch_route_eta_pedestrian(
-                lng_src, lat_src, lng_dest, lat_dest,
-                alternative=route_options.get("alternative", False),
-                bearing=bearing,
-            )
-            if dist_neshan is not None and dur_sec is not None:
-                dist_km = dist_neshan
-                eta_minutes = max(1, round(dur_sec / 60.0))
-                eta_source = "neshan_pedestrian"
-            else:
-                eta_minutes = max(1, round(dist_km / 0.08))
-        except Exception:
-            eta_minutes = max(1, round(dist_km / 0.08))
-    else:
-        eta_minutes = max(1, round(dist_km / 0.4))
 
-    result = {
+def _route_result_for_coords(lat_src, lng_src, name_src, lat_dest, lng_dest, name_dest, travel_mode, route,
+                             geometry=None):
+    return {
         "source_name": name_src or "مبدأ",
         "destination_name": name_dest or "مقصد",
-        "travel_mode": travel_mode,
-        "distance_km": round(dist_km, 2),
-        "eta_minutes": eta_minutes,
-        "eta_source": eta_source,
+        **_route_fields(route, travel_mode, geometry),
         "source_amenities": [],
         "destination_amenities": [],
         "source_lat": lat_src,
@@ -1167,83 +1240,121 @@ def _compute_route_result_from_coords(lat_src, lng_src, name_src, lat_dest, lng_
         "dest_lat": lat_dest,
         "dest_lng": lng_dest,
     }
-    if route_geometry is not None:
-        result["route_geometry"] = route_geometry
-    return result
 
 
-@require_GET
-def route_request(request):
+def _route_places(src_id, dst_id):
+    """مکان مبدأ و مقصد با ترجمه‌ها و امکانات (برای فراخوانی با sync_to_async از view async)."""
+    qs = Place.objects.using(TEAM13_DB).prefetch_related("translations", "amenities")
+    return qs.get(place_id=src_id), qs.get(place_id=dst_id)
+
+
+def _log_route(request, source, dest, travel_mode):
+    if getattr(request.user, "is_authenticated", False):
+        try:
+            RouteLog.objects.using(TEAM13_DB).create(
+                user_id=getattr(request.user, "id", None),
+                source_place=source,
+                destination_place=dest,
+                travel_mode=travel_mode,
+            )
+        except Exception:
+            return
+        record_route(source.place_id, dest.place_id)
+
+
+def _render_routes_page(request, route_result, travel_mode, src_id, dst_id):
+    places_choices = list(Place.objects.using(TEAM13_DB).all().prefetch_related("translations")[:200])
+    places_for_select = []
+    for p in places_choices:
+        trans_fa, trans_en = translation_pair(p)
+        name = (trans_fa.name if trans_fa else None) or (trans_en.name if trans_en else None) or str(p.place_id)
+        places_for_select.append({"place_id": str(p.place_id), "name": name})
+
+    return render(request, f"{TEAM_NAME}/routes.html", {
+        "route_result": route_result,
+        "places_for_select": places_for_select,
+        "travel_mode": travel_mode,
+        "source_place_id": src_id or "",
+        "destination_place_id": dst_id or "",
+    })
+
+
+def _route_params(params):
     """
-    مسیریابی و ETA بین دو مکان + امکانات مبدأ و مقصد.
-    پذیرش: source_place_id/destination_place_id (مکان از دیتابیس) یا
-    source_lat, source_lng, source_name, dest_lat, dest_lng, dest_name (جستجوی آدرس).
+    travel_mode و گزینه‌های API مسیریابی نشان (v4) از پارامترهای GET یا یک آیتم JSON؛
+    مقدار نامعتبر به پیش‌فرض برمی‌گردد. خروجی (travel_mode, route_options).
     """
-    src_id = request.GET.get("source_place_id")
-    dst_id = request.GET.get("destination_place_id")
-    source_lat = request.GET.get("source_lat")
-    source_lng = request.GET.get("source_lng")
-    source_name = request.GET.get("source_name", "")
-    dest_lat = request.GET.get("dest_lat")
-    dest_lng = request.GET.get("dest_lng")
-    dest_name = request.GET.get("dest_name", "")
-    travel_mode = request.GET.get("travel_mode", "car").lower()
+    def flag(name):
+        return str(params.get(name) or "").lower() in ("1", "true", "yes")
+
+    travel_mode = str(params.get("travel_mode") or "car").lower()
     if travel_mode not in ("car", "walk", "transit", "motorcycle"):
         travel_mode = "car"
-    # پارامترهای اختیاری API مسیریابی نشان (v4)
-    vehicle_type = request.GET.get("vehicle_type", "").lower().strip() or None
+    vehicle_type = str(params.get("vehicle_type") or "").lower().strip() or None
     if vehicle_type and vehicle_type not in ("car", "motorcycle"):
         vehicle_type = None
-    avoid_traffic_zone = request.GET.get("avoid_traffic_zone", "").lower() in ("1", "true", "yes")
-    avoid_odd_even_zone = request.GET.get("avoid_odd_even_zone", "").lower() in ("1", "true", "yes")
-    alternative = request.GET.get("alternative", "").lower() in ("1", "true", "yes")
-    no_traffic = request.GET.get("no_traffic", "").lower() in ("1", "true", "yes")
     try:
-        bearing = int(request.GET.get("bearing", ""))
+        bearing = int(params.get("bearing", ""))
         if not (0 <= bearing <= 360):
             bearing = None
     except (TypeError, ValueError):
         bearing = None
-    route_options = {
+    return travel_mode, {
         "vehicle_type": vehicle_type,
-        "avoid_traffic_zone": avoid_traffic_zone,
-        "avoid_odd_even_zone": avoid_odd_even_zone,
-        "alternative": alternative,
-        "no_traffic": no_traffic,
+        "avoid_traffic_zone": flag("avoid_traffic_zone"),
+        "avoid_odd_even_zone": flag("avoid_odd_even_zone"),
+        "alternative": flag("alternative"),
+        "no_traffic": flag("no_traffic"),
         "bearing": bearing,
     }
 
+
+@_async_require_GET
+@_neshan_client_scope
+async def route_request(request):
+    """
+    مسیریابی و ETA بین دو مکان + امکانات مبدأ و مقصد.
+    پذیرش: source_place_id/destination_place_id (مکان از دیتابیس) یا
+    source_lat, source_lng, source_name, dest_lat, dest_lng, dest_name (جستجوی آدرس).
+    route_geometry فقط overview_polyline فشرده است؛ steps=1 برای legs و stepها، simplify (متر) یا zoom
+    برای ساده‌سازی Douglas–Peucker (route_cache.shape_geometry).
+    view async است تا انتظار برای نشان worker را اشغال نکند؛ دسترسی به دیتابیس با sync_to_async.
+    """
+    src_id = request.GET.get("source_place_id")
+    dst_id = request.GET.get("destination_place_id")
+    source_lat = request.GET.get("source_lat")
+    source_lng = request.GET.get("source_lng")
+    source_name = request.GET.get("source_name", "")
+    dest_lat = request.GET.get("dest_lat")
+    dest_lng = request.GET.get("dest_lng")
+    dest_name = request.GET.get("dest_name", "")
+    travel_mode, route_options = _route_params(request.GET)
+    geometry = _geometry_params(request.GET)
+
     if _wants_json(request):
         if src_id and dst_id:
             try:
-                source = Place.objects.using(TEAM13_DB).prefetch_related("translations", "amenities").get(place_id=src_id)
-                dest = Place.objects.using(TEAM13_DB).prefetch_related("translations", "amenities").get(place_id=dst_id)
-                result = _compute_route_result(source, dest, travel_mode, request, **route_options)
-                if getattr(request.user, "is_authenticated", False):
-                    try:
-                        RouteLog.objects.using(TEAM13_DB).create(
-                            user_id=getattr(request.user, "id", None),
-                            source_place=source,
-                            destination_place=dest,
-                            travel_mode=travel_mode,
-                        )
-                    except Exception:
-                        pass
-                return JsonResponse(result)
+                source, dest = await sync_to_async(_route_places)(src_id, dst_id)
             except Place.DoesNotExist:
                 return JsonResponse({"error": "مکان مبدأ یا مقصد یافت نشد"}, status=404)
+            route = await get_routing_engine().aroute(RouteQuery(
+                source.latitude, source.longitude, dest.latitude, dest.longitude, travel_mode, **route_options
+            ))
+            await sync_to_async(_log_route)(request, source, dest, travel_mode)
+            return JsonResponse(_route_result_for_places(source, dest, travel_mode, route, geometry))
         if source_lat and source_lng and dest_lat and dest_lng:
             try:
                 lat_s = float(source_lat)
                 lng_s = float(source_lng)
                 lat_d = float(dest_lat)
                 lng_d = float(dest_lng)
-                result = _compute_route_result_from_coords(
-                    lat_s, lng_s, source_name, lat_d, lng_d, dest_name, travel_mode, **route_options
-                )
-                return JsonResponse(result)
             except (TypeError, ValueError):
                 pass
+            else:
+                route = await get_routing_engine().aroute(RouteQuery(lat_s, lng_s, lat_d, lng_d, travel_mode, **route_options))
+                return JsonResponse(_route_result_for_coords(
+                    lat_s, lng_s, source_name, lat_d, lng_d, dest_name, travel_mode, route, geometry
+                ))
         return JsonResponse({"error": "source_place_id و destination_place_id یا source_lat/lng و dest_lat/lng الزامی است"}, status=400)
 
     # صفحه HTML
@@ -1254,43 +1365,119 @@ def route_request(request):
             lng_s = float(source_lng)
             lat_d = float(dest_lat)
             lng_d = float(dest_lng)
-            route_result = _compute_route_result_from_coords(
-                lat_s, lng_s, source_name, lat_d, lng_d, dest_name, travel_mode, **route_options
-            )
         except (TypeError, ValueError):
             route_result = {"error": "مختصات مبدأ یا مقصد نامعتبر است."}
+        else:
+            route = await get_routing_engine().aroute(RouteQuery(lat_s, lng_s, lat_d, lng_d, travel_mode, **route_options))
+            route_result = _route_result_for_coords(lat_s, lng_s, source_name, lat_d, lng_d, dest_name, travel_mode, route)
     elif src_id and dst_id:
         try:
-            source = Place.objects.using(TEAM13_DB).prefetch_related("translations", "amenities").get(place_id=src_id)
-            dest = Place.objects.using(TEAM13_DB).prefetch_related("translations", "amenities").get(place_id=dst_id)
-            route_result = _compute_route_result(source, dest, travel_mode, request, **route_options)
-            if getattr(request.user, "is_authenticated", False):
-                try:
-                    RouteLog.objects.using(TEAM13_DB).create(
-                        user_id=getattr(request.user, "id", None),
-                        source_place=source,
-                        destination_place=dest,
-                        travel_mode=travel_mode,
-                    )
-                except Exception:
-                    pass
+            source, dest = await sync_to_async(_route_places)(src_id, dst_id)
         except Place.DoesNotExist:
             route_result = {"error": "مکان مبدأ یا مقصد یافت نشد."}
+        else:
+            route = await get_routing_engine().aroute(RouteQuery(
+                source.latitude, source.longitude, dest.latitude, dest.longitude, travel_mode, **route_options
+            ))
+            route_result = _route_result_for_places(source, dest, travel_mode, route)
+            await sync_to_async(_log_route)(request, source, dest, travel_mode)
 
-    places_choices = list(Place.objects.using(TEAM13_DB).all().prefetch_related("translations")[:200])
-    places_for_select = []
-    for p in places_choices:
-        t = p.translations.filter(lang="fa").first()
-        name = (t.name if t else None) or (p.translations.filter(lang="en").first().name if p.translations.filter(lang="en").first() else None) or str(p.place_id)
-        places_for_select.append({"place_id": str(p.place_id), "name": name})
+    return await sync_to_async(_render_routes_page)(request, route_result, travel_mode, src_id, dst_id)
 
-    return render(request, f"{TEAM_NAME}/routes.html", {
-        "route_result": route_result,
-        "places_for_select": places_for_select,
-        "travel_mode": travel_mode,
-        "source_place_id": src_id or "",
-        "destination_place_id": dst_id or "",
-    })
+
+# حداکثر تعداد زوج مبدأ/مقصد در یک درخواست routes/batch/ (TEAM13_ROUTE_BATCH_MAX_ITEMS)
+DEFAULT_ROUTE_BATCH_MAX_ITEMS = 100
+
+
+def _route_places_bulk(place_ids):
+    """مکان‌های مبدأ/مقصد یک batch با یک پرس‌وجو: {place_id (str): Place}؛ شناسه‌های نامعتبر نادیده گرفته می‌شوند."""
+    valid = []
+    for place_id in place_ids:
+        try:
+            valid.append(uuid.UUID(str(place_id)))
+        except ValueError:
+            continue
+    qs = Place.objects.using(TEAM13_DB).prefetch_related("translations", "amenities").filter(place_id__in=valid)
+    return {str(p.place_id): p for p in qs}
+
+
+def _batch_route_item(item, places):
+    """یک آیتم routes/batch/ → dict آمادهٔ مسیریابی یا رشتهٔ خطا."""
+    if not isinstance(item, dict):
+        return "هر آیتم باید یک شیء JSON باشد"
+    travel_mode, route_options = _route_params(item)
+    src_id = item.get("source_place_id")
+    dst_id = item.get("destination_place_id")
+    if src_id and dst_id:
+        source, dest = places.get(str(src_id)), places.get(str(dst_id))
+        if source is None or dest is None:
+            return "مکان مبدأ یا مقصد یافت نشد"
+        coords = (source.latitude, source.longitude, dest.latitude, dest.longitude)
+        return {
+            "coords": coords, "travel_mode": travel_mode, "options": route_options, "geometry": _geometry_params(item),
+            "places": (source, dest),
+        }
+    try:
+        coords = tuple(float(item[k]) for k in ("source_lat", "source_lng", "dest_lat", "dest_lng"))
+    except (KeyError, TypeError, ValueError):
+        return "source_place_id و destination_place_id یا source_lat/lng و dest_lat/lng الزامی است"
+    return {
+        "coords": coords, "travel_mode": travel_mode, "options": route_options, "geometry": _geometry_params(item),
+        "names": (item.get("source_name", ""), item.get("dest_name", "")),
+    }
+
+
+@_async_require_http_methods(["POST"])
+@_neshan_client_scope
+async def route_batch_request(request):
+    """
+    چند مسیریابی در یک درخواست (مثلاً برای مقایسهٔ گزینه‌ها).
+    POST بدنهٔ JSON: { "routes": [ {...}, ... ] }؛ هر آیتم همان پارامترهای routes/ را دارد:
+    source_place_id/destination_place_id یا source_lat, source_lng, dest_lat, dest_lng (+ source_name, dest_name)،
+    travel_mode، vehicle_type، no_traffic، avoid_traffic_zone، avoid_odd_even_zone، alternative، bearing،
+    steps، simplify، zoom.
+    زوج‌های تکراری یک بار حساب می‌شوند، hitهای کش فوراً و باقی هم‌زمان (RoutingEngine.aroute_many)؛
+    هزینهٔ کل تقریباً برابر کُندترین فراخوانی نشان است نه مجموع آن‌ها.
+    پاسخ: { "count", "results" } هم‌ترتیب با routes؛ هر نتیجه index و status دارد:
+    "ok" (به‌همراه فیلدهای پاسخ routes/) یا "error" (به‌همراه error).
+    """
+    try:
+        body = json.loads(request.body)
+    except (ValueError, TypeError):
+        body = None
+    items = body.get("routes") if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "بدنهٔ JSON با فهرست routes الزامی است"}, status=400)
+    max_items = getattr(settings, "TEAM13_ROUTE_BATCH_MAX_ITEMS", DEFAULT_ROUTE_BATCH_MAX_ITEMS)
+    if len(items) > max_items:
+        return JsonResponse({"error": f"حداکثر {max_items} مسیر در هر درخواست مجاز است"}, status=400)
+
+    place_ids = {
+        item.get(k) for item in items if isinstance(item, dict)
+        for k in ("source_place_id", "destination_place_id") if item.get(k)
+    }
+    places = await sync_to_async(_route_places_bulk)(place_ids) if place_ids else {}
+    specs = [_batch_route_item(item, places) for item in items]
+    valid = [spec for spec in specs if isinstance(spec, dict)]
+    routes = iter(await get_routing_engine().aroute_many([
+        RouteQuery(*spec["coords"], spec["travel_mode"], **spec["options"]) for spec in valid
+    ]))
+
+    results = []
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            results.append({"index": index, "status": "error", "error": spec})
+            continue
+        travel_mode = spec["travel_mode"]
+        route = next(routes)
+        if "places" in spec:
+            result = _route_result_for_places(*spec["places"], travel_mode, route, spec["geometry"])
+        else:
+            lat_s, lng_s, lat_d, lng_d = spec["coords"]
+            name_s, name_d = spec["names"]
+            result = _route_result_for_coords(lat_s, lng_s, name_s, lat_d, lng_d, name_d, travel_mode, route, spec["geometry"])
+        results.append({"index": index, "status": "ok", **result})
+    return JsonResponse({"count": len(results), "results": results})
 
 
 # -----------------------------------------------------------------------------
@@ -1298,49 +1485,90 @@ def route_request(request):
 # مستندات: https://platform.neshan.org/docs/api/routing-category/tsp/
 # -----------------------------------------------------------------------------
 
-@require_GET
-def tsp_request(request):
+@_async_require_GET
+@_neshan_client_scope
+async def tsp_request(request):
     """
     بهینه‌سازی ترتیب بازدید از چند نقطه (TSP).
     GET: waypoints (اجباری) = lat1,lng1|lat2,lng2|... یا چند waypoints=lat,lng
          round_trip، source_is_any_point، last_is_any_point (اختیاری، true/false).
-    پاسخ JSON: { "points": [ { "name", "location": [lng, lat], "index" }, ... ] } یا { "error": "..." }.
+         engine = neshan | hybrid | local (اختیاری؛ پیش‌فرض neshan اگر کلید تنظیم شده، وگرنه hybrid):
+         neshan از /v3/trip نشان؛ hybrid و local بهینه‌ساز درون‌پردازه‌ای (team13.tsp_solver) روی ماتریس
+         زمان سفر team13.distance_engine. در صورت خطای نشان از hybrid استفاده می‌شود.
+         type = car | motorcycle | walk (اختیاری، برای ماتریس hybrid/local).
+    پاسخ JSON: { "points": [ { "name", "location": [lng, lat], "index" }, ... ], "engine" } یا { "error": "..." }.
     """
+    from . import distance_engine
+    from .neshan import aio, is_configured
+
     waypoints_raw = request.GET.get("waypoints", "").strip()
     if not waypoints_raw:
         # چند پارامتر waypoints
         waypoints_list = request.GET.getlist("waypoints")
         waypoints_raw = "|".join(p.strip() for p in waypoints_list if p.strip())
     if not waypoints_raw or waypoints_raw.count("|") < 1:
-        if _wants_json(request):
-            return JsonResponse({"error": "پارامتر waypoints الزامی است (حداقل دو نقطه به صورت lat,lng|lat,lng)"}, status=400)
         return JsonResponse({"error": "پارامتر waypoints الزامی است (حداقل دو نقطه به صورت lat,lng|lat,lng)"}, status=400)
 
     round_trip = request.GET.get("round_trip", "true").lower() in ("1", "true", "yes")
     source_is_any = request.GET.get("source_is_any_point", "true").lower() in ("1", "true", "yes")
     last_is_any = request.GET.get("last_is_any_point", "true").lower() in ("1", "true", "yes")
+    engine = request.GET.get("engine", "").lower().strip()
+    if engine not in distance_engine.ENGINES:
+        engine = distance_engine.ENGINE_NESHAN if is_configured() else distance_engine.ENGINE_HYBRID
+
+    if engine == distance_engine.ENGINE_NESHAN:
+        try:
+            points = await aio.fetch_tsp(
+                waypoints_raw,
+                round_trip=round_trip,
+                source_is_any_point=source_is_any,
+                last_is_any_point=last_is_any,
+            )
+        except Exception:
+            points = None
+        if points is not None:
+            return JsonResponse({"points": points, "engine": engine})
+        engine = distance_engine.ENGINE_HYBRID
 
     try:
-        from .neshan import fetch_tsp
-        points = fetch_tsp(
-            waypoints_raw,
-            round_trip=round_trip,
-            source_is_any_point=source_is_any,
-            last_is_any_point=last_is_any,
-        )
-    except Exception as e:
-        if _wants_json(request):
-            return JsonResponse({"error": "خطا در فراخوانی سرویس بهینه‌سازی مسیر"}, status=500)
-        return JsonResponse({"error": "خطا در فراخوانی سرویس بهینه‌سازی مسیر"}, status=500)
+        waypoints = distance_engine.parse_points(waypoints_raw)
+    except (ValueError, IndexError):
+        return JsonResponse({"error": "مختصات waypoints نامعتبر است"}, status=400)
+    if len(waypoints) ** 2 > distance_engine.max_cells():
+        return JsonResponse({"error": "تعداد نقاط بیش از حد زیاد است"}, status=400)
+    travel_mode = request.GET.get("type", "car").lower().strip()
+    if travel_mode not in ("car", "motorcycle", "walk"):
+        travel_mode = "car"
+    try:
+        return JsonResponse(await sync_to_async(_local_tsp)(
+            waypoints, travel_mode, engine, round_trip, source_is_any, last_is_any,
+        ))
+    except Exception:
+        return JsonResponse({"error": "خطا در بهینه‌سازی ترتیب بازدید"}, status=500)
 
-    if points is None:
-        if _wants_json(request):
-            return JsonResponse({"error": "سرویس بهینه‌سازی مسیر در دسترس نیست یا پاسخ نامعتبر"}, status=502)
-        return JsonResponse({"error": "سرویس بهینه‌سازی مسیر در دسترس نیست یا پاسخ نامعتبر"}, status=502)
 
-    if _wants_json(request):
-        return JsonResponse({"points": points})
-    return JsonResponse({"points": points})
+def _local_tsp(waypoints, travel_mode, engine, round_trip, source_is_any, last_is_any):
+    """ترتیب بازدید با بهینه‌ساز درون‌پردازه‌ای روی ماتریس زمان سفر distance_engine (هم‌گام)."""
+    from . import distance_engine, tsp_solver
+
+    _, duration, _, engine = distance_engine.compute_matrix(
+        waypoints, waypoints, travel_mode=travel_mode, engine=engine,
+    )
+    order = tsp_solver.solve(
+        duration,
+        round_trip=round_trip,
+        source_is_any_point=source_is_any,
+        last_is_any_point=last_is_any,
+    )
+    points = [
+        {"name": "", "location": [float(waypoints[i][1]), float(waypoints[i][0])], "index": i}
+        for i in order
+    ]
+    return {
+        "points": points,
+        "engine": engine,
+        "duration_s": round(tsp_solver.tour_cost(duration, order, round_trip)),
+    }
 
 
 # -----------------------------------------------------------------------------
@@ -1348,14 +1576,21 @@ def tsp_request(request):
 # مستندات: https://platform.neshan.org/docs/api/routing-category/distance-matrix/
 # -----------------------------------------------------------------------------
 
-@require_GET
-def distance_matrix_request(request):
+@_async_require_GET
+@_neshan_client_scope
+async def distance_matrix_request(request):
     """
     ماتریس فاصله و زمان بین نقاط مبدأ و مقصد.
     GET: origins (اجباری) = lat1,lng1|lat2,lng2|... ، destinations (اجباری) همان فرمت.
-         type = car | motorcycle (اختیاری)، no_traffic = 0|1|true|false (اختیاری).
-    پاسخ JSON: { status, rows, origin_addresses, destination_addresses } یا { "error": "..." }.
+         type = car | motorcycle | walk (اختیاری)، no_traffic = 0|1|true|false (اختیاری).
+         engine = neshan | hybrid | local (اختیاری؛ پیش‌فرض neshan اگر کلید تنظیم شده، وگرنه hybrid).
+         neshan در صورت خطا به hybrid برمی‌گردد: خانه‌های کش‌شدهٔ نشان + برآورد محلی (team13.distance_engine).
+    پاسخ JSON: { status, engine, rows, origin_addresses, destination_addresses } یا { "error": "..." }.
+    هر خانه source = neshan | estimate دارد.
     """
+    from . import distance_engine
+    from .neshan import is_configured
+
     origins_raw = request.GET.get("origins", "").strip()
     destinations_raw = request.GET.get("destinations", "").strip()
     if not origins_raw:
@@ -1369,23 +1604,29 @@ def distance_matrix_request(request):
             {"error": "پارامترهای origins و destinations الزامی هستند (مختصات به صورت lat,lng با جداکننده |)"},
             status=400,
         )
+    try:
+        origins = distance_engine.parse_points(origins_raw)
+        destinations = distance_engine.parse_points(destinations_raw)
+    except (ValueError, IndexError):
+        return JsonResponse({"error": "مختصات origins یا destinations نامعتبر است"}, status=400)
+    if len(origins) * len(destinations) > distance_engine.max_cells():
+        return JsonResponse({"error": "ماتریس درخواستی بیش از حد بزرگ است"}, status=400)
     vehicle_type = request.GET.get("type", "car").lower().strip()
-    if vehicle_type not in ("car", "motorcycle"):
+    if vehicle_type not in ("car", "motorcycle", "walk"):
         vehicle_type = "car"
     no_traffic = request.GET.get("no_traffic", "").lower() in ("1", "true", "yes")
+    engine = request.GET.get("engine", "").lower().strip()
+    if engine not in distance_engine.ENGINES:
+        engine = distance_engine.ENGINE_NESHAN if is_configured() else distance_engine.ENGINE_HYBRID
     try:
-        from .neshan import fetch_distance_matrix
-        data = fetch_distance_matrix(
-            origins_raw,
-            destinations_raw,
-            vehicle_type=vehicle_type,
-            no_traffic=no_traffic,
+        distance, duration, known, engine_used = await distance_engine.acompute_matrix(
+            origins, destinations, travel_mode=vehicle_type, no_traffic=no_traffic, engine=engine,
         )
     except Exception:
-        return JsonResponse({"error": "خطا در فراخوانی سرویس ماتریس فاصله"}, status=500)
-    if data is None:
-        return JsonResponse({"error": "سرویس ماتریس فاصله در دسترس نیست یا پاسخ نامعتبر"}, status=502)
-    return JsonResponse(data)
+        return JsonResponse({"error": "خطا در محاسبهٔ ماتریس فاصله"}, status=500)
+    return JsonResponse(
+        distance_engine.matrix_payload(origins, destinations, distance, duration, known, engine_used)
+    )
 
 
 # -----------------------------------------------------------------------------
@@ -1393,13 +1634,16 @@ def distance_matrix_request(request):
 # مستندات: https://platform.neshan.org/docs/api/routing-category/isochrone/
 # -----------------------------------------------------------------------------
 
-@require_GET
-def isochrone_request(request):
+@_async_require_GET
+@_neshan_client_scope
+async def isochrone_request(request):
     """
     محدوده‌ای که از نقطه مرکز در زمان یا مسافت معین قابل دسترسی است.
     GET: location=lat,lng یا lat و lng جداگانه؛ distance (کیلومتر) و/یا time (دقیقه) — حداقل یکی اجباری.
-         polygon = true|false (اختیاری)، denoise = 0..1 (اختیاری).
-    پاسخ: GeoJSON FeatureCollection یا { "error": "..." }.
+         polygon = true|false (اختیاری)، denoise = 0..1 (اختیاری)، fallback = 0 (بدون برآورد محلی؛ اختیاری).
+    مرکز و زمان/مسافت برای استفادهٔ مجدد از کش گرد می‌شوند (team13.isochrones)؛ اگر نشان در دسترس نباشد
+    محدوده با مدل سرعت محلی تقریب زده می‌شود.
+    پاسخ: GeoJSON FeatureCollection با source = neshan | estimate، یا { "error": "..." }.
     """
     location_raw = request.GET.get("location", "").strip()
     lat = request.GET.get("lat")
@@ -1416,7 +1660,7 @@ def isochrone_request(request):
         lng_f = float(lng) if lng else None
     except (TypeError, ValueError):
         lat_f = lng_f = None
-    if lat_f is None or lng_f is None:
+    if lat_f is None or lng_f is None or not (-90 <= lat_f <= 90 and -180 <= lng_f <= 180):
         return JsonResponse(
             {"error": "پارامتر location (lat,lng) یا lat و lng الزامی است"},
             status=400,
@@ -1435,6 +1679,8 @@ def isochrone_request(request):
             time_minutes = float(time_raw)
         except (TypeError, ValueError):
             pass
+    if any(v is not None and not (math.isfinite(v) and v > 0) for v in (distance_km, time_minutes)):
+        return JsonResponse({"error": "distance و time باید عدد مثبت باشند"}, status=400)
     if distance_km is None and time_minutes is None:
         return JsonResponse(
             {"error": "حداقل یکی از پارامترهای distance (کیلومتر) یا time (دقیقه) الزامی است"},
@@ -1450,17 +1696,15 @@ def isochrone_request(request):
                 denoise = d
         except (TypeError, ValueError):
             pass
-    try:
-        from .neshan import fetch_isochrone
-        data = fetch_isochrone(
-            lat_f, lng_f,
-            distance_km=distance_km,
-            time_minutes=time_minutes,
-            polygon=polygon,
-            denoise=denoise,
-        )
-    except Exception:
-        return JsonResponse({"error": "خطا در فراخوانی سرویس محدوده در دسترس"}, status=500)
+    fallback = request.GET.get("fallback", "1").lower() not in ("0", "false", "no")
+    data = await aisochrone(
+        lat_f, lng_f,
+        distance_km=distance_km,
+        time_minutes=time_minutes,
+        polygon=polygon,
+        denoise=denoise,
+        fallback=fallback,
+    )
     if data is None:
         return JsonResponse({"error": "سرویس محدوده در دسترس در دسترس نیست یا پاسخ نامعتبر"}, status=502)
     return JsonResponse(data)
@@ -1471,18 +1715,23 @@ def isochrone_request(request):
 # مستندات: https://platform.neshan.org/docs/api/routing-category/map-matching/
 # -----------------------------------------------------------------------------
 
-def map_matching_request(request):
+@_neshan_client_scope
+async def map_matching_request(request):
     """
-    نگاشت مجموعه نقاط به مسیر واقعی روی نقشه.
-    POST: بدنهٔ JSON { "path": "lat1,lng1|lat2,lng2|..." } — حداقل ۲ نقطه، حداکثر ۱۰۰۰.
-    GET (برای تست): path=lat1,lng1|lat2,lng2|...
-    پاسخ: { "snappedPoints": [...], "geometry": "encoded_polyline" } یا { "error": "..." }.
+    نگاشت مجموعه نقاط (مثلاً رد GPS) به مسیر واقعی روی نقشه.
+    POST: بدنهٔ JSON { "path": "lat1,lng1|lat2,lng2|..." یا [[lat, lng], ...] } — حداقل ۲ نقطه، حداکثر
+    TEAM13_MAP_MATCHING_MAX_POINTS (پیش‌فرض ۵۰٬۰۰۰). GET (برای تست): path=lat1,lng1|lat2,lng2|...
+    ردهای طولانی در پنجره‌های هم‌پوشان هم‌زمان نگاشت و به هم چسبانده می‌شوند (team13.trace_matching).
+    پاسخ: { "snappedPoints": [...], "geometry": "encoded_polyline", "windows", "failed_windows" } یا { "error": "..." }.
+    با stream=1 یا Accept: application/x-ndjson پاسخ NDJSON است: یک خط برای هر پنجره به محض آماده شدن
+    ({"type": "window", "index", "range", "snappedPoints", "geometry"} یا با "error") و خط پایانی
+    {"type": "summary", "points", "windows", "failed_windows"}. جریان واقعی فقط زیر ASGI است؛ زیر WSGI پاسخ
+    async بافر می‌شود، پس همان NDJSON پس از نگاشت همهٔ پنجره‌ها یک‌جا برگردانده می‌شود.
     """
     path_raw = None
     if request.method == "POST":
         if request.content_type and "application/json" in request.content_type:
             try:
-                import json
                 body = json.loads(request.body)
                 path_raw = body.get("path") if isinstance(body, dict) else None
             except (ValueError, TypeError):
@@ -1496,16 +1745,26 @@ def map_matching_request(request):
             {"error": "پارامتر path الزامی است (مختصات به صورت lat,lng|lat,lng|... ، حداقل ۲ نقطه)"},
             status=400,
         )
-    parts = [p.strip() for p in path_raw.split("|") if p.strip()]
-    if len(parts) < 2:
-        return JsonResponse({"error": "path باید حداقل ۲ نقطه داشته باشد"}, status=400)
-    if len(parts) > 1000:
-        return JsonResponse({"error": "حداکثر ۱۰۰۰ نقطه در path مجاز است"}, status=400)
     try:
-        from .neshan import fetch_map_matching
-        data = fetch_map_matching(path_raw)
-    except Exception:
-        return JsonResponse({"error": "خطا در فراخوانی سرویس نگاشت نقطه بر نقشه"}, status=500)
+        points = trace_matching.parse_trace(path_raw)
+    except (TypeError, ValueError, IndexError):
+        return JsonResponse({"error": "مختصات path نامعتبر است"}, status=400)
+    if len(points) < 2:
+        return JsonResponse({"error": "path باید حداقل ۲ نقطه داشته باشد"}, status=400)
+    limit = trace_matching.max_points()
+    if len(points) > limit:
+        return JsonResponse({"error": f"حداکثر {limit} نقطه در path مجاز است"}, status=400)
+
+    stream = (
+        request.GET.get("stream", "").lower() in ("1", "true", "yes")
+        or "application/x-ndjson" in request.headers.get("Accept", "")
+    )
+    if stream:
+        if isinstance(request, ASGIRequest):
+            return StreamingHttpResponse(_map_matching_ndjson(points), content_type="application/x-ndjson")
+        body = "".join([line async for line in _map_matching_ndjson(points)])
+        return HttpResponse(body, content_type="application/x-ndjson")
+    data = await trace_matching.amatch_trace_combined(points)
     if data is None:
         return JsonResponse(
             {"error": "سرویس نگاشت نقطه بر نقشه در دسترس نیست یا مسیری برای نقاط یافت نشد"},
@@ -1514,6 +1773,18 @@ def map_matching_request(request):
     return JsonResponse(data)
 
 
+async def _map_matching_ndjson(points):
+    windows = 0
+    failed = []
+    async for part in trace_matching.amatch_trace(points):
+        windows += 1
+        if "error" in part:
+            failed.append(part["index"])
+        yield json.dumps(part, ensure_ascii=False) + "\n"
+    summary = {"type": "summary", "points": len(points), "windows": windows, "failed_windows": failed}
+    yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+
 # -----------------------------------------------------------------------------
 # تبدیل مختصات به آدرس (Reverse Geocode) با API نشان
 # -----------------------------------------------------------------------------
@@ -1549,7 +1820,8 @@ def reverse_geocode_view(request):
 # تبدیل آدرس به مختصات (Geocoding) با API نشان
 # -----------------------------------------------------------------------------
 
-def geocode_view(request):
+@_neshan_client_scope
+async def geocode_view(request):
     """
     پراکسی تبدیل آدرس متنی به مختصات (Geocoding) نشان.
     مستندات: https://platform.neshan.org/docs/api/search-category/geocoding/
@@ -1606,8 +1878,8 @@ def geocode_view(request):
     if not address:
         return JsonResponse({"error": "پارامتر address (یا q) الزامی است", "items": []}, status=400)
     try:
-        from .neshan import geocode
-        data = geocode(address, province=province, city=city, location=location, extent=extent, plus=plus)
+        from .neshan import aio
+        data = await aio.geocode(address, province=province, city=city, location=location, extent=extent, plus=plus)
     except Exception:
         data = None
     if data is None:
@@ -1619,12 +1891,33 @@ def geocode_view(request):
 # جستجوی آدرس (نشان) — برای باکس جستجو و مسیریابی در فرانت
 # -----------------------------------------------------------------------------
 
+def _search_places_fts(q, limit):
+    """(cities, places) به همان شکل خروجی search_index، از جدول FTS5 ترجمه‌ها با رتبهٔ bm25."""
+    place_ids = fts.search_place_ids(q, limit=limit, using=TEAM13_DB)
+    by_id = {
+        p.place_id.hex: p
+        for p in Place.objects.using(TEAM13_DB).filter(place_id__in=place_ids).prefetch_related("translations")
+    }
+    places = []
+    for place_id in place_ids:
+        p = by_id.get(place_id)
+        if p is not None:
+            names = [(t.lang, t.name) for t in p.translations.all()]
+            places.append(make_doc(
+                place_id, p.type, p.get_type_display(), p.city, p.address, p.latitude, p.longitude, names,
+            ))
+    return fts.search_cities(q, using=TEAM13_DB), places
+
+
 @require_GET
 def search_places(request):
     """
-    جستجو در دیتابیس team13: اول شهرهای منطبق، بعد مکان‌های آن شهرها.
-    شهرها اولویت دارند؛ مکان‌ها بر اساس پربازدید (تعداد استفاده در مسیر) و امتیاز (ستاره) مرتب می‌شوند.
-    GET: q (متن جستجو)، limit (اختیاری، پیش‌فرض ۲۰).
+    جستجو در مکان‌های team13 با نمایهٔ درون‌پردازه‌ای (search_index): اول شهرهای منطبق، بعد مکان‌ها.
+    متن با یکسان‌سازی فارسی مقایسه می‌شود (ي/ك عربی، نیم‌فاصله، اعراب، ارقام فارسی).
+    مکان‌ها بر اساس کیفیت انطباق نام، سپس پربازدید (تعداد استفاده در مسیر) و امتیاز (ستاره) مرتب می‌شوند.
+    با TEAM13_SEARCH_BACKEND="fts" جستجو روی جدول FTS5 ترجمه‌ها (MATCH با رتبهٔ bm25) انجام می‌شود؛
+    مناسب چند worker که هر کدام نمایهٔ درون‌پردازه‌ای جدا نگه ندارند.
+    GET: q (متن جستجو)، limit (اختیاری، پیش‌فرض ۳۰).
     خروجی: items با item_type="city" یا "place"؛ city اول، سپس placeها.
     """
     q = (request.GET.get("q") or request.GET.get("term") or "").strip()
@@ -1632,81 +1925,31 @@ def search_places(request):
         return JsonResponse({"count": 0, "items": []})
     limit = min(100, max(1, int(request.GET.get("limit", 30))))
 
-    # ۱) فقط شهرهایی که نام شهر (فیلد city) شامل متن جستجو است — حروف مرتبط
-    city_names = list(
-        Place.objects.using(TEAM13_DB)
-        .filter(city__icontains=q)
-        .values_list("city", flat=True)
-        .distinct()[:10]
-    )
-    city_names = [c for c in city_names if c and str(c).strip()]
-    city_items = []
-    for city_name in city_names:
-        first_place = (
-            Place.objects.using(TEAM13_DB)
-            .filter(city=city_name)
-            .order_by("-latitude")
-            .first()
-        )
-        if first_place:
-            city_items.append({
-                "item_type": "city",
-                "title": city_name,
-                "address": "شهر " + city_name,
-                "lat": first_place.latitude,
-                "lng": first_place.longitude,
-            })
-
-    # ۲) مکان‌ها: شهر یا نام مکان منطبق؛ مرتب‌سازی: پربازدید (route_count) سپس امتیاز (avg_rating)
-    rating_subq = (
-        Comment.objects.using(TEAM13_DB)
-        .filter(
-            target_type=Comment.TargetType.PLACE,
-            target_id=OuterRef("place_id"),
-        )
-        .values("target_id")
-        .annotate(avg=Avg("rating"))
-        .values("avg")
-    )
-    places_qs = (
-        Place.objects.using(TEAM13_DB)
-        .filter(
-            Q(city__icontains=q)
-            | Q(translations__name__icontains=q)
-        )
-        .annotate(
-            routes_from_c=Count("routes_from", distinct=True),
-            routes_to_c=Count("routes_to", distinct=True),
-        )
-        .annotate(
-            route_count=F("routes_from_c") + F("routes_to_c"),
-            avg_rating=Coalesce(Subquery(rating_subq), 0.0),
-        )
-        .prefetch_related("translations")
-        .distinct()
-        .order_by("-route_count", "-avg_rating")[:limit]
-    )
-    place_items = []
-    for p in places_qs:
-        trans_fa = next((t for t in p.translations.all() if t.lang == "fa"), None)
-        trans_en = next((t for t in p.translations.all() if t.lang == "en"), None)
-        title = (trans_fa.name if trans_fa else trans_en.name if trans_en else p.city or "").strip() or str(p.get_type_display())
-        address = (p.address or p.city or "").strip() or title
-        place_items.append({
+    if getattr(settings, "TEAM13_SEARCH_BACKEND", "index") == "fts" and fts.is_available(TEAM13_DB):
+        cities, places = _search_places_fts(q, limit)
+    else:
+        cities, places = get_search_index().search(q, limit=limit)
+    items = [
+        {"item_type": "city", "title": title, "address": "شهر " + title, "lat": lat, "lng": lng}
+        for title, lat, lng in cities
+    ]
+    items.extend(
+        {
             "item_type": "place",
-            "title": title,
-            "address": address,
-            "lat": p.latitude,
-            "lng": p.longitude,
-            "city": p.city or "",
-        })
-
-    items = city_items + place_items
+            "title": doc.title,
+            "address": doc.address,
+            "lat": doc.latitude,
+            "lng": doc.longitude,
+            "city": doc.city,
+        }
+        for doc in places
+    )
     return JsonResponse({"count": len(items), "items": items})
 
 
-@require_GET
-def neshan_search(request):
+@_async_require_GET
+@_neshan_client_scope
+async def neshan_search(request):
     """
     پراکسی جستجوی مکان‌مبنا (Search API) نشان.
     مستندات: https://platform.neshan.org/docs/api/search-category/search/
@@ -1723,8 +1966,8 @@ def neshan_search(request):
         lat, lng = None, None
     limit = min(50, max(1, int(request.GET.get("limit", 20))))
     try:
-        from .neshan import search_response
-        data = search_response(q, lat=lat, lng=lng, limit=limit)
+        from .neshan import aio
+        data = await aio.search_response(q, lat=lat, lng=lng, limit=limit)
         return JsonResponse(data)
     except Exception:
         return JsonResponse({"count": 0, "items": []})
@@ -1768,25 +2011,28 @@ def emergency_nearby(request):
     except (TypeError, ValueError):
         limit = 50
 
+    from .spatial_index import get_place_index
+
     try:
-        all_emergency = list(
-            Place.objects.using(TEAM13_DB)
-            .filter(type__in=EMERGENCY_PLACE_TYPES)
-            .prefetch_related("translations")
-        )
+        hits = get_place_index(TEAM13_DB).within_radius(lat, lon, radius_km, types=EMERGENCY_PLACE_TYPES)
     except Exception:
-        all_emergency = []
+        hits = []
+    # مرتب‌سازی مانند قبل (فاصلهٔ گردشده، سپس نوع) و فقط limit مکان اول از دیتابیس خوانده می‌شود
+    hits.sort(key=lambda x: (round(x[0], 2), x[1].type))
+    hits = hits[:limit]
+    places_by_id = {
+        str(p.place_id): p
+        for p in Place.objects.using(TEAM13_DB)
+        .filter(place_id__in=[hit.place_id for _, hit in hits])
+        .prefetch_related("translations")
+    }
 
     with_dist = []
-    for p in all_emergency:
-        try:
-            d = _distance_km(lat, lon, float(p.latitude), float(p.longitude))
-        except (TypeError, ValueError):
-            continue
-        if d > radius_km:
+    for d, hit in hits:
+        p = places_by_id.get(hit.place_id)
+        if p is None:
             continue
-        trans_fa = next((t for t in p.translations.all() if t.lang == "fa"), None)
-        trans_en = next((t for t in p.translations.all() if t.lang == "en"), None)
+        trans_fa, trans_en = translation_pair(p)
         name_fa = (trans_fa.name if trans_fa else "").strip()
         name_en = (trans_en.name if trans_en else "").strip()
         with_dist.append({
@@ -1803,8 +2049,7 @@ def emergency_nearby(request):
             "eta_minutes": max(1, round(d / 0.5)),
             "source": "db",
         })
-    with_dist.sort(key=lambda x: (x["distance_km"], x["type"]))
-    emergency_places = with_dist[:limit]
+    emergency_places = with_dist
 
     if _wants_json(request):
         return JsonResponse({
@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import json
-import math
 from ipaddress import ip_address
 from urllib.error import URLError
 from urllib.request import urlopen
 
+from core.geo_math import distances_km, top_k_indices
+
 
 def get_client_ip(request, *, ip_override: str | None = None) -> str | None:
     """Return client IP from query override, X-Forwarded-For or REMOTE_ADDR."""
@@ -115,8 +116,9 @@ def _match_city_name(cities: list[dict], city_name: str) -> dict | None:
 
 
 def _nearest_city_by_coordinates(cities: list[dict], *, latitude: float, longitude: float) -> dict | None:
-    best_city: dict | None = None
-    best_distance_km: float | None = None
+    located: list[dict] = []
+    lats: list[float] = []
+    lons: list[float] = []
 
     for city in cities:
         coords = city.get("coordinates") or []
@@ -126,27 +128,14 @@ def _nearest_city_by_coordinates(cities: list[dict], *, latitude: float, longitu
         city_lon = _to_float(coords[1])
         if city_lat is None or city_lon is None:
             continue
-        distance = _haversine_km(latitude, longitude, city_lat, city_lon)
-        if best_distance_km is None or distance < best_distance_km:
-            best_distance_km = distance
-            best_city = city
-
-    return best_city
-
-
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    radius_km = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-
-    a = (
-        math.sin(delta_phi / 2.0) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2.0) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return radius_km * c
+        located.append(city)
+        lats.append(city_lat)
+        lons.append(city_lon)
+
+    if not located:
+        return None
+    nearest = top_k_indices(distances_km(latitude, longitude, lats, lons), 1)
+    return located[int(nearest[0])]
 
 
 def _to_float(value) -> float | None: